@@ -0,0 +1,14 @@
+import warnings
+from pandas.errors import PerformanceWarning
+warnings.simplefilter(action="ignore", category=PerformanceWarning)
+
+import typer
+
+from ..io import build_dataset_cache
+
+app = typer.Typer()
+app.command()(build_dataset_cache)
+
+
+if __name__ == "__main__":
+    app()
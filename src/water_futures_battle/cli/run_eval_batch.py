@@ -0,0 +1,14 @@
+import warnings
+from pandas.errors import PerformanceWarning
+warnings.simplefilter(action="ignore", category=PerformanceWarning)
+
+import typer
+
+from ..io import run_eval_batch
+
+app = typer.Typer()
+app.command()(run_eval_batch)
+
+
+if __name__ == "__main__":
+    app()
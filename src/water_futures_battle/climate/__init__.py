@@ -1,5 +1,6 @@
-from .services import configure_climate
+from .services import configure_climate, configure_climate_reads
 
 __all__ = [
-    'configure_climate'
+    'configure_climate',
+    'configure_climate_reads'
 ]
\ No newline at end of file
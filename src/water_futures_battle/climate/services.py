@@ -1,8 +1,9 @@
 import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List
 
 from ..core import Settings
+from ..core.dataset_cache import ExcelRead, excel_reads
 
 from .dynamic_properties import ClimateDB
 
@@ -14,6 +15,10 @@ def configure_climate(
 
     return ClimateDB.load_from_file(os.path.join(data_path, config[ClimateDB.NAME]))
 
+def configure_climate_reads(config: dict, data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by configure_climate."""
+    return excel_reads(ClimateDB.excel_read(os.path.join(data_path, config[ClimateDB.NAME])))
+
 def dump_climate(
         climate_db: ClimateDB,
         output_dir: Path
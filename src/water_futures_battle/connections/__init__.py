@@ -1,5 +1,6 @@
-from .services import build_piping_infrastructure
+from .services import build_piping_infrastructure, build_piping_infrastructure_reads
 
 __all__ = [
-    'build_piping_infrastructure'
+    'build_piping_infrastructure',
+    'build_piping_infrastructure_reads'
 ]
\ No newline at end of file
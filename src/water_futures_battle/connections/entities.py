@@ -1,11 +1,12 @@
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Self, Set, Tuple
+from typing import Any, ClassVar, Dict, List, Optional, Self, Set, Tuple
 
 import numpy as np
 import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import bwf_entity
+from ..core.registry import EntityRegistry
 from ..core.utility import BWFTimeLike, timestampify
 from ..jurisdictions import Municipality, State
 from ..sources.entities import SourcesContainer
@@ -58,6 +59,39 @@ class Connection:
     replaces_cnn_ids: List[str]
     REPLACES = 'replaces'
 
+    # Calendar of the pipes failures: by year, the connections with a pipe that
+    # fails that year (the lifetime of a pipe is sampled when it is installed).
+    # Every year only these connections are inspected, see failing_in.
+    _FAILURE_CALENDAR: ClassVar[Dict[int, Dict[str, 'Connection']]] = {}
+
+    def __post_init__(self):
+        for pipe in self.pipes.values():
+            self._schedule_failure(pipe)
+
+        EntityRegistry.register(Connection, self)
+        if isinstance(self, SupplyConnection):
+            EntityRegistry.link(EntityRegistry.SOURCE_SUPPLY_CONNECTION, self.from_node.bwf_id, self)
+
+    def _schedule_failure(self, pipe: Pipe) -> None:
+        # Never failing if sampled lifetime is not there (see Pipe._is_failing_this_year)
+        if pipe._sampled_lifetime <= 0:
+            return
+        failure_year = pipe.installation_date.year + int(pipe._sampled_lifetime)
+        self._FAILURE_CALENDAR.setdefault(failure_year, {})[self.bwf_id] = self
+
+    @classmethod
+    def failing_in(cls, year: int) -> List['Connection']:
+        """
+        The connections that had a pipe scheduled to fail in `year`, sorted by id.
+        The pipe may have been replaced in the meantime, `inspect` tells.
+        """
+        scheduled = cls._FAILURE_CALENDAR.get(year, {})
+        return [scheduled[bwf_id] for bwf_id in sorted(scheduled)]
+
+    @classmethod
+    def clear_failure_calendar(cls) -> None:
+        cls._FAILURE_CALENDAR = {}
+
     def is_active(self, when: BWFTimeLike) -> bool:
         """
         Returns True if the connection is active at the given time.
@@ -72,6 +106,13 @@ class Connection:
         - installation_date <= when
         - (decommission_date is NaT or decommission_date > when)
         """
+        if isinstance(when, int):
+            for pipe in self.pipes.values():
+                first, stop = pipe._ACTIVE_YEARS[pipe.bwf_id]
+                if first <= when < stop:
+                    return pipe
+            return None
+
         ts = timestampify(when)
 
         for pipe in self.pipes.values():
@@ -133,6 +174,7 @@ class Connection:
 
         # Actually install it
         self.pipes[len(self.pipes)] = new_pipe
+        self._schedule_failure(new_pipe)
 
         return new_pipe
     
@@ -244,9 +286,9 @@ def get_pipe_collection(
             )
 
             if lifetime_bounds[0] < lifetime_bounds[1]:
-                lifetime = int(settings.pipes_lifetime_rng.integers(
-                    *lifetime_bounds
-                ))
+                lifetime = int(settings.get_random_generator(
+                    'pipes-lifetime', f"{bwf_id_prefix}-{i:02d}"
+                ).integers(*lifetime_bounds))
             else:
                 lifetime = lifetime_bounds[0]
 
@@ -1,6 +1,7 @@
 from typing import Any, Dict, Set
 
 from ..core import Settings
+from ..core.registry import EntityRegistry
 from ..core.utility import timestampify
 from ..pipes import Pipe, PipeOption
 from ..pipes.dynamic_properties import PipeOptionsDB
@@ -25,18 +26,18 @@ class InstallPipe:
         pipe_option_id = intervention_desc[PipeOption.ID]
         pipe_inst_date = timestampify(year)
 
-        connection = next((c for c in connections if c.bwf_id == cnn_id), None)
+        connection = EntityRegistry.get(Connection, cnn_id, within=connections)
         if connection is None:
             raise ValueError(f"Connection with id '{cnn_id}' not found.")
 
-        pipe_option = next((p for p in pipe_options if p.bwf_id == pipe_option_id), None)
+        pipe_option = EntityRegistry.get(PipeOption, pipe_option_id, within=pipe_options)
         if pipe_option is None:
             raise ValueError(f"PipeOption with id '{pipe_option_id}' not found.")
 
         new_pipe = connection.install_pipe(
             pipe_option=pipe_option,
             installation_date=pipe_inst_date,
-            lifetime_rng=settings.get_random_generator(cls._RNG_NAME)
+            lifetime_rng=settings.get_random_generator(cls._RNG_NAME, connection.bwf_id, year, 'install')
         )
 
         # Calculate this new pipe cost because it will immediately influence the 
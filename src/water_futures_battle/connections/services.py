@@ -1,13 +1,15 @@
 import os
 from pathlib import Path
-from typing import Any, Dict, Set, Tuple
+from typing import Any, Dict, List, Set, Tuple
 
 import numpy as np
 import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import StaticProperties
+from ..core.registry import EntityRegistry
 from ..core.utility import timestampify, BWFTimeLike
+from ..core.dataset_cache import ExcelRead, excel_reads
 from ..jurisdictions.entities import State
 from ..sources.entities import SourcesContainer
 from ..pipes.dynamic_properties import PipeOptionsDB, PipesDB
@@ -29,10 +31,7 @@ def build_piping_infrastructure(
     pipe_options_db = PipeOptionsDB.load_from_file(os.path.join(data_path, desc[PipeOptionsDB.NAME]))
     PipeOption.set_dynamic_properties(pipe_options_db)
 
-    pipe_options_data = pd.read_excel(
-        os.path.join(data_path, desc['pipe_options-static_properties']),
-        sheet_name=None
-    )
+    pipe_options_data = _pipe_options_read(desc, data_path).read()
 
     pipe_options_map: Dict[str, PipeOption] = {}
     for idx, option in pipe_options_data['options'].iterrows():
@@ -41,13 +40,12 @@ def build_piping_infrastructure(
         pipe_options_map[pipe_option.bwf_id] = pipe_option
 
     # PIPES (objects) and CONNECTIONS (container of pipes)
+    # The failures of the pipes of a previously built system are not ours
+    Connection.clear_failure_calendar()
     pipes_db = PipesDB.load_from_file(os.path.join(data_path, desc[PipesDB.NAME]))
     Pipe.set_dynamic_properties(pipes_db)
 
-    connections_data = pd.read_excel(
-        os.path.join(data_path, desc['connections-static_properties']),
-        sheet_name=['provincial', 'sources', 'cross-provincial']
-    )
+    connections_data = _connections_read(desc, data_path).read()
 
     connections: Set[Connection] = set()
     for idx, conn_data in connections_data['sources'].iterrows():
@@ -79,20 +77,40 @@ def build_piping_infrastructure(
 
     return pipe_options, connections
 
+def _pipe_options_read(desc: Dict[str, str], data_path: str) -> ExcelRead:
+    return ExcelRead(os.path.join(data_path, desc['pipe_options-static_properties']), dict(sheet_name=None))
+
+def _connections_read(desc: Dict[str, str], data_path: str) -> ExcelRead:
+    return ExcelRead(
+        os.path.join(data_path, desc['connections-static_properties']),
+        dict(sheet_name=['provincial', 'sources', 'cross-provincial'])
+    )
+
+def build_piping_infrastructure_reads(desc: Dict[str, str], data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by build_piping_infrastructure."""
+    return excel_reads(
+        PipeOptionsDB.excel_read(os.path.join(data_path, desc[PipeOptionsDB.NAME])),
+        _pipe_options_read(desc, data_path),
+        PipesDB.excel_read(os.path.join(data_path, desc[PipesDB.NAME])),
+        _connections_read(desc, data_path)
+    )
+
 def age_pipes(
         connections: Set[Connection],
         year: int,
-        pipe_ageing_rng: np.random.Generator
+        settings: Settings
     )-> None:
     """
     Age by one year all active pipes in the passed connections.
+    The decay of each pipe is drawn with the pipe id and the year as key, so
+    adding or removing a pipe doesn't change the decay of the others.
     
     :param connections: Description
     :type connections: Set[Connection]
     :param year: Description
     :type year: int
-    :param pipe_options_db: Description
-    :type pipe_options_db: PipeOptionsDB
+    :param settings: Description
+    :type settings: Settings
     """
 
     # Track a few properties to vectorize the set operation
@@ -118,11 +136,12 @@ def age_pipes(
         pipe_dec_rate_ub.append(pipe._pipe_option.dff_decay_rate[1])
 
     # complete the ageing process in a vectorized fashion
-    rnd_sample = pipe_ageing_rng.uniform(low=0, high=1, size=len(pipe_ids))
-    decay_low = np.array(pipe_dec_rate_lb)
-    decay_high = np.array(pipe_dec_rate_ub)
-    
-    decay = decay_low + (decay_high-decay_low)*rnd_sample
+    decay = settings.draw_uniform(
+        'pipes-fric_f_decay',
+        keys=[(pipe_id, year) for pipe_id in pipe_ids],
+        low=np.array(pipe_dec_rate_lb),
+        high=np.array(pipe_dec_rate_ub)
+    )
 
     ff_df = Pipe._dynamic_properties[PipesDB.FRICTIONF]
 
@@ -240,10 +259,8 @@ def resolve_current_cnn(
         )
     ):
         # it has happened already, we return the new connection effective date
-        new_connection = next(
-            c for c in other_connections
-            if c.bwf_id == old_connection.replaced_by_cnn_id
-        )
+        new_connection = EntityRegistry.get(Connection, old_connection.replaced_by_cnn_id, within=other_connections)
+        assert new_connection is not None, f"Connection {old_connection.replaced_by_cnn_id} not found."
 
         return resolve_current_cnn(
             old_connection=new_connection,
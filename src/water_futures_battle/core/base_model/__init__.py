@@ -1,5 +1,5 @@
 from .properties import StaticProperties, DynamicProperties, bwf_database
-from .results import BWFResult
+from .results import BWFResult, RetentionPolicy
 from .entities import bwf_entity, Location, Policy, Intervention
 
 __all__ = [
@@ -7,6 +7,7 @@ __all__ = [
 	"DynamicProperties",
 	"bwf_database",
 	"BWFResult",
+	"RetentionPolicy",
 	"bwf_entity",
 	"Location",
 	"Policy",
@@ -2,8 +2,11 @@ import os
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Protocol, Type, TypeVar, Union
 
+import numpy as np
 import pandas as pd
 
+from ..dataset_cache import ExcelRead
+
 class PropertiesContainer:
     """Base container for a collection of related DataFrames."""
     def __init__(self, name: str, dataframes: Optional[Dict[str, pd.DataFrame]] = None):
@@ -11,12 +14,27 @@ class PropertiesContainer:
         if dataframes is None:
             dataframes = {}
         self.dataframes = dataframes
+        # How many times each dataframe has been written (see touch)
+        self._versions: Dict[str, int] = {}
 
     def __getitem__(self, key: str) -> pd.DataFrame:
         return self.dataframes[key]
 
     def __setitem__(self, key: str, value: pd.DataFrame) -> None:
         self.dataframes[key] = value
+        self.touch(key)
+
+    def touch(self, key: str) -> None:
+        """
+        Record that the dataframe `key` has been written. Whoever writes in
+        place (e.g., `db[key].loc[ts, id] = value`) must call it, so that the
+        values materialised from it (e.g., the yearly state tables, see
+        core/views.py) are computed again.
+        """
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, key: str) -> int:
+        return self._versions.get(key, 0)
 
     def __getattr__(self, attr):
         # Delegate to the dataframes dict if attribute not found on self
@@ -80,6 +98,39 @@ def _dump_to_csv(
             fps.append(fp)
         return fps
 
+def _dump_to_parquet(
+        base_path: Path,
+        base_name: str,
+        a_dict: Dict[str, pd.DataFrame],
+        f__index: bool = False,
+        presave_task = None
+    ) -> Path:
+        # one directory per container, one parquet per sheet →  base_name/sheet.parquet
+        dir_path = base_path / base_name
+        dir_path.mkdir(exist_ok=True)
+
+        for sheet, df in a_dict.items():
+            if presave_task:
+                df = presave_task(df)
+
+            df.to_parquet(dir_path / f"{sheet}.parquet", index=f__index)
+        return dir_path
+
+def _read_parquet_dataset(dir_path: Path, sheets: List[str]) -> Dict[str, pd.DataFrame]:
+        # Inverse of DynamicProperties.dump(format='parquet'): a sheet is either
+        # a single file or a directory with one file per year
+        dfs = {}
+        for sheet in sheets:
+            fp = dir_path / f"{sheet}.parquet"
+            if fp.exists():
+                dfs[sheet] = pd.read_parquet(fp)
+                continue
+
+            year_fps = sorted((dir_path / sheet).glob("*.parquet"))
+            if year_fps:
+                dfs[sheet] = pd.concat([pd.read_parquet(yfp) for yfp in year_fps])
+        return dfs
+
 ALLOWED_FORMATS = {'xlsx', 'csv', 'parquet'}
 def _dump_to_file(
         base_path: Path,
@@ -112,7 +163,7 @@ def _dump_to_file(
             )
         
         else:
-            return _dump_to_csv(
+            return _dump_to_parquet(
                 base_path=base_path,
                 base_name=base_name,
                 a_dict=a_dict,
@@ -149,6 +200,9 @@ class DynamicProperties(PropertiesContainer):
 
                 return df
 
+            if format == 'parquet':
+                return self._dump_to_parquet_dataset(path=path, alternative_name=alternative_name)
+
             dump_kwargs = dict(path=path, alternative_name=alternative_name, f__index=True, presave_task=_fix_index_dates, format=format)
 
             flat_dfs = {k: v for k, v in self.dataframes.items() if len(v) < self.HOURLY_YEAR_THRESHOLD}
@@ -175,6 +229,44 @@ class DynamicProperties(PropertiesContainer):
 
             return fps[0] if len(fps) == 1 else fps
 
+    def _dump_to_parquet_dataset(
+            self,
+            path: Optional[Path] = None,
+            alternative_name: Optional[str] = None
+        ) -> Path:
+        """
+        Columnar version of dump: the index stays a native timestamp and the 
+        columns keep their dtype (results are float32).
+        Everything goes in a directory named after the container, one file per
+        variable, or one directory per variable with a file per year for the 
+        long (hourly) ones:
+            <name>/<variable>.parquet
+            <name>/<variable>/<year>.parquet
+        """
+        base_path = Path(path) if path else Path(os.getcwd())
+        base_path.mkdir(exist_ok=True)
+        dir_path = base_path / (alternative_name if alternative_name else self.name)
+        dir_path.mkdir(exist_ok=True)
+
+        for var, df in self.dataframes.items():
+            df = df.copy(deep=False)
+            df.index = pd.to_datetime(df.index)
+            df.index.name = 'timestamp'
+            df = df.sort_index()
+
+            if len(df.index) < self.HOURLY_YEAR_THRESHOLD:
+                df.to_parquet(dir_path / f"{var}.parquet", index=True)
+                continue
+
+            var_path = dir_path / var
+            var_path.mkdir(exist_ok=True)
+            for year in np.unique(df.index.year):
+                # Drop columns full of NaNs for elements that were not there in a given year
+                year_df = df[df.index.year == year].dropna(axis=1, how='all')
+                year_df.to_parquet(var_path / f"{year}.parquet", index=True)
+
+        return dir_path
+
     
 T = TypeVar("T", bound="DynamicProperties")
 
@@ -202,15 +294,27 @@ def bwf_database(cls: Type[T]) -> Type[T]:
         return vars
     
     @classmethod
-    def load_from_file(cls_, full_filepath: Path):
-        vars = must_contain_variables_named()
-        dfs = pd.read_excel(
+    def excel_read(cls_, full_filepath: Path) -> Optional[ExcelRead]:
+        """How load_from_file parses the file (None if it is a parquet dataset)."""
+        if Path(full_filepath).is_dir():
+            return None
+        return ExcelRead(
             full_filepath,
-            sheet_name=vars,
-            index_col='timestamp', # we said this decorator is only for dynamic properties
-            parse_dates=True
+            dict(
+                sheet_name=must_contain_variables_named(),
+                index_col='timestamp', # we said this decorator is only for dynamic properties
+                parse_dates=True
+            )
         )
-        return cls_(dataframes=dfs)
+
+    @classmethod
+    def load_from_file(cls_, full_filepath: Path):
+        read = cls_.excel_read(full_filepath)
+        if read is None:
+            # a parquet dataset, as written by dump(format='parquet')
+            return cls_(dataframes=_read_parquet_dataset(Path(full_filepath), must_contain_variables_named()))
+
+        return cls_(dataframes=read.read())
     
     def _must_contain_variables_check(self) -> None:
         missing = [k for k in must_contain_variables_named() if k not in self.dataframes]
@@ -230,6 +334,7 @@ def bwf_database(cls: Type[T]) -> Type[T]:
         self._must_contain_variables_check()
         self.variables_validation_checks()
 
+    cls.excel_read = excel_read
     cls.load_from_file = load_from_file
     cls._must_contain_variables_check = _must_contain_variables_check
     if not hasattr(cls, 'variables_validation_checks'):
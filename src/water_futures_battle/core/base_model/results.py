@@ -1,33 +1,467 @@
+from dataclasses import dataclass
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Self, Optional, Union
+import re
+import tempfile
+import weakref
+from typing import Any, Dict, List, NamedTuple, Self, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 from .properties import DynamicProperties, PropertiesContainer
 
+class _ColumnarBlock:
+    """
+    Storage of a tracked variable: a preallocated (timestamps x entities) float32
+    block, with sorted timestamps and an entity to column index.
+    Rows and columns grow in amortised chunks, so that committing one more year 
+    of results doesn't copy the results of the previous years.
+    The frames returned by `view` are read-only and never change: the block is
+    copied before changing in place the values (or timestamps) they show.
+    """
+    MIN_ROWS_CAPACITY = 8
+    MIN_COLS_CAPACITY = 16
+
+    def __init__(self, n_rows_capacity: int = 0, n_cols_capacity: int = 0):
+        n_rows_capacity = max(n_rows_capacity, self.MIN_ROWS_CAPACITY)
+        n_cols_capacity = max(n_cols_capacity, self.MIN_COLS_CAPACITY)
+
+        self.data = np.full((n_rows_capacity, n_cols_capacity), np.nan, dtype=np.float32)
+        self.timestamps = np.empty(n_rows_capacity, dtype='datetime64[us]')
+        self.n_rows = 0
+        self.columns: List[str] = []
+        self.column_index: Dict[str, int] = {}
+
+        self._view: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> Self:
+        df = df.sort_index()
+        block = cls(n_rows_capacity=len(df), n_cols_capacity=len(df.columns))
+        block.write(pd.DatetimeIndex(df.index), df.columns, df.to_numpy(dtype=np.float32))
+        return block
+
+    def reserve(self, n_rows: int, n_cols: int = 0) -> None:
+        """Make sure that the block can hold at least these many rows and columns."""
+        rows_cap, cols_cap = self.data.shape
+        if n_rows <= rows_cap and n_cols <= cols_cap:
+            return
+        
+        new_data = np.full((max(n_rows, rows_cap), max(n_cols, cols_cap)), np.nan, dtype=np.float32)
+        new_data[:self.n_rows, :len(self.columns)] = self.data[:self.n_rows, :len(self.columns)]
+        self.data = new_data
+        self._view = None
+
+        if n_rows > rows_cap:
+            new_timestamps = np.empty(n_rows, dtype='datetime64[us]')
+            new_timestamps[:self.n_rows] = self.timestamps[:self.n_rows]
+            self.timestamps = new_timestamps
+
+    def _rows_of(self, timestamps: pd.DatetimeIndex) -> np.ndarray:
+        ts = timestamps.as_unit('us').to_numpy()
+        current = self.timestamps[:self.n_rows]
+
+        positions = np.searchsorted(current, ts)
+        found = positions < self.n_rows
+        found[found] = current[positions[found]] == ts[found]
+        if found.all():
+            return positions
+        
+        missing = np.unique(ts[~found])
+        if self.n_rows == 0 or missing[0] > current[-1]:
+            # Usual case, we are appending the results of a new period
+            if self.n_rows + len(missing) > self.data.shape[0]:
+                self.reserve(max(self.n_rows + len(missing), 2 * self.data.shape[0]))
+            self.timestamps[self.n_rows:self.n_rows+len(missing)] = missing
+            self.n_rows += len(missing)
+        else:
+            # Writing in the past, move the existing rows to their new place
+            union = np.union1d(current, missing)
+            old_rows = np.searchsorted(union, current)
+            new_data = np.full((max(len(union), self.data.shape[0]), self.data.shape[1]), np.nan, dtype=np.float32)
+            new_data[old_rows, :] = self.data[:self.n_rows, :]
+            self.data = new_data
+            self.timestamps = np.empty(self.data.shape[0], dtype='datetime64[us]')
+            self.timestamps[:len(union)] = union
+            self.n_rows = len(union)
+            self._view = None
+
+        return np.searchsorted(self.timestamps[:self.n_rows], ts)
+
+    def _columns_of(self, columns: pd.Index) -> np.ndarray:
+        # New columns are added in alphabetical order (as pd.Index.difference does)
+        new_columns = sorted(set(c for c in columns if c not in self.column_index))
+        if new_columns:
+            n_cols = len(self.columns) + len(new_columns)
+            cols_cap = self.data.shape[1]
+            if n_cols > cols_cap:
+                self.reserve(0, max(n_cols, cols_cap + cols_cap // 2))
+            for c in new_columns:
+                self.column_index[c] = len(self.columns)
+                self.columns.append(c)
+
+        return np.array([self.column_index[c] for c in columns], dtype=np.int64)
+
+    def write(self, timestamps: pd.DatetimeIndex, columns: pd.Index, values: np.ndarray) -> None:
+        rows = self._rows_of(timestamps)
+        cols = self._columns_of(columns)
+
+        if len(rows) == 0 or len(cols) == 0:
+            self._view = None
+            return
+
+        if self._view is not None:
+            # Appending rows or columns doesn't touch the ones already viewed
+            n_viewed_rows, n_viewed_cols = self._view.shape
+            if rows.min() < n_viewed_rows and cols.min() < n_viewed_cols:
+                self._detach()
+            self._view = None
+
+        if rows[-1] - rows[0] + 1 == len(rows) and np.all(np.diff(rows) == 1):
+            # contiguous rows (e.g. a new year), avoid the fancy indexing on the long axis
+            self.data[rows[0]:rows[-1]+1, cols] = values
+        else:
+            self.data[np.ix_(rows, cols)] = values
+
+    def shrink(self, n_rows_capacity: int) -> None:
+        """Give back the rows reserved beyond `n_rows_capacity` (never the used ones)."""
+        n_rows_capacity = max(n_rows_capacity, self.n_rows, self.MIN_ROWS_CAPACITY)
+        if n_rows_capacity >= self.data.shape[0]:
+            return
+        self.data = self.data[:n_rows_capacity, :].copy()
+        self.timestamps = self.timestamps[:n_rows_capacity].copy()
+        self._view = None
+
+    def drop_first_rows(self, n_rows: int) -> None:
+        """Forget the oldest `n_rows` rows, the capacity of the block doesn't change."""
+        n_rows = min(n_rows, self.n_rows)
+        if n_rows <= 0:
+            return
+        if self._view is not None:
+            self._detach()
+        n_left = self.n_rows - n_rows
+        self.data[:n_left, :] = self.data[n_rows:self.n_rows, :]
+        self.data[n_left:self.n_rows, :] = np.nan
+        self.timestamps[:n_left] = self.timestamps[n_rows:self.n_rows]
+        self.n_rows = n_left
+        self._view = None
+
+    def _detach(self) -> None:
+        """Leave the arrays to the frames already viewed, continue on a copy."""
+        self.data = self.data.copy()
+        self.timestamps = self.timestamps.copy()
+        self._view = None
+
+    def view(self) -> pd.DataFrame:
+        """Read-only DataFrame on top of the block (no copy), cached until the next write."""
+        if self._view is None:
+            values = self.data[:self.n_rows, :len(self.columns)]
+            values.flags.writeable = False
+            timestamps = self.timestamps[:self.n_rows]
+            timestamps.flags.writeable = False
+            self._view = pd.DataFrame(
+                values,
+                index=pd.DatetimeIndex(timestamps, name='timestamp'),
+                columns=pd.Index(self.columns),
+                copy=False
+            )
+        return self._view
+
+_AGGREGATE_RE = re.compile(r'^(sum|mean|min|max|p\d{1,2})$')
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    What is kept of a tracked variable once a period is settled (see
+    :meth:`BWFResult.settle`):
+    - 'keep': every value stays in memory (the default);
+    - 'aggregate': only the yearly `aggregates` of the settled values are kept;
+    - 'spill': as 'aggregate', and the settled values are moved to files in
+      `spill_dir`, from where they are memory-mapped when read back.
+    The aggregates are 'sum', 'mean', 'min', 'max' or a percentile like 'p95'.
+    """
+    KEEP = 'keep'
+    AGGREGATE = 'aggregate'
+    SPILL = 'spill'
+    MODES = (KEEP, AGGREGATE, SPILL)
+
+    mode: str = KEEP
+    aggregates: Tuple[str, ...] = ('sum', 'max')
+    spill_dir: Optional[Path] = None
+
+    def __post_init__(self):
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unknown retention mode '{self.mode}'.",
+                             f"Available modes are: {self.MODES}")
+        
+        for stat in self.aggregates:
+            if not _AGGREGATE_RE.match(stat):
+                raise ValueError(f"Unknown aggregate '{stat}'.",
+                                 "Available aggregates are: sum, mean, min, max and percentiles as p<NN>")
+        
+        if self.mode == self.SPILL and self.spill_dir is None:
+            raise ValueError("The 'spill' retention mode needs a spill directory")
+
+_KEEP_EVERYTHING = RetentionPolicy()
+
+class _SpilledRows(NamedTuple):
+    path: Path
+    timestamps: np.ndarray
+    columns: List[str]
+    # The process that wrote the file: forked copies of the results read it,
+    # only its owner deletes it
+    owner: int
+
+def _delete_spilled(spilled: Dict[str, List[_SpilledRows]]) -> None:
+    for chunks in spilled.values():
+        for chunk in chunks:
+            if chunk.owner == os.getpid():
+                chunk.path.unlink(missing_ok=True)
+
+def _yearly_aggregate(df: pd.DataFrame, stat: str) -> pd.DataFrame:
+    grouped = df.groupby(df.index.year)
+    if stat == 'sum':
+        # Entities that were not there have no values, not zeros
+        agg = grouped.sum(min_count=1)
+    elif stat.startswith('p'):
+        agg = grouped.quantile(int(stat[1:]) / 100)
+    else:
+        agg = getattr(grouped, stat)()
+    agg.index = pd.DatetimeIndex([pd.Timestamp(year=y, month=1, day=1) for y in agg.index], name='timestamp')
+    return agg
+
 class BWFResult(DynamicProperties):
     NAME: str # For type hints, must be defined in derived class, we check in the init
 
     TRACKED_VARIABLES: List[str] = [ ] # Default for results, just in case you use them as a placeholder (you would not need this class if you don't use this)
 
+    # Rows before the settled period that the simulation still reads
+    # (e.g., the production of the last 23 hours), by tracked variable
+    LOOKBACK: Dict[str, int] = { }
+
     def __init__(self):
 
         # Enforce check on NAME
         if not hasattr(self, 'NAME') or self.NAME is None:
             raise TypeError(f"{self.__class__.__name__} must define a class attribute 'NAME'")
         
-        dataframes = {
-            var: pd.DataFrame(
-                index=pd.DatetimeIndex(
-                    [],
-                    name="timestamp"
-                ),
-                dtype=np.float32
-            )
+        # The results are not kept in dataframes but in columnar blocks,
+        # dataframes are views on top of them (see __getitem__)
+        self._blocks: Dict[str, _ColumnarBlock] = {
+            var: _ColumnarBlock()
             for var in self.TRACKED_VARIABLES
         }
-        super().__init__(name=self.NAME, dataframes=dataframes)
+        self.name = self.NAME
+
+        # Retention of the settled values (see set_retention and settle)
+        self._retention: Dict[str, RetentionPolicy] = {}
+        self._settled_until: Dict[str, np.datetime64] = {}
+        self._aggregates: Dict[str, Dict[str, _ColumnarBlock]] = {}
+        self._spilled: Dict[str, List[_SpilledRows]] = {}
+        weakref.finalize(self, _delete_spilled, self._spilled)
+
+        self._versions: Dict[str, int] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The spill files are deleted with the results, so the pickled results
+        # (e.g., in a checkpoint) carry the spilled values themselves
+        state = self.__dict__.copy()
+        state['_spilled'] = {
+            var: [(chunk.path.parent, np.load(chunk.path), chunk.timestamps, chunk.columns) for chunk in chunks]
+            for var, chunks in self._spilled.items()
+        }
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        spilled = state.pop('_spilled', {})
+        self.__dict__.update(state)
+
+        # Spilled again, in files owned by this process
+        self._spilled = {}
+        weakref.finalize(self, _delete_spilled, self._spilled)
+        for var, chunks in spilled.items():
+            for spill_dir, values, timestamps, columns in chunks:
+                self._spill(var, spill_dir, pd.DataFrame(
+                    values,
+                    index=pd.DatetimeIndex(timestamps),
+                    columns=columns
+                ))
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        return self._blocks[key].view()
+    
+    def __getattr__(self, attr):
+        # Private attributes are never delegated (e.g., when the blocks are not 
+        # there yet while unpickling)
+        if attr.startswith('_'):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{attr}'")
+        return super().__getattr__(attr)
+    
+    def __setitem__(self, key: str, value: pd.DataFrame) -> None:
+        self._blocks[key] = _ColumnarBlock.from_frame(value)
+        self.touch(key)
+
+    @property
+    def dataframes(self) -> Dict[str, pd.DataFrame]: # type: ignore[override]
+        """
+        Everything that is kept of the tracked variables: the whole history
+        of the variables kept or spilled, the yearly aggregates of the others
+        (as '<variable>-<aggregate>').
+        """
+        dataframes = {}
+        for var in self._blocks:
+            policy = self.retention(var)
+            if policy.mode == RetentionPolicy.AGGREGATE:
+                for stat in policy.aggregates:
+                    dataframes[f"{var}-{stat}"] = self.aggregates(var, stat)
+            else:
+                dataframes[var] = self.history(var)
+        return dataframes
+    
+    def reserve(
+            self,
+            a_property: str,
+            n_timestamps: int,
+            n_entities: int = 0
+        ) -> Self:
+        """
+        Preallocate the space for a tracked variable, e.g., for the hourly 
+        results of all the years to simulate. It is just an hint, results 
+        grow as needed anyway.
+        """
+        self._blocks[a_property].reserve(n_timestamps, n_entities)
+        return self
+
+    def retention(self, a_property: str) -> RetentionPolicy:
+        return self._retention.get(a_property, _KEEP_EVERYTHING)
+
+    def set_retention(
+            self,
+            a_property: str,
+            policy: RetentionPolicy,
+            live_rows: Optional[int] = None
+        ) -> Self:
+        """
+        Choose what is kept of a tracked variable once a period is settled.
+        `live_rows` is how many rows are committed between two settlements
+        (e.g., one year of hourly values): the block is sized for them (and
+        the LOOKBACK rows), the space reserved for more is given back.
+        """
+        if a_property not in self.TRACKED_VARIABLES:
+            raise KeyError(f"Property '{a_property}' not in TRACKED_VARIABLES: {self.TRACKED_VARIABLES}")
+
+        self._retention[a_property] = policy
+        if live_rows is not None and policy.mode != RetentionPolicy.KEEP:
+            # Exactly the rows that are ever in memory at once
+            n_rows = live_rows + self.LOOKBACK.get(a_property, 0)
+            self._blocks[a_property].shrink(n_rows)
+            self._blocks[a_property].reserve(n_rows)
+
+        return self
+
+    def settle(self, until: pd.Timestamp) -> Self:
+        """
+        Apply the retention policies to the values before `until`: compute their
+        yearly aggregates, spill them (if so) and drop them from memory, except
+        the LOOKBACK rows. Settle whole years, the aggregates of a year are
+        computed on the values settled at once.
+        """
+        until_us = pd.Timestamp(until).as_unit('us').to_datetime64()
+
+        for var, policy in self._retention.items():
+            if policy.mode == RetentionPolicy.KEEP:
+                continue
+
+            block = self._blocks[var]
+            timestamps = block.timestamps[:block.n_rows]
+            start = int(np.searchsorted(timestamps, self._settled_until[var])) if var in self._settled_until else 0
+            end = int(np.searchsorted(timestamps, until_us))
+
+            if end > start:
+                rows = block.view().iloc[start:end]
+                for stat in policy.aggregates:
+                    agg = _yearly_aggregate(rows, stat)
+                    self._aggregates.setdefault(var, {}).setdefault(stat, _ColumnarBlock()).write(
+                        timestamps=pd.DatetimeIndex(agg.index),
+                        columns=agg.columns,
+                        values=agg.to_numpy(dtype=np.float32)
+                    )
+                if policy.mode == RetentionPolicy.SPILL:
+                    assert policy.spill_dir is not None
+                    self._spill(var, Path(policy.spill_dir), rows)
+                self._settled_until[var] = until_us
+
+            block.drop_first_rows(end - self.LOOKBACK.get(var, 0))
+            self.touch(var)
+
+        return self
+
+    def _spill(self, a_property: str, spill_dir: Path, rows: pd.DataFrame) -> None:
+        spill_dir.mkdir(parents=True, exist_ok=True)
+
+        # Unique names: concurrent runs may share the directory
+        fd, path = tempfile.mkstemp(dir=spill_dir, prefix=f"{self.NAME}-{a_property}-", suffix='.npy')
+        os.close(fd)
+        np.save(path, rows.to_numpy(dtype=np.float32))
+
+        self._spilled.setdefault(a_property, []).append(_SpilledRows(
+            path=Path(path),
+            timestamps=pd.DatetimeIndex(rows.index).as_unit('us').to_numpy(),
+            columns=list(rows.columns),
+            owner=os.getpid()
+        ))
+
+    def discard_spilled(self) -> Self:
+        """
+        Delete the files spilled by this process, once the results are saved
+        (they are deleted anyway when the results are garbage collected).
+        The spilled values are gone: the history starts where they end.
+        """
+        _delete_spilled(self._spilled)
+        self._spilled.clear()
+        return self
+
+    def history(self, a_property: str) -> pd.DataFrame:
+        """
+        All the values of a tracked variable: the spilled ones, read back from
+        disk, followed by the ones in memory. For a variable that is only
+        aggregated, the values in memory (the period not settled yet).
+        """
+        spilled = self._spilled.get(a_property, [])
+        if not spilled:
+            return self[a_property]
+
+        live = self[a_property]
+        frames = [
+            pd.DataFrame(
+                np.load(chunk.path, mmap_mode='r'),
+                index=pd.DatetimeIndex(chunk.timestamps, name='timestamp'),
+                columns=chunk.columns
+            )
+            for chunk in spilled
+        ]
+        frames.append(live[live.index >= self._settled_until[a_property]])
+
+        return pd.concat(frames).reindex(columns=live.columns)
+
+    def aggregates(self, a_property: str, stat: str) -> pd.DataFrame:
+        """
+        Yearly `stat` of a tracked variable, indexed by the first day of the
+        year. The settled years come from the aggregates kept when they were
+        settled, the others are computed on the values in memory.
+        """
+        live = self[a_property]
+        columns = live.columns
+        if a_property in self._settled_until:
+            live = live[live.index >= self._settled_until[a_property]]
+
+        settled = self._aggregates.get(a_property, {}).get(stat)
+        if settled is None:
+            return _yearly_aggregate(live, stat)
+        if live.empty:
+            return settled.view().reindex(columns=columns)
+        return pd.concat([settled.view(), _yearly_aggregate(live, stat)]).reindex(columns=columns)
 
     def commit(
         self,
@@ -121,26 +555,14 @@ class BWFResult(DynamicProperties):
             assert data is not None
             data_df = data.astype(np.float64)
 
-        res_df = self.dataframes[a_property]
-        
-        # let's make space for them in case indexes and columns are not there
-        new_timestamps = timestamps.difference(res_df.index)
-        if len(new_timestamps) > 0:
-            res_df = res_df.reindex(res_df.index.union(timestamps))
-            res_df.index.name = 'timestamp'
-            res_df = res_df.astype(np.float32)  # reindex fills NaNs as float64
-
-        new_cols = data_df.columns.difference(res_df.columns)
-        if len(new_cols) > 0:
-            res_df[new_cols] = np.float32(np.nan)  # typed from the start, no cast needed
-
-        res_df.loc[timestamps, data_df.columns] = data_df.values.astype(np.float32)
-        
-        assert (res_df.dtypes == np.float32).all(), \
-            f"dtype drift detected: {res_df.dtypes[res_df.dtypes != np.float32].to_dict()}"
-
-        # We modified only the local instance so assign it back
-        self.dataframes[a_property] = res_df
+        # The block makes space for new timestamps and columns (if needed)
+        # and writes the values in place
+        self._blocks[a_property].write(
+            timestamps=pd.DatetimeIndex(timestamps),
+            columns=data_df.columns,
+            values=data_df.values.astype(np.float32)
+        )
+        self.touch(a_property)
 
         return self
 
@@ -168,11 +590,13 @@ class BWFResult(DynamicProperties):
             if f in self.TRACKED_VARIABLES
         ]
         # we then create a temp DynamicProperties object with the requested fields
+        # (with their aggregates, for the variables that are only aggregated)
         return DynamicProperties(
             name=self.NAME,
             dataframes={
-                f: self[f]
-                for f in requested_fields
+                name: df
+                for name, df in self.dataframes.items()
+                if name in requested_fields or name.rsplit('-', 1)[0] in requested_fields
             }
         ).dump(
             path=path,
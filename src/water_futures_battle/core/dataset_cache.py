@@ -0,0 +1,260 @@
+import contextlib
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+
+# Bump it when the content of the cached objects changes meaning
+CACHE_FORMAT_VERSION = 1
+
+ParsedExcel = Union[pd.DataFrame, Dict[str, pd.DataFrame]]
+
+class ExcelRead(NamedTuple):
+    """A workbook and the arguments it is parsed with (see DatasetCache.prefetching)."""
+    filepath: Union[str, Path]
+    kwargs: Dict[str, Any]
+
+    def read(self) -> ParsedExcel:
+        return read_excel(self.filepath, **self.kwargs)
+
+def excel_reads(*reads: Optional[ExcelRead]) -> List[ExcelRead]:
+    """The reads that are actually workbooks (DynamicProperties.excel_read is None for parquet)."""
+    return [read for read in reads if read is not None]
+
+def _read_key(filepath: Union[str, Path], kwargs: Dict[str, Any]) -> Tuple[str, str]:
+    return os.path.abspath(filepath), json.dumps(kwargs, sort_keys=True, default=str)
+
+def _same_kwargs(stored: Dict[str, Any], kwargs: Dict[str, Any]) -> bool:
+    """Are the arguments stored in an entry's json the same as `kwargs`?"""
+    return json.dumps(stored, sort_keys=True) == json.dumps(json.loads(json.dumps(kwargs, default=str)), sort_keys=True)
+
+def _parse_in_worker(
+        filepath: Union[str, Path],
+        kwargs: Dict[str, Any],
+        directory: Optional[Path]
+    ) -> Tuple[ParsedExcel, bool]:
+    """Parse a workbook in a worker process, through the cache if enabled (was it a hit?)."""
+    cache = DatasetCache()
+    if directory is not None:
+        cache.enable(directory)
+    parsed = cache.read_excel(filepath, **kwargs)
+    return parsed, cache.n_hits > 0
+
+class DatasetCache:
+    """
+    Compiled version of the input workbooks.
+
+    Parsing the Excel files is the slowest part of configuring the system, and
+    the input data doesn't change between the evaluation of two masterplans.
+    When enabled, every workbook is parsed once and the resulting dataframes
+    are pickled in the cache directory (pickle keeps dtypes, index and mixed
+    columns exactly as pandas parsed them). The key of each entry is the hash
+    of the source file and of the parsing arguments, so a modified input file
+    is parsed again automatically.
+
+    Next to each entry we keep a small json with where it comes from, so that
+    the entry of the previous version of a workbook is removed when a new one
+    is written, and the cache can be verified against the sources (see
+    :meth:`verify`). If the cache can't be written, the workbook is simply
+    parsed.
+    """
+    def __init__(self):
+        self.directory: Optional[Path] = None
+        self.n_hits = 0
+        self.n_misses = 0
+        self._prefetched: Dict[Tuple[str, str], Future] = {}
+
+    def enable(self, directory: Union[str, Path]) -> None:
+        self.directory = Path(directory)
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def disable(self) -> None:
+        self.directory = None
+
+    @staticmethod
+    def hash_file(filepath: Union[str, Path]) -> str:
+        h = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def key_of(file_hash: str, kwargs: Dict[str, Any]) -> str:
+        desc = json.dumps(
+            {
+                'file': file_hash,
+                'kwargs': kwargs,
+                'pandas': pd.__version__,
+                'format': CACHE_FORMAT_VERSION
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(desc.encode()).hexdigest()
+
+    def read_excel(self, filepath: Union[str, Path], **kwargs) -> ParsedExcel:
+        """
+        Same as pandas.read_excel, but going through the cache when enabled.
+        """
+        prefetched = self._prefetched.pop(_read_key(filepath, kwargs), None) if self._prefetched else None
+        if prefetched is not None:
+            parsed, hit = prefetched.result()
+            if self.directory is not None:
+                if hit:
+                    self.n_hits += 1
+                else:
+                    self.n_misses += 1
+            return parsed
+
+        if self.directory is None:
+            return pd.read_excel(filepath, **kwargs)
+
+        file_hash = self.hash_file(filepath)
+        entry_path = self.entry_path(filepath, file_hash, kwargs)
+
+        if entry_path.exists():
+            self.n_hits += 1
+            return pd.read_pickle(entry_path)
+
+        self.n_misses += 1
+        parsed = pd.read_excel(filepath, **kwargs)
+
+        # The cache is only an optimisation: a data folder we can't write to
+        # (read-only, or shared with other runs) just means parsing every time
+        try:
+            self._write_entry(entry_path, parsed, filepath, file_hash, kwargs)
+        except OSError as err:
+            warnings.warn(f"Could not write the dataset cache entry for {filepath} in {self.directory} ({err})")
+
+        return parsed
+
+    def entry_path(self, filepath: Union[str, Path], file_hash: str, kwargs: Dict[str, Any]) -> Path:
+        key = self.key_of(file_hash, kwargs)
+        return self.directory / f"{Path(filepath).stem}-{key[:20]}.pkl"
+
+    def _write_entry(
+            self,
+            entry_path: Path,
+            parsed: ParsedExcel,
+            filepath: Union[str, Path],
+            file_hash: str,
+            kwargs: Dict[str, Any]
+        ) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Write and then move, so that an interrupted run doesn't leave a broken entry
+        tmp_path = entry_path.with_suffix('.tmp')
+        pd.to_pickle(parsed, tmp_path)
+        os.replace(tmp_path, entry_path)
+
+        source = str(Path(filepath).resolve())
+        meta = {'source': source, 'sha256': file_hash, 'kwargs': kwargs}
+        tmp_path = entry_path.with_suffix('.meta.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, default=str)
+        os.replace(tmp_path, entry_path.with_suffix('.json'))
+
+        # The entries of the previous versions of the same workbook (same
+        # arguments) will never be read again. Other processes may be
+        # writing or removing entries meanwhile, skip what we can't read.
+        for meta_path in self.directory.glob('*.json'):
+            if meta_path == entry_path.with_suffix('.json'):
+                continue
+            try:
+                with open(meta_path) as f:
+                    other = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if other['source'] == source and _same_kwargs(other['kwargs'], kwargs):
+                meta_path.with_suffix('.pkl').unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+
+    @contextlib.contextmanager
+    def prefetching(self, reads: Iterable[ExcelRead], n_workers: int) -> Iterator[None]:
+        """
+        Parse the workbooks in `reads` concurrently, on `n_workers` processes
+        (parsing is pure Python, threads would wait for each other), while
+        the body of the `with` runs. The workbooks are submitted in order, so
+        list first the ones needed first.
+
+        A read_excel call with the same file and arguments gets the parsed
+        workbook from the pool instead of parsing it again. What is not
+        prefetched, or is never read, is just parsed as usual.
+        """
+        reads = list(reads)
+        if n_workers <= 1 or not reads:
+            yield
+            return
+
+        with ProcessPoolExecutor(max_workers=min(n_workers, len(reads))) as pool:
+            for filepath, kwargs in reads:
+                key = _read_key(filepath, kwargs)
+                if key not in self._prefetched:
+                    self._prefetched[key] = pool.submit(_parse_in_worker, filepath, kwargs, self.directory)
+            try:
+                yield
+            finally:
+                for future in self._prefetched.values():
+                    future.cancel()
+                self._prefetched = {}
+
+    def clear(self) -> None:
+        if self.directory is None or not self.directory.exists():
+            return
+        for fp in self.directory.iterdir():
+            if fp.suffix in ('.pkl', '.json', '.tmp'):
+                fp.unlink()
+
+    def verify(self, reads: Iterable[ExcelRead]) -> List[str]:
+        """
+        Check the entries of the workbooks in `reads` (e.g. the ones read by
+        the current configuration) against their source files: the entry of
+        the current version of the file must be there, and parsing the file
+        again must give the same dataframes.
+
+        Returns
+        -------
+        List[str]
+            Description of the problems found, empty if the cache is valid.
+        """
+        if self.directory is None:
+            raise RuntimeError("The dataset cache is not enabled")
+
+        problems = []
+        for filepath, kwargs in reads:
+            if not os.path.isfile(filepath):
+                problems.append(f"{filepath}: source not found")
+                continue
+            entry_path = self.entry_path(filepath, self.hash_file(filepath), kwargs)
+            if not entry_path.exists():
+                problems.append(f"{entry_path.name}: missing for {filepath}")
+                continue
+
+            cached = pd.read_pickle(entry_path)
+            parsed = pd.read_excel(filepath, **kwargs)
+            if not isinstance(parsed, dict):
+                cached, parsed = {'': cached}, {'': parsed}
+
+            if list(cached.keys()) != list(parsed.keys()):
+                problems.append(f"{entry_path.name}: different sheets than {filepath}")
+                continue
+            for sheet in parsed:
+                try:
+                    pd.testing.assert_frame_equal(cached[sheet], parsed[sheet])
+                except AssertionError as err:
+                    problems.append(f"{entry_path.name}: sheet '{sheet}' differs from the source ({err})")
+
+        return problems
+
+dataset_cache = DatasetCache()
+
+def read_excel(filepath: Union[str, Path], **kwargs) -> ParsedExcel:
+    """Drop-in replacement of pandas.read_excel for the input data (see :class:`DatasetCache`)."""
+    return dataset_cache.read_excel(filepath, **kwargs)
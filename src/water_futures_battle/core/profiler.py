@@ -0,0 +1,215 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError: # not available on Windows
+    resource = None
+
+MEMORY_MODES = ('rss', 'tracemalloc')
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def _current_rss() -> int:
+    """Resident set size of the process, in bytes (0 if we can't know it)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        pass
+    if resource is not None:
+        # Peak, not current, but better than nothing (bytes on macOS, KiB elsewhere)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+    return 0
+
+class _OpenPhase:
+    __slots__ = ('path', 'year', 'label', 'wall', 'cpu', 'memory', 'peak')
+
+    def __init__(self, path: str, year: Optional[int], label: Optional[str], memory: int):
+        self.path = path
+        self.year = year
+        self.label = label
+        self.wall = time.perf_counter()
+        self.cpu = time.thread_time()
+        self.memory = memory
+        self.peak = 0
+
+class PhaseProfiler:
+    """
+    Wall time, CPU time and memory of the phases of an evaluation.
+
+    When enabled, every `with profiler.phase(name, year)` block is recorded.
+    Phases can be nested (e.g., the hydraulics of each cluster inside the
+    hydraulics of the year): the name of a phase is the path from the
+    outermost one, like 'hydraulics/cluster'. The stack of open phases is
+    kept per thread, so the phases that may run in worker threads must be
+    given their full path (a name with a '/' is never prefixed).
+
+    The CPU time is the one of the thread that runs the phase. The memory is
+    - 'rss': resident set size of the process at the end of the phase, and
+      its increase during the phase;
+    - 'tracemalloc': peak of the memory allocated by Python during the phase
+      and net allocation. Much more precise, but it slows the run down.
+    With threads, the memory of a phase includes what the other threads do.
+
+    When disabled (the default), `phase` costs a function call.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.memory_mode = 'rss'
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracemalloc = False
+
+    def enable(self, memory_mode: str = 'rss') -> None:
+        if memory_mode not in MEMORY_MODES:
+            raise ValueError(f"Unknown memory mode '{memory_mode}'.",
+                             f"Available modes are: {MEMORY_MODES}")
+        self.memory_mode = memory_mode
+        self.records = []
+        self.enabled = True
+        if memory_mode == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _stack(self) -> List[_OpenPhase]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _memory(self) -> int:
+        if self.memory_mode == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[0]
+        return _current_rss()
+
+    def phase(self, name: str, year: Optional[int] = None, label: Optional[str] = None):
+        """
+        Context manager recording the phase `name` of `year`. `label` tells
+        apart the repetitions of a phase in the same year (e.g., the utility).
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._record(name, year, label)
+
+    @contextlib.contextmanager
+    def _record(self, name: str, year: Optional[int], label: Optional[str]) -> Iterator[None]:
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+
+        if self.memory_mode == 'tracemalloc':
+            # The peak of the parent must include what happened before this phase
+            if parent is not None:
+                parent.peak = max(parent.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        opened = _OpenPhase(
+            path=name if parent is None or '/' in name else f"{parent.path}/{name}",
+            year=year if year is not None or parent is None else parent.year,
+            label=label,
+            memory=self._memory()
+        )
+        stack.append(opened)
+        try:
+            yield
+        finally:
+            stack.pop()
+            wall = time.perf_counter() - opened.wall
+            cpu = time.thread_time() - opened.cpu
+            memory = self._memory()
+
+            record = {
+                'year': opened.year,
+                'phase': opened.path,
+                'label': opened.label,
+                'wall_time': wall,
+                'cpu_time': cpu,
+            }
+            if self.memory_mode == 'tracemalloc':
+                peak = max(opened.peak, tracemalloc.get_traced_memory()[1])
+                if parent is not None:
+                    parent.peak = max(parent.peak, peak)
+                record['memory_peak'] = peak
+                record['memory_allocated'] = memory - opened.memory
+            else:
+                record['memory_rss'] = memory
+                record['memory_allocated'] = memory - opened.memory
+
+            with self._lock:
+                self.records.append(record)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        """Number of calls, total times and maxima of each phase over the years and labels."""
+        df = self.to_dataframe()
+        if df.empty:
+            return df
+        memory = 'memory_peak' if self.memory_mode == 'tracemalloc' else 'memory_rss'
+        return df.groupby('phase', sort=False).agg(
+            calls=('wall_time', 'size'),
+            wall_time=('wall_time', 'sum'),
+            cpu_time=('cpu_time', 'sum'),
+            max_wall_time=('wall_time', 'max'),
+            max_memory_allocated=('memory_allocated', 'max'),
+            **{f"max_{memory}": (memory, 'max')}
+        ).sort_values('wall_time', ascending=False)
+
+    def folded_stacks(self) -> List[str]:
+        """
+        Flame-graph summary in the folded format (one line per phase, the
+        frames separated by ';' and the self time in microseconds), which can
+        be rendered by flamegraph.pl or speedscope.
+        """
+        df = self.to_dataframe()
+        if df.empty:
+            return []
+        total = df.groupby('phase', sort=False)['wall_time'].sum()
+
+        # self time: what is not spent in the children phases
+        self_time = total.copy()
+        for phase, wall_time in total.items():
+            parent = phase.rpartition('/')[0]
+            if parent in self_time.index:
+                self_time[parent] -= wall_time
+
+        return [
+            f"{phase.replace('/', ';')} {max(int(round(t*1e6)), 0)}"
+            for phase, t in self_time.items()
+        ]
+
+    def dump(self, directory: Union[str, Path], name: str = 'profile') -> Path:
+        """
+        Write the records (csv and json), the summary by phase (csv) and the
+        folded stacks (txt) in `directory`.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        df = self.to_dataframe()
+        df.to_csv(directory / f"{name}.csv", index=False)
+        with open(directory / f"{name}.json", 'w') as f:
+            json.dump({'memory_mode': self.memory_mode, 'records': self.records}, f, indent=1)
+        self.summary().to_csv(directory / f"{name}-summary.csv")
+        with open(directory / f"{name}-folded.txt", 'w') as f:
+            f.write('\n'.join(self.folded_stacks()) + '\n')
+
+        return directory
+
+profiler = PhaseProfiler()
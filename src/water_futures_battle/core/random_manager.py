@@ -1,7 +1,22 @@
+import hashlib
+from typing import Hashable, Sequence
+
 import numpy as np
 
 class RandomManager:
-    """Centralized random number generator management."""
+    """
+    Centralized random number generator management.
+
+    Two modes are available:
+    - 'sequential': one generator per module, shared by all the entities, so
+      the draws depend on the order in which the entities ask for them;
+    - 'keyed': when the caller passes a key (e.g., the entity id and the year),
+      it gets a counter-based generator (Philox) whose key is derived from the
+      master seed, the module and the key. The draws of an entity in a year
+      don't depend on what was drawn before, nor on the order of execution,
+      and two masterplans see the same random numbers for the same entity-year.
+      Without a key, the module generator is returned as in 'sequential'.
+    """
 
     AVAILABLE_GENERATORS = [
         'municipalities-res_p_weight',
@@ -18,19 +33,58 @@ class RandomManager:
         'sources-opex-volum-other',
     ]
     
-    def __init__(self, master_seed: int):
+    MODES = ('sequential', 'keyed')
+
+    def __init__(self, master_seed: int, mode: str = 'sequential'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown random generators mode '{mode}'.",
+                             f"Available modes are: {self.MODES}")
         self.master_seed = master_seed
+        self.mode = mode
         base_rng = np.random.default_rng(self.master_seed)
         
         # Spawn independent generators
         spawned = base_rng.spawn(len(self.AVAILABLE_GENERATORS))
         self.generators = dict(zip(self.AVAILABLE_GENERATORS, spawned))
     
-    def get(self, module_name: str) -> np.random.Generator:
-        """Get the RNG for a specific module."""
+    def get(self, module_name: str, *key: Hashable) -> np.random.Generator:
+        """Get the RNG for a specific module (and key, see the class description)."""
         if module_name not in self.generators:
             raise ValueError(f"Unknown module: {module_name}")
-        return self.generators[module_name]
+
+        if self.mode == 'sequential' or not key:
+            return self.generators[module_name]
+
+        return np.random.Generator(np.random.Philox(key=self._philox_key(module_name, key)))
+
+    def uniform(
+            self,
+            module_name: str,
+            keys: Sequence[tuple],
+            low: np.ndarray,
+            high: np.ndarray
+        ) -> np.ndarray:
+        """
+        One uniform draw per key, the same as calling get(module_name, *key).uniform
+        for each key in order. In 'sequential' mode they are drawn all at once.
+        """
+        if module_name not in self.generators:
+            raise ValueError(f"Unknown module: {module_name}")
+
+        low = np.asarray(low, dtype=np.float64)
+        high = np.asarray(high, dtype=np.float64)
+        if self.mode == 'sequential':
+            return self.generators[module_name].uniform(low=low, high=high)
+
+        return np.array([
+            self.get(module_name, *key).uniform(low=lb, high=ub)
+            for key, lb, ub in zip(keys, low, high)
+        ], dtype=np.float64)
+
+    def _philox_key(self, module_name: str, key: tuple) -> int:
+        # Python's hash of strings changes from one process to the other
+        desc = '/'.join(str(k) for k in (self.master_seed, module_name, *key))
+        return int.from_bytes(hashlib.sha256(desc.encode()).digest()[:16], 'little')
 
 class FakeLifetimeGenerator:
     def __init__(self, fixed_value):
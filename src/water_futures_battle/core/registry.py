@@ -0,0 +1,59 @@
+from typing import Any, ClassVar, Container, Dict, Hashable, Optional, Type, TypeVar
+
+E = TypeVar('E')
+
+class EntityRegistry:
+    """
+    The entities of the system by family (the base class, e.g., WaterSource
+    for all the kinds of sources) and id, and the reverse indexes between
+    them (e.g., from a source to the pumping station drawing from it).
+
+    The entities register themselves when they are created, so the registry
+    follows the installations of new pipes, pumps, sources, etc. It is
+    cleared when a new system is configured. It is class-level state, so it
+    follows the evaluation in the checkpoints and in the forked workers.
+    """
+    _ENTITIES: ClassVar[Dict[type, Dict[Hashable, Any]]] = {}
+    _LINKS: ClassVar[Dict[str, Dict[Any, Any]]] = {}
+
+    # The reverse indexes, keyed by the id of the entity they start from
+    SOURCE_PUMPING_STATION = 'source-pumping_station'
+    SOURCE_SUPPLY_CONNECTION = 'source-supply_connection'
+    MUNICIPALITY_WATER_UTILITY = 'municipality-water_utility'
+
+    @classmethod
+    def register(cls, family: type, entity: Any, entity_id: Optional[Hashable] = None) -> None:
+        """Register `entity` in `family`, by its bwf_id unless `entity_id` is given."""
+        if entity_id is None:
+            entity_id = entity.bwf_id
+        cls._ENTITIES.setdefault(family, {})[entity_id] = entity
+
+    @classmethod
+    def get(
+            cls,
+            family: Type[E],
+            entity_id: Hashable,
+            within: Optional[Container] = None
+        ) -> Optional[E]:
+        """
+        The entity of `family` with id `entity_id` (None if there is none, or
+        if it is not in `within`, when given).
+        """
+        entity = cls._ENTITIES.get(family, {}).get(entity_id)
+        if entity is not None and within is not None and entity not in within:
+            return None
+        return entity
+
+    @classmethod
+    def link(cls, index: str, key: Hashable, value: Any) -> None:
+        cls._LINKS.setdefault(index, {})[key] = value
+
+    @classmethod
+    def linked(cls, index: str, key: Hashable) -> Optional[Any]:
+        """What `key` is linked to in the reverse index `index` (None if nothing)."""
+        return cls._LINKS.get(index, {}).get(key)
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._ENTITIES = {}
+        cls._LINKS = {}
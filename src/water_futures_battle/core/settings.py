@@ -1,6 +1,6 @@
 from dataclasses import dataclass, field
 from importlib.resources import files
-from typing import Self, Dict, Any, List
+from typing import Self, Dict, Any, Hashable, List
 
 import numpy as np
 import pandas as pd
@@ -32,6 +32,8 @@ class Settings:
 
     _rnd_manager: RandomManager
     SEED = 'seed'
+    # 'sequential' or 'keyed', see RandomManager
+    RNG_MODE = 'rng_mode'
 
     lifeline_volume: float
     LIFELINE_VOLUME = 'lifeline_volume'
@@ -42,6 +44,32 @@ class Settings:
     AVAILABLE_CORES = 'available_cores'
     available_cores: int
 
+    # How the clusters hydraulic simulations are distributed over the available cores:
+    # - 'threads': one thread per cluster (cheap to start, but limited by the GIL)
+    # - 'processes': one forked process per cluster, results returned via shared memory
+    HYDRAULICS_BACKEND = 'hydraulics_backend'
+    HYDRAULICS_BACKENDS = ('threads', 'processes')
+    hydraulics_backend: str
+
+    # Which solver simulates the hydraulics of a cluster:
+    # - 'epanet': the EPANET model of the cluster, for every cluster
+    # - 'tree': the numpy solver for the clusters with a single source and a
+    #   radial network, EPANET for the others (see services/tree_hydraulics.py)
+    HYDRAULICS_ENGINE = 'hydraulics_engine'
+    HYDRAULICS_ENGINES = ('epanet', 'tree')
+    hydraulics_engine: str = 'epanet'
+
+    # Keep one EPANET session open for the whole year (each hour starts from the
+    # flows of the previous one) instead of restarting the solver every week.
+    # The results agree within EPANET's accuracy (see tests/test_continuous_hydraulics.py)
+    HYDRAULICS_CONTINUOUS = 'hydraulics_continuous'
+    hydraulics_continuous: bool = False
+
+    # Move the exogenous datasets to memory shared with the forked workers before
+    # forking them, so that they are not copied in each (see services/shared_datasets.py)
+    SHARE_DATASETS = 'share_datasets'
+    share_datasets: bool = False
+
     @classmethod
     def from_config(cls, config: Dict[str, Any]) -> Self:
         """Primary constructor from config object (dictionary)"""
@@ -51,14 +79,27 @@ class Settings:
             start_year=config[cls.START_YEAR],
             end_year=config[cls.END_YEAR],
             _rnd_manager=RandomManager(
-                master_seed=config[cls.SEED]
+                master_seed=config[cls.SEED],
+                mode=config.get(cls.RNG_MODE, 'sequential')
             ),
             lifeline_volume=config[cls.LIFELINE_VOLUME],
             national_investment_budget=config.get(cls.NIB, 0),
             available_cores=config.get(cls.AVAILABLE_CORES, 1),
+            hydraulics_backend=config.get(cls.HYDRAULICS_BACKEND, 'threads'),
+            hydraulics_engine=config.get(cls.HYDRAULICS_ENGINE, 'epanet'),
+            hydraulics_continuous=config.get(cls.HYDRAULICS_CONTINUOUS, False),
+            share_datasets=config.get(cls.SHARE_DATASETS, False),
         )
     
     def __post_init__(self):
+
+        if self.hydraulics_backend not in self.HYDRAULICS_BACKENDS:
+            raise ValueError(f"Unknown hydraulics backend '{self.hydraulics_backend}'.",
+                             f"Available backends are: {self.HYDRAULICS_BACKENDS}")
+
+        if self.hydraulics_engine not in self.HYDRAULICS_ENGINES:
+            raise ValueError(f"Unknown hydraulics engine '{self.hydraulics_engine}'.",
+                             f"Available engines are: {self.HYDRAULICS_ENGINES}")
         
         for year in self.years_to_simulate:
             if year not in _cost_normalisation_df.index:
@@ -79,7 +120,16 @@ class Settings:
     def _is_simulating_historical_period(self) -> bool:
         return self.end_year <= _HISTORICAL_PERIOD_END
 
-    def get_random_generator(self, name: str) -> np.random.Generator:
+    @property
+    def rng_mode(self) -> str:
+        return self._rnd_manager.mode
+
+    def get_random_generator(self, name: str, *key: Hashable) -> np.random.Generator:
+        """
+        The generator of module `name`. Pass the entity id and the year (or
+        whatever identifies the draw) as `key`, so that in 'keyed' mode the
+        draws don't depend on the order of execution.
+        """
 
         # Handle the case where pumps and pipes lifetime do not need to be sampled
         # because in the historical period, they are generated in the pre-processing scripts
@@ -89,7 +139,17 @@ class Settings:
             return FakeLifetimeGenerator(fixed_value=200)  # type: ignore
 
         # Else, default behaviour
-        return self._rnd_manager.get(module_name=name)
+        return self._rnd_manager.get(name, *key)
+
+    def draw_uniform(
+            self,
+            name: str,
+            keys: List[tuple],
+            low: np.ndarray,
+            high: np.ndarray
+        ) -> np.ndarray:
+        """One draw per key, as many calls to get_random_generator(name, *key).uniform."""
+        return self._rnd_manager.uniform(name, keys, low, high)
 
     @property
     def residential_p_weight_rng(self) -> np.random.Generator:
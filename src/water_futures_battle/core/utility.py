@@ -1,5 +1,6 @@
+import math
 import pandas as pd
-from typing import List, TypeAlias, Union
+from typing import List, Tuple, TypeAlias, Union
 
 BWFTimeLike: TypeAlias = int | str | pd.Timestamp
 
@@ -15,6 +16,24 @@ def timestampify(a_value: BWFTimeLike, **kwargs) -> pd.Timestamp:
         return pd.Timestamp(year=a_value, month=1, day=1)
     return pd.to_datetime(a_value, **kwargs)
 
+# Years of activity of an entity as (first, stop), see active_years
+ActiveYears: TypeAlias = Tuple[float, float]
+
+def _first_year_from(ts: OptionalTimestamp) -> float:
+    """The first year whose January 1st is not before `ts` (inf if `ts` is NaT)."""
+    if pd.isna(ts):
+        return math.inf
+    return ts.year if ts <= pd.Timestamp(year=ts.year, month=1, day=1) else ts.year + 1
+
+def active_years(begin: OptionalTimestamp, end: OptionalTimestamp) -> ActiveYears:
+    """
+    The years in which an entity active from `begin` (included) to `end`
+    (excluded) is active, as (first, stop): the entity is active in year Y,
+    i.e., on January 1st of Y as for timestampify, if first <= Y < stop.
+    A missing `begin` means never active, a missing `end` never closed.
+    """
+    return _first_year_from(begin), _first_year_from(end)
+
 def keyify(text: str) -> str:
     """Normalize text for use as keys (preserves dashes)."""
     return text.lower().replace("'", "").replace(" ", "_")
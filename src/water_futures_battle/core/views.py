@@ -1,5 +1,6 @@
-from typing import TypeVar, Dict, Generic, Any
+from typing import Any, Callable, Dict, Generic, NamedTuple, Optional, Sequence, Tuple, TypeVar
 
+import numpy as np
 import pandas as pd
 
 from .utility import timestampify
@@ -7,6 +8,148 @@ from .utility import timestampify
 # Define a Type Variable for the Generic
 C = TypeVar('C')
 
+class StateColumn(NamedTuple):
+    """
+    Declaration of a dynamic property that the yearly state tables materialise
+    for all the entities of a class at once.
+
+    - sources: (class variable, dataframe) of the databases the property comes
+      from, e.g., ('_dynamic_properties', MunicipalitiesDB.POPULATION). The
+      columns of the dataframes are the entities ids.
+    - combine: how to obtain the property from the dataframes of the sources,
+      if there is more than one (the single dataframe otherwise).
+    """
+    sources: Sequence[Tuple[str, str]]
+    combine: Optional[Callable[..., pd.DataFrame]] = None
+
+def values_asof(df: pd.DataFrame, ts: pd.Timestamp) -> np.ndarray:
+    """
+    Series.asof of every column of `df` at once: the last value that is not
+    NaN at or before `ts` (NaN if there is none).
+    """
+    if not df.index.is_monotonic_increasing:
+        raise ValueError("asof requires a sorted index")
+
+    n_rows = int(df.index.searchsorted(ts, side='right'))
+    if n_rows == 0 or len(df.columns) == 0:
+        return np.full(len(df.columns), np.nan)
+
+    values = df.to_numpy()[:n_rows]
+    valid = ~pd.isna(values)
+    # Counting from the bottom, the first valid row of each column
+    from_bottom = np.argmax(valid[::-1], axis=0)
+    last_values = values[n_rows - 1 - from_bottom, np.arange(values.shape[1])]
+
+    has_values = valid.any(axis=0)
+    if not has_values.all():
+        last_values = last_values.astype(np.float64) if last_values.dtype.kind in 'iub' else last_values.copy()
+        last_values[~has_values] = np.nan
+    return last_values
+
+class _MaterialisedColumn(NamedTuple):
+    values: np.ndarray
+    entities: pd.Index
+    rows: Dict[str, int]
+    # (database, dataframe, version) of the sources when the values were computed
+    stamp: Tuple[Tuple[Any, str, int], ...]
+
+class YearlyStateTable:
+    """
+    The state of all the entities of a class at a point in time, as a struct
+    of arrays: one array per dynamic property (declared in the STATE_COLUMNS
+    of the class), one value per entity.
+
+    A property is materialised the first time it is read, and again after one
+    of the dataframes it comes from has been written (see
+    PropertiesContainer.touch).
+    """
+    def __init__(self, entity_cls: type, ts: pd.Timestamp):
+        self.entity_cls = entity_cls
+        self.ts = ts
+        self._columns: Dict[str, _MaterialisedColumn] = {}
+
+    def column(self, name: str) -> _MaterialisedColumn:
+        declaration: StateColumn = self.entity_cls.STATE_COLUMNS[name]
+        databases = [getattr(self.entity_cls, attr) for attr, _ in declaration.sources]
+        stamp = tuple(
+            (db, var, db.version(var))
+            for db, (_, var) in zip(databases, declaration.sources)
+        )
+
+        materialised = self._columns.get(name)
+        if materialised is not None and all(
+            db is old_db and var == old_var and version == old_version
+            for (db, var, version), (old_db, old_var, old_version) in zip(stamp, materialised.stamp)
+        ):
+            return materialised
+
+        frames = [db[var] for db, (_, var) in zip(databases, declaration.sources)]
+        frame = frames[0] if declaration.combine is None else declaration.combine(*frames)
+
+        # Most writes change values, not entities
+        if materialised is not None and materialised.entities.equals(frame.columns):
+            rows = materialised.rows
+        else:
+            rows = {entity_id: i for i, entity_id in enumerate(frame.columns)}
+
+        materialised = _MaterialisedColumn(
+            values=values_asof(frame, self.ts),
+            entities=frame.columns,
+            rows=rows,
+            stamp=stamp
+        )
+        self._columns[name] = materialised
+        return materialised
+
+    def value(self, entity_id: str, name: str) -> Any:
+        """The raw value of the property (NaN if the entity is not there)."""
+        derived = getattr(self.entity_cls, 'STATE_DERIVED', {}).get(name)
+        if derived is not None:
+            source, function = derived
+            value = self.value(entity_id, source)
+            return value if pd.isna(value) else function(value)
+
+        materialised = self.column(name)
+        row = materialised.rows.get(entity_id)
+        return np.nan if row is None else materialised.values[row]
+
+class StateTables:
+    """
+    The yearly state tables of the entities classes, by class and timestamp.
+    The entities classes opt in by declaring:
+    - STATE_ID: the attribute with the id of the entity (the column in the databases);
+    - STATE_COLUMNS: the dynamic properties that are a column of the databases,
+      see StateColumn;
+    - STATE_DERIVED (optional): the dynamic properties computed from one of
+      the others, as (property, function of its value).
+    """
+    def __init__(self):
+        self._tables: Dict[Tuple[type, pd.Timestamp], YearlyStateTable] = {}
+
+    @staticmethod
+    def materialises(entity_cls: type, name: str) -> bool:
+        return (
+            name in getattr(entity_cls, 'STATE_COLUMNS', {})
+            or name in getattr(entity_cls, 'STATE_DERIVED', {})
+        )
+
+    def table(self, entity_cls: type, ts: pd.Timestamp) -> YearlyStateTable:
+        key = (entity_cls, ts)
+        table = self._tables.get(key)
+        if table is None:
+            table = YearlyStateTable(entity_cls, ts)
+            self._tables[key] = table
+        return table
+
+    def value(self, entity: Any, name: str, ts: pd.Timestamp) -> Any:
+        entity_cls = type(entity)
+        return self.table(entity_cls, ts).value(getattr(entity, entity_cls.STATE_ID), name)
+
+    def clear(self) -> None:
+        self._tables = {}
+
+state_tables = StateTables()
+
 class YearlyView(Generic[C]):
     """"
     Yearly view is a class that acts as a view on a bwf_entity.
@@ -16,7 +159,7 @@ class YearlyView(Generic[C]):
         self._ts = timestampify(year, errors='raise')
 
     def __getattr__(self, name: str):
-        
+
         # Get the list of dynamic properties from the *bwf entity*
         dynamic_properties: Dict[str, Any] = getattr(self._original, 'DYNAMIC_PROPERTIES', {})
 
@@ -25,15 +168,20 @@ class YearlyView(Generic[C]):
         if name in dynamic_properties:
             # The user requested an attribute that has been declared a dynamic property.
             # We use the declaration to handle the cases:
-            # A: user declared a type. The method returns a pd.series, and we use self._ts
+            # A: user declared a type. The method returns a pd.series, and we use self._ts
             #    to get the value at that point in time and we cast it to the required type.
-            # B: user declared the corresponding time-aware method (a string), we get
+            #    If the class materialises it in the yearly state tables, we read it
+            #    from there instead (same value, without going through pandas).
+            # B: user declared the corresponding time-aware method (a string), we get
             #    the value of that method.
             handler = dynamic_properties[name]
 
             if isinstance(handler, type):
+                if state_tables.materialises(type(self._original), name):
+                    return handler(state_tables.value(self._original, name, self._ts))
+
                 time_series_data = getattr(self._original, name)
-            
+
                 if not isinstance(time_series_data, pd.Series) and not isinstance(time_series_data, pd.DataFrame):
                     raise TypeError(
                         f"Dynamic property '{name}' of {type(self._original).__name__} is not a pandas Series or DataFrame. "
@@ -44,7 +192,7 @@ class YearlyView(Generic[C]):
                 value = time_series_data.asof(self._ts)
                 # but return it in the format we declared we want, e.g., EnumClass
                 return dynamic_properties[name](value)
-            
+
             elif isinstance(handler, str):
                 method = getattr(self._original, handler)
                 return method(self._ts)
@@ -53,4 +201,4 @@ class YearlyView(Generic[C]):
         return getattr(self._original, name)
 
 def get_snapshot(c: C, year: int) -> YearlyView[C]:
-    return YearlyView(c, year)
\ No newline at end of file
+    return YearlyView(c, year)
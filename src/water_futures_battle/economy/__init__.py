@@ -1,6 +1,7 @@
-from .services import configure_economy, raise_amount
+from .services import configure_economy, configure_economy_reads, raise_amount
 
 __all__ = [
     'configure_economy',
+    'configure_economy_reads',
     'raise_amount'
 ]
\ No newline at end of file
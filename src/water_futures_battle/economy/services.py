@@ -1,7 +1,7 @@
 from __future__ import annotations
 import os
 from pathlib import Path
-from typing import Any, Dict, Set, Tuple
+from typing import Any, Dict, List, Set, Tuple
 
 import numpy as np
 import pandas as pd
@@ -9,6 +9,7 @@ import pandas as pd
 from ..core.utility import timestampify
 from ..core.base_model import StaticProperties
 from ..core import Settings
+from ..core.dataset_cache import ExcelRead, excel_reads
 
 from .dynamic_properties import EconomyDB
 from .entities import BondIssuance, BondsSettings
@@ -34,6 +35,10 @@ def configure_economy(
 
     return bnd_settings, economy_db, bonds
 
+def configure_economy_reads(config: dict, data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by configure_economy."""
+    return excel_reads(EconomyDB.excel_read(os.path.join(data_path, config[EconomyDB.NAME])))
+
 def bond_price(
         face_value: float,
         coupon_rate: float,
@@ -1,5 +1,6 @@
-from .services import configure_energy_system
+from .services import configure_energy_system, configure_energy_system_reads
 
 __all__ = [
-    'configure_energy_system'
+    'configure_energy_system',
+    'configure_energy_system_reads'
 ]
\ No newline at end of file
@@ -1,11 +1,13 @@
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Any, Dict, List, Self, Set, Union
 
 import numpy as np
 import pandas as pd
 
 from ..core.base_model import bwf_entity
-from ..core.utility import BWFTimeLike, timestampify
+from ..core.registry import EntityRegistry
+from ..core.utility import ActiveYears, BWFTimeLike, active_years, timestampify
 from ..sources.entities import WaterSource, SourcesContainer
 from ..pumping_stations.entities import PumpingStation
 
@@ -49,10 +51,13 @@ class SolarFarm:
         
         connected_entity_id: str = row_data[SolarFarm.CONN_ENTITY_ID]
 
+        connected_entity: Union[WaterSource, PumpingStation, None]
         if connected_entity_id.startswith(PumpingStation.ID_PREFIX):
-            connected_entity = next(ps for ps in pumping_stations if ps.bwf_id ==connected_entity_id)
+            connected_entity = EntityRegistry.get(PumpingStation, connected_entity_id, within=pumping_stations)
+            if connected_entity is None:
+                raise KeyError(f"No PumpingStation with bwf_id '{connected_entity_id}' found.")
         else:
-            connected_entity = next(s for s in sources if s.bwf_id == connected_entity_id)
+            connected_entity = sources.entity(connected_entity_id)
 
         instance = cls(
             bwf_id=row_data[SolarFarm.ID],
@@ -71,6 +76,7 @@ class SolarFarm:
 
         # Register this solar farm on the connected entity
         self.connected_entity.register_solar_farm(self)
+        EntityRegistry.register(SolarFarm, self)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -91,7 +97,15 @@ class SolarFarm:
             cls.CONN_ENTITY_ID
         ]
     
+    @cached_property
+    def _active_years(self) -> ActiveYears:
+        return active_years(self.installation_date, self.decommission_date)
+
     def is_active(self, when: BWFTimeLike) -> bool:
+        if isinstance(when, int):
+            first, stop = self._active_years
+            return first <= when < stop
+
         ts = timestampify(when)
         return (
             ts >= self.installation_date and 
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Any, Dict, Set, Tuple
+from typing import Any, Dict, List, Set, Tuple
 
 import numpy as np
 import pandas as pd
@@ -9,6 +9,7 @@ import pvlib
 from ..core import Settings
 from ..core.base_model import StaticProperties
 from ..core.utility import timestampify
+from ..core.dataset_cache import ExcelRead, excel_reads
 from ..jurisdictions.entities import State
 from ..sources.entities import SourcesContainer
 from ..pumping_stations.entities import PumpingStation
@@ -31,10 +32,7 @@ def configure_energy_system(
     SolarFarm.set_dynamic_properties(energysys_db)
     SolarFarm.set_results(solar_farms_res)
 
-    solar_farms_descriptions = pd.read_excel(
-        Path(data_path) / config['solar_farms-static_properties'],
-        sheet_name='entities'
-    )
+    solar_farms_descriptions = _solar_farms_read(config, data_path).read()
     
     solar_farms: Set[SolarFarm] = set()
     for _, solar_farm_data in solar_farms_descriptions.iterrows():
@@ -50,6 +48,16 @@ def configure_energy_system(
 
     return energysys_db, solar_farms
 
+def _solar_farms_read(config: dict, data_path: str) -> ExcelRead:
+    return ExcelRead(Path(data_path) / config['solar_farms-static_properties'], dict(sheet_name='entities'))
+
+def configure_energy_system_reads(config: dict, data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by configure_energy_system."""
+    return excel_reads(
+        EnergySysDB.excel_read(os.path.join(data_path, config[EnergySysDB.NAME])),
+        _solar_farms_read(config, data_path)
+    )
+
 def dump_energy_system(
         energy_db: EnergySysDB,
         all_solar_farms: Set[SolarFarm],
@@ -175,26 +183,20 @@ def get_hourly_electricity_price_of_year(
     ele_patterns = energy_sys_db[EnergySysDB.EPRICE_PATT]
 
     # we create the array by merging the first day (holiday, thus like a sunday)
-    # with 53 weeks, i.e, 53 times a pattern, we then remove the extra days
-    sub_patterns = []
-
-    # First dya of the year: Take a sunday price and data as of 1st January
+    # with 53 weeks, i.e, 53 times a pattern, we then remove the extra days.
+    # The prices and patterns of all the weeks are looked up at once.
     ts = timestampify(year)
-    ele_uc = ele_ucs.asof(ts)[scope]
-    ele_pattern = ele_patterns.asof(ts).to_numpy()
-    sub_patterns.append(
-        ele_uc * ele_pattern[-24:]
-    )
+    first_week = ts + pd.DateOffset(hours=24)
+    weeks_ts = pd.DatetimeIndex([ts] + [first_week + pd.DateOffset(weeks=i) for i in range(53)])
 
-    ts += pd.DateOffset(hours=24)
-    for i in range(53):
-        curr_ts = ts + pd.DateOffset(weeks=i)
+    ele_uc = ele_ucs.asof(weeks_ts)[scope].to_numpy()
+    ele_pattern = ele_patterns.asof(weeks_ts).to_numpy()
 
-        ele_uc = ele_ucs.asof(curr_ts)[scope]
-        ele_pattern = ele_patterns.asof(curr_ts).to_numpy()
-        sub_patterns.append(
-            ele_uc * ele_pattern
-        )
+    sub_patterns = [
+        # First day of the year: Take a sunday price and data as of 1st January
+        ele_uc[0] * ele_pattern[0, -24:],
+        (ele_uc[1:, np.newaxis] * ele_pattern[1:]).ravel()
+    ]
 
     full_pattern = np.concat(sub_patterns, axis=0)[:24*365]
     
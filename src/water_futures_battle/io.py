@@ -1,28 +1,35 @@
+import contextlib
+import glob
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 import pandas as pd
 import requests
 from rich.progress import Progress
 import tempfile
+import traceback
 import warnings
 import yaml
 import zipfile
 
 from .core import Settings
-from .climate import configure_climate
-from .economy import configure_economy
-from .nrw_model import configure_nrw_model
-from .water_demand_model import configure_water_demand_model
-from .jurisdictions import build_state
-from .sources import build_sources
-from .pumping_stations import build_pumping_infrastructure
-from .energy import configure_energy_system
-from .connections import build_piping_infrastructure
-from .water_utilities import WaterUtility, configure_water_utilities
+from .core.dataset_cache import ExcelRead, dataset_cache
+from .core.profiler import profiler
+from .core.registry import EntityRegistry
+from .climate import configure_climate, configure_climate_reads
+from .economy import configure_economy, configure_economy_reads
+from .nrw_model import configure_nrw_model, configure_nrw_model_reads
+from .water_demand_model import configure_water_demand_model, configure_water_demand_model_reads
+from .jurisdictions import build_state, build_state_reads
+from .sources import build_sources, build_sources_reads
+from .pumping_stations import build_pumping_infrastructure, build_pumping_infrastructure_reads
+from .energy import configure_energy_system, configure_energy_system_reads
+from .connections import build_piping_infrastructure, build_piping_infrastructure_reads
+from .water_utilities import WaterUtility, configure_water_utilities, configure_water_utilities_reads
 from .national_context import NationalContext
-from .services.evaluation import escalate_costs, age_water_utilities, age_national_context_assets
+from .services.evaluation import escalate_costs_over_horizon, age_water_utilities, age_national_context_assets
+from .services.hydraulics_telemetry import HydraulicsTelemetryLog
 
 
 def get_package_version():
@@ -36,9 +43,13 @@ def parse_version(ver):
 # Zenodo concept DOI (resolves to latest)
 ZENODO_CONCEPT_ID = "17698299"
 
+DATASET_CACHE_DIRNAME = ".bwf_cache"
+
 def configure_system(
         data_path: str = "data",
-        configuration_filename: str = "configuration.yaml"
+        configuration_filename: str = "configuration.yaml",
+        use_dataset_cache: bool = False,
+        config_workers: int = 1
     ) -> Tuple[Settings, NationalContext, Set[WaterUtility]]:
     
     config_file_path = os.path.join(data_path, configuration_filename)
@@ -121,100 +132,193 @@ def configure_system(
         config = yaml.safe_load(f_yaml)
         config["data_path"] = data_path
 
-        return configure_system_ex(config)
+    # On request, the parsed workbooks are cached in the data folder (see DatasetCache)
+    if use_dataset_cache:
+        dataset_cache.enable(Path(data_path) / DATASET_CACHE_DIRNAME)
+    try:
+        return configure_system_ex(config, config_workers=config_workers)
+    finally:
+        dataset_cache.disable()
 
+def build_dataset_cache(
+        data_path: str = "data",
+        configuration_filename: str = "configuration.yaml",
+        rebuild: bool = False,
+        verify: bool = True
+    ) -> None:
+    """
+    Prebuild the compiled dataset cache by configuring the system once and,
+    optionally, verify that the cached entries of the workbooks it reads match
+    their sources.
+    """
+    cache_dir = Path(data_path) / DATASET_CACHE_DIRNAME
+
+    if rebuild:
+        dataset_cache.enable(cache_dir)
+        dataset_cache.clear()
+        dataset_cache.disable()
+
+    configure_system(
+        data_path=data_path,
+        configuration_filename=configuration_filename,
+        use_dataset_cache=True
+    )
+    print(f"Dataset cache in {cache_dir}: {dataset_cache.n_misses} files compiled, {dataset_cache.n_hits} already up to date.")
+
+    if not verify:
+        return
+
+    # Only the entries of the workbooks this configuration reads
+    with open(Path(data_path) / configuration_filename, 'r') as f_yaml:
+        config = yaml.safe_load(f_yaml)
+        config["data_path"] = data_path
+
+    dataset_cache.enable(cache_dir)
+    try:
+        problems = dataset_cache.verify(configuration_reads(config))
+    finally:
+        dataset_cache.disable()
+
+    for problem in problems:
+        print(problem)
+    if problems:
+        raise typer.Exit(code=1)
+    
+    print("Dataset cache verified.")
+    return
+
+
+def configuration_reads(config: Dict) -> List[ExcelRead]:
+    """
+    The workbooks parsed by configure_system_ex, in the order in which the
+    steps of the configuration need them.
+    """
+    data_path = config["data_path"]
+    return [
+        *configure_climate_reads(config['climate'], data_path),
+        *configure_economy_reads(config['economy'], data_path),
+        *build_state_reads(config['state'], data_path),
+        *configure_water_demand_model_reads(config['water_demand_model'], data_path),
+        *configure_nrw_model_reads(config['nrw_model'], data_path),
+        *build_sources_reads(config['sources'], data_path),
+        *build_pumping_infrastructure_reads(config['pumping_infrastructure'], data_path),
+        *configure_energy_system_reads(config['energy_system'], data_path),
+        *build_piping_infrastructure_reads(config['piping_infrastructure'], data_path),
+        *configure_water_utilities_reads(config['water_utilities'], data_path),
+    ]
 
 def configure_system_ex(
-        config: Dict
+        config: Dict,
+        config_workers: int = 1
     ) -> Tuple[Settings, NationalContext, Set[WaterUtility]]:
-
-    with Progress() as progress:
+    """
+    Build the system described by `config`. The steps depend on each other
+    (state -> sources -> pumping stations -> energy system and pipes ->
+    water utilities) and are built one after the other, always in the same
+    order, so the random draws and the entities are the same every time.
+
+    With `config_workers` > 1, the workbooks of all the steps are parsed
+    ahead on as many processes, while the first steps are being built (see
+    DatasetCache.prefetching). The time of each step is recorded by the
+    profiler as 'configure/<step>'.
+    """
+    with dataset_cache.prefetching(configuration_reads(config) if config_workers > 1 else [], n_workers=config_workers), \
+            Progress() as progress:
         config_task = progress.add_task("[red]Configuring system", total=12)
 
+        @contextlib.contextmanager
+        def step(name: str) -> Iterator[None]:
+            with profiler.phase(f"configure/{name}"):
+                yield
+            progress.update(config_task, advance=1)
+
+        # The entities of the new system register themselves while they are built
+        EntityRegistry.clear()
+
         settings = Settings.from_config(config[Settings.LABEL])
         progress.update(config_task, advance=1)
 
-        climate_db = configure_climate(
-            config['climate'],
-            config["data_path"],
-            settings
-        )
-        progress.update(config_task, advance=1)
+        with step('climate'):
+            climate_db = configure_climate(
+                config['climate'],
+                config["data_path"],
+                settings
+            )
 
-        bonds_settings, economy_db, utilities_bonds = configure_economy(
-            config['economy'],
-            config["data_path"],
-            settings
-        )
-        progress.update(config_task, advance=1)
+        with step('economy'):
+            bonds_settings, economy_db, utilities_bonds = configure_economy(
+                config['economy'],
+                config["data_path"],
+                settings
+            )
 
-        state = build_state(
-            config['state'],
-            config["data_path"],
-            settings
-        )
-        progress.update(config_task, advance=1)
+        with step('state'):
+            state = build_state(
+                config['state'],
+                config["data_path"],
+                settings
+            )
 
-        water_dem_patterns, water_dem_db = configure_water_demand_model(
-            config['water_demand_model'],
-            config["data_path"],
-            settings
-        )
-        progress.update(config_task, advance=1)
+        with step('water_demand_model'):
+            water_dem_patterns, water_dem_db = configure_water_demand_model(
+                config['water_demand_model'],
+                config["data_path"],
+                settings
+            )
 
-        nrw_settings, nrw_db = configure_nrw_model(
-            config['nrw_model'],
-            config["data_path"],
-            settings
-        )
-        progress.update(config_task, advance=1)
+        with step('nrw_model'):
+            nrw_settings, nrw_db = configure_nrw_model(
+                config['nrw_model'],
+                config["data_path"],
+                settings
+            )
 
-        sources, sources_settings = build_sources(
-            properties_desc=config['sources'],
-            a_state=state,
-            data_path=config["data_path"],
-            settings=settings
-        )
-        progress.update(config_task, advance=1)
+        with step('sources'):
+            sources, sources_settings = build_sources(
+                properties_desc=config['sources'],
+                a_state=state,
+                data_path=config["data_path"],
+                settings=settings
+            )
 
-        pump_options, pumping_stations = build_pumping_infrastructure(
-            desc=config['pumping_infrastructure'],
-            sources=sources,
-            data_path=config["data_path"],
-            settings=settings
-        )
-        progress.update(config_task, advance=1)
+        with step('pumping_infrastructure'):
+            pump_options, pumping_stations = build_pumping_infrastructure(
+                desc=config['pumping_infrastructure'],
+                sources=sources,
+                data_path=config["data_path"],
+                settings=settings
+            )
 
-        energy_sys_db, solar_farms = configure_energy_system(
-            config=config['energy_system'],
-            sources=sources,
-            pumping_stations=pumping_stations,
-            data_path=config["data_path"],
-            settings=settings
-        )
-        progress.update(config_task, advance=1)
+        with step('energy_system'):
+            energy_sys_db, solar_farms = configure_energy_system(
+                config=config['energy_system'],
+                sources=sources,
+                pumping_stations=pumping_stations,
+                data_path=config["data_path"],
+                settings=settings
+            )
 
-        pipe_options, connections = build_piping_infrastructure(
-            desc=config['piping_infrastructure'],
-            a_state=state,
-            sources=sources,
-            data_path=config["data_path"],
-            settings=settings
-        )
-        progress.update(config_task, advance=1)
+        with step('piping_infrastructure'):
+            pipe_options, connections = build_piping_infrastructure(
+                desc=config['piping_infrastructure'],
+                a_state=state,
+                sources=sources,
+                data_path=config["data_path"],
+                settings=settings
+            )
 
-        water_utilities, cross_utility_connections = configure_water_utilities(
-            desc=config['water_utilities'],
-            a_state=state,
-            sources=sources,
-            pumping_stations=pumping_stations,
-            connections=connections,
-            utilities_bonds=utilities_bonds,
-            solar_farms=solar_farms,
-            data_path=config["data_path"],
-            settings=settings
-        )
-        progress.update(config_task, advance=1)
+        with step('water_utilities'):
+            water_utilities, cross_utility_connections = configure_water_utilities(
+                desc=config['water_utilities'],
+                a_state=state,
+                sources=sources,
+                pumping_stations=pumping_stations,
+                connections=connections,
+                utilities_bonds=utilities_bonds,
+                solar_farms=solar_farms,
+                data_path=config["data_path"],
+                settings=settings
+            )
 
         national_context = NationalContext(
             state=state,
@@ -238,18 +342,21 @@ def configure_system_ex(
         )
         progress.update(config_task, advance=1)
 
-        if settings.start_year > 2000:
-            # Unless you use the original data folder (which starts with 2000),
-            # the input files have been generated using the evaluator, which doens't 
-            # update the costs and ages the utilities in the last year because it 
-            # assumes it's missing some info to do it (e..g inlfation in year+1). 
-            # In the follow up stage, however this info will be there.
-            escalate_costs(
-                year=settings.start_year-1,
-                national_context=national_context,
-                water_utilities=water_utilities
-            )
+        # Unless you use the original data folder (which starts with 2000),
+        # the input files have been generated using the evaluator, which doens't 
+        # update the costs and ages the utilities in the last year because it 
+        # assumes it's missing some info to do it (e..g inlfation in year+1). 
+        # In the follow up stage, however this info will be there.
+        is_follow_up_stage = settings.start_year > 2000
+
+        # Inflation is exogenous: escalate the costs of all the years to simulate now
+        escalate_costs_over_horizon(
+            from_year=settings.start_year-1 if is_follow_up_stage else settings.start_year,
+            to_year=settings.end_year,
+            national_context=national_context
+        )
 
+        if is_follow_up_stage:
             age_water_utilities(
                 year=settings.start_year-1,
                 national_context=national_context,
@@ -266,7 +373,7 @@ def configure_system_ex(
 
         return settings, national_context, water_utilities
 
-from .core.base_model import DynamicProperties, BWFResult
+from .core.base_model import DynamicProperties, StaticProperties, BWFResult, RetentionPolicy
 from .jurisdictions.services import dump_state
 from .water_demand_model.services import dump_water_demand_model
 from .nrw_model.services import dump_nrw_model
@@ -378,7 +485,12 @@ def save_system_status(
             settings.NIB: 0,
             settings.LIFELINE_VOLUME: settings.lifeline_volume,
             settings.SEED: 128,
+            settings.RNG_MODE: settings.rng_mode,
             settings.AVAILABLE_CORES: settings.available_cores,
+            settings.HYDRAULICS_BACKEND: settings.hydraulics_backend,
+            settings.HYDRAULICS_ENGINE: settings.hydraulics_engine,
+            settings.HYDRAULICS_CONTINUOUS: settings.hydraulics_continuous,
+            settings.SHARE_DATASETS: settings.share_datasets,
         }
 
         config_path = results_dir / "configuration.yaml"
@@ -401,6 +513,65 @@ def save_metrics(
 
         return
 
+# Hourly results committed between two settlements (one year)
+HOURLY_RESULTS_LIVE_ROWS = 365*24
+
+def configure_results_retention(
+        national_context: NationalContext,
+        save_results_config: Dict[str, Any],
+        spill_dir: Path
+    ) -> None:
+    """
+    Choose what is kept of the hourly results once a year is simulated, from
+    the 'retention' section of the save_results configuration:
+        retention:
+          mode: aggregate # 'keep' (default), 'aggregate' or 'spill'
+          aggregates: [sum, max, p95]
+          spill_dir: path/to/dir # where 'spill' writes, default `spill_dir`
+    The hourly results that are saved at the end (entities and epanet_networks
+    sections) are spilled instead of only aggregated, so that they can still
+    be saved, and the peak demands need the maximum of the demands.
+    """
+    if not save_results_config:
+        return
+    
+    retention_config = save_results_config.get('retention', {})
+    mode = retention_config.get('mode', RetentionPolicy.KEEP)
+    if mode == RetentionPolicy.KEEP:
+        return
+    aggregates = tuple(retention_config.get('aggregates', RetentionPolicy.aggregates))
+    spill_dir = Path(retention_config.get('spill_dir', spill_dir))
+
+    entities_config = save_results_config.get('entities', {})
+    analytics_config = save_results_config.get('analytics', {})
+
+    for entity, (results_obj, hourly_var) in national_context.hourly_results.items():
+        entity_config = entities_config.get(entity, False)
+        if isinstance(entity_config, dict):
+            is_saved = entity_config.get('enabled', False) and (
+                not entity_config.get('fields', []) or hourly_var in entity_config['fields']
+            )
+        else:
+            is_saved = bool(entity_config)
+        
+        var_aggregates = aggregates
+        if entity == 'municipalities':
+            is_saved = is_saved or bool(save_results_config.get('epanet_networks', {}))
+            if analytics_config.get('peak_demands', False) and 'max' not in var_aggregates:
+                var_aggregates += ('max',)
+
+        results_obj.set_retention(
+            hourly_var,
+            RetentionPolicy(
+                mode=RetentionPolicy.SPILL if is_saved else mode,
+                aggregates=var_aggregates,
+                spill_dir=spill_dir
+            ),
+            live_rows=HOURLY_RESULTS_LIVE_ROWS
+        )
+
+    return
+
 def save_results(
         result_dir: Path,
         settings: Settings,
@@ -511,11 +682,11 @@ def save_analytics_results(
         saving_task = progress.add_task("[red]Saving out analytics results", total=1)
 
         if save_results_config.get('peak_demands', False):
-            # Take the global database for total demand of every municipality
-            total_dem_df = national_context.municipalities_results['demand-total']
-
-            # Output the peak (max) per year
-            peak_dem_df = total_dem_df.groupby(total_dem_df.index.year).max().rename_axis('year')
+            # Output the peak (max) per year of the total demand of every municipality
+            # (kept even when the hourly demands are not, see configure_results_retention)
+            peak_dem_df = national_context.municipalities_results.aggregates('demand-total', 'max')
+            peak_dem_df.index = peak_dem_df.index.year
+            peak_dem_df = peak_dem_df.rename_axis('year')
 
             peak_dem_df.to_excel(
                 result_dir / "peak_demands.xlsx"
@@ -526,7 +697,7 @@ def save_analytics_results(
     return
 
 from .services.epanet_utils import (
-    build_epanet_network,
+    network_cache,
     apply_demand_patterns,
     apply_electricity_info,
 )
@@ -564,6 +735,10 @@ def save_epanet_networks_results(
     networks_dir = result_dir / "epanet_networks"
     os.makedirs(networks_dir, exist_ok=True)
 
+    # Take the global database for total demand of every municipality (with
+    # the spilled years, if any)
+    nation_demands_df = national_context.municipalities_results.history('demand-total')
+
     with Progress() as progress:
         saving_task = progress.add_task(
             "[red]Saving out epanet networks   ",
@@ -573,7 +748,7 @@ def save_epanet_networks_results(
         for year in settings.years_to_simulate:
             for cluster in national_context.get_wu_clusters(year):
 
-                cluster.network = build_epanet_network(
+                cluster.network = network_cache.get(
                     year=year,
                     water_utilities=cluster.water_utilities,
                     cross_utility_connections=cluster.cross_utility_connections,
@@ -582,7 +757,6 @@ def save_epanet_networks_results(
 
                 # Let's extract the demands to make the job of the apply demands function easier.
                 # Select this year and cluster demands
-                nation_demands_df = national_context.municipalities_results['demand-total']
                 municipalities_cluster = [m.cbs_id 
                     for wu in cluster.water_utilities
                     for m in wu.active_municipalities(when=year)
@@ -631,7 +805,9 @@ def save_epanet_networks_results(
 
                     progress.update(saving_task, advance=len(cluster.water_utilities))
 
-                cluster.network.close()
+            network_cache.release(unused_since=year)
+
+    network_cache.release()
 
     return
 
@@ -643,7 +819,13 @@ from .services.evaluation import run_eval
 
 def run_eval_from_file(
         masterplan_file: Annotated[str, typer.Argument(help="Masterplan file (.xlsx, .yaml, or .json) ")],
-        config_file: Annotated[str, typer.Argument(help=".xlsx file containing the configuration of the scenario")]
+        config_file: Annotated[str, typer.Argument(help=".xlsx file containing the configuration of the scenario")],
+        checkpoint_dir: Annotated[Optional[str], typer.Option(help="Directory where the state of the evaluation is saved at the end of every year")] = None,
+        resume_from: Annotated[Optional[str], typer.Option(help="Checkpoint file to resume the evaluation from (see --checkpoint-dir)")] = None,
+        profile: Annotated[bool, typer.Option(help="Record time and memory of every phase of every year, saved with the results")] = False,
+        profile_memory: Annotated[str, typer.Option(help="How the profiler measures the memory: 'rss' or 'tracemalloc' (slower)")] = 'rss',
+        config_workers: Annotated[int, typer.Option(help="Number of processes parsing the input workbooks while the system is configured")] = 1,
+        use_dataset_cache: Annotated[bool, typer.Option(help="Keep the parsed input workbooks in a cache in the data folder (see water_futures_battle_build_dataset_cache)")] = False
     ) -> None:
 
     # If the configuration file has a folder use that folder to pass it to the configure_system
@@ -652,21 +834,19 @@ def run_eval_from_file(
     data_path = str(config_path.parent) if config_path.parent != Path('') else '.'
     configuration_filename = config_path.name
 
+    # Enabled before the configuration, so that its steps are profiled too
+    if profile:
+        profiler.enable(memory_mode=profile_memory)
+
     settings, national_context, water_utilities = configure_system(
         data_path=data_path,
-        configuration_filename=configuration_filename
+        configuration_filename=configuration_filename,
+        use_dataset_cache=use_dataset_cache,
+        config_workers=config_workers
     ) 
 
     masterplan = parse_masterplan(Path(masterplan_file))
 
-    # Actually run the evaluation of the solution    
-    national_context, water_utilities, metrics = run_eval(
-        settings=settings,
-        national_context=national_context,
-        water_utilities=water_utilities,
-        masterplan=masterplan
-    )
-
     # Create results-{scenario_name} directory in the parent of data_path
     # We re-open the configuration to find these info
     data_parent_dir = config_path.parent.parent
@@ -680,6 +860,23 @@ def run_eval_from_file(
     else:
         results_dir = data_parent_dir / "bwf_results"
 
+    # What is kept of the hourly results depends on what we save at the end
+    configure_results_retention(
+        national_context=national_context,
+        save_results_config=save_results_config,
+        spill_dir=results_dir / "hourly_results-spill"
+    )
+
+    # Actually run the evaluation of the solution    
+    national_context, water_utilities, metrics = run_eval(
+        settings=settings,
+        national_context=national_context,
+        water_utilities=water_utilities,
+        masterplan=masterplan,
+        checkpoint_dir=checkpoint_dir,
+        resume_from=resume_from
+    )
+
     results_dir.mkdir(exist_ok=True)
 
     save_system_status(
@@ -701,5 +898,154 @@ def run_eval_from_file(
         water_utilities=water_utilities,
         save_results_config=save_results_config,
     )
+    national_context.discard_spilled_hourly_results()
+
+    HydraulicsTelemetryLog.dump(results_dir)
+
+    if profile:
+        profiler.disable()
+        profiler.dump(results_dir)
+        print(profiler.summary().head(10).to_string())
+        print(f"The profile of the evaluation is saved in '{results_dir}/profile*'")
+
+    return
+
+from .services.batch_evaluation import (
+    IS_BATCH_EVALUATION_AVAILABLE,
+    MASTERPLAN_EXTENSIONS,
+    DecisionsNode,
+    MasterplanOutcome,
+    combine_metrics,
+    evaluate_masterplans,
+    evaluate_masterplans_sharing_prefixes
+)
+
+def find_masterplans(masterplans: str) -> List[str]:
+    """A directory (all the masterplans in it) or a glob pattern."""
+    if os.path.isdir(masterplans):
+        return sorted(
+            str(fp) for fp in Path(masterplans).iterdir()
+            if fp.suffix.lower() in MASTERPLAN_EXTENSIONS and not fp.name.startswith('~$')
+        )
+    return sorted(glob.glob(masterplans))
+
+def run_eval_batch(
+        masterplans: Annotated[str, typer.Argument(help="Directory containing the masterplans, or a glob pattern, e.g. 'plans/*.yaml'")],
+        config_file: Annotated[str, typer.Argument(help=".yaml file containing the configuration of the scenario")],
+        n_workers: Annotated[int, typer.Option(help="Number of masterplans evaluated at the same time")] = 2,
+        share_prefixes: Annotated[bool, typer.Option(help="Simulate only once the years in which masterplans take the same decisions")] = False,
+        config_workers: Annotated[int, typer.Option(help="Number of processes parsing the input workbooks while the system is configured")] = 1,
+        use_dataset_cache: Annotated[bool, typer.Option(help="Keep the parsed input workbooks in a cache in the data folder (see water_futures_battle_build_dataset_cache)")] = False
+    ) -> None:
+
+    masterplan_files = find_masterplans(masterplans)
+    if not masterplan_files:
+        print(f"No masterplans found in '{masterplans}'")
+        raise typer.Exit(code=1)
+
+    config_path = Path(config_file)
+    data_path = str(config_path.parent) if config_path.parent != Path('') else '.'
+    configuration_filename = config_path.name
+
+    # Same place as run_eval_from_file, but one file with all the masterplans
+    data_parent_dir = config_path.parent.parent
+    with open(config_file, 'r') as f_yaml:
+        config = yaml.safe_load(f_yaml)
+        scenario_name = config.get('scenario_name', None)
+        # Nothing hourly is saved, the results are only aggregated (or spilled)
+        retention_config = {'retention': config.get('save_results', {}).get('retention', {})}
+
+    results_dir = data_parent_dir / (f"bwf_results-{scenario_name}" if scenario_name else "bwf_results")
+
+    # Masterplans are named by their file name, unless two of them have the same
+    names = [Path(fp).stem for fp in masterplan_files]
+    if len(set(names)) != len(names):
+        names = masterplan_files
+    name_of = dict(zip(masterplan_files, names))
+
+    metrics_by_masterplan: Dict[str, MetricsT] = {}
+    failed: List[str] = []
+    not_run: List[str] = []
+
+    def on_result(outcome: MasterplanOutcome) -> None:
+        name = name_of[outcome.masterplan_file]
+        if outcome.not_run:
+            not_run.append(name)
+            print(f"Masterplan '{name}' not run:\n{outcome.error}")
+        elif outcome.metrics is None:
+            failed.append(name)
+            print(f"Masterplan '{name}' failed:\n{outcome.error}")
+        else:
+            metrics_by_masterplan[name] = outcome.metrics
+            print(f"Masterplan '{name}' evaluated ({len(metrics_by_masterplan)+len(failed)+len(not_run)}/{len(masterplan_files)})")
+
+    if IS_BATCH_EVALUATION_AVAILABLE:
+        settings, national_context, water_utilities = configure_system(
+            data_path=data_path,
+            configuration_filename=configuration_filename,
+            use_dataset_cache=use_dataset_cache,
+            config_workers=config_workers
+        )
+        configure_results_retention(national_context, retention_config, results_dir / "hourly_results-spill")
+
+        if share_prefixes:
+            def on_trie(trie: DecisionsNode) -> None:
+                print(f"Simulating {trie.n_simulated_years} years instead of "
+                      f"{len(trie.masterplan_files)*settings.n_years_to_simulate}")
+
+            evaluate_masterplans_sharing_prefixes(
+                settings=settings,
+                national_context=national_context,
+                water_utilities=water_utilities,
+                masterplan_files=masterplan_files,
+                n_workers=n_workers,
+                on_result=on_result,
+                on_trie=on_trie
+            )
+        else:
+            evaluate_masterplans(
+                settings=settings,
+                national_context=national_context,
+                water_utilities=water_utilities,
+                masterplan_files=masterplan_files,
+                n_workers=n_workers,
+                on_result=on_result
+            )
+    else:
+        warnings.warn("Process forking is not available on this platform, the system is configured again for each masterplan.")
+        for masterplan_file in masterplan_files:
+            settings, national_context, water_utilities = configure_system(
+                data_path=data_path,
+                configuration_filename=configuration_filename,
+                use_dataset_cache=use_dataset_cache,
+                config_workers=config_workers
+            )
+            configure_results_retention(national_context, retention_config, results_dir / "hourly_results-spill")
+            try:
+                _, _, metrics = run_eval(
+                    settings=settings,
+                    national_context=national_context,
+                    water_utilities=water_utilities,
+                    masterplan=parse_masterplan(Path(masterplan_file))
+                )
+            except Exception:
+                on_result(MasterplanOutcome(masterplan_file, None, traceback.format_exc()))
+                continue
+            finally:
+                national_context.discard_spilled_hourly_results()
+            on_result(MasterplanOutcome(masterplan_file, metrics, None))
+
+    results_dir.mkdir(exist_ok=True)
+
+    if metrics_by_masterplan:
+        StaticProperties('metrics-batch', combine_metrics(metrics_by_masterplan)).dump(results_dir, f__index=True)
+        print(f"You can visualize the metrics of all the masterplans at '{results_dir}/metrics-batch.xlsx'")
+
+    if not_run:
+        print(f"{len(not_run)} masterplan(s) not run: {not_run}")
+    if failed:
+        print(f"{len(failed)} masterplan(s) failed: {failed}")
+    if failed or not_run:
+        raise typer.Exit(code=1)
 
     return
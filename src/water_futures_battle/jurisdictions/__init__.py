@@ -7,7 +7,9 @@ from .entities import (
 )
 from .services import (
     build_state,
+    build_state_reads,
     dump_state,
+    generate_demands,
     generate_nrw_demand,
     generate_water_demand,
     age_distribution_networks,
@@ -20,7 +22,9 @@ __all__ = [
     "Province",
     "Municipality",
     "build_state",
+    "build_state_reads",
     "dump_state",
+    "generate_demands",
     "generate_nrw_demand",
     "generate_water_demand",
     "age_distribution_networks",
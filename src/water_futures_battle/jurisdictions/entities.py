@@ -8,7 +8,9 @@ import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import bwf_entity, Location
-from ..core.utility import keyify, timestampify, BWFTimeLike, OptionalTimestamp
+from ..core.registry import EntityRegistry
+from ..core.utility import keyify, timestampify, active_years, ActiveYears, BWFTimeLike, OptionalTimestamp
+from ..core.views import StateColumn
 
 from ..nrw_model.enums import NRWClass
 
@@ -376,6 +378,7 @@ class Municipality(Jurisdiction, Location):
 
         # Register this municipality in its province
         self.province.register_municipality(self)
+        EntityRegistry.register(Municipality, self, self.cbs_id)
 
     def __eq__(self, other):
         if not isinstance(other, Jurisdiction):
@@ -406,7 +409,9 @@ class Municipality(Jurisdiction, Location):
             end_reason=row_data[Municipality.END_REASON],
             destination_municipality_cbs_id=row_data[Municipality.END_CBS_ID],
             province=state.province(row_data[Municipality.PROVINCE]),
-            _res_p_weight=settings.residential_p_weight_rng.uniform(low=0, high=1, size=1).item()
+            _res_p_weight=settings.get_random_generator(
+                'municipalities-res_p_weight', row_data[CBS_ID]
+            ).uniform(low=0, high=1, size=1).item()
         )
 
     # Declaration of dynamic properties, i.e., those that have some type of time dependency
@@ -430,6 +435,28 @@ class Municipality(Jurisdiction, Location):
         'billable_consumption': float,
     }
 
+    # The dynamic properties that the yearly state tables materialise for all the
+    # municipalities at once (see core/views.py), and the ones computed from them.
+    STATE_ID = CBS_ID
+    STATE_COLUMNS = {
+        'population': StateColumn([('_dynamic_properties', MunicipalitiesDB.POPULATION)]),
+        'dist_network_avg_age': StateColumn([('_dynamic_properties', MunicipalitiesDB.DISTNET_AVG_AGE)]),
+        'n_houses': StateColumn([('_dynamic_properties', MunicipalitiesDB.N_HOUSES)]),
+        'n_businesses': StateColumn([('_dynamic_properties', MunicipalitiesDB.N_BUSINESSES)]),
+        'disp_income_avg': StateColumn([('_dynamic_properties', MunicipalitiesDB.ADI)]),
+        'billable_demand': StateColumn([('_results', MunicipalitiesResults.DEMAND_BILLABLE)]),
+        'undelivered_demand': StateColumn([('_results', MunicipalitiesResults.DEMAND_UNDELIVERED)]),
+        'billable_consumption': StateColumn(
+            [('_results', MunicipalitiesResults.DEMAND_BILLABLE), ('_results', MunicipalitiesResults.DEMAND_UNDELIVERED)],
+            combine=lambda billable, undelivered: (billable - undelivered).clip(lower=0)
+        ),
+    }
+    STATE_DERIVED = {
+        'size_class': ('population', MunicipalitySize.determine_class),
+        'nrw_class': ('dist_network_avg_age', NRWClass.determine_class),
+        'dist_network_length': ('population', lambda population: population * Municipality.POPULATION_TO_PIPES),
+    }
+
     @property
     def state(self) -> State:
         return self.province.region.state
@@ -502,7 +529,14 @@ class Municipality(Jurisdiction, Location):
     def disp_income_avg(self) -> pd.Series:
         return self._dynamic_properties[MunicipalitiesDB.ADI][self.cbs_id]
 
+    @cached_property
+    def _active_years(self) -> ActiveYears:
+        return active_years(self.begin_date, self.end_date)
+
     def has_open(self, when: BWFTimeLike) -> bool:
+        if isinstance(when, int):
+            return self._active_years[0] <= when
+
         ts = timestampify(when, errors='raise')
         if pd.isna(self.begin_date) or ts < self.begin_date:
             return False
@@ -513,6 +547,10 @@ class Municipality(Jurisdiction, Location):
         Returns True if the municipality is active at the given year/date/timestamp.
         Accepts year (int or str), date string, or pd.Timestamp.
         """
+        if isinstance(when, int):
+            first, stop = self._active_years
+            return first <= when < stop
+
         ts = timestampify(when, errors='raise')
         if not self.has_open(when=ts):
             return False
@@ -586,6 +624,7 @@ class Municipality(Jurisdiction, Location):
             db.loc[ts, self.cbs_id] = current_age+by
         else:
             db.loc[ts, self.cbs_id] = np.nan
+        self._dynamic_properties.touch(MunicipalitiesDB.DISTNET_AVG_AGE)
 
         return self
 
@@ -8,12 +8,19 @@ import pandas as pd
 from ..core import Settings, get_snapshot
 from ..core.utility import timestampify, filter_columns
 from ..core.base_model import StaticProperties
+from ..core.dataset_cache import ExcelRead, excel_reads
 
 from ..nrw_model.enums import NRWClass
 from ..nrw_model.dynamic_properties import NRWModelDB
 from ..water_demand_model import WaterDemandModelData
 from ..water_demand_model.properties import WaterDemandModelDB
-from ..water_demand_model.services import modulate_business_pattern, modulate_house_pattern
+from ..water_demand_model.services import (
+    N_MODULATION_DRAWS,
+    REFERENCE_T_MAX,
+    modulate_business_pattern,
+    modulate_house_pattern,
+    modulate_patterns
+)
 
 from .dynamic_properties import MunicipalitiesDB as MuniDB, MunicipalitiesResults as MuniR
 from .entities import (
@@ -51,10 +58,7 @@ def build_state(
     # Every Jurisdictions will register itself to the correct parent automatically
 
     # Let's upload the static properties explaining the jurisdictions
-    jurisdictions_sheets = pd.read_excel(
-        os.path.join(data_path, Path(config['jurisdictions-static_properties'])),
-        sheet_name=['regions', 'provinces', 'municipalities']
-    )
+    jurisdictions_sheets = _static_properties_read(config, data_path).read()
 
     # Assume we uploaded the 'state' and it only has this:
     a_state = State(name, identifier)
@@ -78,8 +82,30 @@ def build_state(
             settings=settings
         )
 
+    # Total demands are hourly, billable ones yearly; make space for all the
+    # years we are going to simulate
+    for var, n_timestamps in [(MuniR.DEMAND_TOTAL, 365*24), (MuniR.DEMAND_BILLABLE, 1)]:
+        Municipality._results.reserve(
+            var,
+            n_timestamps=n_timestamps*settings.n_years_to_simulate,
+            n_entities=len(a_state.municipalities)
+        )
+
     return a_state
 
+def _static_properties_read(config: dict[str,str], data_path: str) -> ExcelRead:
+    return ExcelRead(
+        os.path.join(data_path, Path(config['jurisdictions-static_properties'])),
+        dict(sheet_name=['regions', 'provinces', 'municipalities'])
+    )
+
+def build_state_reads(config: dict[str,str], data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by build_state."""
+    return excel_reads(
+        MuniDB.excel_read(os.path.join(data_path, Path(config[MuniDB.NAME]))),
+        _static_properties_read(config, data_path)
+    )
+
 def dump_state(
         a_state: State,
         output_dir: Path
@@ -150,7 +176,7 @@ def generate_nrw_demand(
     avg_water_demand = np.array(avg_water_demand)
 
     # Compute daily nrw demands (for one year) by sampling from the base demand (returns m^3/km/day)
-    RNG = settings.get_random_generator('nrw_model-sample_demand')
+    RNG = settings.get_random_generator('nrw_model-sample_demand', municipality.cbs_id, year)
     nrw = pipes_km * nrw_class.sample_demand(n_points=365, RNG=RNG) # m^3/day
     nrw = nrw/24 # m^3/hour
 
@@ -160,6 +186,18 @@ def generate_nrw_demand(
 
     return nrw
 
+def _get_per_unit_demand(
+        all_values_at_ts: pd.Series,
+        municipality: Municipality,
+        RNG: np.random.Generator
+    ) -> float:
+    if municipality.cbs_id in all_values_at_ts:
+        return float(all_values_at_ts[municipality.cbs_id])
+    
+    # municipality specific value is not in there, we take the national bounds
+    all_values_at_ts[[f"{municipality.state.cbs_id}-min",f"{municipality.state.cbs_id}-max"]]
+    return float(RNG.uniform(all_values_at_ts.iloc[0], all_values_at_ts.iloc[1]))
+
 def generate_water_demand(
         wdm_data: WaterDemandModelData,
         municipality: Municipality,
@@ -172,7 +210,7 @@ def generate_water_demand(
     wdm_patterns, wdm_db = wdm_data
 
     # Get the random generator for this module
-    RNG = settings.get_random_generator('water_demand_model-sample_demand')
+    RNG = settings.get_random_generator('water_demand_model-sample_demand', municipality.cbs_id, year)
 
     # get the 3 indexes of the patterns to take from the database
     (pattern_id_h1, pattern_id_h2), pattern_id_b = munic_Y.assigned_demand_patterns
@@ -197,25 +235,16 @@ def generate_water_demand(
     # get the per_house_demand and per_business_demand in year y (uncertain)
     ts = timestampify(year, errors='raise')
 
-    def get_per_unit_value(df: pd.DataFrame, ts: pd.Timestamp, municipality: Municipality) -> float:
-        all_values_at_ts = df.asof(ts).dropna()
-        if municipality.cbs_id in all_values_at_ts:
-            return float(all_values_at_ts[municipality.cbs_id])
-        
-        # municipality specific value is not in there, we take the national bounds
-        all_values_at_ts[[f"{municipality.state.cbs_id}-min",f"{municipality.state.cbs_id}-max"]]
-        return float(RNG.uniform(all_values_at_ts.iloc[0], all_values_at_ts.iloc[1]))
-
-    per_house_demand = get_per_unit_value(
-        df=wdm_db[WaterDemandModelDB.PER_HOUSE_DEMAND],
-        ts=ts,
-        municipality=municipality
+    per_house_demand = _get_per_unit_demand(
+        all_values_at_ts=wdm_db[WaterDemandModelDB.PER_HOUSE_DEMAND].asof(ts).dropna(),
+        municipality=municipality,
+        RNG=RNG
     )
     
-    per_business_demand = get_per_unit_value(
-        df=wdm_db[WaterDemandModelDB.PER_BUSINESS_DEMAND],
-        ts=ts,
-        municipality=municipality
+    per_business_demand = _get_per_unit_demand(
+        all_values_at_ts=wdm_db[WaterDemandModelDB.PER_BUSINESS_DEMAND].asof(ts).dropna(),
+        municipality=municipality,
+        RNG=RNG
     )
     
     # multiply modulated pattern by unit demand by number of units of all 3 patterns
@@ -226,6 +255,85 @@ def generate_water_demand(
     # return the weighted sum of the two shouse demand and the business demand
     return ((pattern_h1 * w_h1 + pattern_h2 * w_h2), pattern_b)
 
+def generate_demands(
+        wdm_data: WaterDemandModelData,
+        nrw_info_db: NRWModelDB,
+        municipalities: List[Municipality],
+        year: int,
+        max_yearly_temperature: float,
+        settings: Settings
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched version of generate_water_demand and generate_nrw_demand for many
+    municipalities at once.
+
+    The random generators are consumed in the same order as calling the two 
+    functions municipality by municipality (in the order received), so the 
+    demands are identical.
+
+    Returns
+    -------
+    Tuple[numpy.ndarray, numpy.ndarray]
+        Billable and total (billable plus NRW) hourly demands, (M, 24*365) arrays.
+    """
+    wdm_patterns, wdm_db = wdm_data
+    ts = timestampify(year, errors='raise')
+
+    per_house_values = wdm_db[WaterDemandModelDB.PER_HOUSE_DEMAND].asof(ts).dropna()
+    per_business_values = wdm_db[WaterDemandModelDB.PER_BUSINESS_DEMAND].asof(ts).dropna()
+
+    n_munis = len(municipalities)
+    draws = np.empty((3, n_munis, N_MODULATION_DRAWS))
+    patterns = ([], [], [])
+    weights = np.empty((2, n_munis))
+    units = np.empty((2, n_munis))
+    per_unit_demands = np.empty((2, n_munis))
+    nrw_demands = np.empty((n_munis, 365))
+
+    for i, municipality in enumerate(municipalities):
+        munic_Y = get_snapshot(municipality, year)
+
+        WDM_RNG = settings.get_random_generator('water_demand_model-sample_demand', municipality.cbs_id, year)
+        NRW_RNG = settings.get_random_generator('nrw_model-sample_demand', municipality.cbs_id, year)
+
+        (pattern_id_h1, pattern_id_h2), pattern_id_b = munic_Y.assigned_demand_patterns
+        for j, pattern_id in enumerate([pattern_id_h1, pattern_id_h2, pattern_id_b]):
+            patterns[j].append(wdm_patterns[pattern_id])
+
+        weights[:, i] = munic_Y.assigned_res_patterns_weights
+        units[:, i] = (munic_Y.n_houses, munic_Y.n_businesses)
+
+        # The three modulations take their draws one after the other, then
+        # we (maybe) sample the per unit demands
+        draws[:, i, :] = WDM_RNG.random(3 * N_MODULATION_DRAWS).reshape((3, N_MODULATION_DRAWS))
+        per_unit_demands[0, i] = _get_per_unit_demand(per_house_values, municipality, WDM_RNG)
+        per_unit_demands[1, i] = _get_per_unit_demand(per_business_values, municipality, WDM_RNG)
+
+        # NRW demands have their own generator (returns m^3/km/day)
+        nrw_class: NRWClass = munic_Y.nrw_class
+        nrw_demands[i, :] = munic_Y.dist_network_length * nrw_class.sample_demand(n_points=365, RNG=NRW_RNG)
+
+    pattern_h1 = modulate_patterns(patterns[0], max_yearly_temperature, draws[0])
+    pattern_h2 = modulate_patterns(patterns[1], max_yearly_temperature, draws[1])
+    pattern_b = modulate_patterns(patterns[2], REFERENCE_T_MAX, draws[2])
+
+    # multiply modulated pattern by unit demand by number of units of all 3 patterns
+    pattern_h1 = pattern_h1 * units[0, :, None] * per_unit_demands[0, :, None]
+    pattern_h2 = pattern_h2 * units[0, :, None] * per_unit_demands[0, :, None]
+    pattern_b = pattern_b * units[1, :, None] * per_unit_demands[1, :, None]
+
+    bill_demands = (pattern_h1 * weights[0, :, None] + pattern_h2 * weights[1, :, None]) + pattern_b
+
+    # NRW: from m^3/day to m^3/hour, upperbounded by 2 * daily average water demand
+    avg_water_demands = bill_demands.reshape((n_munis, 365, 24)).mean(axis=2)
+    nrw_demands = nrw_demands/24
+    mask = nrw_demands > 2. * avg_water_demands
+    nrw_demands[mask] = 2. * avg_water_demands[mask]
+
+    total_demands = bill_demands + np.repeat(nrw_demands, 24, axis=1)
+
+    return bill_demands, total_demands
+
 def age_distribution_networks(
         closing_municipalities: Set[Municipality],
         alive_municipalities: Set[Municipality],
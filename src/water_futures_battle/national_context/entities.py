@@ -1,9 +1,10 @@
 from dataclasses import dataclass
-from typing import Dict, Optional, Self, Set, Tuple
+from typing import Dict, List, Optional, Self, Set, Tuple
 
 from epanet_plus import EPyT
 import pandas as pd 
 
+from ..core.base_model import BWFResult, DynamicProperties
 from ..core.utility import filter_columns, BWFTimeLike, timestampify
 from ..climate.dynamic_properties import ClimateDB
 from ..economy.dynamic_properties import EconomyDB
@@ -67,45 +68,39 @@ class WaterUtilitiesCluster:
         )
         return utilities_names+'-'+str(self.year)
     
-    def get_connections_sign_map_between(
+    def net_water_exchanges(
             self,
-            wu_from: WaterUtility,
-            wu_to: WaterUtility
-        ) -> Dict[str, int]:
+            net_exchanges: pd.Series
+        ) -> Dict[Tuple[WaterUtility, WaterUtility], float]:
         """
-        Returns a map (dictionary) that tells for each connection between the water utility
-        if it has been installed with in the same directionas requested.
-        
-        :param self: Description
-        :param wu_from: Description
-        :type wu_from: WaterUtility
-        :param wu_to: Description
-        :type wu_to: WaterUtility
-        :return: Description
-        :rtype: Dict[str, int]
+        The net water exchange between each pair of utilities of the cluster
+        (sorted by id, from the first to the second) given the net flow of each
+        connection (in the direction it has been installed).
+        The connections between municipalities of the same utility, or of
+        utilities of other clusters, are not exchanges.
         """
-        out_map: Dict[str, int] = {}
-
-        wu_from_municipalities = [wu.cbs_id for wu in wu_from.municipalities]
-        wu_to_municipalities = [wu.cbs_id for wu in wu_to.municipalities]
+        sorted_wus = sorted(self.water_utilities, key= lambda x: x.bwf_id)
+        rank = {wu: i for i, wu in enumerate(sorted_wus)}
+        owners = {m.cbs_id: wu for wu in sorted_wus for m in wu.municipalities}
+
+        exchanges: Dict[Tuple[WaterUtility, WaterUtility], float] = {
+            (wu_from, wu_to): 0.0
+            for i, wu_from in enumerate(sorted_wus)
+            for wu_to in sorted_wus[i+1:]
+        }
         for c in self.cross_utility_connections:
-            if (c.from_node.cbs_id in wu_from_municipalities or 
-                c.to_node.cbs_id in wu_from_municipalities
-                ):
-            
-                if c.from_node.cbs_id in wu_to_municipalities:
-                    out_map[c.bwf_id] = -1
-                
-                if c.to_node.cbs_id in wu_to_municipalities:
-                    out_map[c.bwf_id] = 1
-                
-                # else maybe the connection is for the from municipality but not
-                # in the to municipality
-
-            # endif
-        # endfor
-
-        return out_map
+            owner_from = owners.get(c.from_node.cbs_id)
+            owner_to = owners.get(c.to_node.cbs_id)
+            if owner_from is None or owner_to is None or owner_from == owner_to:
+                continue
+
+            # Change the sign of the inverted pipes (from the second utility to the first)
+            if rank[owner_from] < rank[owner_to]:
+                exchanges[(owner_from, owner_to)] += 1 * net_exchanges[c.bwf_id]
+            else:
+                exchanges[(owner_to, owner_from)] += -1 * net_exchanges[c.bwf_id]
+
+        return exchanges
 
 @dataclass(frozen=True)
 class NationalContext:
@@ -258,6 +253,34 @@ class NationalContext:
     def solar_farms_results(self) -> SolarFarmsResults:
         return SolarFarm._results
 
+    @property
+    def hourly_results(self) -> Dict[str, Tuple[BWFResult, str]]:
+        """The results tracked hour by hour, by entity (as named in the save_results config)."""
+        return {
+            'municipalities': (self.municipalities_results, MunicipalitiesResults.DEMAND_TOTAL),
+            'sources': (self.sources_results, SourcesResults.PRODUCTION),
+            'pumps': (self.pumps_results, PumpsResults.ELE_ENERGY),
+            'solar_farms': (self.solar_farms_results, SolarFarmsResults.YIELD),
+        }
+
+    def settle_hourly_results(self, year: int) -> Self:
+        """
+        Apply the retention policies of the hourly results (see
+        BWFResult.set_retention) to the years up to `year`, included.
+        """
+        until = timestampify(year+1)
+        for results, _ in self.hourly_results.values():
+            results.settle(until)
+
+        return self
+
+    def discard_spilled_hourly_results(self) -> Self:
+        """Delete the files where this process spilled the hourly results."""
+        for results, _ in self.hourly_results.values():
+            results.discard_spilled()
+
+        return self
+
     @property
     def average__maximum_temperature(self) -> pd.Series:
         return self.climate[ClimateDB.TEMPERATURE_MAX_AVG][self.state.cbs_id]
@@ -284,14 +307,6 @@ class NationalContext:
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
     
-    def set_nrw_intervention_costs(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-    ) -> Self:
-        self.nrw_model_db[NRWModelDB.COST].loc[when, value.index] = value.values
-        return self
-
     @property
     def gw_sources_db(self) -> SourcesDB:
         return GroundWater._dynamic_properties
@@ -302,43 +317,19 @@ class NationalContext:
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
     
-    def set_gw_sources_unit_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.gw_sources_db[SourcesDB.UNIT_COST].loc[when, value.index] = value.values
-        return self
-
     @property
     def gw_sources_opex_fixed_cost(self) -> pd.DataFrame:
         df = self.gw_sources_db[SourcesDB.OPEX_FIXED]
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_gw_sources_opex_fixed_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.gw_sources_db[SourcesDB.OPEX_FIXED].loc[when, value.index] = value.values
-        return self
-
     @property
     def gw_sources_opex_volum_other_cost(self) -> pd.DataFrame:
         df = self.gw_sources_db[SourcesDB.OPEX_VOLUM_OTHER]
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_gw_sources_opex_volum_other_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.gw_sources_db[SourcesDB.OPEX_VOLUM_OTHER].loc[when, value.index] = value.values
-        return self
-    
-    # Surface Water (sw) getters and setters
+    # Surface Water (sw) getters
     @property
     def sw_sources_db(self) -> SourcesDB:
         return SurfaceWater._dynamic_properties
@@ -349,43 +340,19 @@ class NationalContext:
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_sw_sources_unit_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.sw_sources_db[SourcesDB.UNIT_COST].loc[when, value.index] = value.values
-        return self
-
     @property
     def sw_sources_opex_fixed_cost(self) -> pd.DataFrame:
         df = self.sw_sources_db[SourcesDB.OPEX_FIXED]
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_sw_sources_opex_fixed_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.sw_sources_db[SourcesDB.OPEX_FIXED].loc[when, value.index] = value.values
-        return self
-
     @property
     def sw_sources_opex_volum_other_cost(self) -> pd.DataFrame:
         df = self.sw_sources_db[SourcesDB.OPEX_VOLUM_OTHER]
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_sw_sources_opex_volum_other_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.sw_sources_db[SourcesDB.OPEX_VOLUM_OTHER].loc[when, value.index] = value.values
-        return self
-
-    # Desalination (des) getters and setters
+    # Desalination (des) getters
     @property
     def des_sources_db(self) -> SourcesDB:
         return Desalination._dynamic_properties
@@ -396,42 +363,18 @@ class NationalContext:
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_des_sources_unit_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.des_sources_db[SourcesDB.UNIT_COST].loc[when, value.index] = value.values
-        return self
-
     @property
     def des_sources_opex_fixed_cost(self) -> pd.DataFrame:
         df = self.des_sources_db[SourcesDB.OPEX_FIXED]
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_des_sources_opex_fixed_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.des_sources_db[SourcesDB.OPEX_FIXED].loc[when, value.index] = value.values
-        return self
-
     @property
     def des_sources_opex_volum_other_cost(self) -> pd.DataFrame:
         df = self.des_sources_db[SourcesDB.OPEX_VOLUM_OTHER]
         national_columns = filter_columns(df, self.state.cbs_id)
         return df[national_columns]
 
-    def set_des_sources_opex_volum_other_cost(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-        ) -> Self:
-        self.des_sources_db[SourcesDB.OPEX_VOLUM_OTHER].loc[when, value.index] = value.values
-        return self
-    
     @property
     def pump_options_db(self) -> PumpOptionsDB:
         return PumpOption._dynamic_properties
@@ -440,14 +383,6 @@ class NationalContext:
     def new_pumps_costs(self) -> pd.DataFrame:
         return self.pump_options_db[PumpOptionsDB.COST]
     
-    def set_new_pumps_costs(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-    ) -> Self:
-        self.new_pumps_costs.loc[when, value.index] = value.values
-        return self
-    
     @property
     def pipe_options_db(self) -> PipeOptionsDB:
         return PipeOption._dynamic_properties
@@ -456,14 +391,26 @@ class NationalContext:
     def new_pipes_costs(self) -> pd.DataFrame:
         return self.pipe_options_db[PipeOptionsDB.COST]
 
-    def set_new_pipes_costs(
-            self,
-            when: pd.Timestamp,
-            value: pd.Series
-    ) -> Self:
-        self.new_pipes_costs.loc[when, value.index] = value.values
-        return self
-    
+    @property
+    def inflation_indexed_costs(self) -> List[Tuple[DynamicProperties, str, List[str]]]:
+        """
+        The cost tables that follow inflation (see services.evaluation.escalate_costs_over_horizon):
+        their database, variable and the columns that are escalated.
+        """
+        def national(db: DynamicProperties, var: str) -> Tuple[DynamicProperties, str, List[str]]:
+            return db, var, filter_columns(db[var], self.state.cbs_id)
+
+        return [
+            national(self.nrw_model_db, NRWModelDB.COST),
+            *(
+                national(sources_db, var)
+                for sources_db in [self.gw_sources_db, self.sw_sources_db, self.des_sources_db]
+                for var in [SourcesDB.UNIT_COST, SourcesDB.OPEX_FIXED, SourcesDB.OPEX_VOLUM_OTHER]
+            ),
+            (self.pump_options_db, PumpOptionsDB.COST, list(self.new_pumps_costs.columns)),
+            (self.pipe_options_db, PipeOptionsDB.COST, list(self.new_pipes_costs.columns)),
+        ]
+
     @property
     def pipes_db(self) -> PipesDB:
         return Pipe._dynamic_properties
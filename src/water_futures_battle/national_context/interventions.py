@@ -3,6 +3,7 @@ from typing import Any, Dict, Set, Tuple
 
 
 from ..core import Settings
+from ..core.registry import EntityRegistry
 from ..core.utility import timestampify
 from ..pipes import PipeOption
 from ..connections.entities import Connection 
@@ -25,10 +26,10 @@ class InstallPipe:
         pipe_option_id = intervention_desc['pipe_'+PipeOption.ID]
         pipe_inst_date = timestampify(year)
 
-        connection = next((c for c in national_context.cross_utility_connections if c.bwf_id == cnn_id), None)
+        connection = EntityRegistry.get(Connection, cnn_id, within=national_context.cross_utility_connections)
         if connection is None:
             raise ValueError(f"Connection with id '{cnn_id}' not found in national context.")
-        pipe_option = next((p for p in pipe_options if p.bwf_id == pipe_option_id), None)
+        pipe_option = EntityRegistry.get(PipeOption, pipe_option_id, within=pipe_options)
         if pipe_option is None:
             raise ValueError(f"PipeOption with id '{pipe_option_id}' not found.")
 
@@ -36,7 +37,8 @@ class InstallPipe:
         # we check only the first time 
         if not connection.has_active_pipe(when=year):
             for replaced_cnn_id in connection.replaces_cnn_ids:
-                replaced_cnn = next(c for c in national_context.cross_utility_connections if c.bwf_id == replaced_cnn_id)
+                replaced_cnn = EntityRegistry.get(Connection, replaced_cnn_id, within=national_context.cross_utility_connections)
+                assert replaced_cnn is not None, f"Connection {replaced_cnn_id} not found in national context."
 
                 repl_cnn_active_pipe = replaced_cnn.active_pipe(when=year)
                 if repl_cnn_active_pipe is not None:
@@ -45,7 +47,7 @@ class InstallPipe:
         new_pipe = connection.install_pipe(
             pipe_option=pipe_option,
             installation_date=pipe_inst_date,
-            lifetime_rng=settings.pipes_lifetime_rng
+            lifetime_rng=settings.get_random_generator('pipes-lifetime', connection.bwf_id, year, 'install')
         )
 
         # Calculate this new pipe cost because it will immediately influence the 
@@ -58,14 +60,7 @@ class InstallPipe:
         emiss = pipe_emb_ghg * connection.distance
 
         #find which water utilities are connected 
-        wu_from = next((wu
-                         for wu in national_context.water_utilities
-                         if connection.from_node in wu.municipalities
-        ))
-    
-        wu_to = next((wu
-                    for wu in national_context.water_utilities
-                    if connection.to_node in wu.municipalities
-        ))
+        wu_from = WaterUtility.serving(connection.from_node)
+        wu_to = WaterUtility.serving(connection.to_node)
 
         return cost, emiss, (wu_from, wu_to)
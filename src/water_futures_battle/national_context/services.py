@@ -6,7 +6,7 @@ from water_futures_battle.core.settings import Settings
 
 from ..core.utility import timestampify
 from ..pipes import PipeOption
-from ..connections.entities import SelfLoopConnection, ClosedWSourceConnection
+from ..connections.entities import Connection, SelfLoopConnection, ClosedWSourceConnection
 from ..connections.services import resolve_current_cnn, age_pipes
 from ..water_utilities import WaterUtility
 from ..water_utilities.dynamic_properties import WaterUtilityResults
@@ -112,13 +112,15 @@ def work_on_connections(
         emissions[wu_from.bwf_id] += emiss/2
         emissions[wu_to.bwf_id] += emiss/2
 
-    for connection in sorted(national_context.cross_utility_connections, key=lambda c: c.bwf_id):
+    for connection in Connection.failing_in(year):
+        if connection not in national_context.cross_utility_connections:
+            continue
         
         if connection.replaced_by_cnn_id == "":
             # the connection doesn't get replaced, if it fails we re-install a pipe here
             cost, emiss = connection.inspect_and_replace(
                 year=year,
-                lifetime_rng=settings.pipes_lifetime_rng
+                lifetime_rng=settings.get_random_generator('pipes-lifetime', connection.bwf_id, year, 'replace')
             )
         else:
             # the connection does get replaced, if it fails we install a new one on the new connection
@@ -144,7 +146,7 @@ def work_on_connections(
                 new_pipe = new_connection.install_pipe(
                     pipe_option=failed_pipe._pipe_option,
                     installation_date=failed_pipe.decommission_date,
-                    lifetime_rng=settings.pipes_lifetime_rng
+                    lifetime_rng=settings.get_random_generator('pipes-lifetime', new_connection.bwf_id, year, 'replace')
                 )
 
                 pipe_unit_cost = float(new_pipe._pipe_option.unit_cost.loc[new_pipe.installation_date])
@@ -157,15 +159,8 @@ def work_on_connections(
         if cost ==  0.0:
             continue
 
-        wu_from = next((wu
-                         for wu in national_context.water_utilities
-                         if connection.from_node in wu.municipalities
-        ))
-    
-        wu_to = next((wu
-                    for wu in national_context.water_utilities
-                    if connection.to_node in wu.municipalities
-        ))
+        wu_from = WaterUtility.serving(connection.from_node)
+        wu_to = WaterUtility.serving(connection.to_node)
 
         capexes[wu_from.bwf_id] += cost/2
         capexes[wu_to.bwf_id] += cost/2
@@ -183,5 +178,5 @@ def age_connections(
     age_pipes(
         national_context.cross_utility_connections,
         year,
-        settings.pipes_frict_f_decay_rng
+        settings
     )
\ No newline at end of file
@@ -1,9 +1,10 @@
 from .enums import NRWClass
 from .entities import NRWInterventionCostTable, NRWModelSettings
-from .services import configure_nrw_model, dump_nrw_model
+from .services import configure_nrw_model, configure_nrw_model_reads, dump_nrw_model
 
 __all__ = [
     'configure_nrw_model',
+    'configure_nrw_model_reads',
     'dump_nrw_model',
     'NRWClass',
     'NRWInterventionCostTable',
@@ -1,9 +1,10 @@
 from pathlib import Path
 import os
 
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 from ..core import Settings
+from ..core.dataset_cache import ExcelRead, excel_reads
 
 from .dynamic_properties import NRWModelDB
 from .entities import NRWModelSettings
@@ -28,6 +29,10 @@ def configure_nrw_model(
 
     return nrw_model_settings, nrw_model_db
 
+def configure_nrw_model_reads(config: dict, data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by configure_nrw_model."""
+    return excel_reads(NRWModelDB.excel_read(os.path.join(data_path, config[NRWModelDB.NAME])))
+
 def dump_nrw_model(
         nrw_settings: NRWModelSettings,
         nrw_db: NRWModelDB,
@@ -5,7 +5,8 @@ import numpy as np
 import pandas as pd
 
 from ..core.base_model import bwf_entity
-from ..core.utility import BWFTimeLike, timestampify, OptionalTimestamp
+from ..core.registry import EntityRegistry
+from ..core.utility import ActiveYears, BWFTimeLike, active_years, timestampify, OptionalTimestamp
 
 from .dynamic_properties import PipeOptionsDB, PipesDB
 
@@ -42,6 +43,9 @@ class PipeOption:
     def __hash__(self) -> int:
         return hash(self.bwf_id)
 
+    def __post_init__(self):
+        EntityRegistry.register(PipeOption, self)
+
     @classmethod
     def from_row(cls, row_data: pd.Series) -> Self:
         return cls(
@@ -105,6 +109,10 @@ class Pipe:
     _DECOMMISSION_REGISTRY: ClassVar[Dict[str, pd.Timestamp]] = {}
     _sampled_lifetime: int
 
+    # Years in which each pipe is active (see active_years), kept in sync with
+    # the decommission registry to answer the queries by year without timestamps
+    _ACTIVE_YEARS: ClassVar[Dict[str, ActiveYears]] = {}
+
     @property
     def decommission_date(self) -> OptionalTimestamp:
         if pd.notna(self._decommission_date):
@@ -123,6 +131,9 @@ class Pipe:
     def __post_init__(self):
         assert self._dynamic_properties is not None
 
+        self._ACTIVE_YEARS[self.bwf_id] = active_years(self.installation_date, self.decommission_date)
+        EntityRegistry.register(Pipe, self)
+
         #--- Register this pipe in the databases
 
         # his pipe has a starting friction factor that depend on the pipe option
@@ -162,6 +173,7 @@ class Pipe:
             )
         
         self._DECOMMISSION_REGISTRY[self.bwf_id] = ts
+        self._ACTIVE_YEARS[self.bwf_id] = active_years(self.installation_date, ts)
 
         return self
 
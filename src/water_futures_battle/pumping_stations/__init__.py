@@ -1,7 +1,8 @@
 from .entities import PumpingStation
-from .services import build_pumping_infrastructure, dump_pumping_infrastructure
+from .services import build_pumping_infrastructure, build_pumping_infrastructure_reads, dump_pumping_infrastructure
 
 __all__ = [
     'build_pumping_infrastructure',
+    'build_pumping_infrastructure_reads',
     'dump_pumping_infrastructure'
 ]
\ No newline at end of file
@@ -1,11 +1,12 @@
 from dataclasses import dataclass
-from typing import Any, ClassVar, Dict, Optional, Self, Set, Tuple
+from typing import Any, ClassVar, Dict, List, Optional, Self, Set, Tuple
 
 import numpy as np
 import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import bwf_entity
+from ..core.registry import EntityRegistry
 from ..core.utility import BWFTimeLike
 from ..sources.entities import WaterSource, SourcesContainer
 from ..pumps import Pump, PumpOption
@@ -94,10 +95,41 @@ class PumpingStation:
 
         return instance
     
+    # Calendar of the pumps failures: by year, the pumping stations with a pump
+    # that fails that year (the lifetime of a pump is sampled when it is installed).
+    # Every year only these pumping stations are inspected, see failing_in.
+    _FAILURE_CALENDAR: ClassVar[Dict[int, Dict[str, 'PumpingStation']]] = {}
+
     def __post_init__(self):
         
         # Register this pumping station to the assigned source
         self.source.register_pumping_station(self)
+        EntityRegistry.register(PumpingStation, self)
+        EntityRegistry.link(EntityRegistry.SOURCE_PUMPING_STATION, self.source.bwf_id, self)
+
+        for pump in self.pumps.values():
+            self._schedule_failure(pump)
+
+    def _schedule_failure(self, pump: Pump) -> None:
+        # Never failing if sampled lifetime is not there (see Pump._is_failing_this_year)
+        if pump._sampled_lifetime <= 0:
+            return
+        failure_year = pump.installation_date.year + int(pump._sampled_lifetime)
+        self._FAILURE_CALENDAR.setdefault(failure_year, {})[self.bwf_id] = self
+
+    @classmethod
+    def failing_in(cls, year: int) -> List['PumpingStation']:
+        """
+        The pumping stations that had a pump scheduled to fail in `year`, sorted
+        by id. The pump may have been replaced in the meantime, `inspect_and_replace`
+        tells.
+        """
+        scheduled = cls._FAILURE_CALENDAR.get(year, {})
+        return [scheduled[bwf_id] for bwf_id in sorted(scheduled)]
+
+    @classmethod
+    def clear_failure_calendar(cls) -> None:
+        cls._FAILURE_CALENDAR = {}
 
     @property
     def province(self):
@@ -185,6 +217,7 @@ class PumpingStation:
 
         #actually install the pump
         self.pumps[len(self.pumps)] = new_pump
+        self._schedule_failure(new_pump)
 
         return new_pump
     
@@ -283,9 +316,9 @@ def get_pumps_collection(
                 poption.lifetime[1]
             )
             if lifetime_bounds[0] < lifetime_bounds[1]:
-                lifetime = settings.get_random_generator('pumps-lifetime').integers(
-                    *lifetime_bounds
-                )
+                lifetime = settings.get_random_generator(
+                    'pumps-lifetime', f"{bwf_id_prefix}-{i:02d}"
+                ).integers(*lifetime_bounds)
             else:
                 lifetime = lifetime_bounds[0]
 
@@ -1,6 +1,7 @@
 from typing import Any, Dict, Set
 
 from ..core import Settings
+from ..core.registry import EntityRegistry
 from ..core.utility import timestampify
 from ..sources import WaterSource
 from ..pumps import PumpOption
@@ -25,12 +26,14 @@ class InstallPumps:
         pump_option_id = intervention_desc[PumpOption.ID]
         pump_inst_date = timestampify(year)
 
-        pump_station = next((ps for ps in pumping_stations if ps.source.bwf_id == source_id), None)
+        pump_station = EntityRegistry.linked(EntityRegistry.SOURCE_PUMPING_STATION, source_id)
+        if pump_station not in pumping_stations:
+            pump_station = None
 
         if pump_station is None:
             raise ValueError(f"No pumping station found for source ID {source_id}")
         
-        pump_option = next((po for po in pump_options if po.bwf_id == pump_option_id), None)
+        pump_option = EntityRegistry.get(PumpOption, pump_option_id, within=pump_options)
         if pump_option is None:
             raise ValueError(f"No pump option found for ID {pump_option_id}")
         
@@ -42,12 +45,13 @@ class InstallPumps:
                 pump.decommission(pump_option_id)
                 
         cost = 0.0
+        lifetime_rng = settings.get_random_generator(cls._RNG_NAME, pump_station.bwf_id, year, 'install')
         for _ in range(intervention_desc["n_pumps"]):
             
             pump = pump_station.install_pump(
                 pump_option=pump_option,
                 installation_date=pump_inst_date,
-                lifetime_rng=settings.get_random_generator(cls._RNG_NAME)
+                lifetime_rng=lifetime_rng
             )
             
             cost += pump._pump_option.unit_cost.loc[pump_inst_date]
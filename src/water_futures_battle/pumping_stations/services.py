@@ -1,12 +1,13 @@
 import os
 from pathlib import Path
-from typing import Any, Dict, Optional, Set, Tuple
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
 
 import numpy as np
 import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import StaticProperties
+from ..core.dataset_cache import ExcelRead, excel_reads
 from ..sources.entities import SourcesContainer, WaterSource
 from ..pumps.dynamic_properties import PumpOptionsDB, PumpsResults
 from ..pumps.entities import Pump, PumpOption
@@ -30,6 +31,9 @@ def build_pumping_infrastructure(
     :rtype: Any
     """
 
+    # The failures of the pumps of a previously built system are not ours
+    PumpingStation.clear_failure_calendar()
+
     # Pumping stations depends on Pump, which depend on Pump Options, so let's start from the latter
 
     # PUMP OPTIONS
@@ -38,8 +42,7 @@ def build_pumping_infrastructure(
     pump_options_db = PumpOptionsDB.load_from_file(os.path.join(data_path, desc[PumpOptionsDB.NAME]))
     PumpOption.set_dynamic_properties(pump_options_db)
 
-    pump_options_data = pd.read_excel(os.path.join(data_path, desc['pump_options-static_properties']),
-                                      sheet_name=None)
+    pump_options_data = _pump_options_read(desc, data_path).read()
     
     pump_options_map: Dict[str, PumpOption] = {}
     for idx, option in pump_options_data['options'].iterrows():
@@ -52,12 +55,11 @@ def build_pumping_infrastructure(
     
     # Once we created the database of pump options we can start building the Pumps and Pumping Stations
     pumps_results = PumpsResults()
+    # Energy consumption is hourly, make space for all the years we are going to simulate
+    pumps_results.reserve(PumpsResults.ELE_ENERGY, n_timestamps=365*24*settings.n_years_to_simulate)
     Pump.set_results(pumps_results)
 
-    pumping_stations_data = pd.read_excel(
-        os.path.join(data_path, desc['pumping_stations-static_properties']),
-        sheet_name='entities'
-    )
+    pumping_stations_data = _pumping_stations_read(desc, data_path).read()
 
     pumping_stations: Set[PumpingStation] = set()
     for idx, ps_data in pumping_stations_data.iterrows():
@@ -74,6 +76,20 @@ def build_pumping_infrastructure(
 
     return pump_options, pumping_stations
 
+def _pump_options_read(desc: Dict[str, str], data_path: str) -> ExcelRead:
+    return ExcelRead(os.path.join(data_path, desc['pump_options-static_properties']), dict(sheet_name=None))
+
+def _pumping_stations_read(desc: Dict[str, str], data_path: str) -> ExcelRead:
+    return ExcelRead(os.path.join(data_path, desc['pumping_stations-static_properties']), dict(sheet_name='entities'))
+
+def build_pumping_infrastructure_reads(desc: Dict[str, str], data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by build_pumping_infrastructure."""
+    return excel_reads(
+        PumpOptionsDB.excel_read(os.path.join(data_path, desc[PumpOptionsDB.NAME])),
+        _pump_options_read(desc, data_path),
+        _pumping_stations_read(desc, data_path)
+    )
+
 def dump_pumping_infrastructure(
         all_pumping_stations: Set[PumpingStation],
         pump_options: Set[PumpOption],
@@ -261,3 +277,123 @@ def get_lowest_energy_pumping_station_setup(
     best_eff    = float(efficiencies[best_idx])
 
     return best_n, best_speed, best_energy, best_eff
+
+class PumpingStationSetups(NamedTuple):
+    n_pumps: np.ndarray
+    speeds: np.ndarray
+    single_pump_energies: np.ndarray
+    efficiencies: np.ndarray
+    valid: np.ndarray
+
+def get_lowest_energy_pumping_station_setups(
+    target_heads: np.ndarray,
+    target_flows: np.ndarray,
+    n_available_pumps: np.ndarray,
+    pump_options: Sequence[PumpOption],
+    speed_ratio_bounds: Tuple[float, float],
+    pump_curve_coeffs: Optional[np.ndarray] = None
+) -> PumpingStationSetups:
+    """
+    Batched version of :func:`get_lowest_energy_pumping_station_setup` for many
+    pumping stations at once (e.g., all the sources of a cluster in one hour).
+    All the pump counts are evaluated together with numpy broadcasting.
+
+    Instead of raising, stations without a valid configuration (or with a 
+    negative flow) are flagged as not `valid` and their other values are 0.
+    Valid results are identical to the ones of the non batched version.
+
+    :param target_heads: (S,) target head of each pumping station
+    :param target_flows: (S,) target flow of each pumping station
+    :param n_available_pumps: (S,) number of pumps available in each pumping station
+    :param pump_options: (S) the pump option of each pumping station
+    :param speed_ratio_bounds: admissible speed ratios
+    :param pump_curve_coeffs: (S, 3) pump curve coefficients (A, B, C) of each pumping station
+    """
+    target_heads = np.asarray(target_heads, dtype=np.float64)
+    target_flows = np.asarray(target_flows, dtype=np.float64)
+    n_available_pumps = np.asarray(n_available_pumps, dtype=np.int64)
+    n_stations = target_flows.shape[0]
+
+    if pump_curve_coeffs is None:
+        pump_curve_coeffs = np.array([po.pump_curve_coeffs for po in pump_options], dtype=np.float64)
+    pump_curve_coeffs = np.asarray(pump_curve_coeffs, dtype=np.float64).reshape(n_stations, 3)
+
+    n_pumps = np.zeros(n_stations, dtype=np.int64)
+    best_speeds = np.zeros(n_stations, dtype=np.float64)
+    best_energies = np.zeros(n_stations, dtype=np.float64)
+    best_effs = np.zeros(n_stations, dtype=np.float64)
+
+    # We check for <-10 because sometimes EPANET return tiny negative flows
+    valid = target_flows >= -10.0
+    is_on = target_flows >= 10.0
+    if not np.any(is_on) or n_available_pumps.max(initial=0) == 0:
+        return PumpingStationSetups(n_pumps, best_speeds, best_energies, best_effs, valid & ~is_on)
+
+    # (S, N) grid: one row per station, one column per possible pump count
+    counts = np.arange(1, n_available_pumps.max()+1)
+    exists = counts[None, :] <= n_available_pumps[:, None]
+    flows = target_flows[:, None] / counts[None, :]
+
+    # Solve A·α² + B·Q·α + (C·Q² - H) = 0 for the speed ratio α (see fit_pump_speed)
+    A = pump_curve_coeffs[:, 0:1]
+    B = pump_curve_coeffs[:, 1:2]
+    C = pump_curve_coeffs[:, 2:3]
+    # (float_power goes through pow as the scalar `**`, np.square may differ in the last bit)
+    a_q = A
+    b_q = B * flows
+    c_q = C * np.float_power(flows, 2) - target_heads[:, None]
+    discriminant = np.float_power(b_q, 2) - 4 * a_q * c_q
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_disc = np.sqrt(discriminant)
+        alpha1 = (-b_q + sqrt_disc) / (2 * a_q)
+        alpha2 = (-b_q - sqrt_disc) / (2 * a_q)
+
+    # Positive root closest to one, the first one wins the ties
+    ok1 = alpha1 > 0
+    ok2 = alpha2 > 0
+    take2 = ok2 & (~ok1 | (np.abs(alpha2 - 1.0) < np.abs(alpha1 - 1.0)))
+    speeds = np.where(take2, alpha2, np.where(ok1, alpha1, np.inf))
+    speeds[(discriminant < 0) | ~exists] = np.inf
+
+    lo, hi = speed_ratio_bounds
+    in_bounds = (speeds >= lo) & (speeds <= hi) & is_on[:, None]
+
+    # Evaluate the pump curves only where needed, grouping the stations by pump option
+    effs = np.full(speeds.shape, np.nan)
+    energies = np.full(speeds.shape, np.nan)
+    options_rows: Dict[PumpOption, list[int]] = {}
+    for i, po in enumerate(pump_options):
+        options_rows.setdefault(po, []).append(i)
+
+    for po, rows in options_rows.items():
+        rows_mask = np.zeros(n_stations, dtype=bool)
+        rows_mask[rows] = True
+        mask = in_bounds & rows_mask[:, None]
+        if not np.any(mask):
+            continue
+        energies[mask], effs[mask] = po.break_powers_and_efficiencies_at_flows_and_speedrs(
+            flows=flows[mask],
+            speed_ratios=speeds[mask]
+        )
+
+    valid_setups = in_bounds & np.isfinite(energies)
+    pumping_station_energies = np.where(valid_setups, energies * counts[None, :], np.inf)
+
+    has_setup = valid_setups.any(axis=1)
+    best_idx = np.argmin(pumping_station_energies, axis=1)
+    rows = np.flatnonzero(has_setup)
+    best_cols = best_idx[rows]
+
+    n_pumps[rows] = best_cols + 1
+    best_speeds[rows] = speeds[rows, best_cols]
+    best_energies[rows] = energies[rows, best_cols]
+    best_effs[rows] = effs[rows, best_cols]
+
+    return PumpingStationSetups(
+        n_pumps=n_pumps,
+        speeds=best_speeds,
+        single_pump_energies=best_energies,
+        efficiencies=best_effs,
+        valid=valid & (~is_on | has_setup)
+    )
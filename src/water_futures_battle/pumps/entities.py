@@ -5,7 +5,8 @@ import numpy as np
 import pandas as pd
 
 from ..core.base_model import bwf_entity
-from ..core.utility import timestampify, BWFTimeLike, OptionalTimestamp
+from ..core.registry import EntityRegistry
+from ..core.utility import timestampify, active_years, ActiveYears, BWFTimeLike, OptionalTimestamp
 
 from .dynamic_properties import PumpOptionsDB, PumpsResults
 
@@ -107,6 +108,8 @@ class PumpOption:
         object.__setattr__(self, "_head", self.head_curve.to_numpy())
         object.__setattr__(self, "_eff",  self.eff_curve.to_numpy())
 
+        EntityRegistry.register(PumpOption, self)
+
     @property
     def head_curve(self) -> pd.Series:
         return self._curves[PumpOption.H]
@@ -172,6 +175,31 @@ class PumpOption:
             return float('nan')
         return (_RHO * _GRAVITY * _Q_CONV * flow * head) / ((eff/100) * 1000)
 
+    def break_powers_and_efficiencies_at_flows_and_speedrs(
+            self,
+            flows: np.ndarray,
+            speed_ratios: np.ndarray
+        ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorised version of :meth:`break_power_at_flow_and_speedr` and
+        :meth:`efficiency_at_flow_and_speedr` (same operations, same results).
+        Speed ratios must be > 0.
+        """
+        nominal_flows = flows / speed_ratios
+        heads = np.interp(nominal_flows, self._flow, self._head,
+            left=self.pump_curve_coeff_A,
+            right=np.nan
+        ) * np.float_power(speed_ratios, 2) # like the scalar `**` (pow), unlike np.square
+        effs = np.interp(nominal_flows, self._flow, self._eff,
+            left=0.0,
+            right=0.0
+        )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            powers = (_RHO * _GRAVITY * _Q_CONV * flows * heads) / ((effs/100) * 1000)
+        powers[effs <= 0.0] = np.nan
+
+        return powers, effs
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             self.ID: self.bwf_id,
@@ -210,6 +238,9 @@ class Pump:
     _DECOMMISSION_REGISTRY: ClassVar[Dict[str, pd.Timestamp]] = {}
     _sampled_lifetime: int
 
+    # Years in which each pump is active, same as for pipes
+    _ACTIVE_YEARS: ClassVar[Dict[str, ActiveYears]] = {}
+
     @property
     def decommission_date(self) -> OptionalTimestamp:
         if pd.notna(self._decommission_date):
@@ -227,8 +258,14 @@ class Pump:
     
     def __post_init__(self):
         assert self._results is not None
+        self._ACTIVE_YEARS[self.bwf_id] = active_years(self.installation_date, self.decommission_date)
+        EntityRegistry.register(Pump, self)
 
     def is_active(self, when: BWFTimeLike) -> bool:
+        if isinstance(when, int):
+            first, stop = self._ACTIVE_YEARS[self.bwf_id]
+            return first <= when < stop
+
         ts = timestampify(when)
         return (
             ts >= self.installation_date and 
@@ -251,6 +288,7 @@ class Pump:
             )
         
         self._DECOMMISSION_REGISTRY[self.bwf_id] = ts
+        self._ACTIVE_YEARS[self.bwf_id] = active_years(self.installation_date, ts)
 
         return self
     
@@ -0,0 +1,444 @@
+import contextlib
+import dataclasses
+import json
+import os
+import queue
+import traceback
+from multiprocessing import active_children, get_context
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import pandas as pd
+from rich.progress import Progress
+
+from ..core import Settings
+from ..masterplan import Masterplan, parse_masterplan
+from ..national_context import NationalContext
+from ..water_utilities import WaterUtility
+
+from .epanet_utils import network_cache
+from .evaluation import evaluate_year, run_eval
+from .hydraulics_pool import IS_PROCESS_BACKEND_AVAILABLE
+from .metrics import MetricsT, compute_metrics
+from .shared_datasets import shared_datasets
+
+# Like the hydraulics process backend, the batch evaluation relies on fork:
+# the system is configured once in the parent and every masterplan is evaluated
+# in a fresh copy-on-write child, so the class-level registries mutated by
+# run_eval never leak from one masterplan to the other.
+IS_BATCH_EVALUATION_AVAILABLE = IS_PROCESS_BACKEND_AVAILABLE
+
+MASTERPLAN_EXTENSIONS = ('.xlsx', '.xls', '.yaml', '.yml', '.json')
+
+class MasterplanOutcome(NamedTuple):
+    """
+    What a worker sends back to the parent: the metrics of the masterplan or,
+    if the evaluation failed, the formatted traceback. A masterplan that was
+    never evaluated (e.g., the process it had to be forked from died) is
+    `not_run`, with the reason in `error`.
+    """
+    masterplan_file: str
+    metrics: Optional[MetricsT]
+    error: Optional[str]
+    not_run: bool = False
+
+# Set by the parent right before forking the pool, read by the workers.
+_FORKED_STATE: Optional[Tuple[Settings, NationalContext, Set[WaterUtility]]] = None
+
+def _evaluate_in_worker(masterplan_file: str) -> MasterplanOutcome:
+    assert _FORKED_STATE is not None, "The process pool must be created through evaluate_masterplans"
+    settings, national_context, water_utilities = _FORKED_STATE
+
+    try:
+        masterplan = parse_masterplan(Path(masterplan_file))
+
+        # The workers progress bars would overwrite each other, the parent
+        # reports the progress of the batch instead
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            try:
+                _, _, metrics = run_eval(
+                    settings=settings,
+                    national_context=national_context,
+                    water_utilities=water_utilities,
+                    masterplan=masterplan
+                )
+            finally:
+                # The pool workers exit without garbage collecting the results
+                national_context.discard_spilled_hourly_results()
+    except Exception:
+        return MasterplanOutcome(masterplan_file, None, traceback.format_exc())
+
+    return MasterplanOutcome(masterplan_file, metrics, None)
+
+def evaluate_masterplans(
+        settings: Settings,
+        national_context: NationalContext,
+        water_utilities: Set[WaterUtility],
+        masterplan_files: List[str],
+        n_workers: int,
+        on_result: Callable[[MasterplanOutcome], None]
+    ) -> None:
+    """
+    Evaluate many masterplans against the same configured system.
+
+    Every masterplan is evaluated in its own forked process (a worker is never
+    reused), which starts from the system as it is in the parent.
+    `on_result` is called in the parent as soon as a masterplan is evaluated,
+    so in order of completion, not in the order of `masterplan_files`.
+    """
+    global _FORKED_STATE
+
+    if not IS_BATCH_EVALUATION_AVAILABLE:
+        raise RuntimeError("The batch evaluation requires the 'fork' start method, not available on this platform.")
+
+    if not masterplan_files:
+        return
+    n_workers = max(1, min(n_workers, len(masterplan_files)))
+
+    # The workers can't fork their own process pool, and they share the cores
+    # among themselves for the hydraulic simulations
+    worker_settings = dataclasses.replace(
+        settings,
+        available_cores=max(1, settings.available_cores // n_workers),
+        hydraulics_backend='threads'
+    )
+
+    if settings.share_datasets:
+        shared_datasets.share(national_context)
+
+    _FORKED_STATE = (worker_settings, national_context, water_utilities)
+    try:
+        with get_context('fork').Pool(processes=n_workers, maxtasksperchild=1) as pool:
+            for outcome in pool.imap_unordered(_evaluate_in_worker, masterplan_files):
+                on_result(outcome)
+    finally:
+        _FORKED_STATE = None
+
+    return
+
+def year_decisions(masterplan: Masterplan, year: int, water_utilities_ids: List[str]) -> str:
+    """
+    Everything the masterplan decides for `year`, serialised so that two
+    masterplans taking the same decisions have the same string.
+    """
+    return json.dumps(
+        {
+            'national_policies': masterplan.national_policies(year=year),
+            'national_interventions': masterplan.national_interventions(year=year),
+            'water_utilities': {
+                wu_id: [
+                    masterplan.water_utility_policies(water_utility=wu_id, year=year),
+                    masterplan.water_utility_interventions(water_utility=wu_id, year=year)
+                ]
+                for wu_id in water_utilities_ids
+            }
+        },
+        sort_keys=True,
+        default=str
+    )
+
+@dataclasses.dataclass
+class DecisionsNode:
+    """
+    Node of the trie of the masterplans decisions: the masterplans below a node
+    at depth d take the same decisions in the first d years, so these years are
+    simulated only once for all of them.
+    """
+    masterplan: Optional[Masterplan] = None # any of the masterplans below, they all agree up to here
+    masterplan_files: List[str] = dataclasses.field(default_factory=list)
+    children: Dict[str, 'DecisionsNode'] = dataclasses.field(default_factory=dict)
+
+    @property
+    def n_simulated_years(self) -> int:
+        return sum(1 + child.n_simulated_years for child in self.children.values())
+
+def build_decisions_trie(
+        masterplans: Dict[str, Masterplan],
+        years: List[int],
+        water_utilities_ids: List[str]
+    ) -> DecisionsNode:
+    root = DecisionsNode()
+    for masterplan_file in sorted(masterplans):
+        masterplan = masterplans[masterplan_file]
+
+        node = root
+        node.masterplan_files.append(masterplan_file)
+        for year in years:
+            node = node.children.setdefault(
+                year_decisions(masterplan, year, water_utilities_ids),
+                DecisionsNode(masterplan=masterplan)
+            )
+            node.masterplan_files.append(masterplan_file)
+
+    return root
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+class _DepthFirstSlots:
+    """
+    The slots of the branches that are simulating, shared by the forked
+    processes. A free slot goes to the deepest branch waiting for one, so the
+    trie is explored depth first: the branches that are started finish (and
+    their processes exit) before the ones above fork new branches.
+    """
+    def __init__(self, ctx, n_slots: int, max_waiting: int):
+        self._condition = ctx.Condition()
+        self._n_free = ctx.Value('i', n_slots, lock=False)
+        # The processes waiting for a slot and their depth (pid 0 is a free entry)
+        self._waiting_pids = ctx.Array('i', max_waiting, lock=False)
+        self._waiting_depths = ctx.Array('i', max_waiting, lock=False)
+
+    def _deeper_waiting(self, depth: int) -> bool:
+        return any(
+            pid != 0 and a_depth > depth and _is_alive(pid)
+            for pid, a_depth in zip(self._waiting_pids, self._waiting_depths)
+        )
+
+    def acquire(self, depth: int) -> None:
+        with self._condition:
+            entry = list(self._waiting_pids).index(0)
+            self._waiting_pids[entry] = os.getpid()
+            self._waiting_depths[entry] = depth
+            while self._n_free.value == 0 or self._deeper_waiting(depth):
+                # A waiting process that is killed doesn't notify: look again
+                # now and then, once its parent has joined it
+                self._condition.wait(timeout=1)
+                active_children()
+            self._waiting_pids[entry] = 0
+            self._n_free.value -= 1
+            # The branches above may take the other free slots now
+            self._condition.notify_all()
+
+    def release(self) -> None:
+        with self._condition:
+            self._n_free.value += 1
+            self._condition.notify_all()
+
+class _BranchStatus(NamedTuple):
+    """
+    Sent by a branch process when it starts simulating, when it stops (to fork
+    the branches below) and when it exits, so that the parent can tell the
+    masterplans that failed with it from the ones that were never run.
+    """
+    pid: int
+    simulating: Tuple[str, ...]
+    exited: bool = False
+
+def _simulate_branch(node: DecisionsNode, depth: int, outcomes, slots: _DepthFirstSlots) -> None:
+    """
+    Runs in its own process, forked once the first `depth` years are simulated
+    and holding one of the `slots`.
+    It simulates the years below `node` while there is a single way forward.
+    Where the masterplans diverge, it forks one process per branch, each once
+    a slot is free for it, and waits for them.
+    """
+    outcomes.put(_BranchStatus(os.getpid(), tuple(node.masterplan_files)))
+    try:
+        _simulate_years_and_fork(node, depth, outcomes, slots)
+    finally:
+        outcomes.put(_BranchStatus(os.getpid(), (), exited=True))
+
+def _simulate_years_and_fork(node: DecisionsNode, depth: int, outcomes, slots: _DepthFirstSlots) -> None:
+    assert _FORKED_STATE is not None, "The branches must be created through evaluate_masterplans_sharing_prefixes"
+    settings, national_context, water_utilities = _FORKED_STATE
+    years = settings.years_to_simulate
+
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), Progress(disable=True) as progress:
+            tasks = {
+                'task_utilities': progress.add_task('', total=len(water_utilities)+1),
+                'task_uncertainties': progress.add_task('', total=len(water_utilities)+1),
+                'task_simu': progress.add_task('', total=len(water_utilities))
+            }
+
+            def _evaluate(a_node: DecisionsNode, a_depth: int) -> None:
+                evaluate_year(
+                    year=years[a_depth-1],
+                    settings=settings,
+                    national_context=national_context,
+                    water_utilities=water_utilities,
+                    masterplan=a_node.masterplan,
+                    progress=progress,
+                    **tasks
+                )
+
+            # Each branch starts with the year where it diverges from its siblings
+            if depth > 0:
+                _evaluate(node, depth)
+            while len(node.children) == 1:
+                node = next(iter(node.children.values()))
+                depth += 1
+                _evaluate(node, depth)
+
+            if not node.children:
+                network_cache.release()
+                metrics = compute_metrics(settings, national_context, water_utilities)
+    except Exception:
+        error = traceback.format_exc()
+        for masterplan_file in node.masterplan_files:
+            outcomes.put(MasterplanOutcome(masterplan_file, None, error))
+        national_context.discard_spilled_hourly_results()
+        slots.release()
+        return
+
+    if not node.children:
+        for masterplan_file in node.masterplan_files:
+            outcomes.put(MasterplanOutcome(masterplan_file, metrics, None))
+        national_context.discard_spilled_hourly_results()
+        slots.release()
+        return
+
+    # The masterplans diverge: this process hands its slot to the first branch
+    # and forks each of the others once a slot is free for it, then it only
+    # waits for them. The EPANET networks can't be shared by the forked
+    # processes (they keep open files), each branch builds its own.
+    network_cache.release()
+    outcomes.put(_BranchStatus(os.getpid(), ()))
+
+    ctx = get_context('fork')
+    children = list(node.children.values())
+    branches = []
+    for i, child in enumerate(children):
+        if i > 0:
+            slots.acquire(depth)
+        try:
+            branch = ctx.Process(target=_simulate_branch, args=(child, depth+1, outcomes, slots))
+            branch.start()
+        except Exception:
+            slots.release()
+            error = traceback.format_exc()
+            for not_forked in children[i:]:
+                for masterplan_file in not_forked.masterplan_files:
+                    outcomes.put(MasterplanOutcome(masterplan_file, None, error, not_run=True))
+            break
+        branches.append(branch)
+    for branch in branches:
+        branch.join()
+
+    # The branches read the years spilled by this process until they are done
+    national_context.discard_spilled_hourly_results()
+
+    return
+
+def evaluate_masterplans_sharing_prefixes(
+        settings: Settings,
+        national_context: NationalContext,
+        water_utilities: Set[WaterUtility],
+        masterplan_files: List[str],
+        n_workers: int,
+        on_result: Callable[[MasterplanOutcome], None],
+        on_trie: Optional[Callable[[DecisionsNode], None]] = None
+    ) -> None:
+    """
+    Same as :func:`evaluate_masterplans`, but the years in which a group of
+    masterplans takes the same decisions (e.g., they only differ from 2031) are
+    simulated once for the whole group. The system is then forked, copy-on-write,
+    at every year where the decisions diverge.
+
+    At most `n_workers` branches are simulated at the same time and a branch is
+    forked only when one of them is free, the deepest branches first: the
+    subtrees that are started finish before new ones are forked.
+    `on_trie` receives the trie of the decisions before the simulations start.
+    """
+    global _FORKED_STATE
+
+    if not IS_BATCH_EVALUATION_AVAILABLE:
+        raise RuntimeError("The batch evaluation requires the 'fork' start method, not available on this platform.")
+
+    masterplans: Dict[str, Masterplan] = {}
+    for masterplan_file in masterplan_files:
+        try:
+            masterplans[masterplan_file] = parse_masterplan(Path(masterplan_file))
+        except Exception:
+            on_result(MasterplanOutcome(masterplan_file, None, traceback.format_exc()))
+
+    if not masterplans:
+        return
+    n_workers = max(1, min(n_workers, len(masterplans)))
+
+    trie = build_decisions_trie(
+        masterplans=masterplans,
+        years=settings.years_to_simulate,
+        water_utilities_ids=sorted(wu.bwf_id for wu in water_utilities)
+    )
+    if on_trie is not None:
+        on_trie(trie)
+
+    worker_settings = dataclasses.replace(
+        settings,
+        available_cores=max(1, settings.available_cores // n_workers),
+        hydraulics_backend='threads'
+    )
+
+    if settings.share_datasets:
+        shared_datasets.share(national_context)
+
+    ctx = get_context('fork')
+    outcomes = ctx.Queue()
+    # Only the processes where the masterplans diverge (fewer than the masterplans) wait for a slot
+    slots = _DepthFirstSlots(ctx, n_slots=n_workers, max_waiting=len(masterplans)+1)
+
+    _FORKED_STATE = (worker_settings, national_context, water_utilities)
+    try:
+        slots.acquire(0)
+        root = ctx.Process(target=_simulate_branch, args=(trie, 0, outcomes, slots))
+        root.start()
+
+        pending = set(masterplans)
+        # The branch processes alive, with the masterplans they are simulating
+        branches: Dict[int, Tuple[str, ...]] = {}
+        died_simulating: Set[str] = set()
+        while pending:
+            try:
+                message = outcomes.get(timeout=1)
+            except queue.Empty:
+                for pid in [pid for pid in branches if not _is_alive(pid)]:
+                    died_simulating.update(branches.pop(pid))
+                if root.is_alive() or branches or not outcomes.empty():
+                    continue
+                break
+            if isinstance(message, _BranchStatus):
+                if message.exited:
+                    branches.pop(message.pid, None)
+                else:
+                    branches[message.pid] = message.simulating
+                continue
+            pending.discard(message.masterplan_file)
+            on_result(message)
+
+        # Some branches died without reporting (e.g., killed by the OS): the
+        # masterplans they were simulating failed, the ones of the branches
+        # they did not fork yet were never run
+        for masterplan_file in sorted(pending):
+            if masterplan_file in died_simulating:
+                on_result(MasterplanOutcome(masterplan_file, None, "The evaluation process terminated unexpectedly."))
+            else:
+                on_result(MasterplanOutcome(masterplan_file, None, "The process it had to be forked from terminated unexpectedly.", not_run=True))
+
+        root.join()
+    finally:
+        _FORKED_STATE = None
+
+    return
+
+def combine_metrics(metrics_by_masterplan: Dict[str, MetricsT]) -> MetricsT:
+    """
+    One table per metric with all the masterplans, indexed by (masterplan, timestamp).
+    """
+    names = sorted(metrics_by_masterplan)
+    if not names:
+        return {}
+
+    return {
+        metric: pd.concat(
+            [metrics_by_masterplan[name][metric] for name in names],
+            keys=names,
+            names=['masterplan', 'timestamp']
+        )
+        for metric in metrics_by_masterplan[names[0]]
+    }
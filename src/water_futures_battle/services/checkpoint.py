@@ -0,0 +1,163 @@
+import importlib
+import os
+import pickle
+import sys
+import typing
+from pathlib import Path
+from typing import Any, Dict, Iterator, Set, Tuple, Union
+
+from ..core import Settings
+from ..core.base_model import BWFResult, RetentionPolicy
+from ..national_context import NationalContext
+from ..water_utilities import WaterUtility
+
+# Bump it when the content of the checkpoint changes meaning
+CHECKPOINT_FORMAT_VERSION = 4
+
+_PACKAGE = __name__.split('.')[0]
+
+# Class-level state injected by bwf_entity (see core/base_model/entities.py)
+_ENTITY_CLASS_VARIABLES = ('_dynamic_properties', '_results')
+
+def checkpoint_path(directory: Union[str, Path], year: int) -> Path:
+    return Path(directory) / f"checkpoint-{year}.pkl"
+
+def _is_class_var(annotation: Any) -> bool:
+    if isinstance(annotation, str):
+        return annotation.startswith(('ClassVar', 'typing.ClassVar'))
+    return typing.get_origin(annotation) is typing.ClassVar or annotation is typing.ClassVar
+
+def _stateful_classes() -> Iterator[type]:
+    """
+    The classes of the package that keep part of the system at class level:
+    the dynamic properties and results of the entities and the registries
+    declared as ClassVar (regions, decommissioned pipes and pumps, etc.).
+    """
+    for module_name, module in sorted(sys.modules.items()):
+        if module is None or not (module_name == _PACKAGE or module_name.startswith(_PACKAGE + '.')):
+            continue
+        for obj in vars(module).values():
+            if isinstance(obj, type) and obj.__module__ == module_name:
+                yield obj
+
+def _collect_class_state() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    class_state = {}
+    for cls in _stateful_classes():
+        annotations = cls.__dict__.get('__annotations__', {})
+        cls_state = {
+            name: value
+            for name, value in vars(cls).items()
+            if name in _ENTITY_CLASS_VARIABLES or _is_class_var(annotations.get(name))
+        }
+        if cls_state:
+            class_state[(cls.__module__, cls.__qualname__)] = cls_state
+
+    return class_state
+
+def _find_class(module_name: str, qualname: str) -> Any:
+    cls = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        cls = getattr(cls, part)
+    return cls
+
+def _restore_class_state(class_state: Dict[Tuple[str, str], Dict[str, Any]]) -> None:
+    for (module_name, qualname), cls_state in class_state.items():
+        cls = _find_class(module_name, qualname)
+        for name, value in cls_state.items():
+            setattr(cls, name, value)
+
+def _collect_results_retention() -> Dict[Tuple[str, str], Dict[str, RetentionPolicy]]:
+    return {
+        (cls.__module__, cls.__qualname__): {var: results.retention(var) for var in results.TRACKED_VARIABLES}
+        for cls in _stateful_classes()
+        if isinstance(results := vars(cls).get('_results'), BWFResult)
+    }
+
+def _apply_results_retention(retention: Dict[Tuple[str, str], Dict[str, RetentionPolicy]]) -> None:
+    for (module_name, qualname), policies in retention.items():
+        results = vars(_find_class(module_name, qualname)).get('_results')
+        if not isinstance(results, BWFResult):
+            continue
+        for var, policy in policies.items():
+            results.set_retention(var, policy)
+
+def save_checkpoint(
+        path: Union[str, Path],
+        year: int,
+        settings: Settings,
+        national_context: NationalContext,
+        water_utilities: Set[WaterUtility]
+    ) -> Path:
+    """
+    Save everything the evaluation needs to continue after `year`: the
+    national context, the water utilities (with their bonds), the class-level
+    dynamic properties, results and registries of the entities, and the state
+    of every random generator.
+
+    Everything is pickled at once, so that the objects shared between the
+    entities and the class registries are still shared when loaded.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    state = {
+        'format': CHECKPOINT_FORMAT_VERSION,
+        'year': year,
+        'start_year': settings.start_year,
+        'end_year': settings.end_year,
+        'seed': settings._rnd_manager.master_seed,
+        'rng_mode': settings.rng_mode,
+        'rng_states': {
+            name: generator.bit_generator.state
+            for name, generator in settings._rnd_manager.generators.items()
+        },
+        'national_context': national_context,
+        'water_utilities': water_utilities,
+        'class_state': _collect_class_state(),
+    }
+
+    # Write and then move, so that an interrupted run doesn't leave a broken checkpoint
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+    return path
+
+def load_checkpoint(
+        path: Union[str, Path],
+        settings: Settings
+    ) -> Tuple[int, NationalContext, Set[WaterUtility]]:
+    """
+    Restore the state saved by :func:`save_checkpoint`. The class registries
+    are replaced and the random generators of `settings` are brought to the
+    state they had when the checkpoint was written.
+    The results keep the retention policies configured in this process (see
+    BWFResult.set_retention), not the ones of the run that was checkpointed.
+
+    Returns
+    -------
+    Tuple[int, NationalContext, Set[WaterUtility]]
+        The last simulated year, the national context and the water utilities.
+    """
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+
+    if state.get('format') != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f"Checkpoint {path} has format {state.get('format')}, "
+                         f"expected {CHECKPOINT_FORMAT_VERSION}.")
+
+    expected = (settings.start_year, settings.end_year, settings._rnd_manager.master_seed, settings.rng_mode)
+    found = (state['start_year'], state['end_year'], state['seed'], state['rng_mode'])
+    if found != expected:
+        raise ValueError(f"Checkpoint {path} was written for (start year, end year, seed, rng mode) {found}, "
+                         f"but the settings are {expected}.")
+
+    retention = _collect_results_retention()
+    _restore_class_state(state['class_state'])
+    _apply_results_retention(retention)
+
+    for name, rng_state in state['rng_states'].items():
+        settings._rnd_manager.get(module_name=name).bit_generator.state = rng_state
+
+    return state['year'], state['national_context'], state['water_utilities']
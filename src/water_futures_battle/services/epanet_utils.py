@@ -1,10 +1,12 @@
 from collections import deque
 from enum import IntEnum
 import os
+import time
 from pathlib import Path
 from typing import Dict, List, NamedTuple, Optional, Set, Tuple
 
 import itertools
+import epanet
 from epanet_plus import EPyT, EpanetConstants
 from geographiclib.geodesic import Geodesic as Geo
 import numpy as np
@@ -17,12 +19,18 @@ from ..sources import WaterSource
 from ..connections.entities import PeerConnection, SupplyConnection
 from ..pumps.entities import Pump, PumpOption
 from ..pumping_stations.entities import PumpingStation
-from ..pumping_stations.services import get_lowest_energy_pumping_station_setup, NoValidPumpConfigurationError
+from ..pumping_stations.services import (
+    get_lowest_energy_pumping_station_setup,
+    get_lowest_energy_pumping_station_setups,
+    NoValidPumpConfigurationError
+)
 from ..energy.entities import ElectricityPricePattern
 from ..water_utilities import WaterUtility
 from ..national_context import NationalContext
 from ..national_context.entities import WaterUtilitiesCluster
 
+from .hydraulics_telemetry import HourStatus, HydraulicsTelemetry
+
 class PumpingStationRepresentation(IntEnum):
     FREE_PARALLEL_PUMPS = 1
     CHOCKED_PARALLEL_PUMPS = 2
@@ -38,6 +46,9 @@ OUTLET_SUFFIX = 'outlet'
 CV_SUFFIX = 'CV'
 FCV_SUFFIX = 'cap'
 
+# EPANET warnings that don't stop the simulation of an hour (see EPANET warning codes)
+IGNORED_WARNING_CODES = [2, 4, 5, 6]
+
 from importlib.resources import files
 
 def load_target_heads() -> pd.DataFrame:
@@ -73,33 +84,22 @@ def get_source_head(pstations_target_heads: pd.DataFrame, source: WaterSource, y
         return 50.0
     return earlier.iloc[-1]
 
-def build_epanet_network(
-    year: int,
-    water_utilities: Set[WaterUtility],
-    cross_utility_connections: Set[PeerConnection],
-    pumping_station_representation: int,
-    epyt_kwargs: Optional[Dict] = None,
-) -> EPyT:
-
-    if epyt_kwargs is None:
-        epyt_kwargs = {}
-
-    assert pumping_station_representation in PumpingStationRepresentation
-
-    ts = timestampify(year, errors='raise')
-
-    net = EPyT(use_project=True, **epyt_kwargs)
-
-    net.setflowunits(EpanetConstants.EN_CMH)
-    net.setoption(EpanetConstants.EN_HEADLOSSFORM, EpanetConstants.EN_DW)
-    net.set_hydraulic_time_step(60*60)
-    net.settimeparam(EpanetConstants.EN_PATTERNSTEP, 60*60)
-    net.setoption(EpanetConstants.EN_ACCURACY, value=0.01)
-    net.setoption(EpanetConstants.EN_DAMPLIMIT, value=0.5)
-    net.setoption(EpanetConstants.EN_CHECKFREQ, value=10)
-    net.setoption(EpanetConstants.EN_TRIALS, value=300)
-    net.set_demand_model(model_type=EpanetConstants.EN_PDA, pmin=15, preq=30, pexp=0.5)
+class _NetworkElements(NamedTuple):
+    municipalities: Set[Municipality]
+    peer_connections: Set[PeerConnection]
+    pumping_stations_map: Dict[WaterSource, Tuple[PumpingStation, SupplyConnection]]
+    pumps: Set[Pump]
+    pump_options: Set[PumpOption]
 
+def _collect_network_elements(
+        year: int,
+        water_utilities: Set[WaterUtility],
+        cross_utility_connections: Set[PeerConnection]
+    ) -> _NetworkElements:
+    """
+    Find the entities that are part of the hydraulic model of these water
+    utilities in a given year.
+    """
     # Find the municipalities in that year
     municipalities = set().union(*[itertools.chain(utility.active_municipalities(year)) for utility in water_utilities])
 
@@ -112,14 +112,12 @@ def build_epanet_network(
     peer_connections = peer_connections.union(cross_utility_connections)
 
     # Find the sources in that year
-    sources: Set[WaterSource] = set()
     pump_options: Set[PumpOption] = set()
     pumping_stations_map: Dict[WaterSource, Tuple[PumpingStation, SupplyConnection]] = {}
     pumps: Set[Pump] = set()
     for utility in water_utilities:
         for ws, (ps, con) in utility.m_supplies.items():
             if ws.is_active(year):
-                sources.add(ws)
                 if ps.has_active_pumps(year):
                     pumping_stations_map[ws] = (ps, con)
 
@@ -127,6 +125,57 @@ def build_epanet_network(
                         pumps.add(p)
                         pump_options.add(p._pump_option)
 
+    return _NetworkElements(
+        municipalities=municipalities,
+        peer_connections=peer_connections,
+        pumping_stations_map=pumping_stations_map,
+        pumps=pumps,
+        pump_options=pump_options
+    )
+
+def set_hydraulic_options(net: EPyT) -> EPyT:
+    """
+    Units, head loss formula, time steps, solver and demand model shared by
+    all the networks of the battle.
+    """
+    net.setflowunits(EpanetConstants.EN_CMH)
+    net.setoption(EpanetConstants.EN_HEADLOSSFORM, EpanetConstants.EN_DW)
+    net.set_hydraulic_time_step(60*60)
+    net.settimeparam(EpanetConstants.EN_PATTERNSTEP, 60*60)
+    net.setoption(EpanetConstants.EN_ACCURACY, value=0.01)
+    net.setoption(EpanetConstants.EN_DAMPLIMIT, value=0.5)
+    net.setoption(EpanetConstants.EN_CHECKFREQ, value=10)
+    net.setoption(EpanetConstants.EN_TRIALS, value=300)
+    net.set_demand_model(model_type=EpanetConstants.EN_PDA, pmin=15, preq=30, pexp=0.5)
+
+    return net
+
+def build_epanet_network(
+    year: int,
+    water_utilities: Set[WaterUtility],
+    cross_utility_connections: Set[PeerConnection],
+    pumping_station_representation: int,
+    epyt_kwargs: Optional[Dict] = None,
+) -> EPyT:
+
+    if epyt_kwargs is None:
+        epyt_kwargs = {}
+
+    assert pumping_station_representation in PumpingStationRepresentation
+
+    ts = timestampify(year, errors='raise')
+
+    net = EPyT(use_project=True, **epyt_kwargs)
+    set_hydraulic_options(net)
+
+    (
+        municipalities,
+        peer_connections,
+        pumping_stations_map,
+        pumps,
+        pump_options
+    ) = _collect_network_elements(year, water_utilities, cross_utility_connections)
+
     # We start adding the helpers to the network
     # ---- Curves
     # -------- Pumps in model (free or chocked)
@@ -468,6 +517,264 @@ def build_epanet_network(
 
     return net
 
+class NetworkLayout(NamedTuple):
+    """
+    What the network of a cluster looks like in a given year.
+
+    `topology` describes everything that can only be changed by rebuilding
+    the network (nodes, links endpoints, curves, pumps per station), while
+    the other fields are the properties that can be patched in place.
+    """
+    topology: Tuple
+    pipes: Dict[str, Tuple[str, float, float, float, float]] # connection id -> (pipe id, length, diameter, roughness, minor loss)
+    supply_connections: Dict[str, str] # source id -> connection id
+    pumps: Dict[str, Tuple[str, ...]] # pumping station id -> active pumps id
+    reservoirs: Dict[str, float] # source id -> elevation
+
+def compute_network_layout(
+        year: int,
+        water_utilities: Set[WaterUtility],
+        cross_utility_connections: Set[PeerConnection],
+        pumping_station_representation: int
+    ) -> NetworkLayout:
+    """
+    Get the layout of the network that :func:`build_epanet_network` would build
+    with the same arguments.
+    """
+    ts = timestampify(year, errors='raise')
+
+    elements = _collect_network_elements(year, water_utilities, cross_utility_connections)
+
+    sources_topology = []
+    pipes: Dict[str, Tuple[str, float, float, float, float]] = {}
+    supply_connections: Dict[str, str] = {}
+    pumps: Dict[str, Tuple[str, ...]] = {}
+    reservoirs: Dict[str, float] = {}
+    for source, (pumping_station, con) in sorted(elements.pumping_stations_map.items(), key= lambda x: x[0].bwf_id):
+        # Pumps are ranked by id, which is also their installation order
+        active_pumps = sorted(pumping_station.active_pumps(when=year).values(), key= lambda p: p.bwf_id)
+
+        sources_topology.append((
+            source.bwf_id,
+            pumping_station.bwf_id,
+            con.bwf_id,
+            con.to_node.effective_cbs_id(year),
+            tuple(p._pump_option.bwf_id for p in active_pumps)
+        ))
+
+        pipe = con.active_pipe(year)
+        assert pipe is not None
+        pipes[con.bwf_id] = (
+            pipe.bwf_id,
+            con.distance,
+            pipe._pipe_option.diameter,
+            pipe.friction_factor.loc[ts],
+            con.minor_loss_coeff
+        )
+        supply_connections[source.bwf_id] = con.bwf_id
+        pumps[pumping_station.bwf_id] = tuple(p.bwf_id for p in active_pumps)
+
+        if (
+            pumping_station_representation == PumpingStationRepresentation.FIXED_HEAD or 
+            pumping_station_representation == PumpingStationRepresentation.CHOCKED_FIXED_HEAD
+        ):
+            reservoirs[source.bwf_id] = source.elevation + get_source_head(pstations_target_heads, source, year)
+        else:
+            reservoirs[source.bwf_id] = source.elevation
+
+    peers_topology = []
+    for con in sorted(elements.peer_connections, key= lambda c: c.bwf_id):
+        if not con.has_active_pipe(year):
+            continue
+
+        peers_topology.append((
+            con.bwf_id,
+            con.from_node.effective_cbs_id(year),
+            con.to_node.effective_cbs_id(year)
+        ))
+
+        pipe = con.active_pipe(year)
+        assert pipe is not None
+        pipes[con.bwf_id] = (
+            pipe.bwf_id,
+            con.distance,
+            pipe._pipe_option.diameter,
+            pipe.friction_factor.loc[ts],
+            con.minor_loss_coeff
+        )
+
+    topology = (
+        int(pumping_station_representation),
+        tuple(sorted(m.cbs_id for m in elements.municipalities)),
+        tuple(sorted(po.bwf_id for po in elements.pump_options)),
+        tuple(sources_topology),
+        tuple(peers_topology)
+    )
+
+    return NetworkLayout(
+        topology=topology,
+        pipes=pipes,
+        supply_connections=supply_connections,
+        pumps=pumps,
+        reservoirs=reservoirs
+    )
+
+def patch_epanet_network(
+        net: EPyT,
+        old_layout: NetworkLayout,
+        new_layout: NetworkLayout
+    ) -> EPyT:
+    """
+    Bring a network built with `old_layout` to `new_layout` in place.
+    The two layouts must have the same topology.
+    """
+    assert old_layout.topology == new_layout.topology
+
+    # ---- Pipes: replaced pipes keep the connection endpoints but change name
+    # and maybe option, all pipes age and change their friction factor
+    for con_id, new_pipe in new_layout.pipes.items():
+        old_pipe = old_layout.pipes[con_id]
+        if old_pipe == new_pipe:
+            continue
+
+        elem_idx = net.getlinkindex(old_pipe[0])
+        if old_pipe[0] != new_pipe[0]:
+            net.setlinkid(elem_idx, new_pipe[0])
+
+        pipe_id, length, diam, rough, mloss = new_pipe
+        net.setpipedata(index=elem_idx, length=length, diam=diam, rough=rough, mloss=mloss)
+
+    # The helper links of the sources have the same diameter of the supply pipe
+    for source_id, con_id in new_layout.supply_connections.items():
+        old_diam = old_layout.pipes[con_id][2]
+        new_diam = new_layout.pipes[con_id][2]
+        if old_diam == new_diam:
+            continue
+
+        elem_idx = net.getlinkindex(source_id+'-'+CV_SUFFIX)
+        net.setpipedata(index=elem_idx, length=1, diam=new_diam, rough=0.0001, mloss=0)
+
+        if source_id+'-'+FCV_SUFFIX in net.get_all_valves_id():
+            elem_idx = net.getlinkindex(source_id+'-'+FCV_SUFFIX)
+            net.setlinkvalue(elem_idx, EpanetConstants.EN_DIAMETER, value=new_diam)
+
+    # ---- Pumps: a failed pump is replaced by a new one with the same option.
+    # Pump links and patterns (when present) are renamed by rank. We go through
+    # temporary names as a new id may be the old id of another pump of the station.
+    network_pumps = set(net.get_all_pumps_id())
+    network_patterns = set(net.get_all_patterns_id())
+    renamings = [
+        (old_id, new_id)
+        for pstat_id, new_pumps in new_layout.pumps.items()
+        for old_id, new_id in zip(old_layout.pumps[pstat_id], new_pumps)
+        if old_id != new_id
+    ]
+    for step in range(2):
+        for i, (old_id, new_id) in enumerate(renamings):
+            from_id, to_id = (old_id, f"~{i}") if step == 0 else (f"~{i}", new_id)
+
+            if old_id in network_pumps:
+                net.setlinkid(net.getlinkindex(from_id), to_id)
+            if old_id in network_patterns:
+                net.setpatternid(net.getpatternindex(from_id), to_id)
+
+    # ---- Reservoirs (the head of the fixed head representations changes over time)
+    for source_id, elevation in new_layout.reservoirs.items():
+        if old_layout.reservoirs[source_id] == elevation:
+            continue
+
+        elem_idx = net.getnodeindex(source_id)
+        net.setnodevalue(elem_idx, EpanetConstants.EN_ELEVATION, value=elevation)
+
+    return net
+
+class EPANETNetworkCache:
+    """
+    Keeps the EPANET network of each cluster alive across the years.
+
+    Networks are identified by the water utilities in the cluster and by the
+    representation of the pumping stations. When the network of a cluster
+    is requested again, we compare its layout with the one of the cached network:
+    if the topology is the same, we only patch pipes, pumps and reservoirs, 
+    otherwise (e.g., municipalities merged, sources opened or closed, new 
+    connections) we rebuild it from scratch.
+    """
+    def __init__(self):
+        self._networks: Dict[Tuple, Tuple[EPyT, NetworkLayout, int]] = {}
+
+    @staticmethod
+    def key_of(
+            water_utilities: Set[WaterUtility],
+            pumping_station_representation: int
+        ) -> Tuple:
+        return (
+            tuple(sorted(wu.bwf_id for wu in water_utilities)),
+            int(pumping_station_representation)
+        )
+
+    def get(
+            self,
+            year: int,
+            water_utilities: Set[WaterUtility],
+            cross_utility_connections: Set[PeerConnection],
+            pumping_station_representation: int,
+            epyt_kwargs: Optional[Dict] = None,
+        ) -> EPyT:
+        """
+        Same as :func:`build_epanet_network`, but the network is owned by the
+        cache: do not close it, use :meth:`release` instead.
+        """
+        key = self.key_of(water_utilities, pumping_station_representation)
+        layout = compute_network_layout(
+            year=year,
+            water_utilities=water_utilities,
+            cross_utility_connections=cross_utility_connections,
+            pumping_station_representation=pumping_station_representation
+        )
+
+        net = None
+        if key in self._networks:
+            cached_net, cached_layout, _ = self._networks.pop(key)
+
+            if cached_layout.topology == layout.topology:
+                try:
+                    net = patch_epanet_network(cached_net, cached_layout, layout)
+                except Exception:
+                    # Something went wrong, better start from a clean network
+                    net = None
+            
+            if net is None:
+                cached_net.close()
+
+        if net is None:
+            net = build_epanet_network(
+                year=year,
+                water_utilities=water_utilities,
+                cross_utility_connections=cross_utility_connections,
+                pumping_station_representation=pumping_station_representation,
+                epyt_kwargs=epyt_kwargs
+            )
+
+        self._networks[key] = (net, layout, year)
+
+        return net
+
+    def release(self, unused_since: Optional[int] = None) -> None:
+        """
+        Close the cached networks. If `unused_since` is passed, only the networks
+        that have not been requested in that year or later are closed (e.g., the
+        clusters that have been merged).
+        """
+        for key in list(self._networks.keys()):
+            net, _, last_used = self._networks[key]
+            if unused_since is None or last_used < unused_since:
+                del self._networks[key]
+                net.close()
+
+        return
+
+network_cache = EPANETNetworkCache()
+
 def apply_demand_patterns(
         net: EPyT,
         demands: pd.DataFrame,
@@ -613,6 +920,18 @@ def apply_sources_remaining_capacity_to_fcvs(
     
     return net
 
+def run_hydraulic_step(net: EPyT) -> int:
+    """
+    Same as net.runH, but returns the EPANET code of this step: 0, or one of
+    the IGNORED_WARNING_CODES. The other codes raise. The wrapper keeps the
+    last non-zero code of any call, which can't tell the warnings of this
+    step from the ones of the previous steps.
+    """
+    errcode, _ = epanet.EN_runH(net.ph)
+    if errcode != 0 and errcode not in IGNORED_WARNING_CODES:
+        raise RuntimeError(net.geterror(errcode))
+    return errcode
+
 class BWFHydraulicSimReults(NamedTuple):
     undelivered_demands: pd.DataFrame
     pumps_energy_consumption: pd.DataFrame
@@ -639,18 +958,21 @@ def run_cluster_hydraulics(
         national_context: NationalContext,
         cluster: WaterUtilitiesCluster, 
         year: int,
-        settings: Settings
-    ) -> BWFHydraulicSimReults:
+        settings: Settings,
+        use_network_cache: bool = True
+    ) -> Tuple[BWFHydraulicSimReults, HydraulicsTelemetry]:
 
     PUMPING_STATION_REPRESENTATION = PumpingStationRepresentation.FREE_PARALLEL_PUMPS
-    cluster.network = build_epanet_network(
+    # When we simulate the clusters in this process, we can reuse (and patch) 
+    # the network of the previous year.
+    build_network = network_cache.get if use_network_cache else build_epanet_network
+    cluster.network = build_network(
         year=year,
         water_utilities=cluster.water_utilities,
         cross_utility_connections=cluster.cross_utility_connections,
         pumping_station_representation=PUMPING_STATION_REPRESENTATION,
         epyt_kwargs={
-            # see EPANET warning codes
-            "ignore_error_codes": [2,4,5,6]
+            "ignore_error_codes": IGNORED_WARNING_CODES
         }
     )
 
@@ -854,10 +1176,11 @@ def run_cluster_hydraulics(
     )
     sources_target_head_peak_discharge = sources_peak_discharge * sources_target_head_max_speed
    
-    # Create a weeks "full on" pumping station pattern for each pumping station
+    # Create a weeks (or a year, when the session is continuous) "full on"
+    # pumping station pattern for each pumping station
     pstations_pattern = pd.DataFrame({
         pstation.bwf_id: np.full(
-            shape=(24*7,),
+            shape=(len(year_timesteps) if settings.hydraulics_continuous else 24*7,),
             fill_value=len(pstation.active_pumps(when=year)) + 1.0
         )
         for pstation in cluster.pumping_stations
@@ -899,6 +1222,13 @@ def run_cluster_hydraulics(
         dtype=np.float32
     )
 
+    telemetry = HydraulicsTelemetry.empty(
+        cluster=cluster.filename,
+        year=year,
+        engine='epanet',
+        n_hours=len(year_timesteps)
+    )
+
     last_working_tidx = -1
     def advance_sim(sidx, eidx):
 
@@ -980,25 +1310,25 @@ def run_cluster_hydraulics(
                     dem_to_cap = municipalities_dem[tidx, :].sum() / sources_peak_discharge.sum()
                     sources_target_flow = sources_current_capacity * dem_to_cap
 
-                    pstation_current_setup = {}
-                    for i, source in enumerate(sources_id):
-                        n_avail = sources_n_avail_pumps[i]
-
-                        try:
-                            n_pumps, pspeed, penergy, peff = get_lowest_energy_pumping_station_setup(
-                                target_head=sources_target_head[i],
-                                target_flow=sources_target_flow[i],
-                                n_available_pumps=sources_n_avail_pumps[i],
-                                pump_option=sources_pump_options[i],
-                                speed_ratio_bounds=(0.5,1.00),
-                                pump_curve_coeffs=tuple(sources_pc_coeff[i, :])
-                            )
-                        except Exception:
-                            # try maxing out
-                            n_pumps = n_avail
-                            pspeed = 1.0
+                    # Solve all the pumping stations of the cluster at once
+                    setup_start = time.perf_counter()
+                    setups = get_lowest_energy_pumping_station_setups(
+                        target_heads=sources_target_head,
+                        target_flows=sources_target_flow,
+                        n_available_pumps=sources_n_avail_pumps,
+                        pump_options=sources_pump_options,
+                        speed_ratio_bounds=(0.5,1.00),
+                        pump_curve_coeffs=sources_pc_coeff
+                    )
+                    # where it is not possible, try maxing out
+                    n_pumps = np.where(setups.valid, setups.n_pumps, sources_n_avail_pumps)
+                    pspeed = np.where(setups.valid, setups.speeds, 1.0)
+                    telemetry.setup_time[tidx] = time.perf_counter() - setup_start
 
-                        pstation_current_setup[pstations_id[i]] = n_pumps + pspeed
+                    pstation_current_setup = {
+                        pstations_id[i]: n_pumps[i] + pspeed[i]
+                        for i in range(len(sources_id))
+                    }
 
                     apply_pumping_stations_pattern_at(
                         net=net,
@@ -1008,7 +1338,9 @@ def run_cluster_hydraulics(
                     )
 
                 # Run
-                net.runH()
+                solve_start = time.perf_counter()
+                telemetry.warning_code[tidx] = run_hydraulic_step(net)
+                telemetry.solve_time[tidx] = time.perf_counter() - solve_start
 
                 d = np.array(net.getnodevalues(EpanetConstants.EN_DEMAND), dtype=np.float32)
                 f = np.array(net.getlinkvalues(EpanetConstants.EN_FLOW), dtype=np.float32)
@@ -1067,6 +1399,7 @@ def run_cluster_hydraulics(
                     consumptions_h = np.zeros(shape=(len(municipalities_id),), dtype=np.float32)
                     exchanges_h = np.zeros(shape=(len(cross_wu_pipes_id),), dtype=np.float32)
                     energies_h = np.zeros(shape=(len(pumps_id),), dtype=np.float32)
+                    telemetry.status[tidx] = HourStatus.FULL_ERROR
                     net_logger.error(f"BWF Simulation hour: {ts} | FULL_ERROR | {e}")
                 
                 else:
@@ -1088,6 +1421,7 @@ def run_cluster_hydraulics(
                     energies_h = demand_ratio * pumps_energy_usage[last_working_tidx, :] 
 
                     # Log again but not a full error
+                    telemetry.status[tidx] = HourStatus.APPROXIMATED
                     net_logger.error(f"BWF Simulation hour: {ts} | APPROXIMATED HYDRAULICS because: {e}")
 
             # Assign the results
@@ -1107,19 +1441,26 @@ def run_cluster_hydraulics(
         return
         # End of sim
 
-    # First day of the year, is a holiday, we take the sunday pattern for pumps
-    start_idx = 0
-    end_idx = 24
-    advance_sim(start_idx, end_idx)
+    if settings.hydraulics_continuous:
+        # One session and year-long patterns: the solver is initialised once
+        # and every hour starts from the flows of the previous one
+        advance_sim(0, len(year_timesteps))
 
-    # All other weeks, contigously
-    for w in range(0, 52):
-        start_idx = 24 + w*7*24
-        end_idx = 24 + (w+1)*7*24
+    else:
+        # First day of the year, is a holiday, we take the sunday pattern for pumps
+        start_idx = 0
+        end_idx = 24
         advance_sim(start_idx, end_idx)
 
-    # Done with the simulations
-    cluster.network.close()
+        # All other weeks, contigously
+        for w in range(0, 52):
+            start_idx = 24 + w*7*24
+            end_idx = 24 + (w+1)*7*24
+            advance_sim(start_idx, end_idx)
+
+    # Done with the simulations, cached networks are closed by the cache
+    if not use_network_cache:
+        cluster.network.close()
 
     # Fix where we don't have values
     municipalities_consumptions = np.nan_to_num(
@@ -1147,7 +1488,7 @@ def run_cluster_hydraulics(
         a_max=None
     )
 
-    return BWFHydraulicSimReults(
+    sim_results = BWFHydraulicSimReults(
         undelivered_demands=pd.DataFrame(
             data=municipalities_udem,
             index=year_timesteps,
@@ -1169,3 +1510,5 @@ def run_cluster_hydraulics(
             columns=sources_id
         )
     )
+
+    return sim_results, telemetry
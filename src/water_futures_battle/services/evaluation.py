@@ -1,18 +1,24 @@
-from typing import Dict, Set, Tuple
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple, Union
 import os
 import tempfile
 
+import numpy as np
 import pandas as pd
 from rich.progress import Progress, TaskID
 import threading
 from joblib import Parallel, delayed
 
 from ..core import Settings, get_snapshot
+from ..core.profiler import profiler
+from ..core.views import state_tables
 from ..core.utility import timestampify
 from ..jurisdictions import Municipality
 from ..economy.services import raise_amount
 from ..water_utilities import WaterUtility
+from ..water_utilities.entities import water_exchanges
 from ..national_context import NationalContext
+from ..national_context.entities import WaterUtilitiesCluster
 from ..masterplan import Masterplan
 
 from ..water_utilities import services as wu_actions
@@ -20,19 +26,41 @@ from ..national_context import services as nat_actions
 from ..energy.services import get_solar_radiation_of_year
 
 from .metrics import MetricsT, compute_metrics
-from .epanet_utils import run_cluster_hydraulics
+from .epanet_utils import BWFHydraulicSimReults, network_cache
+from .hydraulics_telemetry import HydraulicsTelemetry, HydraulicsTelemetryLog
+from .hydraulics_pool import IS_PROCESS_BACKEND_AVAILABLE, run_clusters_in_processes
+from .tree_hydraulics import simulate_cluster_hydraulics
+from .checkpoint import checkpoint_path, load_checkpoint, save_checkpoint
 
 def run_eval(
         settings: Settings,
         national_context: NationalContext,
         water_utilities: Set[WaterUtility],
-        masterplan: Masterplan
+        masterplan: Masterplan,
+        checkpoint_dir: Optional[Union[str, Path]] = None,
+        resume_from: Optional[Union[str, Path]] = None
     ) -> Tuple[
         NationalContext,
         Set[WaterUtility],
         MetricsT
     ]:
 
+    # When resuming, the system received in input is replaced by the one saved
+    # at the end of the last simulated year (see services/checkpoint.py)
+    years_to_simulate = settings.years_to_simulate
+    if resume_from is not None:
+        last_year, national_context, water_utilities = load_checkpoint(
+            path=resume_from,
+            settings=settings
+        )
+        years_to_simulate = [year for year in years_to_simulate if year > last_year]
+    else:
+        HydraulicsTelemetryLog.clear()
+
+    # The state tables and the water exchanges of a previous evaluation hold on to its results
+    state_tables.clear()
+    water_exchanges.clear()
+
     # We evaluate the system received in input one year at the time.
     # We use a progress bar to:
     # - tracking the evaluation across years,
@@ -40,202 +68,251 @@ def run_eval(
     # - realising the uncertainties
     # - simulating the hydraulic results across the utilities
     with Progress() as progress:
-        task_years = progress.add_task("[green]Evaluating the system across the years", total=settings.n_years_to_simulate)
+        task_years = progress.add_task("[green]Evaluating the system across the years", total=settings.n_years_to_simulate,
+                                       completed=settings.n_years_to_simulate-len(years_to_simulate))
         task_utilities = progress.add_task("[cyan]  Applying policies and working on intervention", total=len(water_utilities)+1)
         task_uncertainties = progress.add_task("[cyan]  Realising uncertainties", total=len(water_utilities)+1)
         task_simu = progress.add_task("[cyan]  Extracting the hydraulic results", total=len(water_utilities))
 
-        for year in settings.years_to_simulate:
-            progress.reset(task_utilities)
-            progress.reset(task_uncertainties)
-            progress.reset(task_simu)
-
-            # Retrieve and apply the national policies:
-            # - budget allocation
-            national_policies = masterplan.national_policies(year=year)
-
-            nat_actions.share_yearly_budget(
-                budget=settings.national_investment_budget,
-                national_context=national_context,
+        for year in years_to_simulate:
+            evaluate_year(
                 year=year,
-                policy_desc=national_policies['budget_allocation']
-            )
-
-            # Retrieve and apply the national interventions:
-            # - pipe installation
-            national_interventions = masterplan.national_interventions(year=year)
-
-            wus_national_capex, wus_national_ghg = nat_actions.work_on_connections(
+                settings=settings,
                 national_context=national_context,
-                year=year,
-                intervention_desc=national_interventions['install_pipe'],
-                pipe_options=national_context.pipe_options,
-                settings=settings
+                water_utilities=water_utilities,
+                masterplan=masterplan,
+                progress=progress,
+                task_utilities=task_utilities,
+                task_uncertainties=task_uncertainties,
+                task_simu=task_simu
             )
 
-            # We completed national interventions, we can move to by utility actions
-            progress.update(task_utilities, advance=1)
-            
-            for water_utility in sorted(water_utilities, key=lambda x: x.bwf_id):
-
-                # Retrieve and apply the utility's policies:
-                # - nrw mitigation
-                # - water pricing
-                # - bonds issuance
-                wutil_policies = masterplan.water_utility_policies(
-                    water_utility=water_utility.bwf_id,
-                    year=year
-                )
-
-                wu_actions.apply_nrw_interventions(
-                    water_utility=water_utility,
+            if checkpoint_dir is not None:
+                save_checkpoint(
+                    path=checkpoint_path(checkpoint_dir, year),
                     year=year,
-                    policy_desc=wutil_policies['nrw_mitigation'],
                     settings=settings,
-                    nrw_settings=national_context.nrw_settings,
-                    nrw_info_db=national_context.nrw_model_db
+                    national_context=national_context,
+                    water_utilities=water_utilities
                 )
 
-                wu_actions.apply_water_pricing_adjustments(
-                    water_utility=water_utility,
-                    year=year,
-                    policy_desc=wutil_policies['pricing_adjustment'],
-                    settings=settings,
-                    inflation=national_context.inflation
-                )
+            # end year for loop
+            progress.update(task_years, advance=1)
 
-                wu_actions.apply_bond_to_debt_ratio(
-                    water_utility=water_utility,
-                    year=year,
-                    policy_desc=wutil_policies['bond_ratio']
-                )
+    # The networks are not needed anymore
+    network_cache.release()
+        
+    # end of stage loop, we can calculate all the metrics
+    with profiler.phase('metrics'):
+        metrics = compute_metrics(settings, national_context, water_utilities)
 
-                # Retrieve and apply the utility's interventions:
-                # - opening & closing new sources
-                # - installing/replacing pipes
-                # - installing/replacing pumps
-                # - installing solar
-                # Each of these returns its capex and we save only the cumulative value
-                wutil_interven = masterplan.water_utility_interventions(
-                    water_utility=water_utility.bwf_id,
-                    year=year
-                )
+    return (
+        national_context,
+        water_utilities,
+        metrics
+    )
 
-                sources_capex, sources_ghg = wu_actions.work_on_sources(
-                    water_utility=water_utility,
-                    year=year,
-                    interventions_open_desc=wutil_interven['open_source'],
-                    interventions_close_desc=wutil_interven['close_source'],
-                    pump_options=national_context.pump_options,
-                    pipe_options=national_context.pipe_options,
-                    settings=settings
-                )
 
-                pipes_capex, pipes_ghg = wu_actions.work_on_connections(
-                    water_utility=water_utility,
-                    year=year,
-                    interventions_desc=wutil_interven['install_pipe'],
-                    pipe_options=national_context.pipe_options,
-                    settings=settings
-                )
+def evaluate_year(
+        year: int,
+        settings: Settings,
+        national_context: NationalContext,
+        water_utilities: Set[WaterUtility],
+        masterplan: Masterplan,
+        progress: Progress,
+        task_utilities: TaskID,
+        task_uncertainties: TaskID,
+        task_simu: TaskID
+    ) -> None:
+    """
+    Apply the decisions of the masterplan for `year` and simulate it, up to
+    the update of the financial balances.
+    """
+    progress.reset(task_utilities)
+    progress.reset(task_uncertainties)
+    progress.reset(task_simu)
 
-                pumps_capex, pumps_ghg = wu_actions.work_on_pumps(
-                    water_utility=water_utility,
-                    year=year,
-                    interventions_desc=wutil_interven['install_pumps'],
-                    pump_options=national_context.pump_options,
-                    settings=settings
-                )
+    # Retrieve and apply the national policies:
+    # - budget allocation
+    national_policies = masterplan.national_policies(year=year)
 
-                solar_capex, solar_ghg = wu_actions.work_on_solar_farms(
-                    water_utility=water_utility,
-                    year=year,
-                    interventions_desc=wutil_interven['install_solar'],
-                    settings=settings
-                )
+    with profiler.phase('budget_sharing', year):
+        nat_actions.share_yearly_budget(
+            budget=settings.national_investment_budget,
+            national_context=national_context,
+            year=year,
+            policy_desc=national_policies['budget_allocation']
+        )
 
-                wu_capex = (
-                    sources_capex +
-                    pipes_capex +
-                    pumps_capex +
-                    solar_capex +
-                    wus_national_capex[water_utility.bwf_id]
-                )
-                water_utility.track_capex(when=year, value=wu_capex)
-
-                wu_ghg = (
-                    sources_ghg +
-                    pipes_ghg +
-                    pumps_ghg +
-                    solar_ghg +
-                    wus_national_ghg[water_utility.bwf_id]
-                )
-                water_utility.track_embodied_emissions(when=year, value=wu_ghg)
+    # Retrieve and apply the national interventions:
+    # - pipe installation
+    national_interventions = masterplan.national_interventions(year=year)
+
+    with profiler.phase('national_interventions', year):
+        wus_national_capex, wus_national_ghg = nat_actions.work_on_connections(
+            national_context=national_context,
+            year=year,
+            intervention_desc=national_interventions['install_pipe'],
+            pipe_options=national_context.pipe_options,
+            settings=settings
+        )
+
+    # We completed national interventions, we can move to by utility actions
+    progress.update(task_utilities, advance=1)
 
-                # end water utilities for loop
-                progress.update(task_utilities, advance=1)
-                
-            # compute the missing dependent dynamic properties (demand, etc)
-            realise_uncertainties(
+    for water_utility in sorted(water_utilities, key=lambda x: x.bwf_id):
+
+        with profiler.phase('utility_levers', year, label=water_utility.bwf_id):
+            # Retrieve and apply the utility's policies:
+            # - nrw mitigation
+            # - water pricing
+            # - bonds issuance
+            wutil_policies = masterplan.water_utility_policies(
+                water_utility=water_utility.bwf_id,
+                year=year
+            )
+
+            wu_actions.apply_nrw_interventions(
+                water_utility=water_utility,
                 year=year,
-                national_context=national_context,
-                water_utilities=water_utilities,
+                policy_desc=wutil_policies['nrw_mitigation'],
                 settings=settings,
-                progress=progress,
-                task_uncertainties=task_uncertainties
+                nrw_settings=national_context.nrw_settings,
+                nrw_info_db=national_context.nrw_model_db
             )
 
-            run_hydraulic_simulations(
+            wu_actions.apply_water_pricing_adjustments(
+                water_utility=water_utility,
                 year=year,
-                national_context=national_context,
-                water_utilities=water_utilities,
+                policy_desc=wutil_policies['pricing_adjustment'],
                 settings=settings,
-                progress=progress,
-                task_simu=task_simu
+                inflation=national_context.inflation
             )
-            
-            # Update endogenous dynamic properties (inflation, electricity market, components costs)
-            # Unless we reached the end and therefore we would need future values
-            # for next year (for example inflation or which municipalities close in 2025)
-            if not year == settings.years_to_simulate[-1]:
-                escalate_costs(
-                    year=year,
-                    national_context=national_context,
-                    water_utilities=water_utilities
-                )
-            
-                age_water_utilities(
-                    year=year,
-                    national_context=national_context,
-                    water_utilities=water_utilities,
-                    settings=settings
-                )
 
-                age_national_context_assets(
-                    year=year,
-                    national_context=national_context,
-                    water_utilities=water_utilities,
-                    settings=settings
-                )
+            wu_actions.apply_bond_to_debt_ratio(
+                water_utility=water_utility,
+                year=year,
+                policy_desc=wutil_policies['bond_ratio']
+            )
+
+            # Retrieve and apply the utility's interventions:
+            # - opening & closing new sources
+            # - installing/replacing pipes
+            # - installing/replacing pumps
+            # - installing solar
+            # Each of these returns its capex and we save only the cumulative value
+            wutil_interven = masterplan.water_utility_interventions(
+                water_utility=water_utility.bwf_id,
+                year=year
+            )
+
+            sources_capex, sources_ghg = wu_actions.work_on_sources(
+                water_utility=water_utility,
+                year=year,
+                interventions_open_desc=wutil_interven['open_source'],
+                interventions_close_desc=wutil_interven['close_source'],
+                pump_options=national_context.pump_options,
+                pipe_options=national_context.pipe_options,
+                settings=settings
+            )
+
+            pipes_capex, pipes_ghg = wu_actions.work_on_connections(
+                water_utility=water_utility,
+                year=year,
+                interventions_desc=wutil_interven['install_pipe'],
+                pipe_options=national_context.pipe_options,
+                settings=settings
+            )
+
+            pumps_capex, pumps_ghg = wu_actions.work_on_pumps(
+                water_utility=water_utility,
+                year=year,
+                interventions_desc=wutil_interven['install_pumps'],
+                pump_options=national_context.pump_options,
+                settings=settings
+            )
 
-            update_financial_balances(
+            solar_capex, solar_ghg = wu_actions.work_on_solar_farms(
+                water_utility=water_utility,
+                year=year,
+                interventions_desc=wutil_interven['install_solar'],
+                settings=settings
+            )
+
+            wu_capex = (
+                sources_capex +
+                pipes_capex +
+                pumps_capex +
+                solar_capex +
+                wus_national_capex[water_utility.bwf_id]
+            )
+            water_utility.track_capex(when=year, value=wu_capex)
+
+            wu_ghg = (
+                sources_ghg +
+                pipes_ghg +
+                pumps_ghg +
+                solar_ghg +
+                wus_national_ghg[water_utility.bwf_id]
+            )
+            water_utility.track_embodied_emissions(when=year, value=wu_ghg)
+
+        # end water utilities for loop
+        progress.update(task_utilities, advance=1)
+
+    # compute the missing dependent dynamic properties (demand, etc)
+    with profiler.phase('realise_uncertainties', year):
+        realise_uncertainties(
+            year=year,
+            national_context=national_context,
+            water_utilities=water_utilities,
+            settings=settings,
+            progress=progress,
+            task_uncertainties=task_uncertainties
+        )
+
+    with profiler.phase('hydraulics', year):
+        run_hydraulic_simulations(
+            year=year,
+            national_context=national_context,
+            water_utilities=water_utilities,
+            settings=settings,
+            progress=progress,
+            task_simu=task_simu
+        )
+
+    # Update endogenous dynamic properties (ages of the assets), unless we
+    # reached the end and therefore we would need future values for next year
+    # (for example which municipalities close in 2025). The costs that follow
+    # inflation are escalated for all the years when the system is configured.
+    if not year == settings.years_to_simulate[-1]:
+        with profiler.phase('ageing', year):
+            age_water_utilities(
                 year=year,
                 national_context=national_context,
                 water_utilities=water_utilities,
                 settings=settings
             )
 
-            # end year for loop
-            progress.update(task_years, advance=1)
-        
-    # end of stage loop, we can calculate all the metrics
-    metrics = compute_metrics(settings, national_context, water_utilities)
+            age_national_context_assets(
+                year=year,
+                national_context=national_context,
+                water_utilities=water_utilities,
+                settings=settings
+            )
 
-    return (
-        national_context,
-        water_utilities,
-        metrics
-    )
+    with profiler.phase('financial_balances', year):
+        update_financial_balances(
+            year=year,
+            national_context=national_context,
+            water_utilities=water_utilities,
+            settings=settings
+        )
+
+    # Nothing looks back at this year's hours anymore (but the last ones, see
+    # BWFResult.LOOKBACK), apply the retention policies of the hourly results
+    with profiler.phase('settle_results', year):
+        national_context.settle_hourly_results(year)
 
 
 def realise_uncertainties(
@@ -255,39 +332,41 @@ def realise_uncertainties(
     maxtemp_year = mean_tempmax.loc[mean_tempmax.index.year == year].max()
 
     for water_utility in sorted(water_utilities, key=lambda x: x.bwf_id):
-        wu_actions.realise_demands(
-            water_utility=water_utility,
-            year=year,
-            water_demand_model_data=national_context.water_demand_model_data,
-            nrw_model_data=national_context.nrw_model_data,
-            temperature=maxtemp_year,
-            settings=settings
-        )
+        with profiler.phase('demands', year, label=water_utility.bwf_id):
+            wu_actions.realise_demands(
+                water_utility=water_utility,
+                year=year,
+                water_demand_model_data=national_context.water_demand_model_data,
+                nrw_model_data=national_context.nrw_model_data,
+                temperature=maxtemp_year,
+                settings=settings
+            )
 
         progress.update(task_uncertainties, advance=1)
 
-    solar_yields = {}
-    solar_radiation = get_solar_radiation_of_year(
-        year=year,
-        state=national_context.state,
-        observed_avg_solar_radiation=national_context.average_solar_irradiance,
-        settings=settings
-    )
-
-    for water_utility in sorted(water_utilities, key=lambda x: x.bwf_id):
-        wu_solar_yields = wu_actions.realise_solar_yields(
-            water_utility=water_utility,
+    with profiler.phase('solar', year):
+        solar_yields = {}
+        solar_radiation = get_solar_radiation_of_year(
             year=year,
-            solar_irradiance=solar_radiation,
+            state=national_context.state,
+            observed_avg_solar_radiation=national_context.average_solar_irradiance,
             settings=settings
         )
 
-        solar_yields.update(wu_solar_yields)
+        for water_utility in sorted(water_utilities, key=lambda x: x.bwf_id):
+            wu_solar_yields = wu_actions.realise_solar_yields(
+                water_utility=water_utility,
+                year=year,
+                solar_irradiance=solar_radiation,
+                settings=settings
+            )
 
-    national_context.track_solar_farms_yields(
-        when=year,
-        values=pd.DataFrame(solar_yields)
-    )
+            solar_yields.update(wu_solar_yields)
+
+        national_context.track_solar_farms_yields(
+            when=year,
+            values=pd.DataFrame(solar_yields)
+        )
 
     progress.update(task_uncertainties, advance=1)
 
@@ -305,172 +384,157 @@ def run_hydraulic_simulations(
     wutilities_clusters = national_context.get_wu_clusters(year=year)
     # print(f"Number of utility clusters: {len(wutilities_clusters)} -- Number of utilities: {len(water_utilities)}")
 
-    # Now we are ready for simulation, we apply the demands, simulate and save and repeat in a parralel fashion
-    lock = threading.Lock()
+    # The electricity prices of the year are shared by the settlements of all the clusters
+    settlement = wu_actions.OperationsSettlement(
+        energy_sys_db=national_context.energy_sys,
+        year=year,
+        settings=settings
+    )
 
-    def _run_and_advance(cluster):
-        sim_results = run_cluster_hydraulics(
-            national_context=national_context,
-            cluster=cluster,
-            year=year,
-            settings=settings
+    def _track_results(
+            cluster: WaterUtilitiesCluster,
+            sim_results: BWFHydraulicSimReults,
+            telemetry: HydraulicsTelemetry
+        ):
+        HydraulicsTelemetryLog.track(telemetry)
+
+        national_context.track_municipalities_undelivered_demand(
+            when=year,
+            values=sim_results.undelivered_demands.sum(axis=0)
         )
-        
-        with lock:
-            national_context.track_municipalities_undelivered_demand(
-                when=year,
-                values=sim_results.undelivered_demands.sum(axis=0)
-            )
-            national_context.track_pumps_electrical_energy(
-                when=year,
-                values=sim_results.pumps_energy_consumption
-            )
-            national_context.track_sources_production(
-                when=year,
-                values=sim_results.sources_production
+        national_context.track_pumps_electrical_energy(
+            when=year,
+            values=sim_results.pumps_energy_consumption
+        )
+        national_context.track_sources_production(
+            when=year,
+            values=sim_results.sources_production
+        )
+
+        # Utilities water exchanges
+        # let's sort them to save the results always in order
+        sorted_wus = sorted((wu for wu in cluster.water_utilities), key= lambda x: x.bwf_id)
+        sim_results.cross_utilities_flows.columns = [
+            c[:6] for c in sim_results.cross_utilities_flows.columns
+        ] # convert the columns from the pipe name to the connection name
+        net_exchanges = sim_results.cross_utilities_flows.sum(axis=0, skipna=True)
+        WaterUtility.track_net_wat_exchanges(
+            when=year,
+            exchanges=cluster.net_water_exchanges(net_exchanges)
+        )
+
+        # Account for opex and greenhouse gas emissions derived by the operations
+        with profiler.phase('hydraulics/settle_operations', year, label=cluster.filename):
+            settlement.settle(
+                sorted_wus,
+                pumps_ele_consumption=sim_results.pumps_energy_consumption,
+                sources_production=sim_results.sources_production
             )
 
-            # Utilities water exchanges
-            # let's sort them to save the results always in order
-            sorted_wus = sorted((wu for wu in cluster.water_utilities), key= lambda x: x.bwf_id)
-            sim_results.cross_utilities_flows.columns = [
-                c[:6] for c in sim_results.cross_utilities_flows.columns
-            ] # convert the columns from the pipe name to the connection name
-            net_exchanges = sim_results.cross_utilities_flows.sum(axis=0, skipna=True)
-            for i, wu_from in enumerate(sorted_wus):
-                for j, wu_to in enumerate(sorted_wus[i+1:]):
-
-                    cnns_sign_map = cluster.get_connections_sign_map_between(wu_from, wu_to)
-
-                    # Change the sign of the inverted pipes (from wu_to to wu_from)
-                    net_value = 0.0
-                    for c_id, x in cnns_sign_map.items():
-                        net_value += x * net_exchanges[c_id]
-
-                    wu_from.track_net_wat_exchange(
-                        when=year,
-                        to=wu_to,
-                        value=net_value
-                    )
-
-            # Account for opex and greenhouse gas emissions derived by the operations
-            for water_utility in sorted_wus:
-                opex, ghg_oper, gw_fines = wu_actions.settle_operations_impact(
-                    water_utility=water_utility,
-                    energy_sys_db=national_context.energy_sys,
-                    year=year,
-                    settings=settings,
-                    pumps_ele_consumption=sim_results.pumps_energy_consumption,
-                    sources_production=sim_results.sources_production
-                )
-        
         progress.advance(task_simu, advance=cluster.n_water_utilities)
 
-    if settings.available_cores > 2:
+    # Now we are ready for simulation, we apply the demands, simulate and save and repeat in a parralel fashion
+    simulate_clusters(
+        year=year,
+        national_context=national_context,
+        clusters=wutilities_clusters,
+        settings=settings,
+        on_result=_track_results
+    )
+
+    # Clusters that have been merged this year won't come back
+    network_cache.release(unused_since=year)
+
+    return
+
+def simulate_clusters(
+        year: int,
+        national_context: NationalContext,
+        clusters: Iterable[WaterUtilitiesCluster],
+        settings: Settings,
+        on_result: Callable[[WaterUtilitiesCluster, BWFHydraulicSimReults, HydraulicsTelemetry], None]
+    ) -> None:
+    """
+    Simulate the hydraulics of the clusters with the backend of the settings:
+    forked processes, threads or one cluster after the other. The results do
+    not depend on the backend (see tests/test_hydraulics_pool.py).
+    `on_result` is called for one cluster at the time, in order of filename,
+    but for the threads backend (in order of completion).
+    """
+    lock = threading.Lock()
+
+    def _run_and_advance(cluster: WaterUtilitiesCluster):
+        # Full path: with the threads backend, 'hydraulics' is open in another thread
+        with profiler.phase('hydraulics/cluster', year, label=cluster.filename):
+            sim_results, telemetry = simulate_cluster_hydraulics(
+                national_context=national_context,
+                cluster=cluster,
+                year=year,
+                settings=settings
+            )
+        
+        with lock:
+            on_result(cluster, sim_results, telemetry)
+
+    if settings.available_cores > 2 and settings.hydraulics_backend == 'processes' and IS_PROCESS_BACKEND_AVAILABLE:
+        # The simulations run in forked processes, while the results are tracked here in
+        # the same (deterministic) order of the serial execution, so that the random
+        # draws in the operations settlement are consumed identically.
+        run_clusters_in_processes(
+            national_context=national_context,
+            clusters=sorted(clusters, key=lambda cl: cl.filename),
+            settings=settings,
+            n_workers=settings.available_cores-1,
+            on_result=on_result
+        )
+    elif settings.available_cores > 2:
         # Always leave one core out to avoid going bottlenecks
         Parallel(n_jobs=settings.available_cores-1, prefer="threads")(
             delayed(_run_and_advance)(cluster)
-            for cluster in wutilities_clusters
+            for cluster in clusters
         )
     else:
-        for cluster in sorted(wutilities_clusters, key=lambda cl: cl.filename):
+        for cluster in sorted(clusters, key=lambda cl: cl.filename):
             _run_and_advance(cluster=cluster)
 
     return
 
-def escalate_costs(
-        year: int,
-        national_context: NationalContext,
-        water_utilities: Set[WaterUtility]
+def escalate_costs_over_horizon(
+        from_year: int,
+        to_year: int,
+        national_context: NationalContext
     ) -> None:
     """
-    Docstring for escalate_costs
-    
-    :param year: Description
-    :type year: int
-    :param inflation: Description
-    :type inflation: float
+    Escalate the costs of `from_year` up to `to_year` in one pass: the costs
+    of a year are the ones of the previous year times (1 + inflation of the
+    year). Inflation is exogenous, so the whole trajectory is known upfront.
+
+    The costs to inflate are the NRW interventions, the sources (construction,
+    fixed and volumetric opex), the new pumps and the new pipes. Other costs
+    don't follow inflation (they are purely exogenous): solar panels and
+    electricity unit costs.
     """
-
-    # The costs to inflate are:
-    # NRW options
-    # Sources construction
-    # Pumps construction
-    # Pipes costs
-
-    # Other costs that don't follow inflation (they are purely exogenous):
-    # - Solar panel unit cost
-    # - electricity unit cost
-
-    # We work under the assumption that a value in next_year for inflation is already there.
-    
-    this_year = timestampify(year)
-    next_year = timestampify(year+1)
-    inflation_rate = national_context.inflation.loc[next_year]/100
-    
-    # NRW intervention cost
-    base_cost = national_context.nrw_intervention_costs.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_nrw_intervention_costs(next_year, inflated_cost)
-    
-    # Sources costs
-    # - Groundwater (gw)
-    #   - Unit cost of construction
-    base_cost = national_context.gw_sources_unit_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_gw_sources_unit_cost(next_year, inflated_cost)
-
-    #   - Opex fixed
-    base_cost = national_context.gw_sources_opex_fixed_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_gw_sources_opex_fixed_cost(next_year, inflated_cost)
-
-    #   - Opex volumetric other
-    base_cost = national_context.gw_sources_opex_volum_other_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_gw_sources_opex_volum_other_cost(next_year, inflated_cost)
-
-    # - Surface Water (sw)
-    #   - Unit cost of construction
-    base_cost = national_context.sw_sources_unit_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_sw_sources_unit_cost(next_year, inflated_cost)
-
-    #   - Opex fixed
-    base_cost = national_context.sw_sources_opex_fixed_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_sw_sources_opex_fixed_cost(next_year, inflated_cost)
-
-    #   - Opex volumetric other
-    base_cost = national_context.sw_sources_opex_volum_other_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_sw_sources_opex_volum_other_cost(next_year, inflated_cost)
-
-    # - Desalination (des)
-    #   - Unit cost of construction
-    base_cost = national_context.des_sources_unit_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_des_sources_unit_cost(next_year, inflated_cost)
-
-    #   - Opex fixed
-    base_cost = national_context.des_sources_opex_fixed_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_des_sources_opex_fixed_cost(next_year, inflated_cost)
-
-    #   - Opex volumetric other
-    base_cost = national_context.des_sources_opex_volum_other_cost.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_des_sources_opex_volum_other_cost(next_year, inflated_cost)
-
-    # - Pump options (new pumps)
-    base_cost = national_context.new_pumps_costs.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_new_pumps_costs(next_year, inflated_cost)
-
-    # - Pipe options (new pipes)
-    base_cost = national_context.new_pipes_costs.loc[this_year]
-    inflated_cost = (1+inflation_rate) * base_cost
-    national_context.set_new_pipes_costs(next_year, inflated_cost)
+    if to_year <= from_year:
+        return
+
+    base_year = timestampify(from_year)
+    years = pd.DatetimeIndex([timestampify(y) for y in range(from_year+1, to_year+1)])
+    growth = 1 + national_context.inflation.loc[years].to_numpy(dtype=np.float64)/100
+
+    for db, var, columns in national_context.inflation_indexed_costs:
+        df = db[var]
+
+        # The cumulative product is accumulated year after year, so the values
+        # are exactly the ones of escalating one year at the time
+        trajectory = np.empty((len(years)+1, len(columns)), dtype=np.float64)
+        trajectory[0] = df.loc[base_year, columns].to_numpy(dtype=np.float64)
+        trajectory[1:] = growth[:, None]
+        trajectory = np.multiply.accumulate(trajectory, axis=0)
+
+        # Add all the years at once instead of growing the table every year
+        df = df.reindex(df.index.union(years))
+        df.loc[years, columns] = trajectory[1:]
+        db[var] = df
 
     return
 
@@ -0,0 +1,183 @@
+from multiprocessing import get_all_start_methods, get_context, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core import Settings
+from ..national_context import NationalContext
+from ..national_context.entities import WaterUtilitiesCluster
+
+from .epanet_utils import BWFHydraulicSimReults
+from .hydraulics_telemetry import HydraulicsTelemetry
+from .shared_datasets import shared_datasets
+from .tree_hydraulics import simulate_cluster_hydraulics
+
+# The process backend relies on fork: the workers inherit the whole configured
+# system (entities, class-level registries and databases) from the parent at
+# the moment the pool is created, so we only have to ship a tiny description
+# of each cluster instead of pickling the national context.
+IS_PROCESS_BACKEND_AVAILABLE = 'fork' in get_all_start_methods()
+
+class ClusterDescription(NamedTuple):
+    """
+    Compact and picklable description of a :class:`WaterUtilitiesCluster`.
+    It is resolved back to the actual entities in the worker process.
+    """
+    year: int
+    water_utilities_id: Tuple[str, ...]
+    connections_id: Tuple[str, ...]
+
+def describe_cluster(cluster: WaterUtilitiesCluster) -> ClusterDescription:
+    return ClusterDescription(
+        year=cluster.year,
+        water_utilities_id=tuple(sorted(wu.bwf_id for wu in cluster.water_utilities)),
+        connections_id=tuple(sorted(c.bwf_id for c in cluster.cross_utility_connections))
+    )
+
+def resolve_cluster(
+        national_context: NationalContext,
+        description: ClusterDescription
+    ) -> WaterUtilitiesCluster:
+    water_utilities_id = set(description.water_utilities_id)
+    connections_id = set(description.connections_id)
+
+    return WaterUtilitiesCluster(
+        water_utilities=set(
+            wu for wu in national_context.water_utilities
+            if wu.bwf_id in water_utilities_id
+        ),
+        cross_utility_connections=set(
+            c for c in national_context.cross_utility_connections
+            if c.bwf_id in connections_id
+        ),
+        year=description.year
+    )
+
+class SharedSimResultsHandle(NamedTuple):
+    """
+    Where to find the results of a cluster simulation in shared memory.
+    The four matrices of :class:`BWFHydraulicSimReults` are stored one after
+    the other (float32, C order) in a single block. The telemetry of the
+    solver is small enough to be pickled with the handle.
+    """
+    shm_name: str
+    year: int
+    columns: Tuple[List[str], List[str], List[str], List[str]]
+    telemetry: Optional[HydraulicsTelemetry] = None
+
+# Set by the parent right before forking the pool, read by the workers.
+_FORKED_STATE: Optional[Tuple[NationalContext, Settings]] = None
+
+def _year_timesteps(year: int) -> pd.DatetimeIndex:
+    return pd.date_range(
+        start=f"{year}-01-01 00:00:00",
+        periods=365 * 24,
+        freq="h"
+    )
+
+def _simulate_in_worker(description: ClusterDescription) -> SharedSimResultsHandle:
+    assert _FORKED_STATE is not None, "The process pool must be created through run_clusters_in_processes"
+    national_context, settings = _FORKED_STATE
+
+    sim_results, telemetry = simulate_cluster_hydraulics(
+        national_context=national_context,
+        cluster=resolve_cluster(national_context, description),
+        year=description.year,
+        settings=settings,
+        use_network_cache=False # the worker dies at the end of the year
+    )
+
+    return share_results(sim_results, description.year, telemetry)
+
+def share_results(
+        sim_results: BWFHydraulicSimReults,
+        year: int,
+        telemetry: Optional[HydraulicsTelemetry] = None
+    ) -> SharedSimResultsHandle:
+    """
+    Copy the results of a cluster simulation in a new shared memory block.
+    The block must be released by the receiver with :func:`collect_shared_results`.
+    """
+    matrices = [
+        df.to_numpy(dtype=np.float32)
+        for df in sim_results
+    ]
+    n_bytes = sum(m.nbytes for m in matrices)
+
+    # SharedMemory does not accept empty blocks
+    shm = SharedMemory(create=True, size=max(n_bytes, 1))
+    offset = 0
+    for m in matrices:
+        dst = np.ndarray(m.shape, dtype=np.float32, buffer=shm.buf, offset=offset)
+        dst[:] = m
+        offset += m.nbytes
+    shm.close()
+    # The parent takes ownership of the block (and unlinks it), stop tracking it here
+    resource_tracker.unregister(shm._name, "shared_memory") # type: ignore
+
+    return SharedSimResultsHandle(
+        shm_name=shm.name,
+        year=year,
+        columns=tuple(list(df.columns) for df in sim_results), # type: ignore
+        telemetry=telemetry
+    )
+
+def collect_shared_results(handle: SharedSimResultsHandle) -> BWFHydraulicSimReults:
+    """
+    Copy the results out of the shared memory block and release it.
+    """
+    year_timesteps = _year_timesteps(handle.year)
+    n_steps = len(year_timesteps)
+
+    shm = SharedMemory(name=handle.shm_name)
+    try:
+        frames = []
+        offset = 0
+        for columns in handle.columns:
+            shape = (n_steps, len(columns))
+            data = np.ndarray(shape, dtype=np.float32, buffer=shm.buf, offset=offset).copy()
+            offset += data.nbytes
+            frames.append(pd.DataFrame(data=data, index=year_timesteps, columns=columns))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return BWFHydraulicSimReults(*frames)
+
+def run_clusters_in_processes(
+        national_context: NationalContext,
+        clusters: Iterable[WaterUtilitiesCluster],
+        settings: Settings,
+        n_workers: int,
+        on_result: Callable[[WaterUtilitiesCluster, BWFHydraulicSimReults, HydraulicsTelemetry], None]
+    ) -> None:
+    """
+    Simulate the clusters in a pool of forked processes.
+
+    The pool is created every year, so that the workers see the state of the
+    system as it is after this year's interventions and uncertainties.
+    `on_result` is called in the parent process, one cluster at the time, in
+    the same order as the clusters are given, regardless of which worker
+    finishes first.
+    """
+    global _FORKED_STATE
+
+    clusters = list(clusters)
+    if not clusters:
+        return
+    descriptions = [describe_cluster(cl) for cl in clusters]
+
+    if settings.share_datasets:
+        shared_datasets.share(national_context)
+
+    _FORKED_STATE = (national_context, settings)
+    try:
+        with get_context('fork').Pool(processes=min(n_workers, len(clusters))) as pool:
+            for cluster, handle in zip(clusters, pool.imap(_simulate_in_worker, descriptions)):
+                on_result(cluster, collect_shared_results(handle), handle.telemetry)
+    finally:
+        _FORKED_STATE = None
+
+    return
@@ -0,0 +1,101 @@
+from enum import IntEnum
+from pathlib import Path
+from typing import Any, ClassVar, Dict, List, NamedTuple, Union
+
+import numpy as np
+import pandas as pd
+
+class HourStatus(IntEnum):
+    """How the results of an hour of a cluster hydraulic simulation were obtained."""
+    SOLVED = 0
+    # The solver failed, the results are scaled from the last working hour
+    APPROXIMATED = 1
+    # The solver failed for too long, nothing is delivered nor produced
+    FULL_ERROR = 2
+    # The tree solver reached its maximum number of trials
+    NOT_CONVERGED = 3
+
+# Trials of the hours solved by a solver that doesn't tell them
+UNKNOWN_TRIALS = -1
+
+class HydraulicsTelemetry(NamedTuple):
+    """
+    Hour by hour account of the hydraulic simulation of a cluster in a year.
+
+    - solve_time: seconds spent in the hydraulic solver. The tree engine
+      solves many hours at once, each hour gets an equal share of the time.
+    - setup_time: seconds spent choosing the pumping stations setups.
+    - trials: iterations of the hydraulic solver (UNKNOWN_TRIALS with EPANET,
+      whose binding doesn't expose them per hour).
+    - warning_code: EPANET warning code of the hour (0 if none).
+    - status: see :class:`HourStatus`.
+    """
+    cluster: str
+    year: int
+    engine: str
+    solve_time: np.ndarray # (T,) float64
+    setup_time: np.ndarray # (T,) float64
+    trials: np.ndarray # (T,) int32
+    warning_code: np.ndarray # (T,) int16
+    status: np.ndarray # (T,) int8
+
+    @classmethod
+    def empty(cls, cluster: str, year: int, engine: str, n_hours: int) -> 'HydraulicsTelemetry':
+        return cls(
+            cluster=cluster,
+            year=year,
+            engine=engine,
+            solve_time=np.zeros(n_hours, dtype=np.float64),
+            setup_time=np.zeros(n_hours, dtype=np.float64),
+            trials=np.full(n_hours, UNKNOWN_TRIALS, dtype=np.int32),
+            warning_code=np.zeros(n_hours, dtype=np.int16),
+            status=np.full(n_hours, HourStatus.SOLVED, dtype=np.int8),
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """The telemetry of the year aggregated in a single row."""
+        known_trials = self.trials[self.trials != UNKNOWN_TRIALS]
+        return {
+            'cluster': self.cluster,
+            'year': self.year,
+            'engine': self.engine,
+            'hours': len(self.status),
+            'solve_time': float(self.solve_time.sum()),
+            'max_hour_solve_time': float(self.solve_time.max(initial=0.0)),
+            'setup_time': float(self.setup_time.sum()),
+            'mean_trials': float(known_trials.mean()) if len(known_trials) else np.nan,
+            'max_trials': int(known_trials.max()) if len(known_trials) else UNKNOWN_TRIALS,
+            'hours_with_warnings': int(np.count_nonzero(self.warning_code)),
+            **{
+                f"hours_{status.name.lower()}": int(np.count_nonzero(self.status == status))
+                for status in HourStatus
+            }
+        }
+
+class HydraulicsTelemetryLog:
+    """
+    One summary row per cluster and year simulated. It is class-level state,
+    so it follows the evaluation in the checkpoints and in the forked workers.
+    """
+    _SUMMARIES: ClassVar[List[Dict[str, Any]]] = []
+
+    @classmethod
+    def track(cls, telemetry: HydraulicsTelemetry) -> None:
+        cls._SUMMARIES.append(telemetry.summary())
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._SUMMARIES = []
+
+    @classmethod
+    def to_dataframe(cls) -> pd.DataFrame:
+        df = pd.DataFrame(cls._SUMMARIES)
+        if df.empty:
+            return df
+        return df.sort_values(['year', 'cluster'], kind='stable').reset_index(drop=True)
+
+    @classmethod
+    def dump(cls, directory: Union[str, Path], name: str = 'hydraulics_telemetry') -> Path:
+        path = Path(directory) / f"{name}.csv"
+        cls.to_dataframe().to_csv(path, index=False)
+        return path
@@ -0,0 +1,165 @@
+import mmap
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core.base_model import DynamicProperties
+from ..jurisdictions import Municipality
+from ..national_context import NationalContext
+from ..pipes import Pipe, PipeOption
+from ..pumps import PumpOption
+from ..sources import GroundWater, SurfaceWater, Desalination
+from ..water_demand_model import WaterDemandModelPattern
+from ..water_demand_model.services import get_pattern_harmonics
+
+# Offsets of the arrays in the shared block are aligned to the cache lines
+_ALIGNMENT = 64
+
+def _is_shareable(df: pd.DataFrame) -> bool:
+    """A non-empty dataframe whose columns all have the same numeric numpy dtype."""
+    if df.size == 0:
+        return False
+    dtypes = set(df.dtypes)
+    if len(dtypes) != 1:
+        return False
+    dtype = dtypes.pop()
+    return isinstance(dtype, np.dtype) and dtype.kind in 'biuf'
+
+def _copy_on_write() -> bool:
+    """Does pandas copy the values of a shallow copy when they are written? Always from pandas 3."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.options.mode.copy_on_write is True
+
+class SharedDatasets:
+    """
+    The exogenous datasets (the EXOGENOUS_VARIABLES of the dynamic properties
+    databases and the water demand patterns) moved into memory shared with
+    the forked workers.
+
+    A forked worker shares the memory of the parent only until one of the
+    two writes on the same page, and many of these arrays are small enough to
+    live next to Python objects whose reference counts are written all the
+    time, so every worker ends up with its own copy. Once shared, the values
+    are in an anonymous shared mapping that no process ever writes: it is
+    read-only, and the databases hold a shallow copy of the published
+    dataframes, so that pandas copies (copy-on-write) the columns that a
+    process writes, in that process only. Before pandas 3, copy-on-write is
+    off unless `pd.options.mode.copy_on_write` is True, and a write would hit
+    the read-only values: the dataframes are not shared then, only the
+    patterns (which are never written).
+
+    Shared mappings are inherited by forked processes only, like the rest of
+    the system (see hydraulics_pool.py and batch_evaluation.py).
+    """
+    def __init__(self):
+        # (id of the database, variable) -> (published dataframe, what the database holds)
+        self._published: Dict[Tuple[int, str], Tuple[pd.DataFrame, pd.DataFrame]] = {}
+        # Moved to shared memory so far
+        self.n_bytes = 0
+
+    def _allocate(self, arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """Copy the arrays in a new shared block, return the read-only copies."""
+        offsets = []
+        n_bytes = 0
+        for a in arrays:
+            offsets.append(n_bytes)
+            n_bytes += -(-a.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        # The arrays keep the block alive, it is released with the last of them
+        block = mmap.mmap(-1, max(n_bytes, 1))
+        self.n_bytes += n_bytes
+
+        shared = []
+        for a, offset in zip(arrays, offsets):
+            # Same layout as the original (the values of a dataframe are in Fortran order)
+            dst = np.ndarray(a.shape, dtype=a.dtype, buffer=block, offset=offset,
+                             order='F' if a.flags.f_contiguous else 'C')
+            dst[...] = a
+            dst.flags.writeable = False
+            shared.append(dst)
+        return shared
+
+    def is_shared(self, database: DynamicProperties, variable: str) -> bool:
+        published = self._published.get((id(database), variable))
+        return published is not None and database.dataframes.get(variable) is published[1]
+
+    def publish(
+            self,
+            databases: Iterable[DynamicProperties],
+            patterns: Iterable[WaterDemandModelPattern] = ()
+        ) -> int:
+        """
+        Move the exogenous variables of `databases` and the values of the
+        demand `patterns` to shared memory. What is already shared, or is not
+        a numeric dataframe, is left where it is, and so are all the
+        dataframes if pandas is not copying on write.
+
+        Returns
+        -------
+        int
+            The bytes moved to shared memory.
+        """
+        to_share: List[Tuple[DynamicProperties, str]] = []
+        seen = set()
+        for database in (databases if _copy_on_write() else []):
+            if database is None or id(database) in seen:
+                continue
+            seen.add(id(database))
+            for variable in getattr(type(database), 'EXOGENOUS_VARIABLES', []):
+                df = database.dataframes.get(variable)
+                if df is not None and _is_shareable(df) and not self.is_shared(database, variable):
+                    to_share.append((database, variable))
+
+        # The harmonics of the patterns are computed once, here, instead of in every worker
+        patterns = [p for p in patterns if p.values.flags.writeable]
+        harmonics = [get_pattern_harmonics(p) for p in patterns]
+
+        arrays = (
+            [db.dataframes[var].to_numpy() for db, var in to_share] +
+            [np.asarray(p.values) for p in patterns] +
+            [h.hourly_adim for h in harmonics]
+        )
+        if not arrays:
+            return 0
+
+        n_bytes_before = self.n_bytes
+        shared = iter(self._allocate(arrays))
+
+        for database, variable in to_share:
+            df = database.dataframes[variable]
+            published = pd.DataFrame(next(shared), index=df.index, columns=df.columns, copy=False)
+            # Not through __setitem__: the values are the same, nothing to recompute
+            database.dataframes[variable] = published.copy(deep=False)
+            self._published[(id(database), variable)] = (published, database.dataframes[variable])
+
+        # We bypass immutability substituting the value to the fields
+        for pattern in patterns:
+            object.__setattr__(pattern, 'values', next(shared))
+        for pattern, h in zip(patterns, harmonics):
+            object.__setattr__(pattern, '_harmonics', h._replace(hourly_adim=next(shared)))
+
+        return self.n_bytes - n_bytes_before
+
+    def share(self, national_context: NationalContext) -> int:
+        """Publish the exogenous datasets of the system (see :meth:`publish`)."""
+        return self.publish(
+            databases=[
+                national_context.climate,
+                national_context.economy,
+                national_context.water_demand_model_db,
+                national_context.nrw_model_db,
+                national_context.energy_sys,
+                Municipality._dynamic_properties,
+                PipeOption._dynamic_properties,
+                PumpOption._dynamic_properties,
+                Pipe._dynamic_properties,
+                GroundWater._dynamic_properties,
+                SurfaceWater._dynamic_properties,
+                Desalination._dynamic_properties,
+            ],
+            patterns=national_context.water_demand_patterns.values()
+        )
+
+shared_datasets = SharedDatasets()
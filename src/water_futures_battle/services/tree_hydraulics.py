@@ -0,0 +1,756 @@
+from collections import deque
+import time
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..core import Settings
+from ..core.utility import timestampify
+from ..connections.entities import PeerConnection
+from ..national_context import NationalContext
+from ..national_context.entities import WaterUtilitiesCluster
+from ..pumping_stations.services import get_lowest_energy_pumping_station_setups
+from ..pumps.entities import PumpOption
+from ..water_utilities import WaterUtility
+
+from .epanet_utils import (
+    BWFHydraulicSimReults,
+    _collect_network_elements,
+    get_source_head,
+    pstations_target_heads,
+    run_cluster_hydraulics,
+    setup_cluster_logger
+)
+from .hydraulics_telemetry import HourStatus, HydraulicsTelemetry
+
+# The fast path solves the same equations that EPANET solves for the networks
+# built by build_epanet_network (Darcy-Weisbach head losses, pressure driven
+# demands, parallel variable speed pumps with a multi-point head curve), using
+# EPANET units and constants internally so that the two engines agree.
+_M_PER_FT = 0.3048
+_CMH_PER_CFS = 28.317 * 3.6
+_GRAVITY = 32.2 # ft/s^2
+_VISCOSITY = 1.1e-5 # ft^2/s, water at 20 deg C
+_HP_PER_KW_FACTOR = 8.814 # hp per (cfs * ft) of water
+_KW_PER_HP = 0.7457
+_RQTOL = 1e-7 # smallest head loss gradient (ft/cfs)
+_CBIG = 1e8 # head loss gradient of closed links and of the demand barriers (ft/cfs)
+
+# Pressure driven demand model (see set_hydraulic_options). The networks are
+# created in US units and EPANET keeps the pressures in psi after switching
+# the flows to m^3/h, so the pressure thresholds are 15 and 30 psi.
+_PSI_PER_FT = 0.4333
+PDA_PMIN = 15.0 / _PSI_PER_FT * _M_PER_FT # m
+PDA_PREQ = 30.0 / _PSI_PER_FT * _M_PER_FT # m
+PDA_PEXP = 0.5
+
+class PipeData(NamedTuple):
+    """Pipes, in meters and millimeters as for EPANET."""
+    length: np.ndarray
+    diameter: np.ndarray
+    roughness: np.ndarray
+    minor_loss: np.ndarray
+
+class TreeHydraulicModel(NamedTuple):
+    """
+    A cluster fed by a single source through a radial network.
+
+    The source reservoir feeds the root municipality through a check valve,
+    the pumping station (identical pumps in parallel) and the supply pipe.
+    Every other municipality is connected to its parent by one pipe.
+    Municipalities are in topological order: a parent always comes before its
+    children, so the root is the first one (with parent -1).
+    """
+    reservoir_head: float
+    check_valve: PipeData
+    supply_pipe: PipeData
+    pump_option: PumpOption
+    elevations: np.ndarray # (N,)
+    parents: np.ndarray # (N,), -1 for the root
+    pipes: PipeData # (N,) pipe from the parent to the municipality, unused for the root
+    pipes_sign: np.ndarray # (N,) +1 if the EPANET pipe goes from the parent to the child, else -1
+
+class TreeHydraulicSolution(NamedTuple):
+    consumptions: np.ndarray # (T, N) delivered demands (m^3/h)
+    production: np.ndarray # (T,) outflow of the source (m^3/h)
+    pipes_flow: np.ndarray # (T, N) flow in the pipes, with the EPANET orientation (m^3/h)
+    pump_heads: np.ndarray # (T,) head gain across the pumping station (m)
+    converged: np.ndarray # (T,) bool
+    trials: np.ndarray # (T,) iterations until the hour converged
+
+class NotATreeClusterError(Exception):
+    pass
+
+def _pipe_data(pipes: List[Tuple[float, float, float, float]]) -> PipeData:
+    return PipeData(*[np.array(x, dtype=np.float64) for x in zip(*pipes)])
+
+class _DarcyWeisbach(NamedTuple):
+    """What the head loss of a pipe depends on, besides the flow (EPANET units)."""
+    resistance: np.ndarray
+    minor_loss: np.ndarray
+    rel_roughness: np.ndarray # roughness / (3.7 * diameter)
+    reynolds_per_cfs: np.ndarray
+    laminar_resistance: np.ndarray
+    dunlop: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+def _darcy_weisbach(pipes: PipeData) -> _DarcyWeisbach:
+    d = pipes.diameter / 1000 / _M_PER_FT
+    area = np.pi * d**2 / 4
+    resistance = (pipes.length / _M_PER_FT) / 2.0 / _GRAVITY / d / area**2
+    e = pipes.roughness / pipes.diameter / 3.7
+
+    # Dunlop's cubic interpolation of the friction factor between
+    # Re = 2000 and Re = 4000 (the Swamee-Jain value)
+    y2 = e + 3.28895476345e-03
+    y3 = -0.86858896 * np.log(y2)
+    fa = 1.0 / y3**2
+    fb = (2.0 + -5.14214965799e-03 / (y2 * y3)) * fa
+
+    return _DarcyWeisbach(
+        resistance=resistance,
+        minor_loss=pipes.minor_loss / 2.0 / _GRAVITY / area**2,
+        rel_roughness=e,
+        reynolds_per_cfs=d / (area * _VISCOSITY),
+        laminar_resistance=16.0 * np.pi * _VISCOSITY * d * resistance,
+        dunlop=(
+            7.0 * fa - fb,
+            0.128 - 17.0 * fa + 2.5 * fb,
+            -0.128 + 13.0 * fa - 2.0 * fb,
+            0.032 - 3.0 * fa + 0.5 * fb
+        )
+    )
+
+def _pipe_headloss(q: np.ndarray, dw: _DarcyWeisbach) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Darcy-Weisbach head loss (m) of pipes and its gradient (m per m^3/h),
+    with the friction factor of EPANET (Hagen-Poiseuille, Dunlop's
+    interpolation in the transition zone, Swamee-Jain).
+    """
+    qa = np.abs(q) / _CMH_PER_CFS
+    reynolds = qa * dw.reynolds_per_cfs
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f = 0.25 / np.log10(dw.rel_roughness + 5.74 / np.power(reynolds, 0.9))**2
+        x1, x2, x3, x4 = dw.dunlop
+        r = reynolds / 2000.0
+        f = np.where(reynolds < 4000.0, x1 + r * (x2 + r * (x3 + r * x4)), f)
+
+    # Laminar: f = 64/Re, the head loss is linear in the flow
+    laminar = reynolds <= 2000.0
+    f = np.where(laminar, 0.0, f)
+    laminar_r = np.where(laminar, dw.laminar_resistance, 0.0)
+
+    r1 = f * dw.resistance + dw.minor_loss
+    hloss = (r1 * qa + laminar_r) * qa
+    hgrad = np.maximum(2.0 * r1 * qa + laminar_r, _RQTOL)
+
+    return (
+        np.sign(q) * hloss * _M_PER_FT,
+        hgrad * _M_PER_FT / _CMH_PER_CFS
+    )
+
+def _pump_gain(
+        q: np.ndarray,
+        n_running: np.ndarray,
+        speeds: np.ndarray,
+        curve_flows: np.ndarray,
+        curve_heads: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Head gain (m) of n identical pumps in parallel at the same speed and
+    its gradient (m per m^3/h, positive). Like EPANET, the multi-point curve
+    is piecewise linear, extended with its first and last segments.
+    """
+    n = np.maximum(n_running, 1)
+    s = np.where(speeds > 0, speeds, 1.0)
+    x = np.abs(q) / n / s
+
+    k2 = np.clip(np.searchsorted(curve_flows, x, side='left'), 1, len(curve_flows) - 1)
+    k1 = k2 - 1
+    slope = (curve_heads[k2] - curve_heads[k1]) / (curve_flows[k2] - curve_flows[k1])
+    h0 = curve_heads[k1] - slope * curve_flows[k1]
+
+    gain = s**2 * h0 + s * slope * np.abs(q) / n
+    ggrad = np.maximum(-s * slope / n, _RQTOL * _M_PER_FT / _CMH_PER_CFS)
+
+    return gain, ggrad
+
+def _shutoff_head(speeds: np.ndarray, curve_flows: np.ndarray, curve_heads: np.ndarray) -> np.ndarray:
+    slope = (curve_heads[1] - curve_heads[0]) / (curve_flows[1] - curve_flows[0])
+    return speeds**2 * (curve_heads[0] - slope * curve_flows[0])
+
+def _demand_headloss(d: np.ndarray, full_demand: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pressure driven demands are modelled as links to a virtual reservoir at
+    the minimum pressure: the head loss is (preq - pmin)*(d/D)^(1/pexp), with
+    barriers keeping the delivered demand between 0 and D.
+    """
+    dp = PDA_PREQ - PDA_PMIN
+    n = 1.0 / PDA_PEXP
+    big = _CBIG * _M_PER_FT / _CMH_PER_CFS
+    rqtol = _RQTOL * _M_PER_FT / _CMH_PER_CFS
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(full_demand > 0, d / full_demand, 0.0)
+        hgrad = n * dp * np.power(np.clip(ratio, 0.0, None), n - 1.0) / full_demand
+        hloss = hgrad * d / n
+
+    small = ~(hgrad >= rqtol)
+    hgrad = np.where(small, rqtol, hgrad)
+    hloss = np.where(small, rqtol * d, hloss)
+
+    above = ratio > 1.0
+    hloss = np.where(above, dp + big * (d - full_demand), hloss)
+    hgrad = np.where(above, big, hgrad)
+
+    below = ratio < 0.0
+    hloss = np.where(below, big * d, hloss)
+    hgrad = np.where(below, big, hgrad)
+
+    return hloss, hgrad
+
+def _tree_levels(parents: np.ndarray) -> List[np.ndarray]:
+    """The municipalities grouped by depth in the tree, the root excluded."""
+    depth = np.zeros(len(parents), dtype=np.int64)
+    for c in range(1, len(parents)):
+        depth[c] = depth[parents[c]] + 1
+    return [np.flatnonzero(depth == level) for level in range(1, depth.max(initial=0)+1)]
+
+def solve_tree_hydraulics(
+        model: TreeHydraulicModel,
+        demands: np.ndarray,
+        n_running: np.ndarray,
+        speeds: np.ndarray,
+        accuracy: float = 1e-6,
+        max_trials: int = 200
+    ) -> TreeHydraulicSolution:
+    """
+    Solve T independent hydraulic snapshots of a tree cluster at once.
+
+    It's the same gradient algorithm of EPANET (heads as unknowns, flows
+    updated from the linearised head losses), but the tree structure lets us
+    solve the linear system of each iteration by eliminating the municipalities
+    level by level from the leaves to the root, vectorised over the hours.
+    An hour stops being updated as soon as it converges, so its solution
+    doesn't depend on the other hours solved with it.
+    """
+    T, N = demands.shape
+    demands = demands.astype(np.float64)
+    parents = model.parents
+    levels = _tree_levels(parents)
+    children = np.arange(1, N)
+    up = parents[1:]
+
+    curve_flows = model.pump_option.head_curve.index.to_numpy(dtype=np.float64)
+    curve_heads = model.pump_option.head_curve.to_numpy(dtype=np.float64)
+
+    pumps_on = (n_running > 0) & (speeds > 0)
+    shutoff = _shutoff_head(np.where(pumps_on, speeds, 0.0), curve_flows, curve_heads)
+    fixed_heads = model.elevations + PDA_PMIN
+    has_demand = demands > 0
+
+    # Start from the full demands delivered
+    d = demands.copy()
+    q_pipes = d.copy()
+    for level in reversed(levels):
+        np.add.at(q_pipes, (slice(None), parents[level]), q_pipes[:, level])
+    q_chain = q_pipes[:, 0].copy()
+    q_pipes = q_pipes[:, 1:]
+    chain_open = pumps_on.copy()
+
+    heads = np.zeros((T, N))
+    converged = np.zeros(T, dtype=bool)
+    trials = np.zeros(T, dtype=np.int32)
+    # The check valve, the supply pipe and then the pipes of the tree
+    dw = _darcy_weisbach(PipeData(*[
+        np.concatenate([cv, supply, pipes[1:]])
+        for cv, supply, pipes in zip(model.check_valve, model.supply_pipe, model.pipes)
+    ]))
+    closed_p = 1.0 / (_CBIG * _M_PER_FT / _CMH_PER_CFS)
+
+    for _ in range(max_trials):
+        # ---- Linearise every link: p = 1/hgrad, y = p*hloss
+        hl, hg = _pipe_headloss(np.column_stack([q_chain, q_chain, q_pipes]), dw)
+        gain, gg = _pump_gain(q_chain, n_running, speeds, curve_flows, curve_heads)
+        p_chain = np.where(chain_open, 1.0 / (hg[:, 0] + hg[:, 1] + gg), closed_p)
+        y_chain = np.where(chain_open, p_chain * (hl[:, 0] + hl[:, 1] - gain), q_chain)
+
+        p_pipes = 1.0 / hg[:, 2:]
+        y_pipes = p_pipes * hl[:, 2:]
+
+        hl_d, hg_d = _demand_headloss(d, demands)
+        p_d = np.where(has_demand, 1.0 / hg_d, 0.0)
+        y_d = np.where(has_demand, p_d * hl_d, d)
+
+        # ---- Assemble: diagonal and right hand side of each municipality
+        diag = p_d.copy()
+        rhs = -(d - y_d) + p_d * fixed_heads
+        diag[:, 0] += p_chain
+        rhs[:, 0] += (q_chain - y_chain) + p_chain * model.reservoir_head
+        diag[:, 1:] += p_pipes
+        rhs[:, 1:] += q_pipes - y_pipes
+        np.add.at(diag, (slice(None), up), p_pipes)
+        np.subtract.at(rhs, (slice(None), up), q_pipes - y_pipes)
+
+        # ---- Solve: eliminate from the leaves to the root, then back
+        for level in reversed(levels):
+            p_level = p_pipes[:, level - 1]
+            ratio = p_level / diag[:, level]
+            np.subtract.at(diag, (slice(None), parents[level]), p_level * ratio)
+            np.add.at(rhs, (slice(None), parents[level]), rhs[:, level] * ratio)
+        new_heads = heads.copy()
+        new_heads[:, 0] = rhs[:, 0] / diag[:, 0]
+        for level in levels:
+            new_heads[:, level] = (
+                rhs[:, level] + p_pipes[:, level - 1] * new_heads[:, parents[level]]
+            ) / diag[:, level]
+
+        # ---- Update the flows
+        new_q_chain = q_chain - y_chain + p_chain * (model.reservoir_head - new_heads[:, 0])
+        new_q_pipes = q_pipes - y_pipes + p_pipes * (new_heads[:, up] - new_heads[:, children])
+        new_d = np.where(has_demand, d - y_d + p_d * (new_heads - fixed_heads), 0.0)
+
+        # The check valve (and the pumps) don't let the water flow back:
+        # close when the flow reverses, reopen when the pumps can overcome the head
+        new_q_chain = np.where(chain_open, new_q_chain, 0.0)
+        reopen = ~chain_open & pumps_on & (model.reservoir_head + shutoff > new_heads[:, 0])
+        close = chain_open & (new_q_chain < 0)
+        new_q_chain = np.where(close, 0.0, new_q_chain)
+        status_changed = reopen | close
+        new_chain_open = (chain_open & ~close) | reopen
+
+        dq = (
+            np.abs(new_q_chain - q_chain) +
+            np.abs(new_q_pipes - q_pipes).sum(axis=1) +
+            np.abs(new_d - d).sum(axis=1)
+        )
+        qsum = np.abs(new_q_chain) + np.abs(new_q_pipes).sum(axis=1) + np.abs(new_d).sum(axis=1)
+
+        # Keep the hours that had already converged as they were
+        active = ~converged
+        trials += active
+        q_chain = np.where(active, new_q_chain, q_chain)
+        q_pipes = np.where(active[:, None], new_q_pipes, q_pipes)
+        d = np.where(active[:, None], new_d, d)
+        heads = np.where(active[:, None], new_heads, heads)
+        chain_open = np.where(active, new_chain_open, chain_open)
+
+        converged |= ~status_changed & (dq <= accuracy * np.maximum(qsum, 1e-9))
+        if converged.all():
+            break
+
+    gain, _ = _pump_gain(q_chain, n_running, speeds, curve_flows, curve_heads)
+    pipes_flow = np.zeros((T, N))
+    pipes_flow[:, 1:] = q_pipes * model.pipes_sign[1:]
+
+    return TreeHydraulicSolution(
+        consumptions=np.clip(d, 0.0, demands),
+        production=q_chain,
+        pipes_flow=pipes_flow,
+        pump_heads=np.where(chain_open, gain, 0.0),
+        converged=converged,
+        trials=trials
+    )
+
+def pumps_power(
+        pump_option: PumpOption,
+        pump_heads: np.ndarray,
+        production: np.ndarray,
+        n_running: np.ndarray,
+        speeds: np.ndarray
+    ) -> np.ndarray:
+    """
+    Power (kW) used by each running pump, computed as EPANET does: the
+    efficiency is read at the flow of the pump scaled to full speed.
+    """
+    n = np.maximum(n_running, 1)
+    s = np.where(speeds > 0, speeds, 1.0)
+    q_pump = production / n
+
+    eff_flows = pump_option.eff_curve.index.to_numpy(dtype=np.float64)
+    eff_values = pump_option.eff_curve.to_numpy(dtype=np.float64)
+    e = np.interp(q_pump / s, eff_flows, eff_values)
+    e = 100.0 - (100.0 - e) * np.power(1.0 / s, 0.1)
+    e = np.clip(e, 1.0, 100.0) / 100.0
+
+    kw = (pump_heads / _M_PER_FT) * (q_pump / _CMH_PER_CFS) / _HP_PER_KW_FACTOR / e * _KW_PER_HP
+    return np.where((n_running > 0) & (production > 0), kw, 0.0)
+
+class TreeCluster(NamedTuple):
+    """The hydraulic model of a cluster and the ids to label its results."""
+    model: TreeHydraulicModel
+    source_id: str
+    municipalities_id: List[str] # in the order of the model
+    pipes_id: List[str] # in the order of the model, the root has no pipe ('')
+    pumps_id: List[str] # as in the EPANET model of the cluster
+
+def build_tree_cluster(
+        year: int,
+        water_utilities: Set[WaterUtility],
+        cross_utility_connections: Set[PeerConnection]
+    ) -> TreeCluster:
+    """
+    Build the hydraulic model of the same network build_epanet_network would
+    build this year, if it is a tree fed by a single source.
+
+    Raises
+    ------
+    NotATreeClusterError
+        If the network can't be solved by the fast path.
+    """
+    ts = timestampify(year, errors='raise')
+
+    elements = _collect_network_elements(year, water_utilities, cross_utility_connections)
+
+    if len(elements.pumping_stations_map) != 1:
+        raise NotATreeClusterError(f"{len(elements.pumping_stations_map)} sources with pumps, the fast path needs one")
+    ((source, (pumping_station, supply_con)),) = elements.pumping_stations_map.items()
+
+    pumps = pumping_station.active_pumps(when=year)
+    pump_options = set(p._pump_option for p in pumps.values())
+    if len(pump_options) != 1:
+        raise NotATreeClusterError(f"{pumping_station.bwf_id} has different pump options")
+    (pump_option,) = pump_options
+
+    # EPANET fits a power function instead of using 1 and 3 points curves
+    curve_flows = pump_option.head_curve.index.to_numpy()
+    curve_heads = pump_option.head_curve.to_numpy()
+    if (
+        len(curve_flows) == 1 or
+        (len(curve_flows) == 3 and curve_flows[0] == 0.0) or
+        np.any(np.diff(curve_flows) <= 0) or
+        np.any(np.diff(curve_heads) >= 0)
+    ):
+        raise NotATreeClusterError(f"{pump_option.bwf_id} head curve is not a multi-point curve")
+
+    # Adjacency of the municipalities through the active pipes
+    municipalities_id = set(m.cbs_id for m in elements.municipalities)
+    adjacency: Dict[str, List[Tuple[str, str, PeerConnection]]] = {m: [] for m in municipalities_id}
+    n_pipes = 0
+    for con in sorted(elements.peer_connections, key=lambda c: c.bwf_id):
+        if not con.has_active_pipe(year):
+            continue
+        from_id = con.from_node.effective_cbs_id(year)
+        to_id = con.to_node.effective_cbs_id(year)
+        if from_id not in adjacency or to_id not in adjacency or from_id == to_id:
+            raise NotATreeClusterError(f"{con.bwf_id} doesn't connect two municipalities of the cluster")
+        adjacency[from_id].append((to_id, from_id, con))
+        adjacency[to_id].append((from_id, from_id, con))
+        n_pipes += 1
+
+    if n_pipes != len(municipalities_id) - 1:
+        raise NotATreeClusterError(f"{n_pipes} pipes for {len(municipalities_id)} municipalities, not a tree")
+
+    # Visit the tree from the municipality of the source, so parents come first
+    root_id = supply_con.to_node.effective_entity(year).cbs_id
+    if root_id not in adjacency:
+        raise NotATreeClusterError(f"{source.bwf_id} supplies a municipality outside the cluster")
+    order = [root_id]
+    parents = [-1]
+    edges: List[PeerConnection | None] = [None]
+    signs = [1.0]
+    position = {root_id: 0}
+    queue = deque([root_id])
+    while queue:
+        node_id = queue.popleft()
+        for other_id, from_id, con in adjacency[node_id]:
+            if other_id in position:
+                continue
+            position[other_id] = len(order)
+            order.append(other_id)
+            parents.append(position[node_id])
+            edges.append(con)
+            signs.append(1.0 if from_id == node_id else -1.0)
+            queue.append(other_id)
+
+    if len(order) != len(municipalities_id):
+        raise NotATreeClusterError("Some municipalities are not connected to the source")
+
+    def pipe_data_of(con) -> Tuple[float, float, float, float]:
+        pipe = con.active_pipe(year)
+        assert pipe is not None
+        return (
+            con.distance,
+            pipe._pipe_option.diameter,
+            pipe.friction_factor.loc[ts],
+            con.minor_loss_coeff
+        )
+
+    supply_pipe = pipe_data_of(supply_con)
+    municipalities = {m.cbs_id: m for m in elements.municipalities}
+
+    model = TreeHydraulicModel(
+        reservoir_head=source.elevation,
+        check_valve=_pipe_data([(1.0, supply_pipe[1], 0.0001, 0.0)]),
+        supply_pipe=_pipe_data([supply_pipe]),
+        pump_option=pump_option,
+        elevations=np.array([municipalities[m].elevation for m in order], dtype=np.float64),
+        parents=np.array(parents),
+        pipes=_pipe_data([(0.0, 1.0, 0.0, 0.0)] + [pipe_data_of(con) for con in edges[1:]]),
+        pipes_sign=np.array(signs)
+    )
+
+    return TreeCluster(
+        model=model,
+        source_id=source.bwf_id,
+        municipalities_id=order,
+        pipes_id=[''] + [con.active_pipe(year).bwf_id for con in edges[1:]], # type: ignore
+        pumps_id=[p.bwf_id for p in pumps.values()]
+    )
+
+def run_cluster_tree_hydraulics(
+        national_context: NationalContext,
+        cluster: WaterUtilitiesCluster,
+        year: int,
+        settings: Settings
+    ) -> Tuple[BWFHydraulicSimReults, HydraulicsTelemetry]:
+    """
+    Same simulation of run_cluster_hydraulics, for a cluster that qualifies
+    for the fast path (see :func:`build_tree_cluster`).
+
+    The pumping station controls of an hour depend on the production of the
+    previous 23 hours only when the remaining daily capacity of the source is
+    below the peak discharge of the pumping station. So we guess that it is
+    not, solve many hours at once, and keep them up to the first hour where
+    the guess was wrong. From there we go hour by hour until the capacity stops
+    limiting the source.
+    """
+    tree = build_tree_cluster(year, cluster.water_utilities, cluster.cross_utility_connections)
+    model = tree.model
+    source = next(s for s in cluster.water_sources if s.bwf_id == tree.source_id)
+
+    year_timesteps = pd.date_range(
+        start=f"{year}-01-01 00:00:00",
+        periods=365 * 24,
+        freq="h"
+    )
+    T = len(year_timesteps)
+
+    # Demands in the order of the EPANET junctions, and of the tree model
+    municipalities_id = sorted(tree.municipalities_id)
+    municipalities_dem = national_context.municipalities_total_demands.loc[
+        year_timesteps,
+        municipalities_id
+    ].to_numpy(dtype=np.float32)
+    model_order = [municipalities_id.index(m) for m in tree.municipalities_id]
+    model_dem = municipalities_dem[:, model_order]
+
+    # ---- Pumping station controls, see run_cluster_hydraulics
+    pump_option = model.pump_option
+    n_avail_pumps = len(tree.pumps_id)
+    target_head = get_source_head(pstations_target_heads, source, year)
+    peak_discharge = np.float64(source.pumping_station.peak_discharge(when=year))
+    target_head_peak_discharge = peak_discharge * np.sqrt(target_head / pump_option.head_curve.max())
+
+    # The speeds patterns are assigned to the pumps in order of id
+    pump_rank = np.argsort(np.argsort(tree.pumps_id))
+
+    # Same (S,) arrays of run_cluster_hydraulics, with one source, so that
+    # the rolling daily production is rounded the same way
+    sources_eopy_np = np.array([
+        np.zeros(23, dtype=np.float32)
+        if source.bwf_id not in national_context.sources_production or len(national_context.sources_production[source.bwf_id].dropna())==0
+        else national_context.sources_production[source.bwf_id].dropna().iloc[-23:].to_numpy(dtype=np.float32)
+    ]).T  # (23, 1)
+    daily_prod_history = deque(sources_eopy_np[:, 0], maxlen=23)
+    daily_productions = sources_eopy_np.sum(axis=0)[0]
+
+    sources_available_capacities = pd.DataFrame({
+        s.bwf_id: s.available_capacity
+        for s in cluster.water_sources
+    })
+    sources_available_capacities.ffill(inplace=True)
+    sources_available_capacities = sources_available_capacities.loc[
+        sources_available_capacities.index.year == year
+    ]
+    if sources_available_capacities.empty:
+        sources_available_capacities = pd.DataFrame({
+            s.bwf_id: [s.nominal_capacity]
+            for s in cluster.water_sources
+        }, index=[year_timesteps[0]])
+    avcap_ptr = np.maximum(
+        np.searchsorted(sources_available_capacities.index, year_timesteps, side='right') - 1,
+        0
+    )
+    hourly_avcap = sources_available_capacities[source.bwf_id].to_numpy(dtype=np.float32)[avcap_ptr]
+
+    dem_to_cap = municipalities_dem.sum(axis=1).astype(np.float64) / peak_discharge
+
+    def controls(tidx: np.ndarray, capacity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        n = len(tidx)
+        setups = get_lowest_energy_pumping_station_setups(
+            target_heads=np.full(n, target_head),
+            target_flows=capacity * dem_to_cap[tidx],
+            n_available_pumps=np.full(n, n_avail_pumps),
+            pump_options=[pump_option]*n,
+            speed_ratio_bounds=(0.5,1.00),
+            pump_curve_coeffs=np.tile(pump_option.pump_curve_coeffs, (n, 1))
+        )
+        # where it is not possible, try maxing out
+        pattern_value = (
+            np.where(setups.valid, setups.n_pumps, n_avail_pumps) +
+            np.where(setups.valid, setups.speeds, 1.0)
+        )
+        n_running = np.clip(np.ceil(pattern_value) - 1, 0, n_avail_pumps).astype(np.int64)
+        speeds = np.where(n_running > 0, pattern_value - n_running, 0.0)
+        return n_running, speeds
+
+    telemetry = HydraulicsTelemetry.empty(
+        cluster=cluster.filename,
+        year=year,
+        engine='tree',
+        n_hours=T
+    )
+
+    def solve(tidx: np.ndarray, capacity: np.ndarray):
+        setup_start = time.perf_counter()
+        n_running, speeds = controls(tidx, capacity)
+        solve_start = time.perf_counter()
+        solution = solve_tree_hydraulics(model, model_dem[tidx], n_running, speeds)
+        power = pumps_power(pump_option, solution.pump_heads, solution.production, n_running, speeds)
+        energies = np.where(pump_rank[None, :] < n_running[:, None], power[:, None], 0.0)
+        # The hours are solved together, they share the time equally. Hours
+        # solved again (after a wrong guess) account for both solutions.
+        telemetry.setup_time[tidx] += (solve_start - setup_start) / len(tidx)
+        telemetry.solve_time[tidx] += (time.perf_counter() - solve_start) / len(tidx)
+        return solution, energies
+
+    # Results will be stored here
+    model_consumptions = np.zeros((T, len(tree.municipalities_id)), dtype=np.float32)
+    sources_productions = np.zeros((T, 1), dtype=np.float32)
+    pipes_flows = np.zeros((T, len(tree.pipes_id)), dtype=np.float32)
+    pumps_energy_usage = np.zeros((T, n_avail_pumps), dtype=np.float32)
+    converged = np.ones(T, dtype=bool)
+
+    def capacities(hours: np.ndarray, productions: np.ndarray) -> np.ndarray:
+        """
+        The capacity of the source in these hours, as run_cluster_hydraulics
+        computes it, if the source produced `productions` in these hours.
+        """
+        rolling = daily_productions
+        history = deque(daily_prod_history, maxlen=23)
+        capacity = np.empty(len(hours))
+        for k, h in enumerate(hours):
+            capacity[k] = max(hourly_avcap[h] - rolling, np.float32(0.0))
+            rolling = rolling - history[0] + productions[k]
+            history.append(productions[k])
+        return np.minimum(capacity, target_head_peak_discharge)
+
+    def store(tidx: int, solution: TreeHydraulicSolution, energies: np.ndarray, k: int) -> None:
+        nonlocal daily_productions
+        model_consumptions[tidx] = solution.consumptions[k]
+        sources_productions[tidx] = solution.production[k]
+        pipes_flows[tidx] = solution.pipes_flow[k]
+        pumps_energy_usage[tidx] = energies[k]
+        converged[tidx] = solution.converged[k]
+        telemetry.trials[tidx] = solution.trials[k]
+
+        # keep the rolling daily production as run_cluster_hydraulics does
+        productions_h = sources_productions[tidx, 0]
+        daily_productions = daily_productions - daily_prod_history[0] + productions_h
+        daily_prod_history.append(productions_h)
+
+    # Guess the productions of the hours to come (at first, that they don't
+    # limit the capacity), solve a window of hours with the capacities that
+    # follow from the guess, and keep the hours up to the first one whose
+    # capacity was wrong. The new productions are the next guess.
+    productions_guess = np.zeros(T, dtype=np.float32)
+    tidx = 0
+    window = 24*7
+    while tidx < T:
+        hours = np.arange(tidx, min(tidx + window, T))
+        guessed_capacity = capacities(hours, productions_guess[hours])
+        solution, energies = solve(hours, guessed_capacity)
+
+        productions_guess[hours] = solution.production
+        right = guessed_capacity == capacities(hours, productions_guess[hours])
+        n_right = len(hours) if right.all() else int(np.argmin(right))
+
+        for k in range(n_right):
+            store(tidx, solution, energies, k)
+            tidx += 1
+
+        window = min(2*window, T) if n_right == len(hours) else 24*7
+
+    telemetry.status[~converged] = HourStatus.NOT_CONVERGED
+    if not converged.all():
+        net_logger = setup_cluster_logger(cluster.filename)
+        for ts in year_timesteps[~converged]:
+            net_logger.error(f"BWF Simulation hour: {ts} | TREE HYDRAULICS DID NOT CONVERGE")
+
+    # Results with the same layout of run_cluster_hydraulics
+    municipalities_consumptions = np.zeros_like(model_consumptions)
+    municipalities_consumptions[:, model_order] = model_consumptions
+
+    cross_wu_conn_id = [ c.bwf_id
+        for c in cluster.cross_utility_connections
+        if c.is_active(year)
+    ]
+    cross_wu_pipes = sorted(
+        (pipe_id, i)
+        for i, pipe_id in enumerate(tree.pipes_id)
+        if pipe_id[:6] in cross_wu_conn_id
+    )
+
+    municipalities_udem = np.clip(
+        municipalities_dem - municipalities_consumptions,
+        a_min=0.0,
+        a_max=None
+    )
+
+    sim_results = BWFHydraulicSimReults(
+        undelivered_demands=pd.DataFrame(
+            data=municipalities_udem,
+            index=year_timesteps,
+            columns=municipalities_id
+        ),
+        pumps_energy_consumption=pd.DataFrame(
+            data=pumps_energy_usage,
+            index=year_timesteps,
+            columns=tree.pumps_id
+        ),
+        cross_utilities_flows=pd.DataFrame(
+            data=pipes_flows[:, [i for _, i in cross_wu_pipes]],
+            index=year_timesteps,
+            columns=[pipe_id for pipe_id, _ in cross_wu_pipes]
+        ),
+        sources_production=pd.DataFrame(
+            data=sources_productions,
+            index=year_timesteps,
+            columns=[tree.source_id]
+        )
+    )
+
+    return sim_results, telemetry
+
+def simulate_cluster_hydraulics(
+        national_context: NationalContext,
+        cluster: WaterUtilitiesCluster,
+        year: int,
+        settings: Settings,
+        use_network_cache: bool = True
+    ) -> Tuple[BWFHydraulicSimReults, HydraulicsTelemetry]:
+    """
+    Simulate the hydraulics of a cluster with the engine chosen in the settings.
+    The clusters that don't qualify for the tree engine are simulated with EPANET.
+    The results come with the telemetry of the solver (see services/hydraulics_telemetry.py).
+    """
+    if settings.hydraulics_engine == 'tree':
+        try:
+            return run_cluster_tree_hydraulics(
+                national_context=national_context,
+                cluster=cluster,
+                year=year,
+                settings=settings
+            )
+        except NotATreeClusterError:
+            pass
+
+    return run_cluster_hydraulics(
+        national_context=national_context,
+        cluster=cluster,
+        year=year,
+        settings=settings,
+        use_network_cache=use_network_cache
+    )
@@ -1,5 +1,5 @@
 from .entities import WaterSource, GroundWater, SurfaceWater, Desalination, SourcesSettings
-from .services import build_sources, dump_sources
+from .services import build_sources, build_sources_reads, dump_sources
 
 __all__ = [
 	"WaterSource",
@@ -7,6 +7,7 @@ __all__ = [
 	"SurfaceWater",
 	"Desalination",
 	"build_sources",
+	"build_sources_reads",
     "dump_sources",
     "SourcesSettings",
 ]
\ No newline at end of file
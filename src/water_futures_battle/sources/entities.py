@@ -6,7 +6,8 @@ import numpy as np
 import pandas as pd
 
 from ..core.base_model import bwf_entity, Location
-from ..core.utility import timestampify, BWFTimeLike, OptionalTimestamp, filter_columns
+from ..core.registry import EntityRegistry
+from ..core.utility import timestampify, active_years, ActiveYears, BWFTimeLike, OptionalTimestamp, filter_columns
 from ..jurisdictions.entities import Province, Municipality
 
 from .enums import SourceSize
@@ -83,6 +84,13 @@ class WaterSource(Location, ABC):
         if pd.notna(self._closure_date):
             return self._closure_date
         return self._CLOSURE_REGISTRY.get(self.bwf_id, pd.NaT)
+
+    # Years in which each source is active (see active_years), kept in sync with
+    # the activation and closure registries
+    _ACTIVE_YEARS: ClassVar[Dict[str, ActiveYears]] = {}
+
+    def _index_activity(self) -> None:
+        self._ACTIVE_YEARS[self.bwf_id] = active_years(self.activation_date, self.closure_date)
     
     _opex_vol_enfactor: float
     OPEX_VOLUM_ENERGY = 'opex-volum-energy_factor' # [kWh/m$^3$] Covers pumping, treatment, etc.
@@ -153,6 +161,8 @@ class WaterSource(Location, ABC):
 
     def __post_init__(self) -> None:
         assert self._sources_settings is not None
+        self._index_activity()
+        EntityRegistry.register(WaterSource, self)
 
     def open_production(
             self,
@@ -190,6 +200,7 @@ class WaterSource(Location, ABC):
         self._OPEXVEF_REGISTRY[self.bwf_id] = opex_vol_ene_factor_rng.uniform(
             *self.new_source_opex_energyf_bounds
         )
+        self._index_activity()
 
         return self
     
@@ -215,6 +226,7 @@ class WaterSource(Location, ABC):
             )
         
         self._CLOSURE_REGISTRY[self.bwf_id] = ts
+        self._index_activity()
 
         return self
     
@@ -223,6 +235,10 @@ class WaterSource(Location, ABC):
         Returns True if the source is active at the given year/date/timestamp.
         Accepts year (int or str), date string, or pd.Timestamp.
         """
+        if isinstance(when, int):
+            first, stop = self._ACTIVE_YEARS[self.bwf_id]
+            return first <= when < stop
+
         ts = timestampify(when, errors='raise')
         if pd.isna(self.activation_date) or ts < self.activation_date:
             return False
@@ -379,6 +395,8 @@ class GroundWater(WaterSource):
         assert self._sources_settings is not None
         assert self._dynamic_properties is not None
         assert self._results is not None
+        self._index_activity()
+        EntityRegistry.register(WaterSource, self)
 
     def to_dict(self) -> Dict[str, Any]:
         return super().to_dict() | {self.PERMIT: self.permit}
@@ -470,6 +488,8 @@ class SurfaceWater(WaterSource):
     def __post_init__(self):
         assert self._dynamic_properties is not None
         assert self._results is not None
+        self._index_activity()
+        EntityRegistry.register(WaterSource, self)
 
     def to_dict(self) -> Dict[str, Any]:
         return super().to_dict() | {self.BASIN: self.basin}
@@ -535,6 +555,8 @@ class Desalination(WaterSource):
     def __post_init__(self):
         assert self._dynamic_properties is not None
         assert self._results is not None
+        self._index_activity()
+        EntityRegistry.register(WaterSource, self)
 
 ValidWaterSources = Union[GroundWater, SurfaceWater, Desalination]
 GroundWaterSources = Set[GroundWater]
@@ -611,9 +633,9 @@ class SourcesContainer:
         Return the WaterSource object whose bwf_id matches the given string.
         Raises KeyError if not found.
         """
-        for source in self:
-            if source.bwf_id == bwf_id:
-                return source
+        source = EntityRegistry.get(WaterSource, bwf_id)
+        if source is not None and source in self.m_sources.get(source.NAME, ()):
+            return source
         raise KeyError(f"No WaterSource with bwf_id '{bwf_id}' found.")
         
 @dataclass(frozen=True)
@@ -127,6 +127,11 @@ class SourcesResults(BWFResult):
     TRACKED_VARIABLES = [
         PRODUCTION
     ]
+    # The hydraulics of a year start from the production of the last 23 hours
+    # of the previous one (24-hours capacity of the sources)
+    LOOKBACK = {
+        PRODUCTION: 23
+    }
 
 @bwf_database
 class GroundWaterDB(SourcesDB):
@@ -5,7 +5,7 @@ Here we will have the sources:
 - Desalination (brackish water)
 """
 import os
-from typing import Any, Dict, Set, Tuple
+from typing import Any, Dict, List, Set, Tuple
 from pathlib import Path
 
 import pandas as pd
@@ -13,6 +13,7 @@ import pandas as pd
 from ..core import Settings
 from ..core.base_model import StaticProperties
 from ..core.utility import timestampify
+from ..core.dataset_cache import ExcelRead, excel_reads
 from ..jurisdictions.entities import State
 
 from .enums import GroundwaterPermitDeviation
@@ -33,12 +34,10 @@ def build_sources(
     # They also have a common settings object.
     # Let's allocate the result object and the dictionary to hold the sources by type
     sources_results = SourcesResults()
+    # Production is hourly, make space for all the years we are going to simulate
+    sources_results.reserve(SourcesResults.PRODUCTION, n_timestamps=365*24*settings.n_years_to_simulate)
     
-    global_options_df = pd.read_excel(
-        Path(data_path) / Path(properties_desc.get('sources-static_properties', "")),
-        sheet_name='global',
-        index_col='source_type'
-    )
+    global_options_df = _static_properties_read(properties_desc, data_path, 'global', index_col='source_type').read()
 
     # Create the sources' settings
     src_settings = SourcesSettings.from_configs(
@@ -60,10 +59,7 @@ def build_sources(
         ws_type.set_dynamic_properties(sources_db)
         ws_type.set_results(sources_results)
 
-        entities_df = pd.read_excel(
-            Path(data_path) / Path(properties_desc.get('sources-static_properties', "")),
-            sheet_name=ws_type.NAME
-        )
+        entities_df = _static_properties_read(properties_desc, data_path, ws_type.NAME).read()
 
         sources = []
         for _, a_source_data in entities_df.iterrows():
@@ -83,6 +79,34 @@ def build_sources(
 
     return SourcesContainer(all_sources), src_settings
 
+def _static_properties_read(
+        properties_desc: Dict[str, str | float],
+        data_path: str,
+        sheet_name: str,
+        **kwargs
+    ) -> ExcelRead:
+    return ExcelRead(
+        Path(data_path) / Path(properties_desc.get('sources-static_properties', "")),
+        dict(sheet_name=sheet_name, **kwargs)
+    )
+
+def build_sources_reads(properties_desc: Dict[str, str | float], data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by build_sources."""
+    return excel_reads(
+        _static_properties_read(properties_desc, data_path, 'global', index_col='source_type'),
+        *(
+            read
+            for ws_type, db_type in zip(
+                [GroundWater, SurfaceWater, Desalination],
+                [GroundWaterDB, SurfaceWaterDB, DesalinationDB]
+            )
+            for read in (
+                db_type.excel_read(Path(data_path) / Path(properties_desc.get(db_type.NAME, ""))),
+                _static_properties_read(properties_desc, data_path, ws_type.NAME)
+            )
+        )
+    )
+
 def dump_sources(
         all_sources: SourcesContainer,
         sources_settings: SourcesSettings,
@@ -1,8 +1,9 @@
 from .entities import WaterDemandModelPattern, WaterDemandModelPatterns, WaterDemandModelData
-from .services import configure_water_demand_model, dump_water_demand_model
+from .services import configure_water_demand_model, configure_water_demand_model_reads, dump_water_demand_model
 
 __all__ = [
     'configure_water_demand_model',
+    'configure_water_demand_model_reads',
     'dump_water_demand_model',
     'WaterDemandModelPattern',
     'WaterDemandModelPatterns',
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Any, Dict, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Dict, NamedTuple, Optional, Tuple
 
 import numpy as np
 
@@ -7,6 +7,17 @@ from .properties import WaterDemandModelDB
 
 # Entites are the patterns, which have, identifier, type/category and values (the 8760-value pattern)
 
+class PatternHarmonics(NamedTuple):
+    """
+    Decomposition of a yearly pattern used by the demand modulation:
+    hourly values normalised by their daily mean and the first harmonics of
+    the daily means.
+    """
+    hourly_adim: np.ndarray # (24, 365)
+    base: float
+    a_coeffs: np.ndarray
+    b_coeffs: np.ndarray
+
 @dataclass(frozen=True)
 class WaterDemandModelPattern:
         
@@ -19,6 +30,9 @@ class WaterDemandModelPattern:
     values: np.ndarray
     VALUES = [f'year_hour-{i}' for i in range(8760)]
 
+    # They don't change over the years, we compute them once (see water_demand_model.services)
+    _harmonics: Optional[PatternHarmonics] = field(default=None, init=False, repr=False, compare=False)
+
     def __eq__(self, other):
         if not isinstance(other, WaterDemandModelPattern):
             return NotImplemented
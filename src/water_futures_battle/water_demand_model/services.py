@@ -1,5 +1,5 @@
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 from pathlib import Path
 
 import numpy as np
@@ -7,9 +7,10 @@ import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import StaticProperties
+from ..core.dataset_cache import ExcelRead, excel_reads
 
 from .properties import WaterDemandModelDB
-from .entities import WaterDemandModelPattern, WaterDemandModelPatterns, WaterDemandModelData
+from .entities import PatternHarmonics, WaterDemandModelPattern, WaterDemandModelPatterns, WaterDemandModelData
 
 def configure_water_demand_model(
         config: dict,
@@ -25,10 +26,7 @@ def configure_water_demand_model(
     :return: Tuple with static and dynamic properties for the water demand model
     :rtype: tuple[Any, Any]
     """
-    wdm_sheets = pd.read_excel(
-        os.path.join(data_path, config['water_demand_model-static_properties']),
-        sheet_name=None
-    )
+    wdm_sheets = _static_properties_read(config, data_path).read()
 
     patterns: WaterDemandModelPatterns = {}
     for ptype in ['residential', 'business']:
@@ -46,6 +44,19 @@ def configure_water_demand_model(
 
     return (patterns, wdm_dps)
 
+def _static_properties_read(config: dict, data_path: str) -> ExcelRead:
+    return ExcelRead(
+        os.path.join(data_path, config['water_demand_model-static_properties']),
+        dict(sheet_name=None)
+    )
+
+def configure_water_demand_model_reads(config: dict, data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by configure_water_demand_model."""
+    return excel_reads(
+        _static_properties_read(config, data_path),
+        WaterDemandModelDB.excel_read(os.path.join(data_path, Path(config[WaterDemandModelDB.NAME])))
+    )
+
 N_HARMONICS = 3
 REFERENCE_T_MAX = 20.6
 T_MAX_RATIO_EXPONENT = 5
@@ -117,6 +128,102 @@ def modulate_house_pattern(
 
     return modulated_pattern.flatten()
 
+_HOURS_PER_DAY = 24
+_DAYS_PER_YEAR = 365
+# How many uniform draws (RNG.random) the modulation of one pattern consumes:
+# a and b harmonics scaling, daily scaling and hourly scaling.
+N_MODULATION_DRAWS = 2 * N_HARMONICS + _DAYS_PER_YEAR + _HOURS_PER_DAY * _DAYS_PER_YEAR
+
+def get_pattern_harmonics(pattern: WaterDemandModelPattern) -> PatternHarmonics:
+    """
+    Harmonic decomposition of a base pattern, as computed in modulate_house_pattern.
+    It is cached in the pattern, as it doesn't depend on the year.
+    """
+    if pattern._harmonics is not None:
+        return pattern._harmonics
+
+    hourly_matrix = pattern.values.reshape((_HOURS_PER_DAY, _DAYS_PER_YEAR))
+    daily_mean = np.mean(hourly_matrix, axis=0)
+    hourly_adim = hourly_matrix / daily_mean
+
+    days = np.arange(1, _DAYS_PER_YEAR + 1)
+    base = np.mean(daily_mean)
+    a_coeffs = []
+    b_coeffs = []
+    for k in range(1, N_HARMONICS+1):
+        a = (2 / _DAYS_PER_YEAR) * np.sum(daily_mean * np.cos(k * 2 * np.pi * days / _DAYS_PER_YEAR))
+        b = (2 / _DAYS_PER_YEAR) * np.sum(daily_mean * np.sin(k * 2 * np.pi * days / _DAYS_PER_YEAR))
+        a_coeffs.append(a)
+        b_coeffs.append(b)
+
+    harmonics = PatternHarmonics(
+        hourly_adim=hourly_adim,
+        base=base,
+        a_coeffs=np.array(a_coeffs),
+        b_coeffs=np.array(b_coeffs)
+    )
+    # We bypass immutability substituting the value to the field
+    object.__setattr__(pattern, '_harmonics', harmonics)
+
+    return harmonics
+
+def modulate_patterns(
+        patterns: List[WaterDemandModelPattern],
+        max_yearly_temp: float,
+        draws: np.ndarray
+    ) -> np.ndarray:
+    """
+    Batched version of modulate_house_pattern: modulates P patterns at once.
+
+    Instead of a random generator, it receives the uniform draws that
+    modulate_house_pattern would have taken from it, one row per pattern,
+    in the same order (so the results are identical).
+
+    Args:
+        patterns: the P base patterns to modulate.
+        max_yearly_temp: Maximum yearly temperature for modulation.
+        draws: (P, N_MODULATION_DRAWS) uniform values in [0, 1).
+
+    Returns:
+        (P, 24*365) array with the modulated hourly demand of each pattern.
+    """
+    n_patterns = len(patterns)
+    assert draws.shape == (n_patterns, N_MODULATION_DRAWS)
+
+    harmonics = [get_pattern_harmonics(p) for p in patterns]
+    hourly_adim = np.stack([h.hourly_adim for h in harmonics])
+    base = np.array([h.base for h in harmonics])
+    a_coeffs = np.stack([h.a_coeffs for h in harmonics])
+    b_coeffs = np.stack([h.b_coeffs for h in harmonics])
+
+    # Split the draws as they were taken in sequence
+    a_draws = draws[:, :N_HARMONICS]
+    b_draws = draws[:, N_HARMONICS:2*N_HARMONICS]
+    day_draws = draws[:, 2*N_HARMONICS:2*N_HARMONICS+_DAYS_PER_YEAR]
+    hour_draws = draws[:, 2*N_HARMONICS+_DAYS_PER_YEAR:].reshape((n_patterns, _HOURS_PER_DAY, _DAYS_PER_YEAR))
+
+    # Modulate harmonics with random scaling
+    days = np.arange(1, _DAYS_PER_YEAR + 1)
+    a_rand = a_coeffs * (HARMONIC_VAR_MIN + (HARMONICS_VAR_MAX - HARMONIC_VAR_MIN) * a_draws)
+    b_rand = b_coeffs * (HARMONIC_VAR_MIN + (HARMONICS_VAR_MAX - HARMONIC_VAR_MIN) * b_draws)
+    profiles = np.ones((n_patterns, _DAYS_PER_YEAR)) * base[:, None]
+    for k in range(N_HARMONICS):
+        profiles += a_rand[:, k:k+1] * np.cos((k + 1) * 2 * np.pi * days / _DAYS_PER_YEAR)
+        profiles += b_rand[:, k:k+1] * np.sin((k + 1) * 2 * np.pi * days / _DAYS_PER_YEAR)
+
+    # Apply temperature exponent
+    temp_exp = (max_yearly_temp/REFERENCE_T_MAX)**T_MAX_RATIO_EXPONENT
+    profiles = profiles ** temp_exp
+
+    # Apply random daily scaling
+    profiles *= DAY_VAR_MIN + (DAY_VAR_MAX - DAY_VAR_MIN) * day_draws
+
+    # Apply random hourly scaling and reconstruct full pattern
+    hourly_scaling = HOUR_VAR_MIN + (HOUR_VAR_MAX - HOUR_VAR_MIN) * hour_draws
+    modulated_hourly = hourly_adim * hourly_scaling * profiles[:, None, :]
+
+    return modulated_hourly.reshape((n_patterns, _HOURS_PER_DAY * _DAYS_PER_YEAR))
+
 def modulate_business_pattern(
         pattern: np.ndarray,
         RNG: np.random.Generator
@@ -1,6 +1,7 @@
 from .entities import WaterUtility
 from .services import (
     configure_water_utilities,
+    configure_water_utilities_reads,
     apply_nrw_interventions,
     apply_water_pricing_adjustments,
     apply_bond_to_debt_ratio,
@@ -37,6 +38,7 @@ WaterUtilityInterventions = [
 __all__ = [
     "WaterUtility",
     "configure_water_utilities",
+    "configure_water_utilities_reads",
     "apply_nrw_interventions",
     "apply_water_pricing_adjustments",
     "apply_bond_to_debt_ratio",
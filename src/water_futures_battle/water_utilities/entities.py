@@ -1,11 +1,13 @@
 from dataclasses import dataclass
-from typing import Any, Dict, Self, Set, Tuple, Union
+from typing import Any, Dict, List, Optional, Self, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 from ..core.base_model import bwf_entity
+from ..core.registry import EntityRegistry
 from ..core.utility import BWFTimeLike, timestampify
+from ..core.views import StateColumn
 from ..jurisdictions.entities import State, Region, Province, Municipality
 from ..sources.entities import WaterSource, GroundWater, SurfaceWater, Desalination
 from ..pumping_stations.entities import PumpingStation
@@ -15,6 +17,74 @@ from ..energy.entities import SolarFarm
 
 from .dynamic_properties import WaterUtilityDB, WaterUtilityResults
 
+class WaterExchanges:
+    """
+    The net water exchanges between the water utilities as a dense array
+    (timestamp x utility x utility). It is antisymmetric: [t, w, w'] is the
+    water that w sent to w' (negative if w received it).
+
+    The array is materialised from the tracked results (one column
+    '{w.id}-{w'.id}' per pair), again only after they have been written
+    (see PropertiesContainer.touch).
+    """
+    def __init__(self):
+        self._stamp: Optional[Tuple[WaterUtilityResults, int]] = None
+        self.index = pd.DatetimeIndex([])
+        self.rows: Dict[pd.Timestamp, int] = {}
+        self.utilities: Dict[str, int] = {}
+        self.values = np.zeros((0, 0, 0), dtype=np.float32)
+        # The utilities each utility exchanged water with, in the order of the results columns
+        self.partners: Dict[str, List[str]] = {}
+
+    def refresh(self, results: WaterUtilityResults) -> Self:
+        version = results.version(WaterUtilityResults.NET_WATER_EXCHANGE)
+        if self._stamp is not None and self._stamp[0] is results and self._stamp[1] == version:
+            return self
+
+        df = results[WaterUtilityResults.NET_WATER_EXCHANGE]
+        pairs = [tuple(col.split('-')) for col in df.columns]
+
+        partners: Dict[str, Dict[str, None]] = {}
+        for wu_from, wu_to in pairs:
+            partners.setdefault(wu_from, {})[wu_to] = None
+            partners.setdefault(wu_to, {})[wu_from] = None
+        self.utilities = {wu_id: i for i, wu_id in enumerate(sorted(partners))}
+        self.partners = {wu_id: list(others) for wu_id, others in partners.items()}
+
+        self.index = df.index
+        self.rows = {ts: i for i, ts in enumerate(df.index)}
+
+        data = np.nan_to_num(df.to_numpy(), nan=0.0)
+        self.values = np.zeros((len(df.index), len(self.utilities), len(self.utilities)), dtype=data.dtype)
+        if pairs:
+            from_idx = [self.utilities[wu_from] for wu_from, _ in pairs]
+            to_idx = [self.utilities[wu_to] for _, wu_to in pairs]
+            self.values[:, from_idx, to_idx] = data
+            self.values[:, to_idx, from_idx] = -data
+
+        self._stamp = (results, version)
+        return self
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def of(self, wu_id: str) -> Tuple[np.ndarray, List[str]]:
+        """The (timestamp x partner) exchanges of `wu_id` and its partners."""
+        partners = self.partners.get(wu_id, [])
+        if not partners:
+            return np.zeros((len(self.index), 0), dtype=self.values.dtype), partners
+        return self.values[:, self.utilities[wu_id], [self.utilities[p] for p in partners]], partners
+
+    def of_at(self, wu_id: str, ts: pd.Timestamp) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """The exchanges of `wu_id` at `ts` and its partners (None if nothing was tracked at `ts`)."""
+        partners = self.partners.get(wu_id, [])
+        row = self.rows.get(ts)
+        if not partners or row is None:
+            return None
+        return self.values[row, self.utilities[wu_id], [self.utilities[p] for p in partners]], partners
+
+water_exchanges = WaterExchanges()
+
 @bwf_entity(db_type=WaterUtilityDB, results_type=WaterUtilityResults)
 @dataclass(frozen=True)
 class WaterUtility():
@@ -39,6 +109,18 @@ class WaterUtility():
         assert self._dynamic_properties is not None
         assert self._results is not None
 
+        EntityRegistry.register(WaterUtility, self)
+        for municipality in self.municipalities:
+            EntityRegistry.link(EntityRegistry.MUNICIPALITY_WATER_UTILITY, municipality.cbs_id, self)
+
+    @staticmethod
+    def serving(municipality: Municipality) -> 'WaterUtility':
+        """The water utility the municipality belongs to."""
+        water_utility = EntityRegistry.linked(EntityRegistry.MUNICIPALITY_WATER_UTILITY, municipality.cbs_id)
+        if water_utility is None:
+            raise ValueError(f"No water utility serves municipality {municipality.cbs_id}.")
+        return water_utility
+
     def __eq__(self, other):
         if not isinstance(other, WaterUtility):
             return NotImplemented
@@ -82,6 +164,23 @@ class WaterUtility():
         'nrw_mitigation_budget': float
     }
 
+    # The dynamic properties that the yearly state tables materialise for all the
+    # water utilities at once (see core/views.py)
+    STATE_ID = 'bwf_id'
+    STATE_COLUMNS = {
+        'balance': StateColumn([('_dynamic_properties', WaterUtilityDB.BALANCE)]),
+        'price_fix_comp': StateColumn([('_dynamic_properties', WaterUtilityDB.WPRICE_FIXED)]),
+        'price_var_comp': StateColumn([('_dynamic_properties', WaterUtilityDB.WPRICE_VARIA)]),
+        'price_sel_comp': StateColumn([('_dynamic_properties', WaterUtilityDB.WPRICE_SELL)]),
+        'debt': StateColumn([('_results', WaterUtilityResults.DEBT)]),
+        'bond_ratio': StateColumn([('_results', WaterUtilityResults.BA2D_RATIO)]),
+        'investment_budget': StateColumn([('_results', WaterUtilityResults.WUIB)]),
+        'capex': StateColumn([('_results', WaterUtilityResults.CAPEX)]),
+        'opex': StateColumn([('_results', WaterUtilityResults.OPEX)]),
+        'gw_permit_fine': StateColumn([('_results', WaterUtilityResults.FIN)]),
+        'nrw_mitigation_budget': StateColumn([('_results', WaterUtilityResults.WLR)]),
+    }
+
     @property
     def state(self) -> State:
         # We assume a water utility operates only inside one state
@@ -116,6 +215,14 @@ class WaterUtility():
     
     def active_connections(self, when: BWFTimeLike) -> Set[Connection]:
         return set([c for c in self.connections if c.is_active(when=when)])
+
+    def has_connection(self, connection: Connection) -> bool:
+        """Same as `connection in self.connections`, without collecting them."""
+        if connection in self.m_peer_connections:
+            return True
+        if isinstance(connection, SupplyConnection) and connection.from_node in self.m_supplies:
+            return self.m_supplies[connection.from_node][1] == connection
+        return False
     
     @property
     def pumping_stations(self) -> Set[PumpingStation]:
@@ -125,6 +232,12 @@ class WaterUtility():
     
     def active_pumping_stations(self, when: BWFTimeLike) -> Set[PumpingStation]:
         return set(ps for ps in self.pumping_stations if ps.is_active(when=when))
+
+    def has_pumping_station(self, pumping_station: PumpingStation) -> bool:
+        """Same as `pumping_station in self.pumping_stations`, without collecting them."""
+        if pumping_station.source not in self.m_supplies:
+            return False
+        return self.m_supplies[pumping_station.source][0] == pumping_station
     
     @property
     def sources(self) -> Set[WaterSource]:
@@ -165,6 +278,7 @@ class WaterUtility():
         ts = timestampify(when)
 
         self._dynamic_properties[WaterUtilityDB.BALANCE].loc[ts, self.bwf_id] = value
+        self._dynamic_properties.touch(WaterUtilityDB.BALANCE)
 
         return self
     
@@ -195,6 +309,8 @@ class WaterUtility():
         self._dynamic_properties[WaterUtilityDB.WPRICE_VARIA].loc[ts, self.bwf_id] = price_var_comp
 
         self._dynamic_properties[WaterUtilityDB.WPRICE_SELL].loc[ts, self.bwf_id] = price_sel_comp
+        for var in (WaterUtilityDB.WPRICE_FIXED, WaterUtilityDB.WPRICE_VARIA, WaterUtilityDB.WPRICE_SELL):
+            self._dynamic_properties.touch(var)
 
         return self
     
@@ -236,37 +352,21 @@ class WaterUtility():
         Returns the net water echange of this utility to all other utilities.
         Positive, means this utility is sending the water out, negative getting it in.
         """
-
-        full_df = self._results[WaterUtilityResults.NET_WATER_EXCHANGE]
-
-        int_columns = [ col
-            for col in full_df.columns
-            if self.bwf_id in col
-        ]
-        
-        values = {}
-        for col in int_columns:
-            wu_from, wu_to = col.split('-')
-
-            if self.bwf_id == wu_from:
-                # The values was from this utility to another, leave the sign unotuched
-                values[wu_to] = full_df[col]
-            else:
-                # The values are TO THIS w.u., thus we invert the value
-                assert self.bwf_id == wu_to
-                values[wu_from] = -full_df[col]
-
-        return pd.DataFrame(values).fillna(0.0)
+        values, partners = water_exchanges.refresh(self._results).of(self.bwf_id)
+        if not partners:
+            return pd.DataFrame()
+        return pd.DataFrame(values, index=water_exchanges.index, columns=partners)
 
     def net_water_exchange_at(self, when: BWFTimeLike) -> pd.Series:
         """
         Returns the net water exchange for a specific timestamp (row) or an empty series if not found.
         The returned series is named with the timestamp.
         """
-        df = self.net_water_exchange
         ts = timestampify(when)
-        if ts in df.index:
-            return df.loc[ts]
+        exchanges = water_exchanges.refresh(self._results).of_at(self.bwf_id, ts)
+        if exchanges is not None:
+            values, partners = exchanges
+            return pd.Series(values, index=pd.Index(partners), name=ts)
         
         # Return empty series with correct name
         return pd.Series(dtype=float, name=ts)
@@ -369,42 +469,31 @@ class WaterUtility():
             self.ASSGN_PROVINCES: ';'.join([pv.cbs_id for pv in self.m_provinces])
         }
     
-    def track_net_wat_exchange(
-            self,
+    @classmethod
+    def track_net_wat_exchanges(
+            cls,
             when: BWFTimeLike,
-            to: 'WaterUtility',
-            value: float
-        ) -> Self:
+            exchanges: Dict[Tuple['WaterUtility', 'WaterUtility'], float]
+        ) -> None:
         """
-        Track the net water exchange between one utility (from, i.e., self) to 
-        another one ($Delta Q _w^w'(y)$).
-
-        It expect a single value representing the total net exchange between two utilities
-        
-        :param self: Description
-        :param when: Description
-        :type when: int
-        :param to: Description
-        :type to: 'WaterUtility'
-        :param value: Description
-        :type value: float
-        :return: Description
-        :rtype: Self
+        Track the net water exchanges between pairs of utilities (from, to)
+        ($Delta Q _w^w'(y)$), one column '{from.id}-{to.id}' per pair, in order.
         """
-        assert np.ndim(value) == 0, "Value for net wat exchange is not a scalar"
+        if not exchanges:
+            return
 
-        self._results.commit(
+        cls._results.commit(
             a_property=WaterUtilityResults.NET_WATER_EXCHANGE,
             timestamps=pd.date_range(
                 start=timestampify(when),
                 periods=1,
                 freq='YS'
             ),
-            entity=f'{self.bwf_id}-{to.bwf_id}', # for the columns {w.id}-{w'.id}
-            values=value
+            data={
+                f'{wu_from.bwf_id}-{wu_to.bwf_id}': value
+                for (wu_from, wu_to), value in exchanges.items()
+            }
         )
-
-        return self
     
     def track_debt(
             self,
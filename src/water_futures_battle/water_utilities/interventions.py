@@ -3,6 +3,7 @@ from typing import Any, Dict, Set, Tuple
 import pandas as pd
 
 from ..core import Settings
+from ..core.registry import EntityRegistry
 from ..core.utility import timestampify
 
 from ..sources import WaterSource
@@ -33,103 +34,102 @@ class OpenSource:
         n_pumps = intervention_desc['n_pumps']
         pipe_option_id = intervention_desc['pipe_'+PipeOption.ID]
         
-        for source, (pumping_station, connection) in water_utility.m_supplies.items():
-
-            if source.bwf_id != source_id:
-                continue
-
-            # We have found the source that we need to open.
-            # However, it makes sense to open a source if it is closed and it was not 
-            # never open before. 
-            if source.is_active(when=year):
-                raise ValueError(
-                    f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
-                    f"Reason: the source is already active in this year."
-                )
-            
-            # Source is not active, but it may have been closed already
-            if pd.notna(source.closure_date):
-                raise ValueError(
-                    f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
-                    f"Reason: you can not re-open a closed source."
-                )
-            
-            # We check that the source capacity is ok when we open it for production,
-            # but here we search for the pipe option and pump option to install
-
-            pump_option = next((po for po in pump_options if po.bwf_id == pump_option_id), None)
-            if pump_option is None:
-                raise ValueError(
-                    f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
-                    f"No pump option found for ID {pump_option_id}."
-                )
-            
-            if n_pumps <= 0:
-                raise ValueError(
-                    f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
-                    f"You need to install at least one pump."
-                )
-            
-            pipe_option = next((po for po in pipe_options if po.bwf_id == pipe_option_id), None)
-            if pipe_option is None:
-                raise ValueError(
-                    f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
-                    f"No pipe option found for ID {pipe_option_id}."
-                )
-            
-            # At this point, we have validated all the inputs and it is time to 
-            # do the intervention and track the cost
-            # However, sources take some random time to be built, so we apply and 
-            # return the costs to be paid upfront now, but everything is set in 
-            # place to start working in the future.
-            constr_start_date = timestampify(year)
-
-            construction_time_rng = settings.get_random_generator('new_sources-construction_time')
-            construction_time_bounds = source.construction_years_bounds
+        source = EntityRegistry.get(WaterSource, source_id, within=water_utility.m_supplies)
+        if source is None:
+            raise ValueError(f"Impossible to find source with ID '{source_id}' in water utility {water_utility.bwf_id} for opening it.")
+        pumping_station, connection = water_utility.m_supplies[source]
+
+        # We have found the source that we need to open.
+        # However, it makes sense to open a source if it is closed and it was not 
+        # never open before. 
+        if source.is_active(when=year):
+            raise ValueError(
+                f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
+                f"Reason: the source is already active in this year."
+            )
+        
+        # Source is not active, but it may have been closed already
+        if pd.notna(source.closure_date):
+            raise ValueError(
+                f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
+                f"Reason: you can not re-open a closed source."
+            )
+        
+        # We check that the source capacity is ok when we open it for production,
+        # but here we search for the pipe option and pump option to install
 
-            constr_end_date = timestampify(year + int(construction_time_rng.integers(*construction_time_bounds)))
-            
-            source.open_production(
-                when=constr_end_date,
-                capacity=source_capacity,
-                opex_vol_ene_factor_rng=settings.get_random_generator('new_sources-opex_vol_ene_factor')
+        pump_option = EntityRegistry.get(PumpOption, pump_option_id, within=pump_options)
+        if pump_option is None:
+            raise ValueError(
+                f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
+                f"No pump option found for ID {pump_option_id}."
+            )
+        
+        if n_pumps <= 0:
+            raise ValueError(
+                f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
+                f"You need to install at least one pump."
+            )
+        
+        pipe_option = EntityRegistry.get(PipeOption, pipe_option_id, within=pipe_options)
+        if pipe_option is None:
+            raise ValueError(
+                f"Error applying the intervention 'OpenSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
+                f"No pipe option found for ID {pipe_option_id}."
             )
+        
+        # At this point, we have validated all the inputs and it is time to 
+        # do the intervention and track the cost
+        # However, sources take some random time to be built, so we apply and 
+        # return the costs to be paid upfront now, but everything is set in 
+        # place to start working in the future.
+        constr_start_date = timestampify(year)
 
-            table_unit_costs = source.construction_unit_costs.loc[constr_start_date]
-            unit_cost = table_unit_costs[source.source_size_class]
+        construction_time_rng = settings.get_random_generator('new_sources-construction_time', source.bwf_id, year)
+        construction_time_bounds = source.construction_years_bounds
 
-            cost = source.nominal_capacity * unit_cost
-            emissions = 0.0 # no emission associated with opening a source
+        constr_end_date = timestampify(year + int(construction_time_rng.integers(*construction_time_bounds)))
+        
+        source.open_production(
+            when=constr_end_date,
+            capacity=source_capacity,
+            opex_vol_ene_factor_rng=settings.get_random_generator('new_sources-opex_vol_ene_factor', source.bwf_id, year)
+        )
 
-            for _ in range(n_pumps):
-                new_pump = pumping_station.install_pump(
-                    pump_option=pump_option,
-                    installation_date=constr_end_date,
-                    decommission_date=None,
-                    lifetime_rng=settings.get_random_generator('pumps-lifetime')
-                )
+        table_unit_costs = source.construction_unit_costs.loc[constr_start_date]
+        unit_cost = table_unit_costs[source.source_size_class]
 
-                cost += new_pump._pump_option.unit_cost.loc[constr_start_date]
-                emissions += 0.0 # no emission associated with pumps
-        
-            
-            new_pipe = connection.install_pipe(
-                pipe_option=pipe_option,
+        cost = source.nominal_capacity * unit_cost
+        emissions = 0.0 # no emission associated with opening a source
+
+        pumps_lifetime_rng = settings.get_random_generator('pumps-lifetime', pumping_station.bwf_id, year, 'open')
+        for _ in range(n_pumps):
+            new_pump = pumping_station.install_pump(
+                pump_option=pump_option,
                 installation_date=constr_end_date,
                 decommission_date=None,
-                lifetime_rng=settings.get_random_generator('pipes-lifetime')
+                lifetime_rng=pumps_lifetime_rng
             )
 
-            pipe_unit_cost = float(new_pipe._pipe_option.unit_cost.loc[constr_start_date])
-            cost += pipe_unit_cost * connection.distance
+            cost += new_pump._pump_option.unit_cost.loc[constr_start_date]
+            emissions += 0.0 # no emission associated with pumps
+    
+        
+        new_pipe = connection.install_pipe(
+            pipe_option=pipe_option,
+            installation_date=constr_end_date,
+            decommission_date=None,
+            lifetime_rng=settings.get_random_generator('pipes-lifetime', connection.bwf_id, year, 'open')
+        )
+
+        pipe_unit_cost = float(new_pipe._pipe_option.unit_cost.loc[constr_start_date])
+        cost += pipe_unit_cost * connection.distance
 
-            pipe_emb_ghg = float(new_pipe._pipe_option.embodied_emssions.asof(constr_start_date))
-            emissions += pipe_emb_ghg *connection.distance
+        pipe_emb_ghg = float(new_pipe._pipe_option.embodied_emssions.asof(constr_start_date))
+        emissions += pipe_emb_ghg *connection.distance
 
-            return cost, emissions
+        return cost, emissions
 
-        # If we are here, it means we could not find the source. let's raise an error
-        raise ValueError(f"Impossible to find source with ID '{source_id}' in water utility {water_utility.bwf_id} for opening it.")
             
 class CloseSource:
     NAME = 'close_source'
@@ -146,38 +146,36 @@ class CloseSource:
         # Let's get the mandatory arguements
         source_id = intervention_desc[WaterSource.ID]
         
-        for source, (pumping_station, connection) in water_utility.m_supplies.items():
-
-            if source.bwf_id != source_id:
-                continue
-
-            # We have found the source that we need to close, let's close the
-            # connection, the pumping station and the source.
-            if not source.is_active(when=year):
-                raise ValueError(
-                    f"Error applying the intervention 'CloseSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
-                    f"Reason: the source is not active in this year."
-                )
-            
-            # Since the source is active, the connection should have a pipe and 
-            # the pumping stations at least a pump
-            assert (
-                connection.active_pipe(when=year) is not None and 
-                pumping_station.active_pumps(when=year)
-            ), "Error, closing a source that is active but is not connected (missing pipe in connection or pumps in pumping station)"
-
-            connection.active_pipe(when=year).decommission(when=year)
-            
-            for pump in pumping_station.active_pumps(when=year).values():
-                pump.decommission(when=year)
+        source = EntityRegistry.get(WaterSource, source_id, within=water_utility.m_supplies)
+        if source is None:
+            raise ValueError(f"Impossible to find source with ID '{source_id}' in water utility {water_utility.bwf_id} for closing it.")
+        pumping_station, connection = water_utility.m_supplies[source]
+
+        # We have found the source that we need to close, let's close the
+        # connection, the pumping station and the source.
+        if not source.is_active(when=year):
+            raise ValueError(
+                f"Error applying the intervention 'CloseSource' for source {source_id} in water utility {water_utility.bwf_id} on year {year}",
+                f"Reason: the source is not active in this year."
+            )
+        
+        # Since the source is active, the connection should have a pipe and 
+        # the pumping stations at least a pump
+        assert (
+            connection.active_pipe(when=year) is not None and 
+            pumping_station.active_pumps(when=year)
+        ), "Error, closing a source that is active but is not connected (missing pipe in connection or pumps in pumping station)"
+
+        connection.active_pipe(when=year).decommission(when=year)
+        
+        for pump in pumping_station.active_pumps(when=year).values():
+            pump.decommission(when=year)
 
-            source.close_production(when=year)
+        source.close_production(when=year)
 
-            # Done, no cost or emission associated with closing a source
-            return 0.0, 0.0
+        # Done, no cost or emission associated with closing a source
+        return 0.0, 0.0
 
-        # If we are here, it means we could not find the source. let's raise an error
-        raise ValueError(f"Impossible to find source with ID '{source_id}' in water utility {water_utility.bwf_id} for closing it.")
 
 from .entities import Connection
 
@@ -198,8 +196,8 @@ class InstallPipe:
         pipe_option_id = intervention_desc['pipe_'+PipeOption.ID]
         pipe_inst_date = timestampify(year)
 
-        connection = next((c for c in water_utility.connections if c.bwf_id == cnn_id), None)
-        if connection is None:
+        connection = EntityRegistry.get(Connection, cnn_id)
+        if connection is None or not water_utility.has_connection(connection):
             raise ValueError(f"Connection with id '{cnn_id}' not found in water utility {water_utility.bwf_id}.")
 
         if connection.replaced_by_cnn_id != '':
@@ -207,7 +205,7 @@ class InstallPipe:
                 f"Impossible to install a pipe on connection {cnn_id}: This connection has been replaced by {connection.replaced_by_cnn_id}"
             )
 
-        pipe_option = next((p for p in pipe_options if p.bwf_id == pipe_option_id), None)
+        pipe_option = EntityRegistry.get(PipeOption, pipe_option_id, within=pipe_options)
         if pipe_option is None:
             raise ValueError(f"PipeOption with id '{pipe_option_id}' not found.")
 
@@ -215,7 +213,9 @@ class InstallPipe:
         # we check only the first time 
         if not connection.has_active_pipe(when=year):
             for replaced_cnn_id in connection.replaces_cnn_ids:
-                replaced_cnn = next(c for c in water_utility.connections if c.bwf_id == replaced_cnn_id)
+                replaced_cnn = EntityRegistry.get(Connection, replaced_cnn_id)
+                assert replaced_cnn is not None and water_utility.has_connection(replaced_cnn), \
+                    f"Connection {replaced_cnn_id} not found in water utility {water_utility.bwf_id}."
 
                 repl_cnn_active_pipe = replaced_cnn.active_pipe(when=year)
                 if repl_cnn_active_pipe is not None:
@@ -224,7 +224,7 @@ class InstallPipe:
         new_pipe = connection.install_pipe(
             pipe_option=pipe_option,
             installation_date=pipe_inst_date,
-            lifetime_rng=settings.pipes_lifetime_rng
+            lifetime_rng=settings.get_random_generator('pipes-lifetime', connection.bwf_id, year, 'install')
         )
 
         # Calculate this new pipe cost because it will immediately influence the 
@@ -260,11 +260,11 @@ class InstallPumps:
         pump_option_id = intervention_desc['pump_'+PumpOption.ID]
         pump_inst_date = timestampify(year)
 
-        pump_station = next((ps for ps in water_utility.pumping_stations if ps.source.bwf_id == source_id), None)
-        if pump_station is None:
+        pump_station = EntityRegistry.linked(EntityRegistry.SOURCE_PUMPING_STATION, source_id)
+        if pump_station is None or not water_utility.has_pumping_station(pump_station):
             raise ValueError(f"No pumping station found for source ID {source_id} in water utility {water_utility.bwf_id}")
         
-        pump_option = next((po for po in pump_options if po.bwf_id == pump_option_id), None)
+        pump_option = EntityRegistry.get(PumpOption, pump_option_id, within=pump_options)
         if pump_option is None:
             raise ValueError(f"No pump option found for ID {pump_option_id}")
         
@@ -277,12 +277,13 @@ class InstallPumps:
                 
         cost = 0.0
         emiss = 0.0
+        lifetime_rng = settings.get_random_generator(cls._RNG_NAME, pump_station.bwf_id, year, 'install')
         for _ in range(intervention_desc["n_pumps"]):
             
             pump = pump_station.install_pump(
                 pump_option=pump_option,
                 installation_date=pump_inst_date,
-                lifetime_rng=settings.get_random_generator(cls._RNG_NAME)
+                lifetime_rng=lifetime_rng
             )
             
             cost += pump._pump_option.unit_cost.loc[pump_inst_date]
@@ -309,7 +310,7 @@ class InstallSolarFarm:
             if WaterSource.ID in intervention_desc:
                 source_id = intervention_desc[WaterSource.ID]
                 #check if the source id exists in the water utility, if not raise an error
-                source = next((s for s in water_utility.sources if s.bwf_id == source_id), None)
+                source = EntityRegistry.get(WaterSource, source_id, within=water_utility.m_supplies)
                 if source is None:
                     raise ValueError(f"No source found for ID {source_id} in water utility {water_utility.bwf_id}")
                 
@@ -319,8 +320,8 @@ class InstallSolarFarm:
             elif PumpingStation.ID in intervention_desc:
                 pumpst_id = intervention_desc[PumpingStation.ID]
                 # Find the pumping station
-                pumpst = next((ps for ps in water_utility.pumping_stations if ps.bwf_id == pumpst_id), None)
-                if pumpst is None:
+                pumpst = EntityRegistry.get(PumpingStation, pumpst_id)
+                if pumpst is None or not water_utility.has_pumping_station(pumpst):
                     raise ValueError(f"No pumping station found for ID {pumpst_id} in water utility {water_utility.bwf_id}")
                 
                 entity = pumpst
@@ -1,25 +1,26 @@
 import itertools
 import os
 from pathlib import Path
-from typing import Any, Dict, List, Set, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
 
 from ..core import Settings
 from ..core.base_model import StaticProperties
-from ..core.utility import timestampify, filter_columns
+from ..core.utility import timestampify
 from ..core.views import get_snapshot, YearlyView
+from ..core.dataset_cache import ExcelRead, excel_reads
 from ..nrw_model import NRWClass, NRWModelSettings
 from ..nrw_model.dynamic_properties import NRWModelDB
 from ..water_demand_model import WaterDemandModelPatterns
 from ..water_demand_model.properties import WaterDemandModelDB
+from ..jurisdictions.dynamic_properties import MunicipalitiesResults
 from ..jurisdictions import (
     State,
     Municipality,
     MunicipalitySize,
-    generate_nrw_demand,
-    generate_water_demand,
+    generate_demands,
     age_distribution_networks
 )
 from ..sources.entities import WaterSource, SourcesContainer
@@ -27,7 +28,7 @@ from ..sources.services import check_groundwater_permits
 from ..pumping_stations.entities import PumpingStation
 from ..pumps.entities import PumpOption
 from ..economy.entities import BondIssuance
-from ..energy.dynamic_properties import EnergySysDB
+from ..energy.dynamic_properties import EnergySysDB, SolarFarmsResults
 from ..energy.entities import SolarFarm
 from ..energy.services import get_solar_radiation_of_year, get_solar_yield, get_hourly_electricity_price_of_year
 from ..pipes.dynamic_properties import PipeOptionsDB
@@ -72,10 +73,16 @@ def configure_water_utilities(
     wu_st_properties = desc['water_utilities-static_properties']
 
     if isinstance(wu_st_properties, str):
-        wu_st_properties = pd.read_excel(
-            os.path.join(data_path, Path(wu_st_properties)),
-            sheet_name=None
-        )
+        wu_st_properties = _static_properties_read(wu_st_properties, data_path).read()
+
+    # The first pumping station and supply connection of every source
+    stations_by_source: Dict[WaterSource, PumpingStation] = {}
+    for ps in pumping_stations:
+        stations_by_source.setdefault(ps.source, ps)
+    supplies_by_source: Dict[WaterSource, Connection] = {}
+    for c in connections:
+        if isinstance(c, SupplyConnection):
+            supplies_by_source.setdefault(c.from_node, c)
 
     wutilities: Set[WaterUtility] = set()
     assigned_connections: Set[Connection] = set()
@@ -90,9 +97,9 @@ def configure_water_utilities(
         
         wu_supplies: Dict[WaterSource, Tuple[PumpingStation, Connection]] = {}
         for source in wu_sources:
-            pumping_station = next(ps for ps in pumping_stations if ps.source == source)
+            pumping_station = stations_by_source[source]
         
-            connection = next(c for c in connections if isinstance(c, SupplyConnection) and c.from_node == source)
+            connection = supplies_by_source[source]
 
             wu_supplies[source] = (pumping_station, connection)
 
@@ -126,6 +133,17 @@ def configure_water_utilities(
 
     return wutilities, unassigned_connections
 
+def _static_properties_read(wu_st_properties: str, data_path: str) -> ExcelRead:
+    return ExcelRead(os.path.join(data_path, Path(wu_st_properties)), dict(sheet_name=None))
+
+def configure_water_utilities_reads(desc: Dict[str, Any], data_path: str) -> List[ExcelRead]:
+    """The workbooks parsed by configure_water_utilities."""
+    wu_st_properties = desc['water_utilities-static_properties']
+    return excel_reads(
+        WaterUtilityDB.excel_read(os.path.join(data_path, desc[WaterUtilityDB.NAME])),
+        _static_properties_read(wu_st_properties, data_path) if isinstance(wu_st_properties, str) else None
+    )
+
 def apply_nrw_interventions(
         water_utility: WaterUtility,
         year: int,
@@ -188,18 +206,15 @@ def apply_nrw_interventions(
     else:
         raise ValueError(f"Unknown policy for NRW mitigation: {policy_desc['policy']}")
 
-    # However, not every year we get the same success, let's get the random generator
-    RNG = settings.get_random_generator('nrw_model-intervention_succes_prob')
-    
-    success_probabilities = RNG.uniform(
-            low=nrw_settings.success_proba_bounds[0],
-            high=nrw_settings.success_proba_bounds[1],
-            size=len(NRWClass) * len(MunicipalitySize)
+    # However, not every year we get the same success, one draw per class of municipalities
+    classes = list(itertools.product(NRWClass, MunicipalitySize))
+    success_probabilities = settings.draw_uniform(
+        'nrw_model-intervention_succes_prob',
+        keys=[(water_utility.bwf_id, year, nrw_class.name, muni_size_class.name) for nrw_class, muni_size_class in classes],
+        low=np.full(len(classes), nrw_settings.success_proba_bounds[0]),
+        high=np.full(len(classes), nrw_settings.success_proba_bounds[1])
     )
-    success_probabilities_map = { 
-        (nrw_class, muni_size_class): success_probabilities[i]
-        for i, (nrw_class, muni_size_class) in enumerate(itertools.product(NRWClass, MunicipalitySize))
-    }
+    success_probabilities_map = dict(zip(classes, success_probabilities))
     
     # Spend budget on the municipalities
     def budget_to_years(a_budget: float, a_municipality: YearlyView[Municipality]) -> float:
@@ -404,13 +419,16 @@ def work_on_connections(
 
     # Once, we have installed of the utility pipes, we can see if there are pipes 
     # that are failing this year and for which we need emergency interevention.
-    for connection in sorted(water_utility.connections, key=lambda c: c.bwf_id):
+    # The failure calendar tells which connections may have one (see Connection.failing_in).
+    for connection in Connection.failing_in(year):
+        if not water_utility.has_connection(connection):
+            continue
         
         if connection.replaced_by_cnn_id == "":
             # the connection doesn't get replaced, if it fails we re-install a pipe here
             cost, emiss = connection.inspect_and_replace(
                 year=year,
-                lifetime_rng=settings.pipes_lifetime_rng
+                lifetime_rng=settings.get_random_generator('pipes-lifetime', connection.bwf_id, year, 'replace')
             )
 
         else:
@@ -436,7 +454,7 @@ def work_on_connections(
             new_pipe = new_connection.install_pipe(
                 pipe_option=failed_pipe._pipe_option,
                 installation_date=failed_pipe.decommission_date,
-                lifetime_rng=settings.pipes_lifetime_rng
+                lifetime_rng=settings.get_random_generator('pipes-lifetime', new_connection.bwf_id, year, 'replace')
             )
 
             pipe_unit_cost = new_pipe._pipe_option.unit_cost.loc[new_pipe.installation_date]
@@ -504,10 +522,13 @@ def work_on_pumps(
         capex += cost
         emissions += emiss
 
-    for pumping_station in sorted(water_utility.pumping_stations, key=lambda ps: ps.bwf_id):
+    for pumping_station in PumpingStation.failing_in(year):
+        if not water_utility.has_pumping_station(pumping_station):
+            continue
+
         cost, emiss = pumping_station.inspect_and_replace(
             year=year,
-            lifetime_rng=settings.get_random_generator('pumps-lifetime')
+            lifetime_rng=settings.get_random_generator('pumps-lifetime', pumping_station.bwf_id, year, 'replace')
         )
 
         capex += cost
@@ -578,33 +599,35 @@ def realise_demands(
         settings: Settings
 ) -> Dict[str, np.ndarray]:
     
-    municipalities = water_utility.active_municipalities(when=year)
-
-    for municipality in sorted(municipalities, key=lambda x: x.cbs_id):
-
-        household_demand, business_demand = generate_water_demand(
-            water_demand_model_data,
-            municipality,
-            year,
-            max_yearly_temperature=temperature,
-            settings=settings
-        )
-        bill_demand = household_demand + business_demand
-
-        nrw_demand = generate_nrw_demand(
-            municipality,
-            year,
-            nrw_info_db=nrw_model_data[1],
-            water_demand=bill_demand,
-            settings=settings
-        )
-
-        total_demand = bill_demand + np.repeat(nrw_demand, 24, axis=0)
-        
-        municipality.track_total_demand(when=year, values=total_demand)
-        municipality.track_billable_demand(when=year, values=bill_demand)
+    municipalities = sorted(
+        water_utility.active_municipalities(when=year),
+        key=lambda x: x.cbs_id
+    )
+    if not municipalities:
+        return {}
+
+    bill_demands, total_demands = generate_demands(
+        water_demand_model_data,
+        nrw_info_db=nrw_model_data[1],
+        municipalities=municipalities,
+        year=year,
+        max_yearly_temperature=temperature,
+        settings=settings
+    )
 
-        # end municipalities for loop
+    # Same as Municipality.track_total_demand and track_billable_demand, but
+    # committing all the municipalities of the utility at once
+    cbs_ids = [municipality.cbs_id for municipality in municipalities]
+    Municipality._results.commit(
+        a_property=MunicipalitiesResults.DEMAND_TOTAL,
+        timestamps=pd.date_range(start=timestampify(year), periods=24*365, freq='h'),
+        data=pd.DataFrame(total_demands.T, columns=cbs_ids)
+    )
+    Municipality._results.commit(
+        a_property=MunicipalitiesResults.DEMAND_BILLABLE,
+        timestamps=pd.date_range(start=timestampify(year), periods=1, freq='YS'),
+        data=pd.DataFrame(bill_demands.sum(axis=1)[None, :], columns=cbs_ids)
+    )
 
     return {} 
 
@@ -634,139 +657,231 @@ def realise_solar_yields(
 
     return solar_yields
 
-def settle_operations_impact(
-    water_utility: WaterUtility,
-    energy_sys_db: EnergySysDB,
-    year: int,
-    settings: Settings,
-    pumps_ele_consumption: pd.DataFrame,
-    sources_production: pd.DataFrame
-) -> Tuple[float, float, float]:
-    
-    wu_opex = 0.0
-    wu_emissions = 0.0
-    wu_gw_fines = 0.0
-
-    # Get this year electricity price and emission factor
-    hourly_ele_price = get_hourly_electricity_price_of_year(
-        scope=water_utility.state.cbs_id,
-        energy_sys_db=energy_sys_db,
-        year=year
-    )
-    ts = timestampify(year)
-
-    # emission factor (convert to kgCO2eq)
-    ef = float(energy_sys_db[EnergySysDB.EMISS_FACTOR].asof(ts)[water_utility.state.cbs_id]) / 1000
-    
-    # Opex and emissions of water sources
-    # Eq. 8
-    for source in sorted(water_utility.active_sources(when=year), key= lambda s: s.bwf_id):
-        source_opex = 0.0
-
-        # Fixed costs (Fs term of Eq. 5)
-        # Fixed opex is an uncertain unit cost, so we extract the bounds, sample and multiply by the nominal capacity
-        fixed_opex_uc_bounds = source.opex_fixed_unit_cost.loc[ts].values
-        fixed_opex_uc = settings.sources_fixed_opex_uc_rng.uniform(
-            low=fixed_opex_uc_bounds[0],
-            high=fixed_opex_uc_bounds[1]
-        )
-        source_opex += source.nominal_capacity * fixed_opex_uc
-
-        # Eq 7
-        source_production = sources_production[source.bwf_id]
-        source_energy_consumption = source_production * source.opex_vol_enfactor
-        
-        # Eq 6
-        source_energy_production = source.onsite_energy_production
-        source_energy_production = source_energy_production[source_energy_production.index.year == year]
-
-        if not source_energy_production.empty:
-            source_grid_energy = (source_energy_consumption - source_energy_production).clip(lower=0.0)
-        else:
-            source_grid_energy = source_energy_consumption
-
-        # multiply each hour grid energy consumption by its electricity price
-        source_grid_ele_cost = hourly_ele_price * source_grid_energy
-
-        # Add the volumetric cost for energy (second term of Eq 5)
-        source_opex += sum(source_grid_ele_cost)
+def _sequential_sum(values: np.ndarray) -> float:
+    """
+    The sum of `values` added one after the other, in double precision, i.e.,
+    the same number as the builtin sum over a pandas Series.
+    """
+    if len(values) == 0:
+        return 0.0
+    return float(np.add.accumulate(values.astype(np.float64, copy=False))[-1])
 
-        # Add the volumetric cost for non-energy related (third and fourth term of Eq 5)
-        source_total_production = source_production.sum()
+class OperationsSettlement:
+    """
+    Opex, operational emissions and groundwater fines of the water utilities
+    in a year, settled from the results of the hydraulic simulations.
 
-        source_under_capacity_production = min(
-            source_total_production, # this is m^3/year
-            source.nominal_capacity*365*source.capacity_target_factor # convert also to m^3/year
-        )
+    Built once per year, it keeps the hourly electricity price and the
+    emission factor of each state, so that the utilities of all the clusters
+    share them. The hourly quantities of the sources and pumping stations are
+    numpy arrays, the pumps are mapped to their stations once per cluster and
+    the solar yields of the year are selected once.
 
-        source_over_capacity_production = max(
-            source_total_production - source_under_capacity_production,
-            0.0
+    The numbers are the same as settling the utilities one source and one
+    pumping station at a time with pandas, and so are the random draws.
+    """
+    def __init__(self, energy_sys_db: EnergySysDB, year: int, settings: Settings):
+        self.energy_sys_db = energy_sys_db
+        self.year = year
+        self.settings = settings
+        self._prices: Dict[str, Tuple[np.ndarray, float]] = {}
+
+        solar_yields = SolarFarm._results[SolarFarmsResults.YIELD]
+        self._solar_yields = solar_yields[solar_yields.index.year == year]
+
+    def energy_prices(self, scope: str) -> Tuple[np.ndarray, float]:
+        """Hourly electricity price and emission factor (in kgCO2eq) of `scope`."""
+        if scope not in self._prices:
+            hourly_ele_price = get_hourly_electricity_price_of_year(
+                scope=scope,
+                energy_sys_db=self.energy_sys_db,
+                year=self.year
+            )
+            ts = timestampify(self.year)
+            # emission factor (convert to kgCO2eq)
+            ef = float(self.energy_sys_db[EnergySysDB.EMISS_FACTOR].asof(ts)[scope]) / 1000
+            self._prices[scope] = (hourly_ele_price, ef)
+
+        return self._prices[scope]
+
+    def _onsite_energy_production(
+            self,
+            entity: Union[WaterSource, PumpingStation],
+            index: pd.Index
+        ) -> Optional[np.ndarray]:
+        """
+        The hourly yield of the solar farms of `entity` in the year (None if
+        there is none), as `entity.onsite_energy_production` in this year.
+        """
+        farms_id = [sf.bwf_id for sf in entity.solar_farms if sf.bwf_id in self._solar_yields.columns]
+        if not farms_id or self._solar_yields.empty:
+            return None
+        return self._solar_yields[farms_id].sum(axis=1).reindex(index).to_numpy()
+
+    def settle(
+            self,
+            water_utilities: List[WaterUtility],
+            pumps_ele_consumption: pd.DataFrame,
+            sources_production: pd.DataFrame
+        ) -> Dict[WaterUtility, Tuple[float, float, float]]:
+        """
+        Settle and track the operations of `water_utilities` (a cluster),
+        in this order. Returns the opex, the emissions and the groundwater
+        fines of each utility.
+        """
+        year = self.year
+        ts = timestampify(year)
+
+        wu_sources = {
+            wu: sorted(wu.active_sources(when=year), key= lambda s: s.bwf_id)
+            for wu in water_utilities
+        }
+        sources = [source for wu in water_utilities for source in wu_sources[wu]]
+
+        # Fixed costs (Fs term of Eq. 5) and volumetric non-energy costs (third and
+        # fourth term of Eq. 5) are uncertain unit costs: sample all of them at once,
+        # in the order the sources are settled
+        keys = [(source.bwf_id, year) for source in sources]
+        fixed_opex_uc_bounds = np.array(
+            [source.opex_fixed_unit_cost.loc[ts].values[:2] for source in sources], dtype=np.float64
+        ).reshape(-1, 2)
+        fixed_opex_ucs = self.settings.draw_uniform(
+            'sources-opex-fixed',
+            keys,
+            low=fixed_opex_uc_bounds[:, 0],
+            high=fixed_opex_uc_bounds[:, 1]
         )
-
-        vol_other_opex_uc_bounds = source.opex_volum_other_unit_cost.loc[ts].values
-        vol_other_opex_uc = settings.sources_vol_other_opex_uc_rng.uniform(
-            low=vol_other_opex_uc_bounds[0],
-            high=vol_other_opex_uc_bounds[1]
+        vol_other_opex_uc_bounds = np.array(
+            [source.opex_volum_other_unit_cost.loc[ts].values[:2] for source in sources], dtype=np.float64
+        ).reshape(-1, 2)
+        vol_other_opex_ucs = self.settings.draw_uniform(
+            'sources-opex-volum-other',
+            keys,
+            low=vol_other_opex_uc_bounds[:, 0],
+            high=vol_other_opex_uc_bounds[:, 1]
         )
-
-        # Eq 5 (third term)
-        source_opex += source_under_capacity_production * vol_other_opex_uc
-
-        # Eq 5 (fourth term)
-        source_opex += source_over_capacity_production * vol_other_opex_uc * source.opex_volum_other_multiplier
-
-        # Aggregate on global wu opex and emissions
-        wu_opex += source_opex
-        wu_emissions += ef*sum(source_grid_energy)
-
-    # Opex and emissions of pumping stations
-    for pstation in water_utility.active_pumping_stations(when=year):
-
-        # Get the consumption of the pumps belonging to this station using the
-        # filter_columns utility
-        pstat_ele_cons = pumps_ele_consumption[
-            filter_columns(
-                pumps_ele_consumption,
-                logical_part=pstation.bwf_id
+        source_ucs = {
+            source.bwf_id: (float(fixed_uc), float(vol_other_uc))
+            for source, fixed_uc, vol_other_uc in zip(sources, fixed_opex_ucs, vol_other_opex_ucs)
+        }
+
+        # Pumps columns of each pumping station (as filter_columns would select them)
+        pumps_values = pumps_ele_consumption.to_numpy()
+        pumps_idx_by_part: Dict[str, List[int]] = {}
+        for i, column in enumerate(pumps_ele_consumption.columns):
+            for part in dict.fromkeys(column.split('-')):
+                pumps_idx_by_part.setdefault(part, []).append(i)
+
+        settled = {}
+        for water_utility in water_utilities:
+            wu_opex = 0.0
+            wu_emissions = 0.0
+
+            hourly_ele_price, ef = self.energy_prices(water_utility.state.cbs_id)
+
+            # Opex and emissions of water sources
+            # Eq. 8
+            for source in wu_sources[water_utility]:
+                fixed_opex_uc, vol_other_opex_uc = source_ucs[source.bwf_id]
+                source_opex = source.nominal_capacity * fixed_opex_uc
+
+                # Eq 7
+                source_production = sources_production[source.bwf_id]
+                # (pandas keeps the dtype of the production with any scalar, numpy wouldn't)
+                source_energy_consumption = (source_production * source.opex_vol_enfactor).to_numpy()
+
+                # Eq 6
+                source_energy_production = self._onsite_energy_production(source, source_production.index)
+                if source_energy_production is not None:
+                    source_grid_energy = np.clip(source_energy_consumption - source_energy_production, 0.0, None)
+                else:
+                    source_grid_energy = source_energy_consumption
+
+                # Add the volumetric cost for energy (second term of Eq 5)
+                source_opex += _sequential_sum(hourly_ele_price * source_grid_energy)
+
+                # Add the volumetric cost for non-energy related (third and fourth term of Eq 5)
+                source_total_production = source_production.sum()
+
+                source_under_capacity_production = min(
+                    source_total_production, # this is m^3/year
+                    source.nominal_capacity*365*source.capacity_target_factor # convert also to m^3/year
+                )
+
+                source_over_capacity_production = max(
+                    source_total_production - source_under_capacity_production,
+                    0.0
+                )
+
+                # Eq 5 (third term)
+                source_opex += source_under_capacity_production * vol_other_opex_uc
+
+                # Eq 5 (fourth term)
+                source_opex += source_over_capacity_production * vol_other_opex_uc * source.opex_volum_other_multiplier
+
+                # Aggregate on global wu opex and emissions
+                wu_opex += source_opex
+                wu_emissions += ef*_sequential_sum(source_grid_energy)
+
+            # Opex and emissions of pumping stations
+            for pstation in water_utility.active_pumping_stations(when=year):
+
+                pumps_idx = pumps_idx_by_part.get(pstation.bwf_id, [])
+                if pumps_idx:
+                    pstat_pumps_ele_cons = pumps_values[:, pumps_idx]
+                    pstat_pumps_ele_cons[np.isnan(pstat_pumps_ele_cons)] = 0.0
+                    pstat_ele_cons = pstat_pumps_ele_cons.sum(axis=1)
+                else:
+                    pstat_ele_cons = np.zeros(len(pumps_values))
+
+                pstat_ele_prod = self._onsite_energy_production(pstation, pumps_ele_consumption.index)
+                if pstat_ele_prod is not None:
+                    pstat_ele_grid = np.clip(pstat_ele_cons - pstat_ele_prod, 0.0, None)
+                else:
+                    pstat_ele_grid = pstat_ele_cons
+
+                wu_opex += _sequential_sum(pstat_ele_grid * hourly_ele_price)
+                wu_emissions += ef*_sequential_sum(pstat_ele_grid)
+
+            # Handle the groundwater permits
+            wu_gw_fines = check_groundwater_permits(
+                gw_sources=water_utility.active_gw_sources(when=year),
+                sources_year_production=sources_production,
+                year=year
             )
-        ]
-        pstat_ele_cons = pstat_ele_cons.sum(axis=1)
-        
-        pstat_ele_prod = pstation.onsite_energy_production
-        pstat_ele_prod = pstat_ele_prod[pstat_ele_prod.index.year == year]
-
-        if not pstat_ele_prod.empty:
-            pstat_ele_grid = (pstat_ele_cons - pstat_ele_prod).clip(lower=0.0)
-        else:
-            pstat_ele_grid = pstat_ele_cons
 
-        pstat_ele_cost = pstat_ele_grid * hourly_ele_price
+            water_utility.track_opex(
+                when=year,
+                value=wu_opex
+            )
+            water_utility.track_operations_emissions(
+                when=year,
+                value=wu_emissions
+            )
+            water_utility.track_gw_permit_fine(
+                when=year,
+                value=wu_gw_fines
+            )
 
-        wu_opex += sum(pstat_ele_cost)
-        wu_emissions += ef*sum(pstat_ele_grid)
+            settled[water_utility] = (wu_opex, wu_emissions, wu_gw_fines)
 
-    # Handle the groundwater permits
-    wu_gw_fines = check_groundwater_permits(
-        gw_sources=water_utility.active_gw_sources(when=year),
-        sources_year_production=sources_production,
-        year=year
-    )
-    
-    water_utility.track_opex(
-        when=year,
-        value=wu_opex
-    )
-    water_utility.track_operations_emissions(
-        when=year,
-        value=wu_emissions
-    )
-    water_utility.track_gw_permit_fine(
-        when=year,
-        value=wu_gw_fines
-    )
+        return settled
 
-    return wu_opex, wu_emissions, wu_gw_fines
+def settle_operations_impact(
+    water_utility: WaterUtility,
+    energy_sys_db: EnergySysDB,
+    year: int,
+    settings: Settings,
+    pumps_ele_consumption: pd.DataFrame,
+    sources_production: pd.DataFrame
+) -> Tuple[float, float, float]:
+    """Settle the operations of a single utility, see OperationsSettlement."""
+    settlement = OperationsSettlement(energy_sys_db=energy_sys_db, year=year, settings=settings)
+    return settlement.settle(
+        [water_utility],
+        pumps_ele_consumption=pumps_ele_consumption,
+        sources_production=sources_production
+    )[water_utility]
 
 def age_water_utility(
         wu: WaterUtility,
@@ -795,7 +910,7 @@ def age_water_utility(
     age_pipes(
         wu_y.connections,
         year,
-        settings.pipes_frict_f_decay_rng
+        settings
     )
 
     #------ Other
@@ -0,0 +1,223 @@
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from water_futures_battle.connections.entities import PeerConnection
+from water_futures_battle.national_context.entities import WaterUtilitiesCluster
+from water_futures_battle.pumps.entities import PumpOption
+
+# The entities below have only the attributes read by the network builder and
+# by the hydraulic simulations (see services/epanet_utils.py).
+
+class _Municipality:
+    def __init__(self, cbs_id: str, elevation: float, longitude: float, latitude: float):
+        self.cbs_id = cbs_id
+        self.elevation = elevation
+        self.longitude = longitude
+        self.latitude = latitude
+        self.begin_date = pd.Timestamp('2000-01-01')
+
+    @property
+    def coordinates(self):
+        return (self.latitude, self.longitude)
+
+    def effective_entity(self, when):
+        return self
+
+    def effective_cbs_id(self, when) -> str:
+        return self.cbs_id
+
+class _Pipe:
+    def __init__(self, bwf_id: str, diameter: float, friction_factor: Dict[int, float]):
+        self.bwf_id = bwf_id
+        self._pipe_option = SimpleNamespace(diameter=diameter)
+        self.friction_factor = pd.Series({pd.Timestamp(year=y, month=1, day=1): f for y, f in friction_factor.items()})
+
+class _Connection:
+    def __init__(self, bwf_id: str, from_node, to_node: _Municipality, distance: float, minor_loss_coeff: float, pipes: Dict[int, _Pipe]):
+        for name, value in [
+            ('bwf_id', bwf_id),
+            ('from_node', from_node),
+            ('to_node', to_node),
+            ('distance', distance),
+            ('minor_loss_coeff', minor_loss_coeff),
+            ('pipes', pipes) # the active pipe of each year
+        ]:
+            # The peer connections are frozen dataclasses
+            object.__setattr__(self, name, value)
+
+    def is_active(self, when) -> bool:
+        return True
+
+    def active_pipe(self, when) -> Optional[_Pipe]:
+        return self.pipes.get(int(when))
+
+    def has_active_pipe(self, when) -> bool:
+        return self.active_pipe(when) is not None
+
+class _PeerConnection(_Connection, PeerConnection):
+    # Not registered, not in the failure calendar
+    pass
+
+class _Pump:
+    def __init__(self, bwf_id: str, pump_option: PumpOption, years: List[int]):
+        self.bwf_id = bwf_id
+        self._pump_option = pump_option
+        self.years = years
+
+    def is_active(self, when) -> bool:
+        return int(when) in self.years
+
+class _PumpingStation:
+    def __init__(self, bwf_id: str, pumps: List[_Pump]):
+        self.bwf_id = bwf_id
+        self.pumps = dict(enumerate(pumps))
+
+    def active_pumps(self, when):
+        return {pidx: pump for pidx, pump in self.pumps.items() if pump.is_active(when)}
+
+    def has_active_pumps(self, when) -> bool:
+        return len(self.active_pumps(when)) > 0
+
+    def peak_discharge(self, when) -> float:
+        return sum(p._pump_option.head_curve.index.max() for p in self.active_pumps(when).values())
+
+class _Source:
+    def __init__(self, bwf_id: str, elevation: float, municipality: _Municipality, pumping_station: _PumpingStation, nominal_capacity: float):
+        self.bwf_id = bwf_id
+        self.elevation = elevation
+        self.longitude = municipality.longitude - 0.05
+        self.latitude = municipality.latitude - 0.05
+        self.closest_municipality = municipality
+        self.pumping_station = pumping_station
+        self.nominal_capacity = nominal_capacity
+        self.available_capacity = pd.Series([nominal_capacity], index=[pd.Timestamp('2000-01-01')])
+
+    @property
+    def coordinates(self):
+        return (self.latitude, self.longitude)
+
+    def is_active(self, when) -> bool:
+        return True
+
+class _WaterUtility:
+    def __init__(self, bwf_id: str, municipalities: List[_Municipality], supplies, peer_connections: List[_Connection]):
+        self.bwf_id = bwf_id
+        self.municipalities = municipalities
+        self.m_supplies = supplies
+        self.m_peer_connections = peer_connections
+
+    def active_municipalities(self, when):
+        return self.municipalities
+
+    def active_sources(self, when):
+        return list(self.m_supplies.keys())
+
+    def active_pumping_stations(self, when):
+        return [ps for ps, _ in self.m_supplies.values()]
+
+def _pump_option() -> PumpOption:
+    curves = pd.DataFrame({
+        PumpOption.Q: [200., 400., 600., 800.],
+        PumpOption.H: [68., 62., 52., 38.],
+        PumpOption.P: [60., 85., 105., 120.],
+        PumpOption.E: [55., 72., 78., 70.]
+    }).set_index(PumpOption.Q)
+    return PumpOption(
+        bwf_id='PU0001',
+        name='test pump',
+        nominal_flow_rate=500.,
+        lifetime=(10, 20),
+        _curves=curves
+    )
+
+@pytest.fixture
+def synthetic_system():
+    """
+    Three water utilities over 2025 and 2026. WU01 and WU02 are connected
+    (one cluster), WU03 is on its own. In 2026 a pump of PS0001 and one of
+    PS0002 fail and are replaced, the supply pipe of WU01 is replaced by a
+    bigger one and all the pipes age. The topology of the networks is the
+    same in the two years.
+    """
+    years = [2025, 2026]
+    pump_option = _pump_option()
+
+    # Outside of target_heads.csv, the pumping stations target the default head
+    municipalities = [
+        _Municipality(f'GM99{j:02d}', elevation, 5.0 + 0.02*j, 52.0 + 0.01*j)
+        for j, elevation in enumerate([5., 8., 3., 12., 6., 2.], start=1)
+    ]
+    m = {mun.cbs_id: mun for mun in municipalities}
+
+    def pipe(con_id: str, diameter: float, roughness: float, n: int = 0) -> _Pipe:
+        return _Pipe(f'{con_id}-{n:02d}', diameter, {2025: roughness, 2026: roughness * 1.1})
+
+    def supply(source_id: str, ps_id: str, con_id: str, to: _Municipality, n_pumps: int, failed: List[int], pipes):
+        pumps = [_Pump(f'{ps_id}-{i:02d}', pump_option, [y for y in years if y == 2025 or i not in failed]) for i in range(n_pumps)]
+        pumps += [_Pump(f'{ps_id}-{n_pumps+k:02d}', pump_option, [2026]) for k, _ in enumerate(failed)]
+        pumping_station = _PumpingStation(ps_id, pumps)
+        source = _Source(source_id, 0.0, to, pumping_station, nominal_capacity=30_000.)
+        con = _Connection(con_id, source, to, 8000., 1.5, pipes)
+        return source, (pumping_station, con)
+
+    def peer(con_id: str, from_id: str, to_id: str, distance: float, diameter: float, roughness: float) -> _PeerConnection:
+        p = pipe(con_id, diameter, roughness)
+        return _PeerConnection(con_id, m[from_id], m[to_id], distance, 0.5, {2025: p, 2026: p})
+
+    wu01 = _WaterUtility(
+        'WU01',
+        [m['GM9901'], m['GM9902']],
+        dict([supply('SG0001', 'PS0001', 'CS0001', m['GM9901'], 3, [0], {
+            2025: pipe('CS0001', 400., 0.3),
+            2026: pipe('CS0001', 450., 0.1, n=1)
+        })]),
+        [peer('CG0001', 'GM9901', 'GM9902', 3000., 300., 0.1)]
+    )
+    wu02 = _WaterUtility(
+        'WU02',
+        [m['GM9903']],
+        dict([supply('SG0002', 'PS0002', 'CS0002', m['GM9903'], 2, [0], {
+            y: pipe('CS0002', 350., 0.2) for y in years
+        })]),
+        []
+    )
+    wu03 = _WaterUtility(
+        'WU03',
+        [m['GM9904'], m['GM9905'], m['GM9906']],
+        dict([supply('SG0003', 'PS0003', 'CS0003', m['GM9904'], 3, [], {
+            y: pipe('CS0003', 400., 0.3) for y in years
+        })]),
+        [
+            peer('CG0004', 'GM9904', 'GM9905', 2000., 250., 0.5),
+            peer('CG0005', 'GM9905', 'GM9906', 4000., 200., 0.2)
+        ]
+    )
+    cross = peer('CP0001', 'GM9902', 'GM9903', 5000., 200., 1.0)
+
+    timesteps = pd.date_range(start=f'{years[0]}-01-01', end=f'{years[-1]}-12-31 23:00:00', freq='h')
+    rng = np.random.default_rng(11)
+    daily = 1.0 + 0.5*np.sin(2*np.pi*(timesteps.hour.to_numpy() - 9)/24)
+    demands = daily[:, None] * rng.uniform(40., 80., len(municipalities)) * rng.uniform(0.9, 1.1, (len(timesteps), len(municipalities)))
+
+    national_context = SimpleNamespace(
+        water_utilities={wu01, wu02, wu03},
+        cross_utility_connections={cross},
+        municipalities_total_demands=pd.DataFrame(demands, index=timesteps, columns=list(m)),
+        sources_production=pd.DataFrame()
+    )
+
+    def clusters(year: int) -> List[WaterUtilitiesCluster]:
+        return [
+            WaterUtilitiesCluster({wu01, wu02}, {cross}, year),
+            WaterUtilitiesCluster({wu03}, set(), year)
+        ]
+
+    return SimpleNamespace(
+        years=years,
+        national_context=national_context,
+        clusters=clusters
+    )
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core.base_model import DynamicProperties
+from water_futures_battle.core.utility import active_years, timestampify
+from water_futures_battle.connections.entities import Connection
+from water_futures_battle.pipes.dynamic_properties import PipeOptionsDB, PipesDB
+from water_futures_battle.pipes.entities import Pipe, PipeOption
+
+def _is_active(begin, end, year):
+    ts = timestampify(year)
+    return ts >= begin and (pd.isna(end) or ts < end)
+
+def test_active_years():
+    dates = [
+        pd.NaT,
+        pd.Timestamp('2020-01-01'),
+        pd.Timestamp('2020-01-01 00:00:01'),
+        pd.Timestamp('2020-06-15'),
+        pd.Timestamp('2021-12-31 23:00'),
+        pd.Timestamp('2023-01-01'),
+    ]
+    for begin in dates:
+        for end in dates:
+            first, stop = active_years(begin, end)
+            for year in range(2018, 2026):
+                assert (first <= year < stop) == _is_active(begin, end, year), (begin, end, year)
+
+def test_active_pipe_by_year():
+
+    old_pipes_db = Pipe._dynamic_properties
+    old_options_db = PipeOption._dynamic_properties
+    old_registry = Pipe._DECOMMISSION_REGISTRY
+    old_active_years = Pipe._ACTIVE_YEARS
+    old_calendar = Connection._FAILURE_CALENDAR
+    Pipe._dynamic_properties = DynamicProperties('pipes', {PipesDB.FRICTIONF: pd.DataFrame(dtype=float)})
+    years = pd.date_range('2020-01-01', periods=10, freq='YS')
+    PipeOption._dynamic_properties = DynamicProperties('pipe_options', {
+        PipeOptionsDB.COST: pd.DataFrame({'PI01': 100.0}, index=years),
+        PipeOptionsDB.EMISSION: pd.DataFrame({'PI01': 1.0}, index=years),
+    })
+    Pipe._DECOMMISSION_REGISTRY = {}
+    Pipe._ACTIVE_YEARS = {}
+    try:
+        option = PipeOption(
+            bwf_id='PI01', diameter=0.3, material='PVC', dff_new=0.02,
+            dff_decay_rate=(0.0, 0.0), lifetime=(3, 6)
+        )
+        rng = np.random.default_rng(7)
+        connection = Connection(
+            bwf_id='CG0001', to_node=None, distance=1.0, minor_loss_coeff=0.0,
+            pipes={}, replaced_by_cnn_id='', replaces_cnn_ids=[]
+        )
+        connection.install_pipe(option, pd.Timestamp('2020-03-01'), lifetime_rng=rng)
+        connection.install_pipe(option, pd.Timestamp('2023-01-01'), lifetime_rng=rng)
+
+        for year in range(2018, 2030):
+            assert connection.active_pipe(year) == connection.active_pipe(timestampify(year))
+        assert connection.active_pipe(2020) is None
+        assert connection.active_pipe(2021) == connection.pipes[0]
+        assert connection.active_pipe(2023) == connection.pipes[1]
+    finally:
+        Pipe._dynamic_properties = old_pipes_db
+        PipeOption._dynamic_properties = old_options_db
+        Pipe._DECOMMISSION_REGISTRY = old_registry
+        Pipe._ACTIVE_YEARS = old_active_years
+        Connection._FAILURE_CALENDAR = old_calendar
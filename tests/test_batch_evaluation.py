@@ -0,0 +1,171 @@
+import errno
+import os
+from multiprocessing.context import ForkProcess
+
+import pandas as pd
+import yaml
+
+from water_futures_battle.core import Settings
+from water_futures_battle.masterplan import Masterplan
+from water_futures_battle.services import batch_evaluation
+from water_futures_battle.services.batch_evaluation import (
+    IS_BATCH_EVALUATION_AVAILABLE,
+    build_decisions_trie,
+    combine_metrics,
+    evaluate_masterplans,
+    evaluate_masterplans_sharing_prefixes
+)
+
+def test_combine_metrics():
+
+    def metrics(value: float):
+        return {
+            'GHG_emissions': pd.DataFrame(
+                {'WU01': [value, value]},
+                index=pd.Index(pd.to_datetime(['2025-01-01', '2026-01-01']), name='timestamp')
+            )
+        }
+
+    combined = combine_metrics({'plan_b': metrics(2.), 'plan_a': metrics(1.)})
+
+    ghg = combined['GHG_emissions']
+    assert ghg.index.names == ['masterplan', 'timestamp']
+    assert list(ghg.index.get_level_values('masterplan').unique()) == ['plan_a', 'plan_b']
+    assert ghg.loc[('plan_b', pd.Timestamp('2026-01-01')), 'WU01'] == 2.
+
+def test_failed_masterplan_is_reported(tmp_path):
+    if not IS_BATCH_EVALUATION_AVAILABLE:
+        return
+
+    settings = Settings.from_config({'start_year': 2025, 'end_year': 2025, 'seed': 128, 'lifeline_volume': 50})
+    outcomes = []
+    evaluate_masterplans(
+        settings=settings,
+        national_context=None, # never reached, parsing fails first
+        water_utilities=set(),
+        masterplan_files=[str(tmp_path / 'missing.yaml')],
+        n_workers=2,
+        on_result=outcomes.append
+    )
+
+    assert len(outcomes) == 1
+    assert outcomes[0].metrics is None
+    assert 'FileNotFoundError' in outcomes[0].error
+
+def test_decisions_trie():
+
+    def masterplan(pipe_year: int, diameter: float) -> Masterplan:
+        return Masterplan({'years': [
+            {
+                'year': 2025,
+                'water_utilities': [{'water_utility': 'WU01', 'policies': {'bond_ratio': {'value': 0.5}}}]
+            },
+            {
+                'year': pipe_year,
+                'water_utilities': [{
+                    'water_utility': 'WU01',
+                    'interventions': {'install_pipe': [{'connection_id': 'CN0001', 'pipe_option_id': diameter}]}
+                }]
+            }
+        ]})
+
+    masterplans = {
+        'a': masterplan(2027, 300),
+        'b': masterplan(2027, 400),
+        'c': masterplan(2026, 300),
+        'd': masterplan(2027, 300), # same as 'a'
+    }
+    years = [2025, 2026, 2027, 2028]
+    trie = build_decisions_trie(masterplans, years=years, water_utilities_ids=['WU01', 'WU02'])
+
+    # 2025 is shared by all, 2026 splits 'c' out, 2027 splits 'b' out
+    assert list(trie.children.values())[0].masterplan_files == ['a', 'b', 'c', 'd']
+    assert trie.n_simulated_years == 1 + 2 + 3 + 3
+    assert trie.n_simulated_years < len(masterplans) * len(years)
+
+    leaves = []
+    def collect_leaves(node):
+        if not node.children:
+            leaves.append(node.masterplan_files)
+        for child in node.children.values():
+            collect_leaves(child)
+    collect_leaves(trie)
+    assert sorted(leaves) == [['a', 'd'], ['b'], ['c']]
+
+class _WaterUtility:
+    bwf_id = 'WU01'
+
+class _NationalContext:
+    def discard_spilled_hourly_results(self):
+        pass
+
+def _bond_ratio(masterplan: Masterplan, year: int) -> float:
+    return masterplan.water_utility_policies(water_utility='WU01', year=year)['bond_ratio']['value']
+
+def _evaluate_branches(tmp_path, monkeypatch, on_year):
+    """
+    Four masterplans: the same in 2025, two groups in 2026, all different in
+    2027. The years are not simulated, `on_year` is called instead.
+    """
+    files = []
+    for name, ratios in [('a', [.5, .1, .11]), ('b', [.5, .1, .12]), ('c', [.5, .2, .21]), ('d', [.5, .2, .22])]:
+        path = tmp_path / f"{name}.yaml"
+        path.write_text(yaml.safe_dump({'years': [
+            {'year': year, 'water_utilities': [{'water_utility': 'WU01', 'policies': {'bond_ratio': {'value': ratio}}}]}
+            for year, ratio in zip([2025, 2026, 2027], ratios)
+        ]}))
+        files.append(str(path))
+
+    monkeypatch.setattr(batch_evaluation, 'evaluate_year', lambda year, masterplan, **kwargs: on_year(year, masterplan))
+    monkeypatch.setattr(batch_evaluation, 'compute_metrics', lambda *args: {})
+
+    outcomes = {}
+    evaluate_masterplans_sharing_prefixes(
+        settings=Settings.from_config({'start_year': 2025, 'end_year': 2027, 'seed': 128, 'lifeline_volume': 50}),
+        national_context=_NationalContext(),
+        water_utilities={_WaterUtility()},
+        masterplan_files=files,
+        n_workers=1,
+        on_result=lambda outcome: outcomes.__setitem__(os.path.basename(outcome.masterplan_file), outcome)
+    )
+    return outcomes
+
+def test_branches_depth_first(tmp_path, monkeypatch):
+    if not IS_BATCH_EVALUATION_AVAILABLE:
+        return
+
+    log = tmp_path / 'years.log'
+    def on_year(year, masterplan):
+        with open(log, 'a') as f:
+            f.write(f"{year}:{_bond_ratio(masterplan, year)}\n")
+
+    outcomes = _evaluate_branches(tmp_path, monkeypatch, on_year)
+
+    assert all(outcome.metrics == {} for outcome in outcomes.values())
+    # With one slot, a branch is finished before the ones above it fork the next
+    assert log.read_text().split() == [
+        '2025:0.5', '2026:0.1', '2027:0.11', '2027:0.12', '2026:0.2', '2027:0.21', '2027:0.22'
+    ]
+
+def test_branches_not_run(tmp_path, monkeypatch):
+    if not IS_BATCH_EVALUATION_AVAILABLE:
+        return
+
+    # The process of 2026 can't fork the branch of 'b' (e.g., too many processes)
+    start = ForkProcess.start
+    def start_or_fail(process):
+        if process._args[0].masterplan_files == [str(tmp_path / 'b.yaml')]:
+            raise OSError(errno.EAGAIN, "Resource temporarily unavailable")
+        start(process)
+    monkeypatch.setattr(ForkProcess, 'start', start_or_fail)
+
+    def on_year(year, masterplan):
+        if _bond_ratio(masterplan, year) == .21:
+            raise RuntimeError("failed in 2027")
+
+    outcomes = _evaluate_branches(tmp_path, monkeypatch, on_year)
+
+    assert outcomes['a.yaml'].metrics == {}
+    assert outcomes['b.yaml'].not_run and 'Resource temporarily unavailable' in outcomes['b.yaml'].error
+    assert not outcomes['c.yaml'].not_run and 'failed in 2027' in outcomes['c.yaml'].error
+    assert outcomes['d.yaml'].metrics == {}
@@ -0,0 +1,138 @@
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pandas as pd
+import pytest
+import yaml
+
+from water_futures_battle import parse_masterplan, run_eval
+from water_futures_battle.core import Settings
+from water_futures_battle.core.base_model import DynamicProperties, RetentionPolicy
+from water_futures_battle.core.utility import timestampify
+from water_futures_battle.core.views import state_tables
+from water_futures_battle.io import configure_system_ex
+from water_futures_battle.pipes.entities import Pipe
+from water_futures_battle.pumps.entities import Pump
+from water_futures_battle.pumps.dynamic_properties import PumpsResults
+from water_futures_battle.services.checkpoint import (
+    _ENTITY_CLASS_VARIABLES,
+    _collect_class_state,
+    _find_class,
+    checkpoint_path,
+    load_checkpoint,
+    save_checkpoint
+)
+
+DATA_PATH = Path("data")
+
+def _settings(seed: int = 128) -> Settings:
+    return Settings.from_config({'start_year': 2025, 'end_year': 2027, 'seed': seed, 'lifeline_volume': 50})
+
+def test_checkpoint_roundtrip(tmp_path):
+
+    settings = _settings()
+    rng = settings.get_random_generator('pipes-fric_f_decay')
+    rng.random(10)
+
+    old_registry = Pipe._DECOMMISSION_REGISTRY
+    Pipe._DECOMMISSION_REGISTRY = {'PI0001': pd.Timestamp('2026-01-01')}
+    try:
+        path = save_checkpoint(
+            path=checkpoint_path(tmp_path, 2025),
+            year=2025,
+            settings=settings,
+            national_context=None,
+            water_utilities=set()
+        )
+        expected_draws = rng.random(5)
+
+        # The run continues (or crashes) after the checkpoint
+        Pipe._DECOMMISSION_REGISTRY['PI0002'] = pd.Timestamp('2027-01-01')
+
+        # A new process configures the system again and resumes
+        resumed_settings = _settings()
+        last_year, _, water_utilities = load_checkpoint(path, resumed_settings)
+
+        assert last_year == 2025
+        assert water_utilities == set()
+        assert Pipe._DECOMMISSION_REGISTRY == {'PI0001': pd.Timestamp('2026-01-01')}
+        resumed_rng = resumed_settings.get_random_generator('pipes-fric_f_decay')
+        assert (resumed_rng.random(5) == expected_draws).all()
+
+        with pytest.raises(ValueError):
+            load_checkpoint(path, _settings(seed=129))
+    finally:
+        Pipe._DECOMMISSION_REGISTRY = old_registry
+
+def test_checkpoint_keeps_configured_retention(tmp_path):
+
+    settings = _settings()
+    old_results = Pump._results
+    try:
+        Pump.set_results(PumpsResults().set_retention(
+            PumpsResults.ELE_ENERGY,
+            RetentionPolicy(mode='aggregate')
+        ))
+        path = save_checkpoint(
+            path=checkpoint_path(tmp_path, 2025),
+            year=2025,
+            settings=settings,
+            national_context=None,
+            water_utilities=set()
+        )
+
+        # The resumed run saves the hourly results, so it spills them
+        spill = RetentionPolicy(mode='spill', spill_dir=tmp_path / 'spill')
+        Pump.set_results(PumpsResults().set_retention(PumpsResults.ELE_ENERGY, spill))
+        load_checkpoint(path, _settings())
+
+        assert Pump._results.retention(PumpsResults.ELE_ENERGY) == spill
+    finally:
+        Pump.set_results(old_results)
+
+def _configure(n_years: int) -> Any:
+    with open(DATA_PATH / "configuration.yaml", 'r') as f_yaml:
+        config = yaml.safe_load(f_yaml)
+    config["data_path"] = str(DATA_PATH)
+    config[Settings.LABEL][Settings.END_YEAR] = config[Settings.LABEL][Settings.START_YEAR] + n_years - 1
+    return configure_system_ex(config)
+
+def _outcome(metrics: Dict[str, Any], years: List[int]) -> Dict[str, Any]:
+    """The metrics, the dynamic properties and results of every class and their yearly state tables."""
+    outcome = {f"metrics/{name}": value.copy() for name, value in metrics.items()}
+    for (module_name, qualname), cls_state in _collect_class_state().items():
+        for attr in _ENTITY_CLASS_VARIABLES:
+            db = cls_state.get(attr)
+            if isinstance(db, DynamicProperties):
+                for name, df in db.dataframes.items():
+                    outcome[f"{qualname}.{attr}/{name}"] = df.copy()
+
+        cls = _find_class(module_name, qualname)
+        for name in getattr(cls, 'STATE_COLUMNS', {}):
+            for year in years:
+                column = state_tables.table(cls, timestampify(year)).column(name)
+                outcome[f"{qualname}@{year}/{name}"] = pd.Series(column.values, index=column.entities)
+    return outcome
+
+@pytest.mark.skipif(not (DATA_PATH / "configuration.yaml").is_file(), reason="needs the data folder")
+def test_resumed_run_is_identical(tmp_path):
+
+    masterplan = parse_masterplan(Path("masterplans/masterplan-empty.yaml"))
+
+    # Years N, N+1 and N+2 at once, saving a checkpoint at the end of each
+    settings, national_context, water_utilities = _configure(n_years=3)
+    _, _, metrics = run_eval(settings, national_context, water_utilities, masterplan, checkpoint_dir=tmp_path)
+    straight = _outcome(metrics, settings.years_to_simulate)
+
+    # A new process configures the system again and continues after year N
+    settings, national_context, water_utilities = _configure(n_years=3)
+    _, _, metrics = run_eval(settings, national_context, water_utilities, masterplan,
+                             resume_from=checkpoint_path(tmp_path, settings.start_year))
+    resumed = _outcome(metrics, settings.years_to_simulate)
+
+    assert resumed.keys() == straight.keys()
+    for key, expected in straight.items():
+        if isinstance(expected, pd.DataFrame):
+            pd.testing.assert_frame_equal(resumed[key], expected, check_exact=True, obj=key)
+        else:
+            pd.testing.assert_series_equal(resumed[key], expected, check_exact=True, obj=key)
@@ -0,0 +1,170 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from epanet_plus import EPyT, EpanetConstants
+
+from water_futures_battle.core import Settings
+from water_futures_battle.pumps.entities import PumpOption
+from water_futures_battle.services import epanet_utils
+from water_futures_battle.services.epanet_utils import run_cluster_hydraulics, set_hydraulic_options
+from water_futures_battle.services.hydraulics_telemetry import HourStatus
+
+YEAR = 2025
+N_PUMPS = 3
+
+# Same tree of test_tree_hydraulics.py: (parent, length, diameter, roughness, minor loss)
+ELEVATIONS = [5., 8., 3., 12., 6., 2.]
+PIPES = [
+    (0, 3000., 300., 0.1, 0.5),
+    (0, 5000., 250., 0.5, 0.),
+    (1, 2000., 200., 1.0, 1.),
+    (1, 4000., 150., 0.2, 0.),
+    (2, 1500., 200., 0.05, 0.2)
+]
+
+def _make_pump_option() -> PumpOption:
+    curves = pd.DataFrame({
+        PumpOption.Q: [200., 400., 600., 800.],
+        PumpOption.H: [68., 62., 52., 38.],
+        PumpOption.P: [60., 85., 105., 120.],
+        PumpOption.E: [55., 72., 78., 70.]
+    }).set_index(PumpOption.Q)
+    return PumpOption(
+        bwf_id='PU0001',
+        name='test pump',
+        nominal_flow_rate=500.,
+        lifetime=(10, 20),
+        _curves=curves
+    )
+
+def _make_network(pump_option: PumpOption) -> EPyT:
+    """Same layout of build_epanet_network (free parallel pumps) for the cluster below."""
+    net = EPyT(use_project=True, ignore_error_codes=[2,4,5,6])
+    set_hydraulic_options(net)
+
+    for curve_id, curve_type, curve in [
+        ('PU0001-hc', EpanetConstants.EN_PUMP_CURVE, pump_option.head_curve),
+        ('PU0001-ec', EpanetConstants.EN_EFFIC_CURVE, pump_option.eff_curve)
+    ]:
+        net.addcurve(curve_id)
+        curve_idx = net.getcurveindex(curve_id)
+        net.setcurvetype(curve_idx, curve_type)
+        net.setcurve(curve_idx, list(curve.index), list(curve.values), len(curve))
+
+    for i in range(N_PUMPS):
+        net.add_pattern(pattern_id=f'PS0001-{i:02d}', pattern_values=[0.0])
+    for j in range(len(ELEVATIONS)):
+        net.add_pattern(pattern_id=f'GM{j:04d}', pattern_values=[0.0])
+
+    for j, elevation in enumerate(ELEVATIONS):
+        node_idx = net.addnode(f'GM{j:04d}', EpanetConstants.EN_JUNCTION)
+        net.setnodevalue(node_idx, EpanetConstants.EN_ELEVATION, elevation)
+        net.setnodevalue(node_idx, EpanetConstants.EN_BASEDEMAND, 1.0)
+        net.setnodevalue(node_idx, EpanetConstants.EN_PATTERN, net.getpatternindex(pattern_id=f'GM{j:04d}'))
+    net.addnode('SO0001', EpanetConstants.EN_RESERVOIR)
+    for helper_id in ['PS0001-inlet', 'PS0001-outlet']:
+        net.addnode(helper_id, EpanetConstants.EN_JUNCTION)
+
+    def add_pipe(link_id, link_type, from_node, to_node, length, diameter, roughness, minor_loss):
+        link_idx = net.addlink(link_id, link_type, from_node=from_node, to_node=to_node)
+        net.setpipedata(index=link_idx, length=length, diam=diameter, rough=roughness, mloss=minor_loss)
+
+    add_pipe('SO0001-CV', EpanetConstants.EN_CVPIPE, 'SO0001', 'PS0001-inlet', 1., 400., 0.0001, 0.)
+    for i in range(N_PUMPS):
+        link_idx = net.addlink(f'PS0001-{i:02d}', EpanetConstants.EN_PUMP, from_node='PS0001-inlet', to_node='PS0001-outlet')
+        net.setlinkvalue(link_idx, EpanetConstants.EN_PUMP_HCURVE, net.getcurveindex('PU0001-hc'))
+        net.setlinkvalue(link_idx, EpanetConstants.EN_PUMP_ECURVE, net.getcurveindex('PU0001-ec'))
+        net.setlinkvalue(link_idx, EpanetConstants.EN_LINKPATTERN, net.getpatternindex(f'PS0001-{i:02d}'))
+    add_pipe('PI0001-00', EpanetConstants.EN_PIPE, 'PS0001-outlet', 'GM0000', 8000., 400., 0.3, 1.5)
+    for j, (parent, *data) in enumerate(PIPES, start=1):
+        add_pipe(f'PI{j+1:04d}-00', EpanetConstants.EN_PIPE, f'GM{parent:04d}', f'GM{j:04d}', *data)
+
+    return net
+
+def _make_cluster(pump_option: PumpOption):
+    """
+    A single source with three pumps supplying six municipalities. Only the
+    attributes read by run_cluster_hydraulics are there, the network is the
+    one of _make_network.
+    """
+    pumps = {i: SimpleNamespace(bwf_id=f'PS0001-{i:02d}', _pump_option=pump_option) for i in range(N_PUMPS)}
+    pumping_station = SimpleNamespace(
+        bwf_id='PS0001',
+        active_pumps=lambda when: pumps,
+        peak_discharge=lambda when: N_PUMPS * pump_option.head_curve.index.max()
+    )
+    # Not in the target heads, the pumping station targets the default head
+    closest_municipality = SimpleNamespace(
+        begin_date=pd.Timestamp('2000-01-01'),
+        effective_entity=lambda when: SimpleNamespace(cbs_id='GM9999')
+    )
+    source = SimpleNamespace(
+        bwf_id='SO0001',
+        pumping_station=pumping_station,
+        closest_municipality=closest_municipality,
+        nominal_capacity=50_000.,
+        available_capacity=pd.Series([50_000.], index=[pd.Timestamp(f'{YEAR}-01-01')])
+    )
+    return SimpleNamespace(
+        filename='WU-test',
+        network=None,
+        water_utilities=set(),
+        cross_utility_connections=[],
+        water_sources=[source],
+        pumping_stations=[pumping_station]
+    )
+
+def _make_national_context():
+    timesteps = pd.date_range(start=f'{YEAR}-01-01 00:00:00', periods=365*24, freq='h')
+    rng = np.random.default_rng(11)
+    daily = 1.0 + 0.5*np.sin(2*np.pi*(timesteps.hour.to_numpy() - 9)/24)
+    demands = (daily[:, None] * rng.uniform(40., 80., len(ELEVATIONS)) * rng.uniform(0.9, 1.1, (len(timesteps), len(ELEVATIONS))))
+    return SimpleNamespace(
+        municipalities_total_demands=pd.DataFrame(
+            demands,
+            index=timesteps,
+            columns=[f'GM{j:04d}' for j in range(len(ELEVATIONS))]
+        ),
+        sources_production=pd.DataFrame()
+    )
+
+def test_continuous_hydraulics_match_weekly_restarts(tmp_path, monkeypatch):
+
+    # Failed hours are logged in the working directory
+    monkeypatch.chdir(tmp_path)
+
+    pump_option = _make_pump_option()
+    monkeypatch.setattr(epanet_utils, 'build_epanet_network', lambda **kwargs: _make_network(pump_option))
+    national_context = _make_national_context()
+
+    results = {}
+    for continuous in [False, True]:
+        settings = Settings.from_config({
+            Settings.START_YEAR: YEAR,
+            Settings.END_YEAR: YEAR,
+            Settings.SEED: 1,
+            Settings.LIFELINE_VOLUME: 0.0,
+            Settings.HYDRAULICS_CONTINUOUS: continuous
+        })
+        results[continuous], telemetry = run_cluster_hydraulics(
+            national_context=national_context,
+            cluster=_make_cluster(pump_option),
+            year=YEAR,
+            settings=settings,
+            use_network_cache=False
+        )
+        assert (telemetry.status == HourStatus.SOLVED).all()
+
+    # Within the accuracy of EPANET (see test_tree_hydraulics.py)
+    weekly, continuous = results[False], results[True]
+    assert np.abs(continuous.sources_production - weekly.sources_production).to_numpy().max() < 0.05
+    assert np.abs(continuous.undelivered_demands - weekly.undelivered_demands).to_numpy().max() < 0.05
+    # The same pumps in parallel can share the flow differently, the station uses the same energy
+    np.testing.assert_allclose(
+        continuous.pumps_energy_consumption.sum(axis=1),
+        weekly.pumps_energy_consumption.sum(axis=1),
+        rtol=1e-3, atol=1e-3
+    )
+    # Some hours are limited by the pressure
+    assert (weekly.undelivered_demands.to_numpy().sum(axis=1) > 1.).any()
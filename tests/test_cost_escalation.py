@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core.base_model import DynamicProperties
+from water_futures_battle.services.evaluation import escalate_costs_over_horizon
+
+def test_escalate_costs_over_horizon():
+
+    years = pd.DatetimeIndex([pd.Timestamp(year=y, month=1, day=1) for y in range(2024, 2031)])
+    rng = np.random.default_rng(128)
+    inflation = pd.Series(rng.uniform(-1., 8., len(years)), index=years)
+
+    costs = pd.DataFrame(
+        {'NL0000-a': [120.3], 'NL0000-b': [7.], 'BE0000-a': [3.5]},
+        index=years[:1]
+    )
+    db = DynamicProperties('costs', {'cost': costs.copy()})
+    national_context = SimpleNamespace(
+        inflation=inflation,
+        inflation_indexed_costs=[(db, 'cost', ['NL0000-a', 'NL0000-b'])]
+    )
+
+    escalate_costs_over_horizon(from_year=2024, to_year=2030, national_context=national_context)
+
+    # One year at the time, as the evaluation used to do
+    expected = costs.copy()
+    for this_year, next_year in zip(years[:-1], years[1:]):
+        base_cost = expected.loc[this_year, ['NL0000-a', 'NL0000-b']]
+        expected.loc[next_year, base_cost.index] = ((1 + inflation.loc[next_year]/100) * base_cost).values
+
+    pd.testing.assert_frame_equal(db['cost'], expected, check_exact=True, check_freq=False)
+    assert db['cost'].loc[years[1:], 'BE0000-a'].isna().all()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from water_futures_battle.core.dataset_cache import DatasetCache, ExcelRead
+
+def test_dataset_cache(tmp_path):
+
+    source = tmp_path / "economy-dynamic_properties.xlsx"
+    timestamps = pd.date_range(start="2000-01-01", periods=5, freq='YS')
+    with pd.ExcelWriter(source) as writer:
+        for sheet in ['inflation', 'discount_rate']:
+            pd.DataFrame(
+                {'NL0000': np.linspace(0.01, 0.05, 5)},
+                index=pd.Index(timestamps, name='timestamp')
+            ).to_excel(writer, sheet_name=sheet)
+
+    cache = DatasetCache()
+    cache.enable(tmp_path / "cache")
+    kwargs = dict(sheet_name=None, index_col='timestamp', parse_dates=True)
+
+    first = cache.read_excel(source, **kwargs)
+    second = cache.read_excel(source, **kwargs)
+    assert (cache.n_misses, cache.n_hits) == (1, 1)
+    for sheet in first:
+        pd.testing.assert_frame_equal(first[sheet], second[sheet])
+    assert cache.verify([ExcelRead(source, kwargs)]) == []
+
+    # Different parsing arguments are a different entry
+    cache.read_excel(source, sheet_name='inflation')
+    assert cache.n_misses == 2
+    assert len(list((tmp_path / "cache").glob('*.pkl'))) == 2
+
+    # A modified source is parsed again, and replaces its old entry only
+    with pd.ExcelWriter(source) as writer:
+        pd.DataFrame({'NL0000': [0.1]}, index=pd.Index(timestamps[:1], name='timestamp')).to_excel(writer, sheet_name='inflation')
+    assert len(cache.read_excel(source, sheet_name='inflation')) == 1
+    assert cache.n_misses == 3
+    assert len(list((tmp_path / "cache").glob('*.pkl'))) == 2
+    assert cache.verify([ExcelRead(source, dict(sheet_name='inflation'))]) == []
+    # The other arguments have not been parsed since
+    assert len(cache.verify([ExcelRead(source, kwargs)])) == 1
+
+    cache.clear()
+    assert list((tmp_path / "cache").iterdir()) == []
+
+def test_dataset_cache_not_writable(tmp_path):
+
+    source = tmp_path / "climate-dynamic_properties.xlsx"
+    pd.DataFrame({'NL0000': [1.0, 2.0]}).to_excel(source, sheet_name='values')
+
+    # The cache directory can't be created: the workbook is parsed anyway
+    blocker = tmp_path / "not_a_folder"
+    blocker.write_text("")
+    cache = DatasetCache()
+    cache.enable(blocker / "cache")
+    with pytest.warns(UserWarning, match="Could not write"):
+        parsed = cache.read_excel(source, sheet_name='values')
+    pd.testing.assert_frame_equal(parsed, pd.read_excel(source, sheet_name='values'))
+
+def test_prefetching(tmp_path):
+
+    sources = []
+    timestamps = pd.date_range(start="2000-01-01", periods=5, freq='YS')
+    for name in ['climate', 'economy']:
+        source = tmp_path / f"{name}-dynamic_properties.xlsx"
+        pd.DataFrame(
+            {'NL0000': np.linspace(0.01, 0.05, 5)},
+            index=pd.Index(timestamps, name='timestamp')
+        ).to_excel(source, sheet_name='values')
+        sources.append(source)
+    kwargs = dict(sheet_name='values', index_col='timestamp', parse_dates=True)
+
+    cache = DatasetCache()
+    cache.enable(tmp_path / "cache")
+    with cache.prefetching([ExcelRead(fp, kwargs) for fp in sources], n_workers=2):
+        assert len(cache._prefetched) == 2
+        for fp in sources:
+            pd.testing.assert_frame_equal(cache.read_excel(fp, **kwargs), pd.read_excel(fp, **kwargs))
+        assert cache._prefetched == {}
+        # What was not prefetched is parsed as usual
+        cache.read_excel(sources[0], sheet_name='values')
+    assert (cache.n_misses, cache.n_hits) == (3, 0)
+    assert cache.verify([ExcelRead(fp, kwargs) for fp in sources]) == []
+
+    # The second time the workers find the entries in the cache
+    with cache.prefetching([ExcelRead(fp, kwargs) for fp in sources], n_workers=2):
+        for fp in sources:
+            cache.read_excel(fp, **kwargs)
+    assert (cache.n_misses, cache.n_hits) == (3, 2)
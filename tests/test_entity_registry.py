@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core.base_model import DynamicProperties
+from water_futures_battle.core.registry import EntityRegistry
+from water_futures_battle.connections.entities import Connection
+from water_futures_battle.pipes.dynamic_properties import PipeOptionsDB, PipesDB
+from water_futures_battle.pipes.entities import Pipe, PipeOption
+
+def test_registry_lookups():
+    old_entities, old_links = EntityRegistry._ENTITIES, EntityRegistry._LINKS
+    EntityRegistry.clear()
+    try:
+        EntityRegistry.register(str, 'a value', 'A')
+        EntityRegistry.link('letter-word', 'A', 'apple')
+
+        assert EntityRegistry.get(str, 'A') == 'a value'
+        assert EntityRegistry.get(str, 'A', within={'a value'}) == 'a value'
+        assert EntityRegistry.get(str, 'A', within=set()) is None
+        assert EntityRegistry.get(str, 'B') is None
+        assert EntityRegistry.get(int, 'A') is None
+        assert EntityRegistry.linked('letter-word', 'A') == 'apple'
+        assert EntityRegistry.linked('letter-word', 'B') is None
+
+        EntityRegistry.clear()
+        assert EntityRegistry.get(str, 'A') is None
+        assert EntityRegistry.linked('letter-word', 'A') is None
+    finally:
+        EntityRegistry._ENTITIES, EntityRegistry._LINKS = old_entities, old_links
+
+def test_entities_register_when_created():
+    old_entities, old_links = EntityRegistry._ENTITIES, EntityRegistry._LINKS
+    old_pipes_db = Pipe._dynamic_properties
+    old_options_db = PipeOption._dynamic_properties
+    old_registry = Pipe._DECOMMISSION_REGISTRY
+    old_active_years = Pipe._ACTIVE_YEARS
+    old_calendar = Connection._FAILURE_CALENDAR
+    EntityRegistry.clear()
+    Pipe._dynamic_properties = DynamicProperties('pipes', {PipesDB.FRICTIONF: pd.DataFrame(dtype=float)})
+    years = pd.date_range('2020-01-01', periods=10, freq='YS')
+    PipeOption._dynamic_properties = DynamicProperties('pipe_options', {
+        PipeOptionsDB.COST: pd.DataFrame({'PI01': 100.0}, index=years),
+        PipeOptionsDB.EMISSION: pd.DataFrame({'PI01': 1.0}, index=years),
+    })
+    Pipe._DECOMMISSION_REGISTRY = {}
+    Pipe._ACTIVE_YEARS = {}
+    try:
+        option = PipeOption(
+            bwf_id='PI01', diameter=0.3, material='PVC', dff_new=0.02,
+            dff_decay_rate=(0.0, 0.0), lifetime=(3, 6)
+        )
+        connection = Connection(
+            bwf_id='CG0001', to_node=None, distance=1.0, minor_loss_coeff=0.0,
+            pipes={}, replaced_by_cnn_id='', replaces_cnn_ids=[]
+        )
+        assert EntityRegistry.get(PipeOption, 'PI01', within={option}) is option
+        assert EntityRegistry.get(Connection, 'CG0001', within={connection}) is connection
+
+        # The installed pipes are found as soon as they exist
+        pipe = connection.install_pipe(option, pd.Timestamp('2021-01-01'), lifetime_rng=np.random.default_rng(3))
+        assert EntityRegistry.get(Pipe, pipe.bwf_id) is pipe
+    finally:
+        EntityRegistry._ENTITIES, EntityRegistry._LINKS = old_entities, old_links
+        Pipe._dynamic_properties = old_pipes_db
+        PipeOption._dynamic_properties = old_options_db
+        Pipe._DECOMMISSION_REGISTRY = old_registry
+        Pipe._ACTIVE_YEARS = old_active_years
+        Connection._FAILURE_CALENDAR = old_calendar
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core.base_model import DynamicProperties
+from water_futures_battle.connections.entities import Connection
+from water_futures_battle.pipes.dynamic_properties import PipeOptionsDB, PipesDB
+from water_futures_battle.pipes.entities import Pipe, PipeOption
+
+def test_failure_calendar():
+
+    old_pipes_db = Pipe._dynamic_properties
+    old_options_db = PipeOption._dynamic_properties
+    old_registry = Pipe._DECOMMISSION_REGISTRY
+    old_active_years = Pipe._ACTIVE_YEARS
+    old_calendar = Connection._FAILURE_CALENDAR
+    Pipe._dynamic_properties = DynamicProperties('pipes', {PipesDB.FRICTIONF: pd.DataFrame(dtype=float)})
+    years = pd.date_range('2020-01-01', periods=30, freq='YS')
+    PipeOption._dynamic_properties = DynamicProperties('pipe_options', {
+        PipeOptionsDB.COST: pd.DataFrame({'PI01': 100.0}, index=years),
+        PipeOptionsDB.EMISSION: pd.DataFrame({'PI01': 1.0}, index=years),
+    })
+    Pipe._DECOMMISSION_REGISTRY = {}
+    Pipe._ACTIVE_YEARS = {}
+    Connection.clear_failure_calendar()
+    try:
+        option = PipeOption(
+            bwf_id='PI01', diameter=0.3, material='PVC', dff_new=0.02,
+            dff_decay_rate=(0.0, 0.0), lifetime=(3, 6)
+        )
+        rng = np.random.default_rng(128)
+        connections = [
+            Connection(
+                bwf_id=f"CG{i:04d}", to_node=None, distance=1.0, minor_loss_coeff=0.0,
+                pipes={}, replaced_by_cnn_id='', replaces_cnn_ids=[]
+            )
+            for i in range(20)
+        ]
+        for connection in connections:
+            connection.install_pipe(option, pd.Timestamp('2020-01-01'), lifetime_rng=rng)
+        # Replaced before failing: its failure must not happen
+        replaced = connections[0]
+        replaced.install_pipe(option, pd.Timestamp('2021-01-01'), lifetime_rng=rng)
+
+        for year in range(2021, 2035):
+            candidates = Connection.failing_in(year)
+            assert [c.bwf_id for c in candidates] == sorted(c.bwf_id for c in candidates)
+
+            # Everything that scanning all the connections would find is in the calendar
+            failing = [c for c in connections if c.active_pipe(year) is not None and c.active_pipe(year)._is_failing_this_year(year)]
+            assert set(failing) <= set(candidates)
+
+            for connection in candidates:
+                connection.inspect_and_replace(year=year, lifetime_rng=rng)
+
+            assert all(
+                not c.active_pipe(year)._is_failing_this_year(year)
+                for c in connections if c.active_pipe(year) is not None
+            )
+
+        assert replaced.pipes[0].decommission_date == pd.Timestamp('2021-01-01')
+    finally:
+        Pipe._dynamic_properties = old_pipes_db
+        PipeOption._dynamic_properties = old_options_db
+        Pipe._DECOMMISSION_REGISTRY = old_registry
+        Pipe._ACTIVE_YEARS = old_active_years
+        Connection._FAILURE_CALENDAR = old_calendar
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core import Settings
+from water_futures_battle.services.epanet_utils import BWFHydraulicSimReults, network_cache
+from water_futures_battle.services.evaluation import simulate_clusters
+from water_futures_battle.services.hydraulics_pool import share_results, collect_shared_results
+
+def test_shared_results_roundtrip():
+
+    year = 2025
+    timesteps = pd.date_range(start=f"{year}-01-01 00:00:00", periods=365*24, freq="h")
+    rng = np.random.default_rng(128)
+
+    def random_frame(columns):
+        return pd.DataFrame(
+            data=rng.random((len(timesteps), len(columns)), dtype=np.float32),
+            index=timesteps,
+            columns=columns
+        )
+
+    sim_results = BWFHydraulicSimReults(
+        undelivered_demands=random_frame(['GM0001', 'GM0002']),
+        pumps_energy_consumption=random_frame(['PS0001-01', 'PS0001-02', 'PS0002-01']),
+        cross_utilities_flows=random_frame([]), # isolated clusters have no exchanges
+        sources_production=random_frame(['SS0001', 'SS0002'])
+    )
+
+    shared = collect_shared_results(share_results(sim_results, year))
+
+    for original, received in zip(sim_results, shared):
+        pd.testing.assert_frame_equal(original, received, check_exact=True, check_freq=False)
+
+def test_backends_give_the_same_results(synthetic_system, tmp_path, monkeypatch):
+
+    # Failed hours are logged in the working directory
+    monkeypatch.chdir(tmp_path)
+
+    results = {}
+    for backend, available_cores in [('serial', 1), ('threads', 3), ('processes', 3)]:
+        settings = Settings.from_config({
+            Settings.START_YEAR: synthetic_system.years[0],
+            Settings.END_YEAR: synthetic_system.years[-1],
+            Settings.SEED: 1,
+            Settings.LIFELINE_VOLUME: 0.0,
+            Settings.AVAILABLE_CORES: available_cores,
+            Settings.HYDRAULICS_BACKEND: 'threads' if backend == 'serial' else backend
+        })
+
+        def on_result(cluster, sim_results, telemetry):
+            results[(backend, cluster.filename)] = sim_results
+
+        # The serial and threads backends patch the networks of 2025 in 2026,
+        # the processes backend builds them again
+        try:
+            for year in synthetic_system.years:
+                simulate_clusters(
+                    year=year,
+                    national_context=synthetic_system.national_context,
+                    clusters=synthetic_system.clusters(year),
+                    settings=settings,
+                    on_result=on_result
+                )
+        finally:
+            network_cache.release()
+
+    for (backend, filename), sim_results in results.items():
+        for expected, received in zip(results[('serial', filename)], sim_results):
+            pd.testing.assert_frame_equal(expected, received, check_exact=True, check_freq=False)
+    assert len(results) == 3 * 2 * len(synthetic_system.years)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+from epanet_plus import EPyT, EpanetConstants
+
+from water_futures_battle.services.epanet_utils import (
+    IGNORED_WARNING_CODES,
+    BWFHydraulicSimReults,
+    run_hydraulic_step
+)
+from water_futures_battle.services.hydraulics_pool import collect_shared_results, share_results
+from water_futures_battle.services.hydraulics_telemetry import (
+    UNKNOWN_TRIALS,
+    HourStatus,
+    HydraulicsTelemetry,
+    HydraulicsTelemetryLog
+)
+
+def test_hydraulics_telemetry_summary(tmp_path):
+
+    telemetry = HydraulicsTelemetry.empty(cluster='WU01', year=2025, engine='epanet', n_hours=5)
+    telemetry.solve_time[:] = [0.1, 0.2, 0.1, 0.0, 0.3]
+    telemetry.warning_code[1] = 6
+    telemetry.status[2] = HourStatus.APPROXIMATED
+    telemetry.status[3] = HourStatus.FULL_ERROR
+
+    summary = telemetry.summary()
+    assert summary['hours'] == 5
+    assert np.isclose(summary['solve_time'], 0.7)
+    assert np.isclose(summary['max_hour_solve_time'], 0.3)
+    assert summary['max_trials'] == UNKNOWN_TRIALS and np.isnan(summary['mean_trials'])
+    assert summary['hours_with_warnings'] == 1
+    assert (summary['hours_solved'], summary['hours_approximated'], summary['hours_full_error']) == (3, 1, 1)
+
+    tree = HydraulicsTelemetry.empty(cluster='WU02', year=2025, engine='tree', n_hours=2)
+    tree.trials[:] = [3, 5]
+    assert tree.summary()['mean_trials'] == 4.0
+
+    # The telemetry crosses the process boundary with the results
+    timesteps = pd.date_range(start="2025-01-01 00:00:00", periods=365*24, freq="h")
+    frame = pd.DataFrame(np.zeros((len(timesteps), 1), dtype=np.float32), index=timesteps, columns=['X'])
+    handle = share_results(BWFHydraulicSimReults(frame, frame, frame, frame), 2025, telemetry)
+    collect_shared_results(handle)
+    assert np.array_equal(handle.telemetry.status, telemetry.status)
+
+    old_summaries = HydraulicsTelemetryLog._SUMMARIES
+    HydraulicsTelemetryLog.clear()
+    try:
+        HydraulicsTelemetryLog.track(tree)
+        HydraulicsTelemetryLog.track(telemetry)
+        df = pd.read_csv(HydraulicsTelemetryLog.dump(tmp_path))
+        assert list(df['cluster']) == ['WU01', 'WU02']
+    finally:
+        HydraulicsTelemetryLog._SUMMARIES = old_summaries
+
+def test_hydraulic_step_warning_code():
+
+    # Reservoir -> pipe -> municipality, too much demand in the second hour
+    net = EPyT(use_project=True, ignore_error_codes=IGNORED_WARNING_CODES)
+    net.setflowunits(EpanetConstants.EN_CMH)
+    net.set_hydraulic_time_step(60*60)
+    net.settimeparam(EpanetConstants.EN_PATTERNSTEP, 60*60)
+    net.add_pattern(pattern_id='GM0001', pattern_values=[10., 5000., 10.])
+    node_idx = net.addnode('SS0001', EpanetConstants.EN_RESERVOIR)
+    net.setnodevalue(node_idx, EpanetConstants.EN_ELEVATION, 30.)
+    node_idx = net.addnode('GM0001', EpanetConstants.EN_JUNCTION)
+    net.setnodevalue(node_idx, EpanetConstants.EN_BASEDEMAND, 1.0)
+    net.setnodevalue(node_idx, EpanetConstants.EN_PATTERN, net.getpatternindex(pattern_id='GM0001'))
+    link_idx = net.addlink('CN0001-00', EpanetConstants.EN_PIPE, from_node='SS0001', to_node='GM0001')
+    net.setpipedata(index=link_idx, length=1000, diam=150, rough=100, mloss=0)
+
+    net.set_simulation_duration(2*60*60)
+    net.openH()
+    net.initH(EpanetConstants.EN_INITFLOW)
+    codes = []
+    for _ in range(3):
+        codes.append(run_hydraulic_step(net))
+        net.nextH()
+    net.closeH()
+    net.close()
+
+    # The negative pressures of the second hour are not reported in the third
+    assert codes == [0, 6, 0]
@@ -0,0 +1,142 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from epanet_plus import EPyT, EpanetConstants
+
+from water_futures_battle.services.epanet_utils import (
+    IGNORED_WARNING_CODES,
+    EPANETNetworkCache,
+    NetworkLayout,
+    PumpingStationRepresentation,
+    apply_pumping_stations_patterns,
+    build_epanet_network,
+    patch_epanet_network,
+    run_hydraulic_step
+)
+
+def test_patch_network():
+
+    # Reservoir -> CV -> inlet -> 2 pumps -> outlet -> pipe -> municipality
+    net = EPyT(use_project=True)
+    net.setflowunits(EpanetConstants.EN_CMH)
+    net.add_pattern(pattern_id='PS0001-00', pattern_values=[1.0])
+    net.add_pattern(pattern_id='PS0001-01', pattern_values=[1.0])
+    net.addnode('SS0001', EpanetConstants.EN_RESERVOIR)
+    net.addnode('PS0001-inlet', EpanetConstants.EN_JUNCTION)
+    net.addnode('PS0001-outlet', EpanetConstants.EN_JUNCTION)
+    net.addnode('GM0001', EpanetConstants.EN_JUNCTION)
+    net.addlink('SS0001-CV', EpanetConstants.EN_CVPIPE, from_node='SS0001', to_node='PS0001-inlet')
+    for pump_id in ['PS0001-00', 'PS0001-01']:
+        net.addlink(pump_id, EpanetConstants.EN_PUMP, from_node='PS0001-inlet', to_node='PS0001-outlet')
+    elem_idx = net.addlink('CN0001-00', EpanetConstants.EN_PIPE, from_node='PS0001-outlet', to_node='GM0001')
+    net.setpipedata(index=elem_idx, length=1000, diam=300, rough=0.1, mloss=0)
+
+    old_layout = NetworkLayout(
+        topology=('same',),
+        pipes={'CN0001': ('CN0001-00', 1000, 300, 0.1, 0)},
+        supply_connections={'SS0001': 'CN0001'},
+        pumps={'PS0001': ('PS0001-00', 'PS0001-01')},
+        reservoirs={'SS0001': 0.0}
+    )
+    # The pipe has been replaced with a bigger one and the first pump failed
+    new_layout = NetworkLayout(
+        topology=('same',),
+        pipes={'CN0001': ('CN0001-01', 1000, 400, 0.2, 0)},
+        supply_connections={'SS0001': 'CN0001'},
+        pumps={'PS0001': ('PS0001-01', 'PS0001-02')},
+        reservoirs={'SS0001': 5.0}
+    )
+
+    patch_epanet_network(net, old_layout, new_layout)
+
+    assert net.get_all_links_id() == ['SS0001-CV', 'PS0001-01', 'PS0001-02', 'CN0001-01']
+    assert net.get_all_patterns_id() == ['PS0001-01', 'PS0001-02']
+
+    pipe_idx = net.getlinkindex('CN0001-01')
+    assert net.getlinkvalue(pipe_idx, EpanetConstants.EN_DIAMETER) == 400
+    assert net.getlinkvalue(net.getlinkindex('SS0001-CV'), EpanetConstants.EN_DIAMETER) == 400
+    assert net.getnodevalue(net.getnodeindex('SS0001'), EpanetConstants.EN_ELEVATION) == 5.0
+
+    net.close()
+
+def _run_hours(net: EPyT, n_hours: int = 48):
+    """Random demands and pumping stations setups, the heads, flows and pump energy of every hour."""
+    rng = np.random.default_rng(5)
+    pumps_patterns: Dict[str, List[int]] = {}
+    for pattern_idx, pattern_id in enumerate(net.get_all_patterns_id(), start=1):
+        if pattern_id.startswith('GM'):
+            net.setpattern(pattern_idx, values=list(rng.uniform(20., 80., n_hours)), len=n_hours)
+        else:
+            pumps_patterns.setdefault(pattern_id[:6], []).append(pattern_idx)
+    # From one pump to all the pumps of the station, at the same speed
+    apply_pumping_stations_patterns(
+        net=net,
+        patterns=pd.DataFrame({
+            pstat_id: rng.integers(1, len(patterns_idx)+1, n_hours) + rng.uniform(0.8, 1.0, n_hours)
+            for pstat_id, patterns_idx in pumps_patterns.items()
+        }),
+        mapping=pumps_patterns
+    )
+    net.set_simulation_duration((n_hours-1) * 60 * 60)
+
+    heads, flows, energy = [], [], []
+    net.openH()
+    net.initH(EpanetConstants.EN_INITFLOW)
+    for _ in range(n_hours):
+        run_hydraulic_step(net)
+        heads.append(net.getnodevalues(EpanetConstants.EN_HEAD))
+        flows.append(net.getlinkvalues(EpanetConstants.EN_FLOW))
+        energy.append(net.getlinkvalues(EpanetConstants.EN_ENERGY))
+        net.nextH()
+    net.closeH()
+
+    return np.array(heads), np.array(flows), np.array(energy)
+
+def test_patched_network_matches_new_network(synthetic_system):
+
+    cache = EPANETNetworkCache()
+    kwargs = dict(
+        pumping_station_representation=PumpingStationRepresentation.FREE_PARALLEL_PUMPS,
+        epyt_kwargs={"ignore_error_codes": IGNORED_WARNING_CODES}
+    )
+    links = []
+    try:
+        for cluster in synthetic_system.clusters(2025):
+            # Simulated, as the cached networks are
+            _run_hours(cache.get(
+                year=2025,
+                water_utilities=cluster.water_utilities,
+                cross_utility_connections=cluster.cross_utility_connections,
+                **kwargs
+            ))
+
+        for cluster in synthetic_system.clusters(2026):
+            patched = cache.get(
+                year=2026,
+                water_utilities=cluster.water_utilities,
+                cross_utility_connections=cluster.cross_utility_connections,
+                **kwargs
+            )
+            new = build_epanet_network(
+                year=2026,
+                water_utilities=cluster.water_utilities,
+                cross_utility_connections=cluster.cross_utility_connections,
+                **kwargs
+            )
+            try:
+                assert patched.get_all_nodes_id() == new.get_all_nodes_id()
+                assert patched.get_all_links_id() == new.get_all_links_id()
+                links += patched.get_all_links_id()
+                assert patched.get_all_patterns_id() == new.get_all_patterns_id()
+
+                for patched_values, new_values in zip(_run_hours(patched), _run_hours(new)):
+                    np.testing.assert_array_equal(patched_values, new_values)
+            finally:
+                new.close()
+
+        # The pump failures, the replaced pipe and the aging are all there
+        assert {'PS0001-03', 'PS0002-02', 'CS0001-01'} <= set(links)
+        assert not {'PS0001-00', 'PS0002-00', 'CS0001-00'} & set(links)
+    finally:
+        cache.release()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core.random_manager import RandomManager
+from water_futures_battle.core.utility import timestampify
+from water_futures_battle.energy.dynamic_properties import EnergySysDB
+from water_futures_battle.energy.services import get_hourly_electricity_price_of_year
+from water_futures_battle.water_utilities.services import _sequential_sum
+
+def _price_week_by_week(scope, energy_sys_db, year):
+    ele_ucs = energy_sys_db[EnergySysDB.EPRICE_UNIT]
+    ele_patterns = energy_sys_db[EnergySysDB.EPRICE_PATT]
+    ts = timestampify(year)
+    sub_patterns = [ele_ucs.asof(ts)[scope] * ele_patterns.asof(ts).to_numpy()[-24:]]
+    ts += pd.DateOffset(hours=24)
+    for i in range(53):
+        curr_ts = ts + pd.DateOffset(weeks=i)
+        sub_patterns.append(ele_ucs.asof(curr_ts)[scope] * ele_patterns.asof(curr_ts).to_numpy())
+    return np.concat(sub_patterns, axis=0)[:24*365]
+
+def test_hourly_electricity_price():
+    rng = np.random.default_rng(3)
+    ucs = pd.DataFrame(
+        {'NL0000': rng.uniform(0.1, 0.3, 8), 'NL0001': rng.uniform(0.1, 0.3, 8)},
+        index=pd.DatetimeIndex(['2020-01-01', '2021-01-01', '2024-01-01', '2024-03-15',
+                                '2024-07-01', '2025-01-01', '2025-06-01', '2026-01-01'])
+    )
+    ucs.iloc[4, 1] = np.nan # DataFrame.asof skips the rows with a NaN
+    patterns = pd.DataFrame(
+        rng.uniform(0.5, 1.5, (3, 168)),
+        index=pd.DatetimeIndex(['2020-01-01', '2024-05-01', '2025-01-01'])
+    )
+    db = {EnergySysDB.EPRICE_UNIT: ucs, EnergySysDB.EPRICE_PATT: patterns}
+
+    for year in (2019, 2020, 2024, 2025, 2030):
+        for scope in ('NL0000', 'NL0001'):
+            np.testing.assert_array_equal(
+                get_hourly_electricity_price_of_year(scope, db, year),
+                _price_week_by_week(scope, db, year)
+            )
+
+def test_sequential_sum():
+    rng = np.random.default_rng(5)
+    for dtype in (np.float32, np.float64):
+        values = pd.Series((rng.normal(size=24*365) * 1e3).astype(dtype))
+        assert _sequential_sum(values.to_numpy()) == sum(values)
+    assert _sequential_sum(np.array([], dtype=np.float32)) == 0.0
+
+def test_uniform_draws():
+    low = np.array([1.0, 2.0, 3.0, 4.0])
+    high = np.array([2.0, 5.0, 3.5, 10.0])
+    keys = [(f"GW{i}", 2030) for i in range(4)]
+
+    for mode in RandomManager.MODES:
+        one_by_one = RandomManager(master_seed=11, mode=mode)
+        at_once = RandomManager(master_seed=11, mode=mode)
+
+        expected = [
+            one_by_one.get('sources-opex-fixed', *key).uniform(low=lb, high=ub)
+            for key, lb, ub in zip(keys, low, high)
+        ]
+        drawn = at_once.uniform('sources-opex-fixed', keys, low, high)
+
+        assert drawn.tolist() == expected
+        # and the generators are left in the same state
+        assert (
+            at_once.get('sources-opex-fixed').random() ==
+            one_by_one.get('sources-opex-fixed').random()
+        )
@@ -0,0 +1,47 @@
+import threading
+import time
+
+from water_futures_battle.core.profiler import PhaseProfiler
+
+def test_phases_are_nested_and_summarised(tmp_path):
+
+    profiler = PhaseProfiler()
+    with profiler.phase('not-recorded', 2025):
+        pass
+    assert profiler.records == []
+
+    profiler.enable(memory_mode='tracemalloc')
+    for year in [2025, 2026]:
+        with profiler.phase('hydraulics', year):
+            with profiler.phase('settle_operations', label='WU01'):
+                data = [0.0] * 100_000
+                time.sleep(0.01)
+                del data
+
+            # what runs in another thread gives its full path
+            def worker():
+                with profiler.phase('hydraulics/cluster', year, label='cluster-1'):
+                    time.sleep(0.01)
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+    profiler.disable()
+
+    df = profiler.to_dataframe()
+    assert sorted(df['phase'].unique()) == ['hydraulics', 'hydraulics/cluster', 'hydraulics/settle_operations']
+    settle = df[df['phase'] == 'hydraulics/settle_operations']
+    assert list(settle['year']) == [2025, 2026] # inherited from the parent phase
+    assert (settle['memory_peak'] >= 800_000).all()
+    assert (df.loc[df['phase'] == 'hydraulics', 'memory_peak'] >= 800_000).all()
+
+    summary = profiler.summary()
+    assert summary.loc['hydraulics', 'calls'] == 2
+    assert summary.index[0] == 'hydraulics'
+
+    folded = dict(line.rsplit(' ', 1) for line in profiler.folded_stacks())
+    assert set(folded) == {'hydraulics', 'hydraulics;cluster', 'hydraulics;settle_operations'}
+    assert int(folded['hydraulics']) < summary.loc['hydraulics', 'wall_time'] * 1e6
+
+    profiler.dump(tmp_path)
+    for name in ['profile.csv', 'profile.json', 'profile-summary.csv', 'profile-folded.txt']:
+        assert (tmp_path / name).exists()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.pumps.entities import PumpOption
+from water_futures_battle.pumping_stations.services import (
+    get_lowest_energy_pumping_station_setup,
+    get_lowest_energy_pumping_station_setups
+)
+
+def make_pump_option(bwf_id: str, scale: float) -> PumpOption:
+    flows = np.array([100., 200., 300., 400., 500.]) * scale
+    curves = pd.DataFrame({
+        PumpOption.Q: flows,
+        PumpOption.H: [62., 58., 51., 41., 28.],
+        PumpOption.P: [40., 55., 68., 78., 85.],
+        PumpOption.E: [45., 68., 79., 76., 62.]
+    }).set_index(PumpOption.Q)
+
+    return PumpOption(
+        bwf_id=bwf_id,
+        name=bwf_id,
+        nominal_flow_rate=300.*scale,
+        lifetime=(15, 25),
+        _curves=curves
+    )
+
+def test_batched_setup_matches_single():
+
+    RNG = np.random.default_rng(128)
+    options = [make_pump_option('PU0001', 1.0), make_pump_option('PU0002', 2.5)]
+
+    n_stations = 500
+    pump_options = [options[i % 2] for i in range(n_stations)]
+    target_heads = RNG.uniform(20., 70., n_stations)
+    target_flows = RNG.uniform(-20., 3000., n_stations)
+    n_available = RNG.integers(1, 7, n_stations)
+    coeffs = np.array([po.pump_curve_coeffs for po in pump_options])
+
+    setups = get_lowest_energy_pumping_station_setups(
+        target_heads=target_heads,
+        target_flows=target_flows,
+        n_available_pumps=n_available,
+        pump_options=pump_options,
+        speed_ratio_bounds=(0.5, 1.0),
+        pump_curve_coeffs=coeffs
+    )
+
+    n_valid = 0
+    for i in range(n_stations):
+        try:
+            expected = get_lowest_energy_pumping_station_setup(
+                target_head=target_heads[i],
+                target_flow=target_flows[i],
+                n_available_pumps=n_available[i],
+                pump_option=pump_options[i],
+                speed_ratio_bounds=(0.5, 1.0),
+                pump_curve_coeffs=tuple(coeffs[i, :])
+            )
+        except Exception:
+            assert not setups.valid[i]
+            continue
+
+        n_valid += 1
+        assert setups.valid[i]
+        assert (
+            setups.n_pumps[i],
+            setups.speeds[i],
+            setups.single_pump_energies[i],
+            setups.efficiencies[i]
+        ) == expected
+
+    # make sure we are not only testing the failures
+    assert n_valid > n_stations // 2
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.connections.services import age_pipes
+from water_futures_battle.core import Settings
+from water_futures_battle.core.random_manager import RandomManager
+from water_futures_battle.pipes.dynamic_properties import PipesDB
+from water_futures_battle.pipes.entities import Pipe
+
+def test_sequential_mode_ignores_keys():
+
+    reference = np.random.default_rng(128).spawn(len(RandomManager.AVAILABLE_GENERATORS))
+    reference = dict(zip(RandomManager.AVAILABLE_GENERATORS, reference))
+
+    rnd_manager = RandomManager(master_seed=128)
+    first = rnd_manager.get('pipes-lifetime', 'CN0001', 2025).random(3)
+    second = rnd_manager.get('pipes-lifetime', 'CN0002', 2025).random(3)
+
+    expected = reference['pipes-lifetime'].random(6)
+    assert (np.concatenate([first, second]) == expected).all()
+
+def test_keyed_mode_is_order_independent():
+
+    rnd_manager = RandomManager(master_seed=128, mode='keyed')
+    a = rnd_manager.get('water_demand_model-sample_demand', 'GM0001', 2025).random(3)
+    b = rnd_manager.get('water_demand_model-sample_demand', 'GM0002', 2025).random(3)
+
+    # Another run, asking in a different order
+    other_manager = RandomManager(master_seed=128, mode='keyed')
+    b_again = other_manager.get('water_demand_model-sample_demand', 'GM0002', 2025).random(3)
+    a_again = other_manager.get('water_demand_model-sample_demand', 'GM0001', 2025).random(3)
+
+    assert (a == a_again).all() and (b == b_again).all()
+    assert not (a == b).any()
+
+    # The key includes the module, the year and the seed
+    assert not (a == other_manager.get('nrw_model-sample_demand', 'GM0001', 2025).random(3)).any()
+    assert not (a == other_manager.get('water_demand_model-sample_demand', 'GM0001', 2026).random(3)).any()
+    assert not (a == RandomManager(129, mode='keyed').get('water_demand_model-sample_demand', 'GM0001', 2025).random(3)).any()
+
+class _Connection:
+    def __init__(self, bwf_id: str):
+        self.bwf_id = bwf_id
+        self.pipe = SimpleNamespace(bwf_id=f"{bwf_id}-00", _pipe_option=SimpleNamespace(dff_decay_rate=(0.01, 0.05)))
+
+    def active_pipe(self, when):
+        return self.pipe
+
+def test_pipe_ageing_keyed_by_pipe():
+
+    def aged(connection_ids):
+        connections = {_Connection(c_id) for c_id in connection_ids}
+        Pipe.set_dynamic_properties(PipesDB(dataframes={PipesDB.FRICTIONF: pd.DataFrame(
+            1.0,
+            index=pd.DatetimeIndex([pd.Timestamp('2025-01-01')]),
+            columns=[c.pipe.bwf_id for c in connections]
+        )}))
+        settings = Settings.from_config({'start_year': 2025, 'end_year': 2026, 'seed': 128, 'lifeline_volume': 50, 'rng_mode': 'keyed'})
+        age_pipes(connections, 2025, settings)
+        return Pipe._dynamic_properties[PipesDB.FRICTIONF].loc[pd.Timestamp('2026-01-01')]
+
+    old_db = Pipe._dynamic_properties
+    try:
+        before = aged(['CN0001', 'CN0003', 'CN0004'])
+        # A new pipe, sorted among the others, doesn't change their decay
+        after = aged(['CN0001', 'CN0002', 'CN0003', 'CN0004'])
+    finally:
+        Pipe.set_dynamic_properties(old_db)
+
+    pd.testing.assert_series_equal(after[before.index], before, check_exact=True)
+    assert ((before > 1.01) & (before < 1.05)).all()
@@ -0,0 +1,200 @@
+import gc
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core.base_model import BWFResult, DynamicProperties, RetentionPolicy, bwf_database
+
+class DummyResults(BWFResult):
+    NAME = 'dummy-results'
+
+    HOURLY = 'hourly'
+    YEARLY = 'yearly'
+
+    TRACKED_VARIABLES = [
+        HOURLY,
+        YEARLY
+    ]
+
+def test_commit_columnar_results():
+
+    results = DummyResults()
+    results.reserve(DummyResults.HOURLY, n_timestamps=3*8760)
+
+    RNG = np.random.default_rng(128)
+    expected = []
+    for year in [2025, 2026, 2027]:
+        timestamps = pd.date_range(start=f"{year}-01-01", periods=8760, freq='h')
+        # entities come and go, the new ones are added in alphabetical order
+        columns = ['SS0003', 'SS0001'] if year < 2027 else ['SS0002', 'SS0003']
+        df = pd.DataFrame(RNG.random((8760, 2)), index=timestamps, columns=columns)
+
+        results.commit(DummyResults.HOURLY, timestamps=timestamps, data=df)
+        expected.append(df)
+
+    expected_df = pd.concat(expected).astype(np.float32)
+    hourly = results[DummyResults.HOURLY]
+    assert list(hourly.columns) == ['SS0001', 'SS0003', 'SS0002']
+    assert (hourly.dtypes == np.float32).all()
+    pd.testing.assert_frame_equal(
+        hourly,
+        expected_df[hourly.columns].rename_axis('timestamp'),
+        check_freq=False
+    )
+
+    # Single entity mode and writing in the past
+    results.commit(DummyResults.YEARLY, pd.DatetimeIndex([pd.Timestamp('2026-01-01')]), entity='WU01', values=2.0)
+    results.commit(DummyResults.YEARLY, pd.DatetimeIndex([pd.Timestamp('2025-01-01')]), data=pd.Series({'WU01': 1.0, 'WU02': 3.0}))
+
+    yearly = results[DummyResults.YEARLY]
+    assert list(yearly.index.year) == [2025, 2026]
+    assert yearly.loc['2025-01-01', 'WU02'] == 3.0
+    assert yearly.loc['2026-01-01', 'WU01'] == 2.0
+    assert np.isnan(yearly.loc['2026-01-01', 'WU02'])
+
+def test_views_dont_change():
+
+    results = DummyResults()
+    timestamps = pd.date_range(start="2025-01-01", periods=48, freq='h')
+    results.commit(DummyResults.HOURLY, timestamps=timestamps, entity='SS0001', values=np.arange(48.))
+
+    held = results[DummyResults.HOURLY]
+    expected = held.copy()
+    assert not held.to_numpy().flags.writeable
+
+    # Appending rows and columns, overwriting a viewed value, forgetting rows
+    results.commit(DummyResults.HOURLY, timestamps=timestamps + pd.Timedelta(days=2), entity='SS0001', values=1.0)
+    results.commit(DummyResults.HOURLY, timestamps=timestamps, entity='SS0002', values=2.0)
+    pd.testing.assert_frame_equal(held, expected)
+
+    results.commit(DummyResults.HOURLY, timestamps=timestamps[:1], entity='SS0001', values=-1.0)
+    pd.testing.assert_frame_equal(held, expected)
+    assert results[DummyResults.HOURLY].iloc[0, 0] == -1.0
+
+    held = results[DummyResults.HOURLY]
+    expected = held.copy()
+    results._blocks[DummyResults.HOURLY].drop_first_rows(24)
+    pd.testing.assert_frame_equal(held, expected)
+    assert results[DummyResults.HOURLY].index[0] == timestamps[24]
+
+class LookbackResults(DummyResults):
+    LOOKBACK = {
+        DummyResults.HOURLY: 23
+    }
+
+def test_retention_policies(tmp_path):
+
+    aggregated = LookbackResults().set_retention(
+        DummyResults.HOURLY,
+        RetentionPolicy(mode='aggregate', aggregates=('sum', 'max', 'p95')),
+        live_rows=8760
+    )
+    spilled = DummyResults().set_retention(
+        DummyResults.HOURLY,
+        RetentionPolicy(mode='spill', spill_dir=tmp_path),
+        live_rows=8760
+    )
+
+    RNG = np.random.default_rng(128)
+    expected = []
+    for year in [2025, 2026, 2027]:
+        timestamps = pd.date_range(start=f"{year}-01-01", periods=8760, freq='h')
+        columns = ['SS0001', 'SS0002'] if year < 2027 else ['SS0001', 'SS0003']
+        df = pd.DataFrame(RNG.random((8760, 2)), index=timestamps, columns=columns)
+        expected.append(df)
+
+        for results in [aggregated, spilled]:
+            results.commit(DummyResults.HOURLY, timestamps=timestamps, data=df)
+            results.settle(pd.Timestamp(year=year+1, month=1, day=1))
+
+        # Only the last 23 hours stay in memory (and the memory doesn't grow)
+        live = aggregated[DummyResults.HOURLY]
+        assert len(live) == 23 and live.index[-1] == timestamps[-1]
+        assert aggregated._blocks[DummyResults.HOURLY].data.shape[0] == 8760 + 23
+        assert len(spilled[DummyResults.HOURLY]) == 0
+
+    expected_df = pd.concat(expected).astype(np.float32)
+    expected_df.index.name = 'timestamp'
+    for stat, expected_agg in [
+        ('sum', expected_df.groupby(expected_df.index.year).sum(min_count=1)),
+        ('max', expected_df.groupby(expected_df.index.year).max()),
+        ('p95', expected_df.groupby(expected_df.index.year).quantile(0.95)),
+    ]:
+        agg = aggregated.aggregates(DummyResults.HOURLY, stat)
+        assert list(agg.index.year) == [2025, 2026, 2027]
+        np.testing.assert_allclose(agg.to_numpy(), expected_agg.to_numpy(dtype=np.float32), rtol=1e-5)
+
+    # The spilled hours are all there
+    pd.testing.assert_frame_equal(spilled.history(DummyResults.HOURLY), expected_df, check_freq=False)
+    # Aggregated variables are saved as their aggregates
+    assert set(aggregated.dataframes) == {'hourly-sum', 'hourly-max', 'hourly-p95', DummyResults.YEARLY}
+
+def _spill_two_years(spill_dir) -> DummyResults:
+    results = DummyResults().set_retention(
+        DummyResults.HOURLY,
+        RetentionPolicy(mode='spill', spill_dir=spill_dir),
+        live_rows=8760
+    )
+    for year in [2025, 2026]:
+        timestamps = pd.date_range(start=f"{year}-01-01", periods=8760, freq='h')
+        results.commit(DummyResults.HOURLY, timestamps=timestamps, data={'SS0001': np.arange(8760.)})
+        results.settle(pd.Timestamp(year=year+1, month=1, day=1))
+    return results
+
+def test_spilled_files_cleanup(tmp_path):
+
+    results = _spill_two_years(tmp_path)
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # Pickled (e.g., in a checkpoint) with the spilled values, spilled again when loaded
+    history = results.history(DummyResults.HOURLY)
+    restored = pickle.loads(pickle.dumps(results))
+    assert len(list(tmp_path.iterdir())) == 4
+    pd.testing.assert_frame_equal(restored.history(DummyResults.HOURLY), history)
+
+    results.discard_spilled()
+    assert len(list(tmp_path.iterdir())) == 2
+    assert len(results.history(DummyResults.HOURLY)) == 0
+
+    del restored
+    gc.collect()
+    assert not list(tmp_path.iterdir())
+
+    # A forked copy doesn't delete the files of its parent
+    results = _spill_two_years(tmp_path)
+    pid = os.fork()
+    if pid == 0:
+        results.discard_spilled()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert len(list(tmp_path.iterdir())) == 2
+
+@bwf_database
+class DummyDB(DynamicProperties):
+    NAME = 'dummy-dynamic_properties'
+
+    EXOGENOUS_VARIABLES = [
+        DummyResults.HOURLY,
+        DummyResults.YEARLY
+    ]
+
+def test_parquet_roundtrip(tmp_path):
+
+    results = DummyResults()
+    RNG = np.random.default_rng(128)
+    timestamps = pd.date_range(start="2025-01-01", periods=3*8760, freq='h')
+    hourly = pd.DataFrame(RNG.random((len(timestamps), 2)), columns=['SS0001', 'SS0002'])
+    # SS0002 is decommissioned after the first two years
+    hourly.iloc[2*8760:, 1] = np.nan
+    results.commit(DummyResults.HOURLY, timestamps=timestamps, data=hourly)
+    results.commit(DummyResults.YEARLY, pd.DatetimeIndex([pd.Timestamp('2025-01-01')]), entity='WU01', values=1.0)
+
+    dir_path = results.dump(path=tmp_path, format='parquet')
+    assert (dir_path / DummyResults.HOURLY / '2027.parquet').exists()
+
+    db = DummyDB.load_from_file(dir_path)
+    for var in [DummyResults.HOURLY, DummyResults.YEARLY]:
+        assert (db[var].dtypes == np.float32).all()
+        pd.testing.assert_frame_equal(db[var], results[var], check_freq=False)
@@ -0,0 +1,86 @@
+import contextlib
+
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.economy.dynamic_properties import EconomyDB
+from water_futures_battle.services.shared_datasets import SharedDatasets, _copy_on_write
+from water_futures_battle.water_demand_model import WaterDemandModelPattern
+from water_futures_battle.water_demand_model.services import get_pattern_harmonics
+
+def copy_on_write():
+    """Copy-on-write is always on from pandas 3, and can be turned on before."""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return contextlib.nullcontext()
+    return pd.option_context('mode.copy_on_write', True)
+
+def test_shared_datasets():
+    with copy_on_write():
+        _test_shared_datasets()
+
+def _test_shared_datasets():
+
+    time_range = pd.date_range(start='2000-01-01', periods=5, freq='YS')
+    inflation = pd.DataFrame(
+        {'NL0000': np.linspace(0.01, 0.05, 5), 'NL0001': np.linspace(0.02, 0.06, 5)},
+        index=time_range
+    )
+    edb = EconomyDB(
+        dataframes={
+            EconomyDB.INFLATION: inflation.copy(),
+            # Not numeric, left where it is
+            EconomyDB.INFEXPECT: pd.DataFrame({'NL0000': ['a'] * 5}, index=time_range),
+            EconomyDB.INVDEMAND: pd.DataFrame(),
+        }
+    )
+    values = np.random.default_rng(3).uniform(1, 2, 8760)
+    pattern = WaterDemandModelPattern(bwf_id='P01', category='residential', values=values.copy())
+    expected_harmonics = get_pattern_harmonics(
+        WaterDemandModelPattern(bwf_id='P02', category='residential', values=values.copy())
+    )
+
+    shared = SharedDatasets()
+    n_bytes = shared.publish([edb, edb], patterns=[pattern])
+    assert n_bytes > 0 and n_bytes % 64 == 0
+    assert shared.is_shared(edb, EconomyDB.INFLATION)
+    assert not shared.is_shared(edb, EconomyDB.INFEXPECT)
+    assert not shared.is_shared(edb, EconomyDB.INVDEMAND)
+
+    # Same values, but read from the shared block
+    published = shared._published[(id(edb), EconomyDB.INFLATION)][0]
+    pd.testing.assert_frame_equal(edb[EconomyDB.INFLATION], inflation)
+    assert np.shares_memory(edb[EconomyDB.INFLATION]['NL0000'].to_numpy(), published.to_numpy())
+    np.testing.assert_array_equal(pattern.values, values)
+    assert not pattern.values.flags.writeable
+    np.testing.assert_array_equal(get_pattern_harmonics(pattern).hourly_adim, expected_harmonics.hourly_adim)
+
+    # Nothing left to share
+    assert shared.publish([edb], patterns=[pattern]) == 0
+
+    # A write is seen by this process only, the shared block doesn't change
+    edb[EconomyDB.INFLATION].loc[time_range[0], 'NL0000'] = 1.0
+    assert edb[EconomyDB.INFLATION].loc[time_range[0], 'NL0000'] == 1.0
+    assert published.loc[time_range[0], 'NL0000'] == inflation.loc[time_range[0], 'NL0000']
+    assert np.shares_memory(edb[EconomyDB.INFLATION]['NL0001'].to_numpy(), published.to_numpy())
+
+def test_write_after_share():
+
+    # With the default options of the installed pandas
+    time_range = pd.date_range(start='2000-01-01', periods=3, freq='YS')
+    inflation = pd.DataFrame({'NL0000': [0.01, 0.02, 0.03]}, index=time_range)
+    edb = EconomyDB(
+        dataframes={
+            EconomyDB.INFLATION: inflation.copy(),
+            EconomyDB.INFEXPECT: inflation.copy(),
+            EconomyDB.INVDEMAND: pd.DataFrame(),
+        }
+    )
+
+    shared = SharedDatasets()
+    shared.publish([edb])
+    assert shared.is_shared(edb, EconomyDB.INFLATION) == _copy_on_write()
+
+    edb[EconomyDB.INFLATION].loc[time_range[1], 'NL0000'] = 1.0
+    assert edb[EconomyDB.INFLATION].loc[time_range[1], 'NL0000'] == 1.0
+    for published, _ in shared._published.values():
+        pd.testing.assert_frame_equal(published, inflation, check_freq=False)
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.core import get_snapshot
+from water_futures_battle.core.base_model import DynamicProperties
+from water_futures_battle.core.views import StateColumn, state_tables, values_asof
+
+YEARS = pd.DatetimeIndex([pd.Timestamp(year=y, month=1, day=1) for y in range(2020, 2026)])
+
+class _Entity:
+    _dynamic_properties = None
+
+    DYNAMIC_PROPERTIES = {
+        'level': float,
+        'level_class': int,
+        'surplus': float,
+    }
+
+    STATE_ID = 'bwf_id'
+    STATE_COLUMNS = {
+        'level': StateColumn([('_dynamic_properties', 'level')]),
+        'surplus': StateColumn(
+            [('_dynamic_properties', 'level'), ('_dynamic_properties', 'target')],
+            combine=lambda level, target: (level - target).clip(lower=0)
+        ),
+    }
+    STATE_DERIVED = {
+        'level_class': ('level', lambda level: int(level // 10)),
+    }
+
+    def __init__(self, bwf_id: str):
+        self.bwf_id = bwf_id
+
+    @property
+    def level(self) -> pd.Series:
+        return self._dynamic_properties['level'][self.bwf_id]
+
+    def set_level(self, when: pd.Timestamp, value: float) -> None:
+        self._dynamic_properties['level'].loc[when, self.bwf_id] = value
+        self._dynamic_properties.touch('level')
+
+def test_values_asof():
+
+    rng = np.random.default_rng(128)
+    values = rng.uniform(0, 100, size=(len(YEARS), 5))
+    values[rng.uniform(size=values.shape) < 0.4] = np.nan
+    values[:, 0] = np.nan
+    df = pd.DataFrame(values, index=YEARS, columns=list('abcde'))
+
+    for ts in [pd.Timestamp('2019-06-01'), *YEARS, pd.Timestamp('2023-06-01'), pd.Timestamp('2030-01-01')]:
+        expected = np.array([df[c].asof(ts) for c in df.columns])
+        np.testing.assert_array_equal(values_asof(df, ts), expected)
+
+def test_state_tables():
+
+    level = pd.DataFrame(
+        {'E1': [12., np.nan, 25., np.nan, np.nan, 31.], 'E2': [3., 4., np.nan, 48., np.nan, np.nan]},
+        index=YEARS
+    )
+    target = pd.DataFrame({'E1': [10.] * 6, 'E2': [10.] * 6}, index=YEARS)
+    _Entity._dynamic_properties = DynamicProperties('entities', {'level': level, 'target': target})
+    entities = [_Entity('E1'), _Entity('E2')]
+
+    state_tables.clear()
+    for year in range(2020, 2027):
+        for entity in entities:
+            snapshot = get_snapshot(entity, year)
+            expected_level = entity.level.asof(pd.Timestamp(year=year, month=1, day=1))
+            assert snapshot.level == expected_level
+            assert snapshot.level_class == int(expected_level // 10)
+            assert snapshot.surplus == max(expected_level - 10., 0.)
+
+    # A setter that writes must be seen by the views of every year
+    entities[1].set_level(YEARS[3], 71.)
+    assert get_snapshot(entities[1], 2025).level == 71.
+    assert get_snapshot(entities[1], 2025).level_class == 7
+    assert get_snapshot(entities[1], 2024).surplus == 61.
+    assert get_snapshot(entities[0], 2025).level == 31.
+
+    # New databases (e.g., a new evaluation) are never mixed with the old ones
+    _Entity._dynamic_properties = DynamicProperties('entities', {'level': level * 2, 'target': target})
+    assert get_snapshot(entities[0], 2025).level == 62.
+    state_tables.clear()
@@ -0,0 +1,173 @@
+import numpy as np
+import pandas as pd
+from epanet_plus import EPyT, EpanetConstants
+
+from water_futures_battle.pumps.entities import PumpOption
+from water_futures_battle.services.epanet_utils import set_hydraulic_options
+from water_futures_battle.services.tree_hydraulics import (
+    PipeData,
+    TreeHydraulicModel,
+    pumps_power,
+    solve_tree_hydraulics
+)
+
+def _make_model() -> TreeHydraulicModel:
+    curves = pd.DataFrame({
+        PumpOption.Q: [200., 400., 600., 800.],
+        PumpOption.H: [68., 62., 52., 38.],
+        PumpOption.P: [60., 85., 105., 120.],
+        PumpOption.E: [55., 72., 78., 70.]
+    }).set_index(PumpOption.Q)
+    pump_option = PumpOption(
+        bwf_id='PU0001',
+        name='test pump',
+        nominal_flow_rate=500.,
+        lifetime=(10, 20),
+        _curves=curves
+    )
+
+    def pipes(*data):
+        return PipeData(*[np.array(x, dtype=np.float64) for x in zip(*data)])
+
+    #        GM0000 (source)
+    #       /      \
+    #   GM0001    GM0002
+    #   /    \        \
+    # GM0003 GM0004   GM0005
+    return TreeHydraulicModel(
+        reservoir_head=-2.0,
+        check_valve=pipes((1., 400., 0.0001, 0.)),
+        supply_pipe=pipes((8000., 400., 0.3, 1.5)),
+        pump_option=pump_option,
+        elevations=np.array([5., 8., 3., 12., 6., 2.]),
+        parents=np.array([-1, 0, 0, 1, 1, 2]),
+        pipes=pipes(
+            (0., 1., 0., 0.),
+            (3000., 300., 0.1, 0.5),
+            (5000., 250., 0.5, 0.),
+            (2000., 200., 1.0, 1.),
+            (4000., 150., 0.2, 0.),
+            (1500., 200., 0.05, 0.2)
+        ),
+        # GM0002 and GM0004 pipes are drawn towards the root
+        pipes_sign=np.array([1., 1., -1., 1., -1., 1.])
+    )
+
+def _run_epanet(model: TreeHydraulicModel, demands, n_running, speeds):
+    """Same layout of build_epanet_network with three pumps."""
+    T, N = demands.shape
+    n_pumps = 3
+
+    net = EPyT(use_project=True, ignore_error_codes=[2,4,5,6])
+    set_hydraulic_options(net)
+
+    head_curve = model.pump_option.head_curve
+    eff_curve = model.pump_option.eff_curve
+    for curve_id, curve_type, curve in [
+        ('hc', EpanetConstants.EN_PUMP_CURVE, head_curve),
+        ('ec', EpanetConstants.EN_EFFIC_CURVE, eff_curve)
+    ]:
+        net.addcurve(curve_id)
+        curve_idx = net.getcurveindex(curve_id)
+        net.setcurvetype(curve_idx, curve_type)
+        net.setcurve(curve_idx, list(curve.index), list(curve.values), len(curve))
+
+    for i in range(n_pumps):
+        net.add_pattern(pattern_id=f'PS0001-{i:02d}', pattern_values=list(np.where(n_running > i, speeds, 0.0)))
+    for j in range(N):
+        net.add_pattern(pattern_id=f'GM{j:04d}', pattern_values=list(demands[:, j]))
+
+    for j in range(N):
+        node_idx = net.addnode(f'GM{j:04d}', EpanetConstants.EN_JUNCTION)
+        net.setnodevalue(node_idx, EpanetConstants.EN_ELEVATION, model.elevations[j])
+        net.setnodevalue(node_idx, EpanetConstants.EN_BASEDEMAND, 1.0)
+        net.setnodevalue(node_idx, EpanetConstants.EN_PATTERN, net.getpatternindex(pattern_id=f'GM{j:04d}'))
+    node_idx = net.addnode('SS0001', EpanetConstants.EN_RESERVOIR)
+    net.setnodevalue(node_idx, EpanetConstants.EN_ELEVATION, model.reservoir_head)
+    for helper_id in ['PS0001-inlet', 'PS0001-outlet']:
+        node_idx = net.addnode(helper_id, EpanetConstants.EN_JUNCTION)
+        net.setnodevalue(node_idx, EpanetConstants.EN_ELEVATION, model.reservoir_head)
+
+    def add_pipe(link_id, link_type, from_node, to_node, data, k=0):
+        link_idx = net.addlink(link_id, link_type, from_node=from_node, to_node=to_node)
+        net.setpipedata(index=link_idx, length=data.length[k], diam=data.diameter[k],
+                        rough=data.roughness[k], mloss=data.minor_loss[k])
+        return link_idx
+
+    add_pipe('SS0001-CV', EpanetConstants.EN_CVPIPE, 'SS0001', 'PS0001-inlet', model.check_valve)
+    pumps_idx = []
+    for i in range(n_pumps):
+        link_idx = net.addlink(f'PS0001-{i:02d}', EpanetConstants.EN_PUMP, from_node='PS0001-inlet', to_node='PS0001-outlet')
+        net.setlinkvalue(link_idx, EpanetConstants.EN_PUMP_HCURVE, net.getcurveindex('hc'))
+        net.setlinkvalue(link_idx, EpanetConstants.EN_PUMP_ECURVE, net.getcurveindex('ec'))
+        net.setlinkvalue(link_idx, EpanetConstants.EN_LINKPATTERN, net.getpatternindex(f'PS0001-{i:02d}'))
+        pumps_idx.append(link_idx)
+    add_pipe('CS0001-00', EpanetConstants.EN_PIPE, 'PS0001-outlet', 'GM0000', model.supply_pipe)
+    pipes_idx = []
+    for j in range(1, N):
+        nodes = [f'GM{model.parents[j]:04d}', f'GM{j:04d}']
+        if model.pipes_sign[j] < 0:
+            nodes.reverse()
+        pipes_idx.append(add_pipe(f'CN{j:04d}-00', EpanetConstants.EN_PIPE, *nodes, model.pipes, j))
+
+    reservoir_idx = net.getnodeindex('SS0001')
+    consumptions, production, flows, energy = [], [], [], []
+    net.set_simulation_duration((T-1) * 60 * 60)
+    net.openH()
+    net.initH(EpanetConstants.EN_INITFLOW)
+    for _ in range(T):
+        net.runH()
+        d = np.array(net.getnodevalues(EpanetConstants.EN_DEMAND))
+        f = np.array(net.getlinkvalues(EpanetConstants.EN_FLOW))
+        e = np.array(net.getlinkvalues(EpanetConstants.EN_ENERGY))
+        consumptions.append(d[:N])
+        production.append(-d[reservoir_idx-1])
+        flows.append(f[[i-1 for i in pipes_idx]])
+        energy.append(e[[i-1 for i in pumps_idx]].sum())
+        net.nextH()
+    net.closeH()
+    net.close()
+
+    return np.array(consumptions), np.array(production), np.array(flows), np.array(energy)
+
+def test_tree_hydraulics_match_epanet():
+
+    model = _make_model()
+    T = 48
+    rng = np.random.default_rng(128)
+    demands = rng.uniform(20., 250., (T, 6))
+    demands[3, 2] = 0.
+    n_running = rng.integers(1, 4, T)
+    speeds = rng.uniform(0.6, 1.0, T)
+    n_running[5] = 0 # pumping station off
+
+    consumptions, production, flows, energy = _run_epanet(model, demands, n_running, speeds)
+
+    solution = solve_tree_hydraulics(model, demands, n_running, speeds)
+    assert solution.converged.all()
+
+    # Within the accuracy of EPANET
+    assert np.abs(solution.consumptions - consumptions).max() < 0.05
+    assert np.abs(solution.production - production).max() < 0.05
+    assert np.abs(solution.pipes_flow[:, 1:] - flows).max() < 0.05
+    # Some hours are limited by the pressure, others by the pumps
+    assert (consumptions.sum(axis=1) < demands.sum(axis=1) - 1.).any()
+
+    power = pumps_power(model.pump_option, solution.pump_heads, solution.production, n_running, speeds)
+    np.testing.assert_allclose(power * n_running, energy, rtol=1e-3, atol=1e-3)
+
+def test_tree_hydraulics_hours_are_independent():
+
+    model = _make_model()
+    T = 24
+    rng = np.random.default_rng(7)
+    demands = rng.uniform(20., 250., (T, 6))
+    n_running = rng.integers(0, 4, T)
+    speeds = rng.uniform(0.5, 1.0, T)
+
+    batch = solve_tree_hydraulics(model, demands, n_running, speeds)
+    for t in [0, 11, 23]:
+        single = solve_tree_hydraulics(model, demands[t:t+1], n_running[t:t+1], speeds[t:t+1])
+        assert single.production[0] == batch.production[t]
+        assert np.array_equal(single.consumptions[0], batch.consumptions[t])
+        assert single.trials[0] == batch.trials[t]
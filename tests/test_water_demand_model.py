@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from water_futures_battle.core import Settings
+from water_futures_battle.jurisdictions.services import generate_demands, generate_nrw_demand, generate_water_demand
+from water_futures_battle.nrw_model.enums import NRWClass
+from water_futures_battle.water_demand_model.entities import WaterDemandModelPattern
+from water_futures_battle.water_demand_model.properties import WaterDemandModelDB
+from water_futures_battle.water_demand_model.services import (
+    N_MODULATION_DRAWS,
+    modulate_house_pattern,
+    modulate_patterns
+)
+
+def test_batched_modulation_matches_single():
+
+    RNG = np.random.default_rng(128)
+    patterns = [
+        WaterDemandModelPattern(
+            bwf_id=f"RES{i:02d}",
+            category='residential',
+            values=RNG.uniform(0.1, 2.0, 24*365)
+        )
+        for i in range(4)
+    ]
+    # The same pattern can be assigned to more than one municipality
+    assigned = [patterns[i] for i in [0, 1, 2, 3, 1, 0]]
+
+    for max_yearly_temp in [18.3, 27.9]:
+        # modulate_house_pattern takes all its draws from the same generator
+        expected = np.stack([
+            modulate_house_pattern(p.values, max_yearly_temp, np.random.default_rng(seed))
+            for seed, p in enumerate(assigned)
+        ])
+
+        draws = np.stack([
+            np.random.default_rng(seed).random(N_MODULATION_DRAWS)
+            for seed in range(len(assigned))
+        ])
+        modulated = modulate_patterns(assigned, max_yearly_temp, draws)
+
+        assert np.array_equal(modulated, expected)
+
+def test_draws_are_concatenation_consistent():
+    # generate_demands draws the three modulations of a municipality at once
+    RNG = np.random.default_rng(128)
+    pattern = RNG.uniform(0.1, 2.0, 24*365)
+
+    RNG_single = np.random.default_rng(7)
+    expected = [modulate_house_pattern(pattern, 20., RNG_single) for _ in range(3)]
+    expected.append(RNG_single.random())
+
+    RNG_batch = np.random.default_rng(7)
+    draws = RNG_batch.random(3 * N_MODULATION_DRAWS).reshape((3, N_MODULATION_DRAWS))
+    p = WaterDemandModelPattern(bwf_id='RES00', category='residential', values=pattern)
+    modulated = modulate_patterns([p, p, p], 20., draws)
+
+    assert np.array_equal(modulated, np.stack(expected[:3]))
+    assert RNG_batch.random() == expected[3]
+
+class _Municipality:
+    # Only what the demand generation reads, the same in every year
+    def __init__(self, cbs_id, patterns, weights, n_houses, n_businesses, nrw_class, dist_network_length):
+        self.cbs_id = cbs_id
+        self.state = SimpleNamespace(cbs_id='NL0000')
+        self.assigned_demand_patterns = patterns
+        self.assigned_res_patterns_weights = weights
+        self.n_houses = n_houses
+        self.n_businesses = n_businesses
+        self.nrw_class = nrw_class
+        self.dist_network_length = dist_network_length
+
+@pytest.mark.parametrize('rng_mode', ['sequential', 'keyed'])
+def test_batched_demands_match_single(rng_mode):
+
+    RNG = np.random.default_rng(128)
+    wdm_patterns = {
+        bwf_id: WaterDemandModelPattern(bwf_id=bwf_id, category=category, values=RNG.uniform(0.1, 2.0, 24*365))
+        for bwf_id, category in [('RES01', 'residential'), ('RES02', 'residential'), ('RES03', 'residential'), ('BUS01', 'business')]
+    }
+    # GM0003 has no per unit demands of its own, they are drawn within the national bounds
+    per_unit = lambda values: pd.DataFrame(
+        [values],
+        index=pd.DatetimeIndex([pd.Timestamp('2020-01-01')], name='timestamp'),
+        columns=['NL0000-min', 'NL0000-max', 'GM0001', 'GM0002']
+    )
+    wdm_db = WaterDemandModelDB(dataframes={
+        WaterDemandModelDB.PER_HOUSE_DEMAND: per_unit([0.004, 0.008, 0.005, 0.006]),
+        WaterDemandModelDB.PER_BUSINESS_DEMAND: per_unit([0.01, 0.03, 0.02, 0.015])
+    })
+    municipalities = [
+        _Municipality('GM0001', (('RES01', 'RES02'), 'BUS01'), (0.3, 0.7), 12000, 800, NRWClass.A, 150.),
+        _Municipality('GM0002', (('RES02', 'RES03'), 'BUS01'), (0.6, 0.4), 4000, 150, NRWClass.C, 80.),
+        _Municipality('GM0003', (('RES03', 'RES01'), 'BUS01'), (0.5, 0.5), 25000, 2100, NRWClass.E, 400.)
+    ]
+
+    def settings():
+        return Settings.from_config({'start_year': 2025, 'end_year': 2025, 'seed': 128, 'lifeline_volume': 50, 'rng_mode': rng_mode})
+
+    # Municipality by municipality, as before the batched version
+    single_settings = settings()
+    expected_bill, expected_total = [], []
+    for municipality in municipalities:
+        house, business = generate_water_demand((wdm_patterns, wdm_db), municipality, 2025, 27.5, single_settings)
+        bill = house + business
+        nrw = generate_nrw_demand(municipality, 2025, None, bill, single_settings)
+        expected_bill.append(bill)
+        expected_total.append(bill + np.repeat(nrw, 24))
+
+    bill_demands, total_demands = generate_demands(
+        (wdm_patterns, wdm_db),
+        nrw_info_db=None,
+        municipalities=municipalities,
+        year=2025,
+        max_yearly_temperature=27.5,
+        settings=settings()
+    )
+
+    np.testing.assert_array_equal(bill_demands, np.stack(expected_bill))
+    np.testing.assert_array_equal(total_demands, np.stack(expected_total))
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from water_futures_battle.water_utilities.dynamic_properties import WaterUtilityResults
+from water_futures_battle.water_utilities.entities import WaterExchanges
+
+def _exchanges_by_column(df: pd.DataFrame, wu_id: str) -> pd.DataFrame:
+    values = {}
+    for col in df.columns:
+        if wu_id not in col:
+            continue
+        wu_from, wu_to = col.split('-')
+        if wu_id == wu_from:
+            values[wu_to] = df[col]
+        else:
+            values[wu_from] = -df[col]
+    return pd.DataFrame(values).fillna(0.0)
+
+def test_water_exchanges():
+    results = WaterUtilityResults()
+    exchanges = WaterExchanges()
+    rng = np.random.default_rng(2)
+
+    wus = ['WU01', 'WU02', 'WU03', 'WU05']
+    for year, pairs in ((2025, [(0, 1), (0, 2), (1, 2)]), (2026, [(0, 1), (0, 2), (1, 2), (2, 3)])):
+        results.commit(
+            a_property=WaterUtilityResults.NET_WATER_EXCHANGE,
+            timestamps=pd.date_range(start=pd.Timestamp(year=year, month=1, day=1), periods=1, freq='YS'),
+            data={f'{wus[i]}-{wus[j]}': rng.normal() * 1e3 for i, j in pairs}
+        )
+        # Written again: the array follows the results
+        exchanges.refresh(results)
+
+        df = results[WaterUtilityResults.NET_WATER_EXCHANGE]
+        for wu_id in wus + ['WU04']:
+            expected = _exchanges_by_column(df, wu_id)
+            values, partners = exchanges.of(wu_id)
+            assert partners == list(expected.columns)
+            if partners:
+                np.testing.assert_array_equal(values, expected.to_numpy())
+
+            for ts in (pd.Timestamp('2025-01-01'), pd.Timestamp('2026-01-01'), pd.Timestamp('2027-01-01')):
+                at = exchanges.of_at(wu_id, ts)
+                if ts not in expected.index:
+                    assert at is None
+                else:
+                    np.testing.assert_array_equal(at[0], expected.loc[ts].to_numpy())
+
+    # antisymmetric
+    np.testing.assert_array_equal(exchanges.values, -exchanges.values.transpose(0, 2, 1))